@@ -0,0 +1,65 @@
+"""056 resource metric rollups
+
+Revision ID: a0b2d4f6h056
+Revises: z9a1c3e5g055
+Create Date: 2026-10-19
+
+Rollups de resource_metrics por bucket de 5 minutos, 1 hora y 1 día
+(min/avg/max/p95). El job resource_metric_rollups del scheduler los llena
+desde las muestras crudas existentes en su primera corrida.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a0b2d4f6h056"
+down_revision: Union[str, Sequence[str], None] = "z9a1c3e5g055"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS resource_metric_rollups (
+            id SERIAL PRIMARY KEY,
+            resolution VARCHAR(3) NOT NULL,
+            bucket_start TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            node_id INTEGER REFERENCES proxmox_nodes(id),
+            container_id INTEGER REFERENCES lxc_containers(id),
+            samples INTEGER NOT NULL DEFAULT 0,
+            cpu_percent_min DOUBLE PRECISION,
+            cpu_percent_avg DOUBLE PRECISION,
+            cpu_percent_max DOUBLE PRECISION,
+            cpu_percent_p95 DOUBLE PRECISION,
+            ram_mb_min DOUBLE PRECISION,
+            ram_mb_avg DOUBLE PRECISION,
+            ram_mb_max DOUBLE PRECISION,
+            ram_mb_p95 DOUBLE PRECISION,
+            disk_gb_min DOUBLE PRECISION,
+            disk_gb_avg DOUBLE PRECISION,
+            disk_gb_max DOUBLE PRECISION,
+            disk_gb_p95 DOUBLE PRECISION
+        )
+        """
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_resource_metric_rollups_id ON resource_metric_rollups (id)")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_resource_rollups_node "
+        "ON resource_metric_rollups (resolution, node_id, bucket_start)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_resource_rollups_container "
+        "ON resource_metric_rollups (resolution, container_id, bucket_start)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_resource_rollups_bucket "
+        "ON resource_metric_rollups (resolution, bucket_start)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS resource_metric_rollups")
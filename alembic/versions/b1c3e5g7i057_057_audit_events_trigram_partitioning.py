@@ -0,0 +1,111 @@
+"""057 audit events trigram search and optional partitioning
+
+Revision ID: b1c3e5g7i057
+Revises: a0b2d4f6h056
+Create Date: 2026-10-19
+
+Búsqueda de auditoría por keyset (services.audit_search): índice
+(created_at, id) para paginar sin OFFSET e índices GIN pg_trgm sobre
+resource y details::text para los filtros ILIKE de recurso / tenant.
+
+Con AUDIT_EVENTS_PARTITIONED=true al migrar, audit_events se convierte en
+tabla particionada por mes (RANGE created_at, PK (id, created_at)) y la
+retención pasa a descartar particiones completas. La conversión copia la
+tabla: correrla en una ventana de mantenimiento. Sin particionado los
+índices se crean con CREATE INDEX CONCURRENTLY (fuera de la transacción de
+la migración); si uno queda INVALID por un fallo, borrarlo y re-ejecutar.
+"""
+
+import os
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b1c3e5g7i057"
+down_revision: Union[str, Sequence[str], None] = "a0b2d4f6h056"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _partition_audit_events() -> None:
+    op.execute(
+        """
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_partitioned_table
+                       WHERE partrelid = to_regclass('audit_events')) THEN
+                RETURN;
+            END IF;
+
+            ALTER SEQUENCE IF EXISTS audit_events_id_seq OWNED BY NONE;
+            ALTER TABLE audit_events RENAME TO audit_events_unpartitioned;
+            ALTER INDEX IF EXISTS audit_events_pkey RENAME TO audit_events_unpartitioned_pkey;
+            UPDATE audit_events_unpartitioned SET created_at = now() WHERE created_at IS NULL;
+
+            CREATE TABLE audit_events (
+                LIKE audit_events_unpartitioned INCLUDING DEFAULTS,
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at);
+            ALTER TABLE audit_events ALTER COLUMN created_at SET NOT NULL;
+
+            -- Un mes por partición desde el evento más antiguo hasta dos meses adelante
+            DECLARE
+                first_month DATE := date_trunc('month', COALESCE(
+                    (SELECT min(created_at) FROM audit_events_unpartitioned), now()))::date;
+                last_month DATE := (date_trunc('month', now()) + interval '2 months')::date;
+            BEGIN
+                WHILE first_month <= last_month LOOP
+                    EXECUTE format(
+                        'CREATE TABLE IF NOT EXISTS %I PARTITION OF audit_events FOR VALUES FROM (%L) TO (%L)',
+                        'audit_events_y' || to_char(first_month, 'YYYY') || 'm' || to_char(first_month, 'MM'),
+                        first_month, (first_month + interval '1 month')::date
+                    );
+                    first_month := (first_month + interval '1 month')::date;
+                END LOOP;
+            END;
+            CREATE TABLE IF NOT EXISTS audit_events_default PARTITION OF audit_events DEFAULT;
+
+            INSERT INTO audit_events SELECT * FROM audit_events_unpartitioned;
+            DROP TABLE audit_events_unpartitioned;
+            ALTER SEQUENCE IF EXISTS audit_events_id_seq OWNED BY audit_events.id;
+        END $$;
+        """
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_audit_events_event_type ON audit_events(event_type)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_audit_events_created_at ON audit_events(created_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_audit_type_created ON audit_events(event_type, created_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_audit_actor_created ON audit_events(actor_username, created_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_audit_actor_id_created ON audit_events(actor_id, created_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_audit_status_created ON audit_events(status, created_at)")
+
+
+_SEARCH_INDEXES = (
+    "ix_audit_created_id ON audit_events(created_at, id)",
+    "ix_audit_resource_trgm ON audit_events USING gin (resource gin_trgm_ops)",
+    "ix_audit_details_trgm ON audit_events USING gin ((details::text) gin_trgm_ops)",
+)
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    if os.getenv("AUDIT_EVENTS_PARTITIONED", "false").lower() == "true":
+        # CONCURRENTLY no aplica a la tabla padre particionada
+        _partition_audit_events()
+        for index in _SEARCH_INDEXES:
+            op.execute(f"CREATE INDEX IF NOT EXISTS {index}")
+        return
+
+    # Sin bloquear escrituras en una audit_events grande: fuera de la transacción
+    with op.get_context().autocommit_block():
+        for index in _SEARCH_INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index}")
+
+
+def downgrade() -> None:
+    # El particionado no se revierte: la tabla particionada sigue siendo compatible
+    op.execute("DROP INDEX IF EXISTS ix_audit_details_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_audit_resource_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_audit_created_id")
@@ -0,0 +1,41 @@
+"""058 funnel lead outbox key
+
+Revision ID: c2d4f6h8j058
+Revises: b1c3e5g7i057
+Create Date: 2026-10-19
+
+Clave única por entrada del outbox de leads (outbox_key, generada al encolar):
+si dos workers drenan el mismo lote (reclamo vencido), el segundo INSERT
+choca con el índice único en lugar de duplicar el lead.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c2d4f6h8j058"
+down_revision: Union[str, Sequence[str], None] = "b1c3e5g7i057"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        DO $$
+        BEGIN
+            IF to_regclass('public.funnel_leads') IS NULL THEN
+                RETURN;
+            END IF;
+            ALTER TABLE funnel_leads ADD COLUMN IF NOT EXISTS outbox_key VARCHAR(64);
+            CREATE UNIQUE INDEX IF NOT EXISTS ux_funnel_leads_outbox_key ON funnel_leads(outbox_key);
+        END $$;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ux_funnel_leads_outbox_key")
+    op.execute("ALTER TABLE IF EXISTS funnel_leads DROP COLUMN IF EXISTS outbox_key")
@@ -0,0 +1,44 @@
+"""059 resource rollups unique bucket
+
+Revision ID: d3e5g7i9k059
+Revises: c2d4f6h8j058
+Create Date: 2026-10-19
+
+Un rollup por (resolución, bucket, nodo, contenedor): índice único sobre
+COALESCE(node_id, 0) / COALESCE(container_id, 0) para que los NULL también
+choquen. Antes de crearlo se eliminan duplicados dejados por corridas
+concurrentes del job (se conserva la fila más reciente).
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d3e5g7i9k059"
+down_revision: Union[str, Sequence[str], None] = "c2d4f6h8j058"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        DELETE FROM resource_metric_rollups r
+        USING resource_metric_rollups newer
+        WHERE newer.resolution = r.resolution
+          AND newer.bucket_start = r.bucket_start
+          AND COALESCE(newer.node_id, 0) = COALESCE(r.node_id, 0)
+          AND COALESCE(newer.container_id, 0) = COALESCE(r.container_id, 0)
+          AND newer.id > r.id
+        """
+    )
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_resource_rollups_target_bucket ON resource_metric_rollups "
+        "(resolution, bucket_start, COALESCE(node_id, 0), COALESCE(container_id, 0))"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ux_resource_rollups_target_bucket")
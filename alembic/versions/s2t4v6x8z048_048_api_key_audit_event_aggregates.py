@@ -0,0 +1,34 @@
+"""048 api key audit event aggregates
+
+Revision ID: s2t4v6x8z048
+Revises: r8s9t0u1v345
+Create Date: 2026-10-19
+
+El writer batch del gateway agrega fallos idénticos (misma key/IP/status/motivo)
+en una sola fila: event_count cuenta las repeticiones y last_seen_at marca la última.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "s2t4v6x8z048"
+down_revision: Union[str, Sequence[str], None] = "r8s9t0u1v345"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "api_key_audit_logs",
+        sa.Column("event_count", sa.Integer(), nullable=False, server_default=sa.text("1")),
+    )
+    op.add_column("api_key_audit_logs", sa.Column("last_seen_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("api_key_audit_logs", "last_seen_at")
+    op.drop_column("api_key_audit_logs", "event_count")
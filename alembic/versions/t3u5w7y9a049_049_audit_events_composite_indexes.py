@@ -0,0 +1,33 @@
+"""049 audit events composite indexes
+
+Revision ID: t3u5w7y9a049
+Revises: s2t4v6x8z048
+Create Date: 2026-10-19
+
+AuditLogStore delega la búsqueda histórica a audit_events. Se agregan índices
+compuestos (actor_id, created_at) y (status, created_at) para los filtros del
+listado; (event_type, created_at) y (actor_username, created_at) ya existen.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "t3u5w7y9a049"
+down_revision: Union[str, Sequence[str], None] = "s2t4v6x8z048"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE INDEX IF NOT EXISTS ix_audit_type_created ON audit_events(event_type, created_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_audit_actor_created ON audit_events(actor_username, created_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_audit_actor_id_created ON audit_events(actor_id, created_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_audit_status_created ON audit_events(status, created_at)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_audit_status_created")
+    op.execute("DROP INDEX IF EXISTS ix_audit_actor_id_created")
@@ -0,0 +1,78 @@
+"""050 funnel lead dedupe hashes and stats counters
+
+Revision ID: u4v6x8z0b050
+Revises: t3u5w7y9a049
+Create Date: 2026-10-19
+
+La captura pública pasa por un outbox local que se drena por lotes. El drain
+deduplica por (niche, email_hash) y (niche, phone_hash) y mantiene contadores
+por nicho en funnel_lead_stats para que /api/public/funnel/stats no escanee
+funnel_leads. funnel_leads se crea con init_db (create_all), así que todo va
+protegido con IF EXISTS / IF NOT EXISTS.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "u4v6x8z0b050"
+down_revision: Union[str, Sequence[str], None] = "t3u5w7y9a049"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        DO $$
+        BEGIN
+            IF to_regclass('public.funnel_leads') IS NULL THEN
+                RETURN;
+            END IF;
+
+            ALTER TABLE funnel_leads ADD COLUMN IF NOT EXISTS email_hash VARCHAR(64);
+            ALTER TABLE funnel_leads ADD COLUMN IF NOT EXISTS phone_hash VARCHAR(64);
+
+            UPDATE funnel_leads
+               SET email_hash = encode(sha256(convert_to(lower(trim(email)), 'UTF8')), 'hex')
+             WHERE email_hash IS NULL AND coalesce(trim(email), '') <> '';
+
+            UPDATE funnel_leads
+               SET phone_hash = encode(sha256(convert_to(regexp_replace(phone, '\\D', '', 'g'), 'UTF8')), 'hex')
+             WHERE phone_hash IS NULL
+               AND length(regexp_replace(coalesce(phone, ''), '\\D', '', 'g')) >= 7;
+
+            CREATE INDEX IF NOT EXISTS ix_funnel_leads_niche_email_hash ON funnel_leads (niche, email_hash);
+            CREATE INDEX IF NOT EXISTS ix_funnel_leads_niche_phone_hash ON funnel_leads (niche, phone_hash);
+
+            CREATE TABLE IF NOT EXISTS funnel_lead_stats (
+                niche funnelniche PRIMARY KEY,
+                lead_count INTEGER NOT NULL DEFAULT 0,
+                qualified_count INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP WITHOUT TIME ZONE
+            );
+
+            INSERT INTO funnel_lead_stats (niche, lead_count, qualified_count, updated_at)
+            SELECT niche,
+                   count(*),
+                   count(*) FILTER (WHERE qualified IS TRUE),
+                   (now() AT TIME ZONE 'utc')
+              FROM funnel_leads
+             GROUP BY niche
+            ON CONFLICT (niche) DO UPDATE
+               SET lead_count = EXCLUDED.lead_count,
+                   qualified_count = EXCLUDED.qualified_count,
+                   updated_at = EXCLUDED.updated_at;
+        END $$;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS funnel_lead_stats")
+    op.execute("DROP INDEX IF EXISTS ix_funnel_leads_niche_phone_hash")
+    op.execute("DROP INDEX IF EXISTS ix_funnel_leads_niche_email_hash")
+    op.execute("ALTER TABLE IF EXISTS funnel_leads DROP COLUMN IF EXISTS phone_hash")
+    op.execute("ALTER TABLE IF EXISTS funnel_leads DROP COLUMN IF EXISTS email_hash")
@@ -0,0 +1,34 @@
+"""051 session geo events located index
+
+Revision ID: v5w7y9a1c051
+Revises: u4v6x8z0b050
+Create Date: 2026-10-19
+
+El índice en memoria de última ubicación (viaje imposible) se carga con
+DISTINCT ON (tenant_db, odoo_login) ordenado todo DESC sobre los eventos con
+coordenadas. Índice parcial compuesto (recorrido hacia atrás); la
+retención (DSAM_GEO_EVENT_RETENTION_DAYS) usa el índice existente de event_at.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "v5w7y9a1c051"
+down_revision: Union[str, Sequence[str], None] = "u4v6x8z0b050"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_geo_events_user_located "
+        "ON session_geo_events (tenant_db, odoo_login, event_at, id) "
+        "WHERE geo_lat IS NOT NULL"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_geo_events_user_located")
@@ -0,0 +1,66 @@
+"""052 session geo daily rollups
+
+Revision ID: w6x8z0b2d052
+Revises: v5w7y9a1c051
+Create Date: 2026-10-19
+
+Rollup diario del mapa de calor DSAM por (tenant, país, ciudad, lat/lon
+redondeadas a 2 decimales). El sync lo incrementa al registrar eventos geo;
+aquí se crea la tabla y se rellena con los eventos existentes para que el
+mapa no pierda histórico al compactar session_geo_events.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "w6x8z0b2d052"
+down_revision: Union[str, Sequence[str], None] = "v5w7y9a1c051"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS session_geo_daily_rollups (
+            id SERIAL PRIMARY KEY,
+            day TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            tenant_db VARCHAR(100) NOT NULL,
+            geo_country_code VARCHAR(3) NOT NULL DEFAULT '',
+            geo_country VARCHAR(100),
+            geo_city VARCHAR(100) NOT NULL DEFAULT '',
+            geo_lat DOUBLE PRECISION NOT NULL,
+            geo_lon DOUBLE PRECISION NOT NULL,
+            event_count INTEGER NOT NULL DEFAULT 0,
+            CONSTRAINT uq_geo_rollup_cell
+                UNIQUE (day, tenant_db, geo_country_code, geo_city, geo_lat, geo_lon)
+        )
+        """
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_session_geo_daily_rollups_id ON session_geo_daily_rollups (id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_geo_rollups_day ON session_geo_daily_rollups (day)")
+    op.execute(
+        """
+        INSERT INTO session_geo_daily_rollups
+            (day, tenant_db, geo_country_code, geo_country, geo_city, geo_lat, geo_lon, event_count)
+        SELECT date_trunc('day', event_at),
+               tenant_db,
+               coalesce(geo_country_code, ''),
+               max(geo_country),
+               coalesce(geo_city, ''),
+               round(geo_lat::numeric, 2)::double precision,
+               round(geo_lon::numeric, 2)::double precision,
+               count(*)
+          FROM session_geo_events
+         WHERE geo_lat IS NOT NULL AND geo_lon IS NOT NULL AND event_at IS NOT NULL
+         GROUP BY 1, 2, 3, 5, 6, 7
+        ON CONFLICT ON CONSTRAINT uq_geo_rollup_cell DO NOTHING
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS session_geo_daily_rollups")
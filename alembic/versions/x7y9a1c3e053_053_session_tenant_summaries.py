@@ -0,0 +1,50 @@
+"""053 session tenant summaries
+
+Revision ID: x7y9a1c3e053
+Revises: w6x8z0b2d052
+Create Date: 2026-10-19
+
+Read model del dashboard DSAM: una fila por tenant con sesiones activas
+(contadores, sesiones por país y vista agrupada por usuario). La llena el
+ciclo de sync DSAM; no se rellena aquí porque la clasificación de cuentas
+(facturable/operativa) se calcula en Python y el primer sync la completa.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "x7y9a1c3e053"
+down_revision: Union[str, Sequence[str], None] = "w6x8z0b2d052"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS session_tenant_summaries (
+            id SERIAL PRIMARY KEY,
+            tenant_db VARCHAR(100) NOT NULL UNIQUE,
+            customer_name VARCHAR(255),
+            total_sessions INTEGER NOT NULL DEFAULT 0,
+            billable_users INTEGER NOT NULL DEFAULT 0,
+            operational_users INTEGER NOT NULL DEFAULT 0,
+            unknown_users INTEGER NOT NULL DEFAULT 0,
+            countries JSON,
+            users JSON,
+            refreshed_at TIMESTAMP WITHOUT TIME ZONE
+        )
+        """
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_session_tenant_summaries_id ON session_tenant_summaries (id)")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_session_summaries_rank "
+        "ON session_tenant_summaries (total_sessions, tenant_db)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS session_tenant_summaries")
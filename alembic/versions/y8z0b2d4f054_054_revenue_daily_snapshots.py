@@ -0,0 +1,50 @@
+"""054 revenue daily snapshots
+
+Revision ID: y8z0b2d4f054
+Revises: x7y9a1c3e053
+Create Date: 2026-10-19
+
+Fotos diarias de revenue por (plan, partner, estado, cohorte). Las escribe la
+tarea revenue_daily_snapshot del scheduler, que además reconstruye los días
+faltantes desde subscriptions, invoices y seat_high_water; por eso no se
+rellena aquí.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "y8z0b2d4f054"
+down_revision: Union[str, Sequence[str], None] = "x7y9a1c3e053"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS revenue_daily_snapshots (
+            id SERIAL PRIMARY KEY,
+            day TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            plan_name VARCHAR(50) NOT NULL,
+            partner_id INTEGER NOT NULL DEFAULT 0,
+            status VARCHAR(20) NOT NULL,
+            cohort_month VARCHAR(7) NOT NULL,
+            subscriptions INTEGER NOT NULL DEFAULT 0,
+            customers INTEGER NOT NULL DEFAULT 0,
+            seats INTEGER NOT NULL DEFAULT 0,
+            mrr DOUBLE PRECISION NOT NULL DEFAULT 0,
+            source VARCHAR(10) NOT NULL DEFAULT 'live',
+            captured_at TIMESTAMP WITHOUT TIME ZONE,
+            CONSTRAINT uq_revenue_snapshot_cell UNIQUE (day, plan_name, partner_id, status, cohort_month)
+        )
+        """
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_revenue_daily_snapshots_id ON revenue_daily_snapshots (id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_revenue_snapshots_day ON revenue_daily_snapshots (day)")
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS revenue_daily_snapshots")
@@ -0,0 +1,40 @@
+"""055 kpi snapshots
+
+Revision ID: z9a1c3e5g055
+Revises: y8z0b2d4f054
+Create Date: 2026-10-19
+
+KPIs materializados del panel admin (overview de /api/reports). La tarea
+kpi_overview_snapshot del scheduler llena la fila al arrancar; si aún no
+existe, el primer request la calcula.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "z9a1c3e5g055"
+down_revision: Union[str, Sequence[str], None] = "y8z0b2d4f054"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS kpi_snapshots (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(50) NOT NULL UNIQUE,
+            payload JSON NOT NULL,
+            as_of TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            compute_ms INTEGER
+        )
+        """
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_kpi_snapshots_id ON kpi_snapshots (id)")
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS kpi_snapshots")
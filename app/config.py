@@ -72,6 +72,17 @@ STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY", "")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "")
 
 
+# ═══════════════════════════════════════════════════════
+# Reportes (fotos de revenue, KPIs materializados, tabla de cuotas)
+# ═══════════════════════════════════════════════════════
+# Días hacia atrás que la tarea diaria de revenue reconstruye si faltan fotos
+REVENUE_SNAPSHOT_BACKFILL_DAYS = int(os.getenv("REVENUE_SNAPSHOT_BACKFILL_DAYS", "90"))
+# Cada cuánto se recalcula el overview materializado de /api/reports/overview
+KPI_SNAPSHOT_REFRESH_SECONDS = int(os.getenv("KPI_SNAPSHOT_REFRESH_SECONDS", "300"))
+# Vigencia del resumen de cuotas de todos los clientes (GET /api/quotas)
+QUOTA_TABLE_CACHE_SECONDS = int(os.getenv("QUOTA_TABLE_CACHE_SECONDS", "300"))
+
+
 # ═══════════════════════════════════════════════════════
 # JWT / Auth
 # ═══════════════════════════════════════════════════════
@@ -105,12 +116,39 @@ ODOO_TEMPLATE_DB = os.getenv("ODOO_TEMPLATE_DB", "template_tenant")
 ODOO_TEMPLATE_DB_BY_COUNTRY = os.getenv("ODOO_TEMPLATE_DB_BY_COUNTRY", "DO=tenant_do")
 ODOO_FILESTORE_PATH = os.getenv("ODOO_FILESTORE_PATH", "/var/lib/odoo/filestore")
 ODOO_FILESTORE_PCT_ID = int(os.getenv("ODOO_FILESTORE_PCT_ID", os.getenv("LXC_CONTAINER_ID", "105")))
+# Recolector de uso Odoo para cuotas (services.odoo_usage): conexiones abiertas a la
+# vez por nodo, conexiones ociosas retenidas por nodo, tenants en paralelo y TTL
+ODOO_USAGE_MAX_CONNECTIONS_PER_NODE = int(os.getenv("ODOO_USAGE_MAX_CONNECTIONS_PER_NODE", "8"))
+ODOO_USAGE_IDLE_CONNECTIONS_PER_NODE = int(os.getenv("ODOO_USAGE_IDLE_CONNECTIONS_PER_NODE", "16"))
+ODOO_USAGE_CONCURRENCY = int(os.getenv("ODOO_USAGE_CONCURRENCY", "8"))
+ODOO_USAGE_CACHE_SECONDS = int(os.getenv("ODOO_USAGE_CACHE_SECONDS", "120"))
 
 # Proxmox host SSH — para operaciones pct exec desde LXC API
 PROXMOX_SSH_HOST = os.getenv("PROXMOX_SSH_HOST", "10.10.10.1")
 PROXMOX_SSH_USER = os.getenv("PROXMOX_SSH_USER", "root")
 PROXMOX_SSH_KEY = os.getenv("PROXMOX_SSH_KEY", "/root/.ssh/id_ed25519")
 
+# Escaneo de recursos (services.resource_monitor): SSH simultáneos por nodo y
+# tiempo máximo por nodo/contenedor antes de reportarlo como timeout
+RESOURCE_SCAN_PER_NODE_CONCURRENCY = int(os.getenv("RESOURCE_SCAN_PER_NODE_CONCURRENCY", "4"))
+RESOURCE_SCAN_TIMEOUT_SECONDS = float(os.getenv("RESOURCE_SCAN_TIMEOUT_SECONDS", "20"))
+# Retención del historial de métricas por resolución (días; 0 = sin límite) y
+# puntos por defecto de los gráficos históricos (LTTB)
+RESOURCE_METRIC_RAW_RETENTION_DAYS = int(os.getenv("RESOURCE_METRIC_RAW_RETENTION_DAYS", "7"))
+RESOURCE_METRIC_5M_RETENTION_DAYS = int(os.getenv("RESOURCE_METRIC_5M_RETENTION_DAYS", "30"))
+RESOURCE_METRIC_1H_RETENTION_DAYS = int(os.getenv("RESOURCE_METRIC_1H_RETENTION_DAYS", "400"))
+RESOURCE_METRIC_1D_RETENTION_DAYS = int(os.getenv("RESOURCE_METRIC_1D_RETENTION_DAYS", "0"))
+RESOURCE_METRIC_CHART_POINTS = int(os.getenv("RESOURCE_METRIC_CHART_POINTS", "500"))
+
+# Modelo incremental de capacidad (services.node_capacity_service): cada cuánto
+# se compara contra el recálculo completo y se reconstruye (cambios de otros procesos)
+NODE_CAPACITY_RESYNC_SECONDS = int(os.getenv("NODE_CAPACITY_RESYNC_SECONDS", "300"))
+
+# Retención de audit_events (services.audit_search; 0 = sin purga). Con la tabla
+# particionada (migración 057) se descartan meses completos y se crean por adelantado
+AUDIT_EVENTS_RETENTION_DAYS = int(os.getenv("AUDIT_EVENTS_RETENTION_DAYS", "0"))
+AUDIT_EVENTS_PARTITION_MONTHS_AHEAD = int(os.getenv("AUDIT_EVENTS_PARTITION_MONTHS_AHEAD", "2"))
+
 # ═══════════════════════════════════════════════════════
 # Dispersión Mercury — Feature Flags
 # ═══════════════════════════════════════════════════════
@@ -167,6 +205,16 @@ DSAM_REDIS_SESSION_SOURCES = os.getenv(
     "DSAM_REDIS_SESSION_SOURCES",
     "0|odoo17:session:*|odoo17,2|odoo19:session:*|odoo19",
 )
+# "scan" = full scan-and-diff en cada sync; "keyspace" = notificaciones de Redis
+# (requiere notify-keyspace-events con K, g, $ y x) + reconcile completo periódico.
+DSAM_SESSION_SYNC_MODE = os.getenv("DSAM_SESSION_SYNC_MODE", "scan").strip().lower()
+DSAM_INCREMENTAL_SYNC_SECONDS = int(os.getenv("DSAM_INCREMENTAL_SYNC_SECONDS", "5"))
+DSAM_FULL_RECONCILE_SECONDS = int(os.getenv("DSAM_FULL_RECONCILE_SECONDS", "900"))
+DSAM_GEO_EVENT_RETENTION_DAYS = int(os.getenv("DSAM_GEO_EVENT_RETENTION_DAYS", "90"))
+DSAM_GEO_ROLLUP_RETENTION_DAYS = int(os.getenv("DSAM_GEO_ROLLUP_RETENTION_DAYS", "400"))
+DSAM_LIVE_MAP_MAX_POINTS = int(os.getenv("DSAM_LIVE_MAP_MAX_POINTS", "3000"))
+DSAM_STREAM_QUEUE_SIZE = int(os.getenv("DSAM_STREAM_QUEUE_SIZE", "256"))
+DSAM_STREAM_HEARTBEAT_SECONDS = int(os.getenv("DSAM_STREAM_HEARTBEAT_SECONDS", "15"))
 DSAM_IMPOSSIBLE_TRAVEL_MIN_HOURS = float(os.getenv("DSAM_IMPOSSIBLE_TRAVEL_MIN_HOURS", "3"))
 DSAM_IMPOSSIBLE_TRAVEL_MIN_KM = float(os.getenv("DSAM_IMPOSSIBLE_TRAVEL_MIN_KM", "500"))
 
@@ -245,6 +293,11 @@ def _get_runtime_value_from_db(key: str):
         return _RUNTIME_DB_MISS
 
 
+def runtime_config_ttl_seconds() -> float:
+    """TTL del cache de runtime config (para caches derivados, p.ej. claves JWT)."""
+    return _RUNTIME_CACHE_TTL_SECONDS
+
+
 def invalidate_runtime_config_cache(*keys: str) -> None:
     """Invalidate cached runtime config values."""
     with _RUNTIME_CACHE_LOCK:
@@ -8,6 +8,7 @@ from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
+import asyncio
 import base64
 import hashlib
 import logging
@@ -20,6 +21,8 @@ validate_required()
 
 # Background scheduler
 from .services.background_scheduler import scheduler
+from .services.api_key_audit import api_key_audit_writer
+from .services.session_monitor import close_redis_clients
 
 # Import routers
 from .routes import auth, dashboard, tenants, onboarding, roles, tenant_portal, secure_auth, nodes, tunnels, provisioning, settings, billing, logs, domains, plans, customers, partners, leads, commissions, quotations, stripe_connect, suspension
@@ -102,6 +105,9 @@ async def lifespan(app: FastAPI):
     yield
     logger.info("🛑 Stopping background scheduler...")
     await scheduler.stop()
+    logger.info("🛑 Flushing gateway audit writer...")
+    await asyncio.to_thread(api_key_audit_writer.stop)
+    await close_redis_clients()
 
 
 app = FastAPI(
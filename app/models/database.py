@@ -1,5 +1,5 @@
 from contextlib import contextmanager
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Text, Enum, Float, ForeignKey, JSON, UniqueConstraint, Index, BigInteger
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Text, Enum, Float, ForeignKey, JSON, UniqueConstraint, Index, BigInteger, text
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
@@ -1431,6 +1431,46 @@ class ResourceMetric(Base):
     recorded_at = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None), index=True)
 
 
+class ResourceMetricRollup(Base):
+    """
+    Rollup de ResourceMetric por bucket cerrado (5m, 1h, 1d) y objetivo (nodo o
+    contenedor): min/avg/max/p95 de cada métrica. Lo mantiene el job de
+    rollups a partir de las muestras crudas, reemplazando ventanas completas;
+    permite retener historial largo después de purgar las muestras.
+    """
+    __tablename__ = "resource_metric_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    resolution = Column(String(3), nullable=False)         # 5m | 1h | 1d
+    bucket_start = Column(DateTime, nullable=False)
+    node_id = Column(Integer, ForeignKey("proxmox_nodes.id"), nullable=True)
+    container_id = Column(Integer, ForeignKey("lxc_containers.id"), nullable=True)
+    samples = Column(Integer, nullable=False, default=0)
+
+    cpu_percent_min = Column(Float)
+    cpu_percent_avg = Column(Float)
+    cpu_percent_max = Column(Float)
+    cpu_percent_p95 = Column(Float)
+    ram_mb_min = Column(Float)
+    ram_mb_avg = Column(Float)
+    ram_mb_max = Column(Float)
+    ram_mb_p95 = Column(Float)
+    disk_gb_min = Column(Float)
+    disk_gb_avg = Column(Float)
+    disk_gb_max = Column(Float)
+    disk_gb_p95 = Column(Float)
+
+    __table_args__ = (
+        Index("ix_resource_rollups_node", "resolution", "node_id", "bucket_start"),
+        Index("ix_resource_rollups_container", "resolution", "container_id", "bucket_start"),
+        Index("ix_resource_rollups_bucket", "resolution", "bucket_start"),
+        Index(
+            "ux_resource_rollups_target_bucket", "resolution", "bucket_start",
+            text("coalesce(node_id, 0)"), text("coalesce(container_id, 0)"), unique=True,
+        ),
+    )
+
+
 class SystemConfig(Base):
     """
     Configuración del sistema administrable desde /admin
@@ -1573,6 +1613,50 @@ class SeatHighWater(Base):
     subscription = relationship("Subscription", back_populates="seat_high_waters")
 
 
+class RevenueDailySnapshot(Base):
+    """
+    Foto diaria de revenue por (plan, partner, estado, cohorte de alta).
+    La escribe la tarea diaria (idempotente: reemplaza las filas del día) y
+    puede reconstruirse hacia atrás desde Subscription, Invoice y
+    SeatHighWater. Comparaciones, tendencias y cohortes leen rangos de días.
+    partner_id 0 = venta directa (para que entre en la clave única).
+    """
+    __tablename__ = "revenue_daily_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(DateTime, nullable=False)                 # Fecha (00:00 UTC)
+    plan_name = Column(String(50), nullable=False)
+    partner_id = Column(Integer, nullable=False, default=0)
+    status = Column(String(20), nullable=False)            # SubscriptionStatus.value
+    cohort_month = Column(String(7), nullable=False)       # YYYY-MM de alta del cliente
+    subscriptions = Column(Integer, nullable=False, default=0)
+    customers = Column(Integer, nullable=False, default=0)
+    seats = Column(Integer, nullable=False, default=0)
+    mrr = Column(Float, nullable=False, default=0)
+    source = Column(String(10), nullable=False, default="live")   # live | backfill
+    captured_at = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+
+    __table_args__ = (
+        UniqueConstraint("day", "plan_name", "partner_id", "status", "cohort_month", name="uq_revenue_snapshot_cell"),
+        Index("ix_revenue_snapshots_day", "day"),
+    )
+
+
+class KpiSnapshot(Base):
+    """
+    KPIs materializados del panel admin (una fila por vista, p. ej. "overview").
+    Los recalcula la tarea kpi_overview_snapshot o un ?fresh=1; el endpoint
+    sirve el payload tal cual junto con su as_of.
+    """
+    __tablename__ = "kpi_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(50), nullable=False, unique=True)
+    payload = Column(JSON, nullable=False)
+    as_of = Column(DateTime, nullable=False)
+    compute_ms = Column(Integer, nullable=True)
+
+
 # ═══════════════════════════════════════════════════════
 # ÉPICA 5: Invoices — emitidas en TENANT_READY
 # ═══════════════════════════════════════════════════════
@@ -1798,6 +1882,9 @@ class AuditEventRecord(Base):
     __table_args__ = (
         Index("ix_audit_type_created", "event_type", "created_at"),
         Index("ix_audit_actor_created", "actor_username", "created_at"),
+        Index("ix_audit_actor_id_created", "actor_id", "created_at"),
+        Index("ix_audit_status_created", "status", "created_at"),
+        Index("ix_audit_created_id", "created_at", "id"),
     )
 
 
@@ -2241,6 +2328,9 @@ def set_config(key: str, value: str, description: str = None, category: str = "g
         try:
             from ..config import invalidate_runtime_config_cache
             invalidate_runtime_config_cache(key)
+            from ..security.tokens import SIGNING_KEY_SETTINGS, reset_signing_keys
+            if key in SIGNING_KEY_SETTINGS:
+                reset_signing_keys()
         except Exception:
             pass
         return True
@@ -2485,6 +2575,9 @@ class ApiKeyAuditLog(Base):
     ip_address = Column(String(45), nullable=True)
     status_code = Column(Integer, nullable=False, default=200)
     reject_reason = Column(String(64), nullable=True, index=True)
+    # Fallos idénticos (misma key/IP/status/motivo) se agregan en una sola fila
+    event_count = Column(Integer, nullable=False, default=1, server_default="1")
+    last_seen_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None), index=True)
 
     __table_args__ = (
@@ -2692,6 +2785,64 @@ class SessionGeoEvent(Base):
     __table_args__ = (
         Index("ix_geo_events_user_time", "tenant_db", "odoo_login", "event_at"),
         Index("ix_geo_events_country", "geo_country_code", "event_at"),
+        # Warm load del índice de última ubicación (DISTINCT ON por usuario)
+        Index(
+            "ix_geo_events_user_located",
+            "tenant_db", "odoo_login", "event_at", "id",
+            postgresql_where=geo_lat.isnot(None),
+        ),
+    )
+
+
+class SessionGeoDailyRollup(Base):
+    """
+    Rollup diario de eventos geo por (tenant, país, ciudad, lat/lon redondeadas).
+    Se incrementa al registrar eventos (sync DSAM) y sirve el mapa de calor con
+    una suma por rango de días; los eventos crudos pueden compactarse luego.
+    País/ciudad vacíos se guardan como '' para que entren en la clave única.
+    """
+    __tablename__ = "session_geo_daily_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(DateTime, nullable=False)                 # Fecha (00:00 UTC)
+    tenant_db = Column(String(100), nullable=False)
+    geo_country_code = Column(String(3), nullable=False, default="")
+    geo_country = Column(String(100), nullable=True)
+    geo_city = Column(String(100), nullable=False, default="")
+    geo_lat = Column(Float, nullable=False)                # Redondeadas (GEO_ROLLUP_PRECISION)
+    geo_lon = Column(Float, nullable=False)
+    event_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "day", "tenant_db", "geo_country_code", "geo_city", "geo_lat", "geo_lon",
+            name="uq_geo_rollup_cell",
+        ),
+        Index("ix_geo_rollups_day", "day"),
+    )
+
+
+class SessionTenantSummary(Base):
+    """
+    Read model del dashboard DSAM: una fila por tenant con sesiones activas.
+    La mantiene el ciclo de sync (solo los tenants tocados) y la leen el
+    dashboard y la vista agrupada sin recorrer active_sessions.
+    """
+    __tablename__ = "session_tenant_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_db = Column(String(100), nullable=False, unique=True)
+    customer_name = Column(String(255), nullable=True)
+    total_sessions = Column(Integer, nullable=False, default=0)
+    billable_users = Column(Integer, nullable=False, default=0)
+    operational_users = Column(Integer, nullable=False, default=0)
+    unknown_users = Column(Integer, nullable=False, default=0)
+    countries = Column(JSON, default=list)          # [{"code", "country", "count"}]
+    users = Column(JSON, default=list)              # Vista agrupada por usuario
+    refreshed_at = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+
+    __table_args__ = (
+        Index("ix_session_summaries_rank", "total_sessions", "tenant_db"),
     )
 
 
@@ -2925,7 +3076,9 @@ class FunnelLead(Base):
     # Contacto
     full_name       = Column(String(150), nullable=False)
     email           = Column(String(150), nullable=False, index=True)
+    email_hash      = Column(String(64),  nullable=True)   # sha256(email normalizado) — dedupe
     phone           = Column(String(50),  nullable=True)
+    phone_hash      = Column(String(64),  nullable=True)   # sha256(dígitos del teléfono) — dedupe
     company_name    = Column(String(200), nullable=True)
     country         = Column(String(100), nullable=True)
     language        = Column(String(10),  nullable=True)  # es / en
@@ -2957,16 +3110,33 @@ class FunnelLead(Base):
     disqualify_reason = Column(String(200), nullable=True)
     jeturing_crm_id = Column(String(100), nullable=True)  # ID en Jeturing Odoo CRM
     notes           = Column(Text, nullable=True)
+    outbox_key      = Column(String(64), nullable=True)  # entrada del outbox que lo creó — idempotencia del drain
 
     created_at      = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None), index=True)
     updated_at      = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None), onupdate=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
 
     __table_args__ = (
+        Index("ux_funnel_leads_outbox_key", "outbox_key", unique=True),
         Index("ix_funnel_leads_niche_created", "niche", "created_at"),
         Index("ix_funnel_leads_email_niche",   "email", "niche"),
+        Index("ix_funnel_leads_niche_email_hash", "niche", "email_hash"),
+        Index("ix_funnel_leads_niche_phone_hash", "niche", "phone_hash"),
     )
 
 
+class FunnelLeadStat(Base):
+    """
+    Contadores incrementales por nicho para las stats públicas del funnel.
+    Se actualizan en la misma transacción que inserta los leads (drain del outbox).
+    """
+    __tablename__ = "funnel_lead_stats"
+
+    niche           = Column(Enum(FunnelNiche), primary_key=True)
+    lead_count      = Column(Integer, nullable=False, default=0)
+    qualified_count = Column(Integer, nullable=False, default=0)
+    updated_at      = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+
+
 # ──────────────────────────────────────────────────────────────────────────
 # Stripe Connect Family — Tenant central config (Phase 6)
 # ──────────────────────────────────────────────────────────────────────────
@@ -27,6 +27,7 @@ from ..models.database import (
     ApiKeyRotationRequest, ApiKeyRotationStatus,
     API_KEY_TIER_LIMITS, get_db,
 )
+from ..services.api_key_audit import api_key_audit_writer
 from ..services.api_key_lifecycle import cleanup_api_keys
 from ..services.rate_limiter import consume_rate_limit
 from .roles import _extract_token, verify_token_with_role
@@ -240,6 +241,18 @@ def run_api_key_lifecycle_cleanup(
     }
 
 
+@router.get("/maintenance/audit-writer", summary="Métricas del writer de auditoría del gateway")
+def get_audit_writer_metrics(
+    request: Request,
+    access_token: Optional[str] = Cookie(None),
+):
+    token_data = _auth(request, access_token)
+    if not (_is_admin(token_data) or _require_permission(token_data, "api_keys:read")):
+        raise HTTPException(status_code=403, detail="Se requiere permiso api_keys:read")
+
+    return {"success": True, "metrics": api_key_audit_writer.metrics()}
+
+
 # ─────────────────────────────────────────────
 # LIST
 # ─────────────────────────────────────────────
@@ -1,17 +1,22 @@
 """
 Audit Routes — Épica 10: Persistent Audit Event Log
 - POST /api/audit/log     → Registrar evento de auditoría
-- GET  /api/audit         → Consultar eventos (filtros + paginación)
+- GET  /api/audit         → Consultar eventos (filtros + paginación por cursor)
+- GET  /api/audit/export  → Exportar eventos filtrados (CSV/XLSX en streaming)
+- GET  /api/audit/security/recent → Eventos de seguridad recientes (buffer en memoria + histórico)
 - GET  /api/audit/{id}    → Detalle de evento
 """
-from fastapi import APIRouter, HTTPException, Depends, Request, Cookie
+from fastapi import APIRouter, HTTPException, Depends, Request, Cookie, Query
 from pydantic import BaseModel
+from datetime import datetime
 from typing import Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import String, or_
 import logging
 
 from ..models.database import AuditEventRecord, get_db
+from ..security.audit import AuditLogStore
+from ..services.audit_search import audit_filters, search_audit_events
+from ..services.exports import EXPORT_BATCH_SIZE, export_response, session_rows
 from .roles import _extract_token, _require_admin as _require_admin_base
 
 router = APIRouter(prefix="/api/audit", tags=["Audit"])
@@ -90,35 +95,28 @@ def list_audit_events(
     status: Optional[str] = None,
     limit: int = 100,
     offset: int = 0,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
 ):
-    """Consulta eventos de auditoría con filtros (incluye filtro por tenant)."""
+    """
+    Consulta eventos de auditoría con filtros (incluye filtro por tenant).
+    Paginación por keyset con `cursor` (= next_cursor de la página anterior);
+    `offset` se mantiene por compatibilidad. El total es estimado por encima
+    de AUDIT_EXACT_COUNT_LIMIT (total_is_estimate).
+    """
     _require_admin_base(request, access_token)
 
     limit = max(1, min(limit, 500))
     offset = max(0, offset)
 
-    q = db.query(AuditEventRecord)
-
-    if event_type:
-        q = q.filter(AuditEventRecord.event_type == event_type)
-    if actor_id is not None:
-        q = q.filter(AuditEventRecord.actor_id == actor_id)
-    if resource:
-        q = q.filter(AuditEventRecord.resource.ilike(f"%{resource}%"))
-    if status:
-        q = q.filter(AuditEventRecord.status == status)
-    if tenant:
-        tenant_like = f"%{tenant}%"
-        q = q.filter(
-            or_(
-                AuditEventRecord.resource.ilike(tenant_like),
-                AuditEventRecord.details.cast(String).ilike(tenant_like),
-            )
+    try:
+        page = search_audit_events(
+            db, limit=limit, cursor=cursor, offset=offset,
+            event_type=event_type, actor_id=actor_id, resource=resource, tenant=tenant, status=status,
         )
-
-    total = q.count()
-    events = q.order_by(AuditEventRecord.created_at.desc()).offset(offset).limit(limit).all()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    events = page["events"]
 
     items = [
         {
@@ -139,13 +137,81 @@ def list_audit_events(
     ]
 
     return {
-        "total": total,
+        "total": page["total"],
+        "total_is_estimate": page["total_is_estimate"],
+        "next_cursor": page["next_cursor"],
+        "has_more": page["has_more"],
         "items": items,
         # Backward compatibility
         "events": items,
     }
 
 
+_EXPORT_COLUMNS = (
+    AuditEventRecord.id,
+    AuditEventRecord.created_at,
+    AuditEventRecord.event_type,
+    AuditEventRecord.actor_id,
+    AuditEventRecord.actor_username,
+    AuditEventRecord.actor_role,
+    AuditEventRecord.ip_address,
+    AuditEventRecord.resource,
+    AuditEventRecord.action,
+    AuditEventRecord.status,
+    AuditEventRecord.details,
+)
+
+
+def _audit_export_rows(db: Session, **filters):
+    q = db.query(*_EXPORT_COLUMNS).filter(*audit_filters(**filters))
+    q = q.order_by(AuditEventRecord.created_at.desc(), AuditEventRecord.id.desc())
+    yield from q.yield_per(EXPORT_BATCH_SIZE)
+
+
+@router.get("/export")
+def export_audit_events(
+    request: Request,
+    access_token: str = Cookie(None),
+    format: str = Query("csv"),
+    event_type: Optional[str] = None,
+    actor_id: Optional[int] = None,
+    resource: Optional[str] = None,
+    tenant: Optional[str] = None,
+    status: Optional[str] = None,
+):
+    """Exporta todos los eventos que cumplen los filtros del listado (sin paginar)."""
+    _require_admin_base(request, access_token)
+    filters = dict(event_type=event_type, actor_id=actor_id, resource=resource, tenant=tenant, status=status)
+    header = [column.key for column in _EXPORT_COLUMNS]
+    return export_response(
+        format, "audit-events", header, session_rows(lambda db: _audit_export_rows(db, **filters)),
+    )
+
+
+@router.get("/security/recent")
+def recent_security_events(
+    request: Request,
+    access_token: str = Cookie(None),
+    event: Optional[str] = None,
+    username: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+):
+    """
+    Eventos de AuditLogger (login, WAF, 2FA…) más recientes primero, desde el
+    ring buffer indexado. Si `start_date` es anterior al buffer, la búsqueda
+    se delega a audit_events.
+    """
+    _require_admin_base(request, access_token)
+    limit = max(1, min(limit, 500))
+    items = AuditLogStore.search(
+        event=event, username=username, start_date=start_date, end_date=end_date, limit=limit, db=db,
+    )
+    return {"items": items, "total": len(items)}
+
+
 @router.get("/{event_id:int}")
 def get_audit_event(
     event_id: int,
@@ -185,6 +251,7 @@ def list_audit_events_legacy(
     status: Optional[str] = None,
     limit: int = 100,
     offset: int = 0,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
 ):
     return list_audit_events(
@@ -197,6 +264,7 @@ def list_audit_events_legacy(
         status=status,
         limit=limit,
         offset=offset,
+        cursor=cursor,
         db=db,
     )
 
@@ -1,7 +1,7 @@
 """
 Billing Routes - API para métricas de facturación y pagos
 """
-from fastapi import APIRouter, HTTPException, Request, Cookie
+from fastapi import APIRouter, HTTPException, Request, Cookie, Query
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta, timezone
 from ..models.database import (
@@ -9,7 +9,11 @@ from ..models.database import (
     StripeEvent, Plan, SessionLocal
 )
 from .roles import _require_admin as _require_admin_base, verify_token_with_role
-from ..services.pricing import get_plan_prices as _shared_get_plan_prices, get_plan_price_for_sub as _shared_get_plan_price_for_sub
+from ..services.exports import EXPORT_BATCH_SIZE, export_response, iter_batches, session_rows
+from ..services.pricing import PricingCatalog, get_subscription_prices
+from ..services.revenue_snapshots import (
+    backfill_revenue_snapshots, get_cohort_retention, get_mrr_on, get_revenue_series,
+)
 import logging
 
 router = APIRouter(prefix="/api/billing", tags=["Billing"])
@@ -23,16 +27,6 @@ def _is_jeturing_associated_customer(customer: Customer) -> bool:
     return bool(customer.is_admin_account) or email in JETURING_INTERNAL_EMAILS
 
 
-def _get_plan_prices(db) -> dict:
-    """Obtiene precios de planes desde la BD. Delega a pricing service."""
-    return _shared_get_plan_prices(db)
-
-
-def _get_plan_price_for_sub(db, sub) -> float:
-    """Obtiene precio para una suscripción. Delega a pricing service."""
-    return _shared_get_plan_price_for_sub(db, sub)
-
-
 def _verify_admin(token: str):
     """Verifica que el usuario sea admin"""
     if not token:
@@ -43,8 +37,8 @@ def _verify_admin(token: str):
         raise
 
 
-def _subscription_rows(db, *, limit: int, offset: int, status: Optional[str] = None) -> Dict[str, Any]:
-    query = db.query(Subscription).join(Customer)
+def _filter_subscriptions(query, status: Optional[str] = None):
+    """Suscripciones del canal (sin cuentas internas), filtradas por estado de pago."""
     query = query.filter(Customer.is_admin_account == False)
     query = query.filter(~Customer.email.in_(JETURING_INTERNAL_EMAILS))
 
@@ -54,23 +48,35 @@ def _subscription_rows(db, *, limit: int, offset: int, status: Optional[str] = N
         query = query.filter(Subscription.status == SubscriptionStatus.pending)
     elif status == "failed":
         query = query.filter(Subscription.status == SubscriptionStatus.past_due)
+    return query
+
+
+def _payment_status(sub: Subscription) -> str:
+    return (
+        "paid" if sub.status == SubscriptionStatus.active
+        else "pending" if sub.status == SubscriptionStatus.pending
+        else "failed" if sub.status == SubscriptionStatus.past_due
+        else "cancelled"
+    )
+
+
+def _subscription_rows(db, *, limit: int, offset: int, status: Optional[str] = None) -> Dict[str, Any]:
+    query = _filter_subscriptions(db.query(Subscription).join(Customer), status)
 
     total = query.count()
     subscriptions = query.order_by(Subscription.created_at.desc()).offset(offset).limit(limit).all()
+    prices = {
+        sub.id: price
+        for sub, price in get_subscription_prices(db, Subscription.id.in_([sub.id for sub in subscriptions]))
+    } if subscriptions else {}
 
     items = []
     for sub in subscriptions:
         customer = sub.customer
         plan = sub.plan_name or "basic"
-        price = _get_plan_price_for_sub(db, sub)
+        price = prices[sub.id]
         user_count = sub.user_count or 1
-
-        payment_status = (
-            "paid" if sub.status == SubscriptionStatus.active
-            else "pending" if sub.status == SubscriptionStatus.pending
-            else "failed" if sub.status == SubscriptionStatus.past_due
-            else "cancelled"
-        )
+        payment_status = _payment_status(sub)
 
         items.append({
             "id": sub.id,
@@ -115,26 +121,14 @@ async def get_billing_metrics(
     
     db = SessionLocal()
     try:
-        # Conteos por estado y plan
-        active_subs = (
-            db.query(Subscription)
-            .join(Customer)
-            .filter(
-                Subscription.status == SubscriptionStatus.active,
-                Customer.is_admin_account == False,
-                ~Customer.email.in_(JETURING_INTERNAL_EMAILS),
-            )
-            .all()
+        # Conteos por estado y plan (pricing por conjuntos: una consulta por estado)
+        catalog = PricingCatalog.load(db)
+        billable = (Customer.is_admin_account == False, ~Customer.email.in_(JETURING_INTERNAL_EMAILS))
+        active_subs = get_subscription_prices(
+            db, Subscription.status == SubscriptionStatus.active, *billable, catalog=catalog
         )
-        pending_subs = (
-            db.query(Subscription)
-            .join(Customer)
-            .filter(
-                Subscription.status == SubscriptionStatus.pending,
-                Customer.is_admin_account == False,
-                ~Customer.email.in_(JETURING_INTERNAL_EMAILS),
-            )
-            .all()
+        pending_subs = get_subscription_prices(
+            db, Subscription.status == SubscriptionStatus.pending, *billable, catalog=catalog
         )
         cancelled_30d = db.query(Subscription).filter(
             Subscription.status == SubscriptionStatus.cancelled,
@@ -145,16 +139,15 @@ async def get_billing_metrics(
         ).count()
         
         # Calcular MRR por plan (dinámico desde BD)
-        plan_prices = _get_plan_prices(db)
+        plan_prices = catalog.plan_prices()
         plan_names = list(set(list(plan_prices.keys()) + ["basic", "pro", "enterprise"]))
         plan_counts = {p: 0 for p in plan_names}
         plan_revenue = {p: 0 for p in plan_names}
         total_mrr = 0
         total_users = 0
         
-        for sub in active_subs:
+        for sub, price in active_subs:
             plan = sub.plan_name or "basic"
-            price = _get_plan_price_for_sub(db, sub)
             plan_counts[plan] = plan_counts.get(plan, 0) + 1
             plan_revenue[plan] = plan_revenue.get(plan, 0) + price
             total_mrr += price
@@ -162,8 +155,8 @@ async def get_billing_metrics(
         
         # Calcular pendiente de cobro
         pending_amount = 0
-        for sub in pending_subs:
-            pending_amount += _get_plan_price_for_sub(db, sub)
+        for _, price in pending_subs:
+            pending_amount += price
         
         # Calcular churn rate
         total_subs_30d_ago = len(active_subs) + cancelled_30d
@@ -225,7 +218,7 @@ async def get_billing_comparison(
     Comparación mes actual vs mes anterior para el dashboard de billing.
     
     Retorna:
-    - MRR actual vs anterior
+    - MRR actual vs anterior (última foto diaria del mes anterior)
     - Revenue actual vs anterior
     - Nuevos clientes vs perdidos
     """
@@ -237,12 +230,13 @@ async def get_billing_comparison(
         current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         previous_month_start = (current_month_start - timedelta(days=1)).replace(day=1)
         
-        # Suscripciones activas actuales
-        current_active = db.query(Subscription).join(Customer).filter(
+        # Suscripciones activas actuales, con su precio efectivo
+        current_active = get_subscription_prices(
+            db,
             Subscription.status == SubscriptionStatus.active,
             Customer.is_admin_account == False,
             ~Customer.email.in_(JETURING_INTERNAL_EMAILS),
-        ).all()
+        )
         
         # Nuevos clientes este mes
         new_customers = db.query(Customer).filter(
@@ -261,18 +255,12 @@ async def get_billing_comparison(
         
         # Calcular MRR actual (dinámico con user_count)
         current_mrr = 0
-        for sub in current_active:
-            current_mrr += _get_plan_price_for_sub(db, sub)
+        for _, price in current_active:
+            current_mrr += price
         
-        # Estimación mes anterior
-        plan_prices = _get_plan_prices(db)
-        avg_price = sum(plan_prices.values()) / len(plan_prices) if plan_prices else 29
-        previous_mrr = current_mrr
-        for _ in range(lost_customers):
-            previous_mrr += avg_price
-        for _ in range(new_customers):
-            previous_mrr -= avg_price
-        previous_mrr = max(0, previous_mrr)
+        # Mes anterior: última foto de revenue del mes (0 si aún no hay historia)
+        previous = get_mrr_on(db, current_month_start - timedelta(days=1))
+        previous_mrr = previous["mrr"] if previous else 0
         
         # Nombres de meses en español
         month_names = {
@@ -294,7 +282,8 @@ async def get_billing_comparison(
             "current_revenue": current_mrr,
             "previous_revenue": previous_mrr,
             "new_customers": new_customers,
-            "lost_customers": lost_customers
+            "lost_customers": lost_customers,
+            "previous_snapshot_day": previous["day"] if previous else None,
         }
     except Exception as e:
         logger.error(f"Error obteniendo comparación de billing: {e}")
@@ -307,12 +296,78 @@ async def get_billing_comparison(
             "current_revenue": 0,
             "previous_revenue": 0,
             "new_customers": 0,
-            "lost_customers": 0
+            "lost_customers": 0,
+            "previous_snapshot_day": None,
         }
     finally:
         db.close()
 
 
+@router.get("/trend")
+async def get_billing_trend(
+    request: Request,
+    access_token: str = Cookie(None),
+    days: int = 90,
+    group_by: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Serie diaria de MRR/ARR desde las fotos de revenue.
+    group_by: plan | partner | status | cohort (opcional).
+    """
+    _require_admin_base(request, access_token)
+
+    days = max(1, min(days, 730))
+    db = SessionLocal()
+    try:
+        start = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+        return {"days": days, "group_by": group_by, "items": get_revenue_series(db, start, group_by=group_by)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        db.close()
+
+
+@router.get("/cohorts")
+async def get_billing_cohorts(
+    request: Request,
+    access_token: str = Cookie(None),
+    months: int = 12,
+) -> Dict[str, Any]:
+    """Retención de MRR por cohorte de alta (fotos de fin de mes)."""
+    _require_admin_base(request, access_token)
+
+    months = max(1, min(months, 36))
+    db = SessionLocal()
+    try:
+        return {"months": months, "items": get_cohort_retention(db, months)}
+    finally:
+        db.close()
+
+
+@router.post("/snapshots/backfill")
+async def backfill_billing_snapshots(
+    request: Request,
+    access_token: str = Cookie(None),
+    days: int = 90,
+    overwrite: bool = False,
+) -> Dict[str, Any]:
+    """Reconstruye fotos de revenue faltantes de los últimos `days` días."""
+    _require_admin_base(request, access_token)
+
+    days = max(1, min(days, 730))
+    db = SessionLocal()
+    try:
+        start = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+        result = backfill_revenue_snapshots(db, start, overwrite=overwrite)
+        db.commit()
+        return result
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
 @router.get("/subscriptions")
 async def get_subscriptions(
     request: Request,
@@ -370,6 +425,50 @@ async def get_invoices(
         db.close()
 
 
+_INVOICE_EXPORT_HEADER = [
+    "id", "customer_id", "company_name", "email", "subdomain", "plan", "amount", "user_count",
+    "currency", "status", "stripe_subscription_id", "created_at", "updated_at",
+]
+
+
+def _invoice_export_rows(db, status: Optional[str]):
+    """Filas de la exportación: precios efectivos calculados por lote de EXPORT_BATCH_SIZE."""
+    query = _filter_subscriptions(db.query(Subscription, Customer).join(Customer), status)
+    query = query.order_by(Subscription.created_at.desc(), Subscription.id.desc())
+    catalog = PricingCatalog.load(db)
+
+    def _flush(batch):
+        ids = [sub.id for sub, _ in batch]
+        prices = {
+            sub.id: price
+            for sub, price in get_subscription_prices(db, Subscription.id.in_(ids), catalog=catalog)
+        }
+        for sub, customer in batch:
+            yield (
+                sub.id, customer.id, customer.company_name, customer.email, customer.subdomain,
+                sub.plan_name or "basic", round(prices.get(sub.id, 0), 2), sub.user_count or 1,
+                "USD", _payment_status(sub), sub.stripe_subscription_id, sub.created_at, sub.updated_at,
+            )
+
+    for batch in iter_batches(db, query.yield_per(EXPORT_BATCH_SIZE)):
+        yield from _flush(batch)
+
+
+@router.get("/invoices/export")
+async def export_invoices(
+    request: Request,
+    access_token: str = Cookie(None),
+    format: str = Query("csv"),
+    status: Optional[str] = None,
+):
+    """Exporta facturas/pagos con el mismo filtro de estado que /invoices (CSV/XLSX en streaming)."""
+    _require_admin_base(request, access_token)
+    return export_response(
+        format, "invoices", _INVOICE_EXPORT_HEADER,
+        session_rows(lambda db: _invoice_export_rows(db, status)),
+    )
+
+
 @router.get("/stripe-events")
 async def get_stripe_events(
     request: Request,
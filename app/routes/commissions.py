@@ -6,13 +6,14 @@ import json
 from datetime import datetime, timezone
 from typing import Optional
 
-from fastapi import APIRouter, Cookie, HTTPException, Request
+from fastapi import APIRouter, Cookie, HTTPException, Query, Request
 from pydantic import BaseModel
 
 from ..models.database import (
     Commission, Partner, Subscription, Lead, SessionLocal,
     CommissionStatus,
 )
+from ..services.exports import EXPORT_BATCH_SIZE, export_response, session_rows
 from .roles import _require_admin
 
 router = APIRouter(prefix="/api/commissions", tags=["Commissions"])
@@ -82,6 +83,18 @@ def _calculate_commission(gross: float, deductions: dict, rate: float) -> dict:
     }
 
 
+def _filter_commissions(q, partner_id: Optional[int], status_filter: Optional[str]):
+    """Filtros compartidos por el listado y la exportación."""
+    if partner_id:
+        q = q.filter(Commission.partner_id == partner_id)
+    if status_filter:
+        try:
+            q = q.filter(Commission.status == CommissionStatus(status_filter))
+        except ValueError:
+            pass
+    return q
+
+
 # ── Routes ──
 
 @router.get("")
@@ -95,15 +108,7 @@ async def list_commissions(
     _require_admin(request, access_token)
     db = SessionLocal()
     try:
-        q = db.query(Commission)
-        if partner_id:
-            q = q.filter(Commission.partner_id == partner_id)
-        if status_filter:
-            try:
-                q = q.filter(Commission.status == CommissionStatus(status_filter))
-            except ValueError:
-                pass
-
+        q = _filter_commissions(db.query(Commission), partner_id, status_filter)
         comms = q.order_by(Commission.created_at.desc()).all()
         items = []
         for c in comms:
@@ -131,6 +136,41 @@ async def list_commissions(
         db.close()
 
 
+_EXPORT_HEADER = [
+    "id", "partner_id", "partner_name", "subscription_id", "lead_id", "period_start", "period_end",
+    "gross_revenue", "deductions", "net_revenue", "partner_amount", "jeturing_amount", "status",
+    "paid_at", "payment_reference", "notes", "created_at",
+]
+
+
+def _commission_export_rows(db, partner_id: Optional[int], status_filter: Optional[str]):
+    q = db.query(
+        Commission.id, Commission.partner_id, Partner.company_name, Commission.subscription_id,
+        Commission.lead_id, Commission.period_start, Commission.period_end, Commission.gross_revenue,
+        Commission.deductions_json, Commission.net_revenue, Commission.partner_amount,
+        Commission.jeturing_amount, Commission.status, Commission.paid_at, Commission.payment_reference,
+        Commission.notes, Commission.created_at,
+    ).outerjoin(Partner, Partner.id == Commission.partner_id)
+    q = _filter_commissions(q, partner_id, status_filter)
+    yield from q.order_by(Commission.created_at.desc(), Commission.id.desc()).yield_per(EXPORT_BATCH_SIZE)
+
+
+@router.get("/export")
+async def export_commissions(
+    request: Request,
+    access_token: Optional[str] = Cookie(None),
+    format: str = Query("csv"),
+    partner_id: Optional[int] = None,
+    status_filter: Optional[str] = None,
+):
+    """Exporta las comisiones filtradas (CSV/XLSX en streaming)."""
+    _require_admin(request, access_token)
+    return export_response(
+        format, "commissions", _EXPORT_HEADER,
+        session_rows(lambda db: _commission_export_rows(db, partner_id, status_filter)),
+    )
+
+
 @router.get("/{commission_id}")
 async def get_commission(
     commission_id: int,
@@ -13,6 +13,8 @@ from ..models.database import (
     ProvisioningAuditLog,
 )
 from .roles import verify_token_with_role
+from ..services.exports import EXPORT_BATCH_SIZE, export_response, iter_batches, session_rows
+from ..services.pricing import PricingCatalog, get_effective_plan_snapshots
 from ..config import get_runtime_setting
 from ..utils.ip import get_real_ip
 import stripe
@@ -654,6 +656,100 @@ async def list_customers(
         db.close()
 
 
+_EXPORT_HEADER = [
+    "id", "company_name", "email", "phone", "full_name", "subdomain", "user_count", "is_admin_account",
+    "status", "stripe_customer_id", "partner_id", "subscription_id", "plan_name", "plan_display_name",
+    "subscription_status", "monthly_amount", "calculated_amount", "discount_pct", "discount_amount",
+    "deployment_subdomain", "database_name", "tunnel_active", "created_at",
+]
+
+
+def _customer_export_batch(db, customers: List[Customer], catalog) -> List[tuple]:
+    """Filas de un lote de clientes: suscripción vigente, precio efectivo y deployment en 3 consultas."""
+    subscriptions_by_customer: Dict[int, Subscription] = {}
+    for sub in (
+        db.query(Subscription)
+        .filter(
+            Subscription.customer_id.in_([c.id for c in customers]),
+            Subscription.status.in_([SubscriptionStatus.active, SubscriptionStatus.suspended]),
+        )
+        .order_by(Subscription.customer_id.asc(), Subscription.created_at.desc())
+    ):
+        subscriptions_by_customer.setdefault(sub.customer_id, sub)
+
+    subscription_ids = [sub.id for sub in subscriptions_by_customer.values()]
+    snapshots: Dict[int, dict] = {}
+    deployments: Dict[int, TenantDeployment] = {}
+    if subscription_ids:
+        snapshots = {
+            sub.id: snapshot
+            for sub, snapshot in get_effective_plan_snapshots(
+                db, Subscription.id.in_(subscription_ids), catalog=catalog
+            )
+        }
+        deployments = {
+            d.subscription_id: d
+            for d in db.query(TenantDeployment).filter(TenantDeployment.subscription_id.in_(subscription_ids))
+        }
+
+    rows = []
+    for c in customers:
+        sub = subscriptions_by_customer.get(c.id)
+        snapshot = snapshots.get(sub.id) if sub else None
+        deployment = deployments.get(sub.id) if sub else None
+        override = snapshot.get("override") if snapshot else None
+        plan = snapshot.get("plan") if snapshot else None
+        display_name = None
+        if sub:
+            display_name = (
+                (override.label or "").strip() if override is not None and getattr(override, "label", None)
+                else (plan.display_name if plan is not None else sub.plan_name)
+            )
+        rows.append((
+            c.id, c.company_name, c.email, c.phone, c.full_name, c.subdomain, c.user_count or 1,
+            c.is_admin_account or False, c.status.value if c.status else "active", c.stripe_customer_id,
+            c.partner_id,
+            sub.id if sub else None,
+            sub.plan_name if sub else None,
+            display_name,
+            sub.status.value if sub and sub.status else None,
+            sub.monthly_amount if sub else None,
+            round(float(snapshot["total"]), 2) if snapshot else None,
+            (sub.discount_pct or 0) if sub else None,
+            (sub.discount_amount or 0) if sub else None,
+            deployment.subdomain if deployment else None,
+            deployment.database_name if deployment else None,
+            deployment.tunnel_active if deployment else None,
+            c.created_at,
+        ))
+    return rows
+
+
+def _customer_export_rows(db, partner_id: Optional[int] = None):
+    catalog = PricingCatalog.load(db)
+    q = db.query(Customer)
+    if partner_id is not None:
+        q = q.filter(Customer.partner_id == partner_id)
+    q = q.order_by(Customer.created_at.desc(), Customer.id.desc())
+
+    for batch in iter_batches(db, q.yield_per(EXPORT_BATCH_SIZE)):
+        yield from _customer_export_batch(db, batch, catalog)
+
+
+@router.get("/export")
+async def export_customers(
+    request: Request,
+    access_token: str = Cookie(None),
+    format: str = Query("csv"),
+    partner_id: int = None,
+):
+    """Exporta los clientes del listado (mismo filtro) en CSV/XLSX por streaming."""
+    _verify_admin(request, access_token)
+    return export_response(
+        format, "customers", _EXPORT_HEADER, session_rows(lambda db: _customer_export_rows(db, partner_id)),
+    )
+
+
 @router.put("/{customer_id}")
 async def update_customer(
     customer_id: int,
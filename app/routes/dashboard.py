@@ -8,7 +8,7 @@ import os
 from ..models.database import Customer, Subscription, SubscriptionStatus, SessionLocal
 from .roles import _require_admin as _require_admin_base, verify_token_with_role
 from ..services.spa_shell import render_spa_shell
-from ..services.pricing import get_plan_price_for_sub
+from ..services.pricing import get_subscription_prices
 
 router = APIRouter(tags=["Dashboard"])
 
@@ -54,8 +54,8 @@ async def dashboard_metrics(request: Request, access_token: str = Cookie(None)):
         
         # Calcular MRR dinámico (Fix B4 — reemplaza price_map hardcodeado)
         total_revenue = 0
-        for sub in db.query(Subscription).filter_by(status=SubscriptionStatus.active).all():
-            total_revenue += get_plan_price_for_sub(db, sub)
+        for _, price in get_subscription_prices(db, Subscription.status == SubscriptionStatus.active):
+            total_revenue += price
         
         # Obtener métricas del cluster (si está disponible)
         cluster_load = {"cpu": 0, "ram": 0}
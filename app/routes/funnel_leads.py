@@ -1,16 +1,19 @@
 """
 Public Funnel Leads — Captura orgánica desde landing pages de nichos.
-No requiere autenticación. Guarda en BDA + intenta sync con Jeturing CRM.
+No requiere autenticación. Encola en el outbox local (drenado por lotes hacia
+BDA por el scheduler) + intenta sync con Jeturing CRM tras el drain.
 """
+import asyncio
 import logging
 import httpx
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional
 
-from fastapi import APIRouter, Request, BackgroundTasks
-from pydantic import BaseModel, EmailStr, field_validator
+from fastapi import APIRouter, Request
+from pydantic import BaseModel, EmailStr, Field, field_validator
 
 from ..models.database import FunnelLead, FunnelNiche, SessionLocal
+from ..services.funnel_outbox import drain_funnel_outbox, enqueue_funnel_lead, get_funnel_stats
 from ..utils.ip import get_real_ip
 
 import os
@@ -26,29 +29,31 @@ JETURING_API_KEY = os.getenv("JETURING_API_KEY")
 # ── DTOs ──────────────────────────────────────────────────────────────────────
 
 class FunnelLeadIn(BaseModel):
+    # max_length = largo de la columna en funnel_leads: un valor más largo
+    # haría fallar el INSERT del lote completo en el drain
     niche:          str               # mpos | build | partners | cpa | smb | general
-    full_name:      str
-    email:          EmailStr
-    phone:          Optional[str]     = None
-    company_name:   Optional[str]     = None
-    country:        Optional[str]     = None
-    language:       Optional[str]     = "es"
+    full_name:      str               = Field(max_length=150)
+    email:          EmailStr          = Field(max_length=150)
+    phone:          Optional[str]     = Field(None, max_length=50)
+    company_name:   Optional[str]     = Field(None, max_length=200)
+    country:        Optional[str]     = Field(None, max_length=100)
+    language:       Optional[str]     = Field("es", max_length=10)
 
     # Calificación
     has_entity:     Optional[bool]    = None
-    monthly_volume: Optional[str]     = None
-    budget_range:   Optional[str]     = None
-    timeline:       Optional[str]     = None
+    monthly_volume: Optional[str]     = Field(None, max_length=50)
+    budget_range:   Optional[str]     = Field(None, max_length=50)
+    timeline:       Optional[str]     = Field(None, max_length=50)
     client_count:   Optional[int]     = None
     has_sales_team: Optional[bool]    = None
-    industry:       Optional[str]     = None
-    main_goal:      Optional[str]     = None
+    industry:       Optional[str]     = Field(None, max_length=100)
+    main_goal:      Optional[str]     = Field(None, max_length=200)
 
     # Tracking (enviados por el frontend)
-    utm_source:     Optional[str]     = None
-    utm_medium:     Optional[str]     = None
-    utm_campaign:   Optional[str]     = None
-    referrer:       Optional[str]     = None
+    utm_source:     Optional[str]     = Field(None, max_length=100)
+    utm_medium:     Optional[str]     = Field(None, max_length=100)
+    utm_campaign:   Optional[str]     = Field(None, max_length=100)
+    referrer:       Optional[str]     = Field(None, max_length=500)
 
     @field_validator("niche")
     @classmethod
@@ -58,7 +63,8 @@ class FunnelLeadIn(BaseModel):
 
 
 class FunnelLeadOut(BaseModel):
-    id:        int
+    id:        Optional[int] = None  # None: el lead quedó en el outbox, aún sin fila en BDA
+    status:    str = "queued"
     qualified: bool
     redirect:  str   # URL a donde llevar al usuario
 
@@ -164,80 +170,53 @@ async def _sync_jeturing(lead_id: int, data: FunnelLeadIn, qualified: bool):
         logger.warning("Jeturing CRM sync failed for lead %s: %s", lead_id, exc)
 
 
+JETURING_SYNC_CONCURRENCY = 5
+
+
+async def drain_and_sync_funnel_leads() -> None:
+    """Drena el outbox a BDA y sincroniza los leads nuevos con Jeturing CRM."""
+    result = await asyncio.to_thread(drain_funnel_outbox)
+    if not result["new_leads"] or not os.getenv("JETURING_API_KEY"):
+        return
+
+    semaphore = asyncio.Semaphore(JETURING_SYNC_CONCURRENCY)
+
+    async def _sync(lead_id: int, record: dict):
+        async with semaphore:
+            data = FunnelLeadIn.model_validate(record)
+            await _sync_jeturing(lead_id, data, bool(record.get("qualified", True)))
+
+    await asyncio.gather(*(_sync(lead_id, record) for lead_id, record in result["new_leads"]))
+
+
 # ── Routes ────────────────────────────────────────────────────────────────────
 
 @router.post("/lead", response_model=FunnelLeadOut)
-async def capture_funnel_lead(
-    data: FunnelLeadIn,
-    request: Request,
-    background_tasks: BackgroundTasks,
-):
+async def capture_funnel_lead(data: FunnelLeadIn, request: Request):
     """
     Captura un lead orgánico desde las landing pages de nichos.
     Público — sin autenticación.
-    Califica el lead y retorna la URL de redirección correcta.
+    Califica el lead, lo encola en el outbox y retorna la URL de redirección correcta.
     """
     qualified, reason = _qualify(data)
     redirect  = _redirect_for(qualified, reason, data.niche)
-    ip        = _get_real_ip(request)
+    ip        = get_real_ip(request)
 
-    db = SessionLocal()
-    try:
-        niche_enum = FunnelNiche(data.niche) if data.niche in {n.value for n in FunnelNiche} else FunnelNiche.general
-
-        row = FunnelLead(
-            niche             = niche_enum,
-            full_name         = data.full_name,
-            email             = data.email,
-            phone             = data.phone,
-            company_name      = data.company_name,
-            country           = data.country,
-            language          = data.language,
-            has_entity        = data.has_entity,
-            monthly_volume    = data.monthly_volume,
-            budget_range      = data.budget_range,
-            timeline          = data.timeline,
-            client_count      = data.client_count,
-            has_sales_team    = data.has_sales_team,
-            industry          = data.industry,
-            main_goal         = data.main_goal,
-            utm_source        = data.utm_source,
-            utm_medium        = data.utm_medium,
-            utm_campaign      = data.utm_campaign,
-            referrer          = data.referrer or request.headers.get("referer"),
-            ip_address        = ip,
-            user_agent        = request.headers.get("user-agent", "")[:500],
-            qualified         = qualified,
-            disqualify_reason = reason,
-        )
-        db.add(row)
-        db.commit()
-        db.refresh(row)
-        lead_id = row.id
-    finally:
-        db.close()
-
-    # Sync a Jeturing CRM en background (no bloquea la respuesta)
-    background_tasks.add_task(_sync_jeturing, lead_id, data, qualified)
-
-    return FunnelLeadOut(id=lead_id, qualified=qualified, redirect=redirect)
+    record = data.model_dump()
+    record.update(
+        referrer          = (data.referrer or request.headers.get("referer") or "")[:500] or None,
+        ip_address        = ip,
+        user_agent        = request.headers.get("user-agent", "")[:500],
+        qualified         = qualified,
+        disqualify_reason = reason,
+        created_at        = datetime.now(timezone.utc).replace(tzinfo=None).isoformat(),
+    )
+    await asyncio.to_thread(enqueue_funnel_lead, record)
+
+    return FunnelLeadOut(qualified=qualified, redirect=redirect)
 
 
 @router.get("/stats")
 async def funnel_stats():
-    """Stats públicas básicas (sin datos PII) para social proof."""
-    db = SessionLocal()
-    try:
-        from sqlalchemy import func
-        total = db.query(func.count(FunnelLead.id)).scalar() or 0
-        by_niche = (
-            db.query(FunnelLead.niche, func.count(FunnelLead.id))
-            .group_by(FunnelLead.niche)
-            .all()
-        )
-        return {
-            "total_leads": total,
-            "by_niche": {row[0].value: row[1] for row in by_niche},
-        }
-    finally:
-        db.close()
+    """Stats públicas básicas (sin datos PII) para social proof, desde contadores incrementales."""
+    return await asyncio.to_thread(get_funnel_stats)
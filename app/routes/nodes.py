@@ -752,14 +752,30 @@ async def get_metrics_history(
     node_id: Optional[int] = None,
     container_id: Optional[int] = None,
     hours: int = 24,
+    points: Optional[int] = None,
+    resolution: str = "auto",
+    metric: str = "cpu_percent",
     access_token: str = Cookie(None)
 ):
-    """Obtiene métricas históricas para gráficos"""
+    """
+    Obtiene métricas históricas para gráficos. resolution=auto elige crudas,
+    5m, 1h o 1d según la ventana; `points` (por defecto
+    RESOURCE_METRIC_CHART_POINTS) acota la serie con LTTB sobre `metric`.
+    """
     verify_admin(access_token)
+    from ..config import RESOURCE_METRIC_CHART_POINTS
     from ..services.resource_monitor import ResourceMonitor
+    try:
+        series = ResourceMonitor.get_metric_series(
+            node_id, container_id, hours, points or RESOURCE_METRIC_CHART_POINTS, resolution, metric,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
         "hours": hours,
-        "data": ResourceMonitor.get_historical_metrics(node_id, container_id, hours)
+        "resolution": series["resolution"],
+        "points": series["points"],
+        "data": series["data"]
     }
 
 
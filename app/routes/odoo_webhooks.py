@@ -12,6 +12,7 @@ Eventos soportados:
 - partner.created: Se creó un res.partner (contacto/cliente) en Odoo
 - tenant.config_changed: Cambió configuración del tenant (company name, etc.)
 - tenant.snapshot: Snapshot completo del tenant para reconciliación
+- seats.batch: Lote de altas/bajas de usuarios (picos de carga), un solo ingest
 """
 import hmac
 import hashlib
@@ -39,6 +40,7 @@ from ..models.database import (
 from ..config import PROVISIONING_API_KEY, get_runtime_setting
 from ..services.pricing import recalculate_subscription_monthly_amount
 from ..services.seat_events import (
+    ingest_seat_events,
     is_billable_user,
     record_hwm_snapshot,
     record_seat_event,
@@ -82,7 +84,7 @@ def _verify_webhook(x_api_key: Optional[str], x_webhook_signature: Optional[str]
 
 class OdooWebhookEvent(BaseModel):
     """Evento genérico desde Odoo."""
-    event: str  # user.created, user.updated, user.deleted, partner.created, tenant.config_changed, tenant.snapshot
+    event: str  # user.created, user.updated, user.deleted, partner.created, tenant.config_changed, tenant.snapshot, seats.batch
     tenant_db: str  # nombre de la BD Odoo (= subdomain del customer)
     data: Dict[str, Any] = {}
     timestamp: Optional[str] = None
@@ -725,6 +727,113 @@ async def _handle_user_deleted(tenant_db: str, data: Dict[str, Any]) -> Dict[str
         db.close()
 
 
+_SEAT_BATCH_EVENTS = {
+    "user.created": (SeatEventType.USER_CREATED, 1),
+    "user.reactivated": (SeatEventType.USER_REACTIVATED, 1),
+    "user.deleted": (SeatEventType.USER_DEACTIVATED, -1),
+}
+
+
+def _parse_occurred_at(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+async def _handle_seats_batch(tenant_db: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Lote de altas/bajas de usuarios del tenant (mismas reglas que user.created /
+    user.deleted). Se registran con un solo ingest_seat_events y se recalcula
+    la suscripción una vez con el conteo final.
+
+    data = {"changes": [{"event": "user.created", "user_id": 10, "login": "...",
+                         "share": false, "occurred_at": "2026-01-01T10:00:00Z"}, ...]}
+    """
+    db = SessionLocal()
+    try:
+        customer = db.query(Customer).filter(Customer.subdomain == tenant_db).first()
+        if not customer:
+            return {"synced": False, "reason": "customer_not_found"}
+
+        old_count = customer.user_count or 1
+        count = old_count
+        items = []
+        skipped = 0
+        changes = sorted(
+            data.get("changes") or [],
+            key=lambda change: _parse_occurred_at(change.get("occurred_at")) or datetime.max,
+        )
+        for change in changes:
+            mapping = _SEAT_BATCH_EVENTS.get(change.get("event"))
+            if not mapping or not is_billable_user(
+                tenant_db,
+                login=change.get("login"),
+                share=change.get("share", False),
+                active=True,
+                customer=customer,
+                admin_email=customer.email,
+            ):
+                skipped += 1
+                continue
+            event_type, delta = mapping
+            count = max(1, count + delta)
+            items.append({
+                "event_type": event_type,
+                "user_count_after": count,
+                "odoo_user_id": change.get("user_id"),
+                "odoo_login": change.get("login"),
+                "occurred_at": _parse_occurred_at(change.get("occurred_at")),
+                "metadata": {"tenant_db": tenant_db, "origin_event": change.get("event")},
+            })
+
+        if not items:
+            return {"synced": False, "reason": "no_billable_changes", "skipped": skipped}
+
+        customer.user_count = count
+        sub = db.query(Subscription).filter(
+            Subscription.customer_id == customer.id,
+            Subscription.status == SubscriptionStatus.active,
+        ).first()
+
+        new_amount = None
+        if sub:
+            for item in items:
+                item["subscription_id"] = sub.id
+            ingest_seat_events(db, items, source="odoo_webhook")
+            db.refresh(sub)
+            new_amount = recalculate_subscription_monthly_amount(
+                db,
+                sub,
+                customer=customer,
+                user_count=count,
+            )
+
+        db.commit()
+
+        logger.info(
+            f"Odoo→Portal: seats.batch en {tenant_db}, "
+            f"{len(items)} cambios, users {old_count}→{count}"
+        )
+
+        return {
+            "synced": True,
+            "changes": len(items),
+            "skipped": skipped,
+            "old_user_count": old_count,
+            "new_user_count": count,
+            "recalculated": bool(sub),
+            "new_monthly_amount": new_amount,
+        }
+    finally:
+        db.close()
+
+
 async def _handle_partner_created(tenant_db: str, data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Un res.partner (contacto/cliente) fue creado en Odoo.
@@ -761,6 +870,7 @@ EVENT_HANDLERS = {
     "partner.created": _handle_partner_created,
     "tenant.config_changed": _handle_tenant_config_changed,
     "tenant.snapshot": _handle_tenant_snapshot,
+    "seats.batch": _handle_seats_batch,
 }
 
 
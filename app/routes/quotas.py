@@ -118,20 +118,26 @@ async def check_quota(
 async def get_all_quotas(
     request: Request,
     access_token: str = Cookie(None),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    sort: str = Query("top_usage", description="company_name | plan | top_usage | <recurso>"),
+    order: str = Query("desc", description="asc | desc"),
+    search: Optional[str] = None,
+    refresh: bool = False,
 ) -> Dict[str, Any]:
     """
-    Retorna resumen de cuotas de todos los clientes (admin dashboard).
+    Retorna resumen de cuotas de todos los clientes (admin dashboard),
+    paginado y ordenado sobre la tabla cacheada (`as_of`); refresh=1 la recalcula.
     """
     _verify_admin(request, access_token)
     db = SessionLocal()
     try:
         svc = QuotaService(db)
-        customers = svc.get_all_customers_quotas()
-        return {
-            "success": True,
-            "total": len(customers),
-            "customers": customers,
-        }
+        return svc.get_quota_table(
+            sort=sort, order=order, limit=limit, offset=offset, search=search, refresh=refresh,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     finally:
         db.close()
 
@@ -14,7 +14,7 @@ from pydantic import BaseModel
 from ..models.database import Customer, SessionLocal, SystemConfig
 from ..services.spa_shell import render_spa_shell
 
-from ..config import get_runtime_setting, require_config_secret
+from ..security.tokens import decode_jwt_cached, get_signing_keys
 from ..utils.runtime_security import utc_now
 
 router = APIRouter(tags=["Roles"])
@@ -27,11 +27,11 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__fil
 
 
 def _jwt_secret_key() -> str:
-    return require_config_secret("JWT_SECRET_KEY", get_runtime_setting("JWT_SECRET_KEY", ""), production_only=False)
+    return get_signing_keys()[0]
 
 
 def _jwt_algorithm() -> str:
-    return get_runtime_setting("JWT_ALGORITHM", "HS256")
+    return get_signing_keys()[1]
 
 # ── Catálogo maestro de permisos agrupados por módulo ──
 PERMISSION_CATALOG: Dict[str, Dict[str, Any]] = {
@@ -380,7 +380,7 @@ def verify_token_with_role(token: str, required_role: str = None) -> dict:
     """Verifica un token JWT y retorna los datos del usuario.
     El rol 'admin' tiene acceso universal a todos los endpoints."""
     try:
-        payload = jwt.decode(token, _jwt_secret_key(), algorithms=[_jwt_algorithm()])
+        payload = decode_jwt_cached(token)
 
         user_role = payload.get("role")
 
@@ -2,13 +2,14 @@
 Seats Routes — Épica 3 (Direct HWM) + Épica 4 (Partner Metered + Grace 8h)
 
 - POST /api/seats/event       → Registra evento de usuario (webhook desde Odoo)
+- POST /api/seats/events/batch → Ingesta por lotes de cambios de asientos
 - GET  /api/seats/hwm/{sub}   → High-water mark actual
 - POST /api/seats/sync-stripe → Sincroniza HWM con Stripe quantity
 - GET  /api/seats/summary/{sub} → Resumen de asientos
 """
 from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from datetime import datetime, timedelta, timezone
@@ -21,6 +22,7 @@ from ..models.database import (
 )
 from ..config import get_runtime_int, get_runtime_setting
 from ..services.seat_events import (
+    ingest_seat_events,
     is_partner_metered as _service_is_partner_metered,
     record_hwm_snapshot,
     record_seat_event as _service_record_seat_event,
@@ -51,6 +53,23 @@ class SeatEventCreate(BaseModel):
     metadata: Optional[dict] = None
 
 
+class SeatEventBatchItem(BaseModel):
+    subscription_id: int
+    event_type: str
+    user_count_after: Optional[int] = None    # conteo absoluto, o bien…
+    delta: Optional[int] = None               # …cambio relativo (+1 / -1)
+    odoo_user_id: Optional[int] = None
+    odoo_login: Optional[str] = None
+    occurred_at: Optional[datetime] = None
+    source: Optional[str] = None
+    metadata: Optional[dict] = None
+
+
+class SeatEventBatch(BaseModel):
+    events: List[SeatEventBatchItem] = Field(..., min_length=1, max_length=5000)
+    source: str = "webhook"
+
+
 # ── HELPERS ──
 
 def _is_partner_metered(sub: Subscription) -> bool:
@@ -131,6 +150,32 @@ def record_seat_event(payload: SeatEventCreate, db: Session = Depends(get_db)):
     }
 
 
+@router.post("/events/batch")
+def record_seat_events_batch(payload: SeatEventBatch, db: Session = Depends(get_db)):
+    """
+    Ingesta por lotes de cambios de asientos (picos de webhooks de Odoo).
+    Un INSERT de seat_events y HWM recalculado por suscripción/día con upsert
+    GREATEST. Sin sync real-time de Stripe: los picos nuevos quedan pendientes
+    para POST /sync-stripe.
+    """
+    items = []
+    for item in payload.events:
+        try:
+            SeatEventType(item.event_type)
+        except ValueError:
+            raise HTTPException(400, f"Invalid event_type: {item.event_type}")
+        if item.user_count_after is None and item.delta is None:
+            raise HTTPException(400, "Each event needs user_count_after or delta")
+        items.append(item.model_dump())
+
+    try:
+        result = ingest_seat_events(db, items, source=payload.source)
+    except ValueError as e:
+        raise HTTPException(404, str(e))
+    db.commit()
+    return result
+
+
 @router.get("/hwm/{subscription_id}")
 def get_hwm(subscription_id: int, days: int = 30, db: Session = Depends(get_db)):
     """Obtiene historial de high-water mark."""
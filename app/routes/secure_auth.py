@@ -4,8 +4,13 @@ Secure Authentication Routes - Production-ready authentication with all security
 from fastapi import APIRouter, HTTPException, Request, Response, status, Depends
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from datetime import datetime, timezone
+import threading
+import time
+
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import Session, object_session
 
 from ..models.database import Customer, Partner, PartnerStatus, AdminUser, AdminUserRole, SessionLocal
 from ..security.tokens import TokenManager, RefreshTokenManager
@@ -532,6 +537,117 @@ async def verify_totp_login(request: Request, payload: TOTPLoginRequest):
     return await secure_login(request, login_data)
 
 
+# ── Cache de perfil para /me ──
+# Los campos "calientes" del perfil se cachean por usuario con TTL corto; las
+# escrituras ORM sobre Customer/Partner/AdminUser invalidan la entrada local.
+_PROFILE_CACHE_TTL_SECONDS = 10.0
+_PROFILE_CACHE_MAX_ENTRIES = 5_000
+_PROFILE_CACHE_LOCK = threading.Lock()
+_PROFILE_CACHE: Dict[Tuple[str, int], Tuple[dict, float]] = {}
+_ADMIN_PROFILE_ROLES = ("admin", "operator", "viewer")
+
+
+def _profile_cache_key(role: Optional[str], user_id: int) -> Tuple[str, int]:
+    return ("admin" if role in _ADMIN_PROFILE_ROLES else (role or ""), int(user_id))
+
+
+def _load_profile_fields(role: Optional[str], user_id: int) -> dict:
+    """Lee de BD los campos de perfil que /me agrega al payload del token."""
+    fields: dict = {}
+    db = SessionLocal()
+    try:
+        # Si es admin con user_id, buscar en admin_users para obtener display_name
+        if role in _ADMIN_PROFILE_ROLES:
+            admin_user = db.query(AdminUser).filter(AdminUser.id == user_id).first()
+            if admin_user:
+                fields["username"] = admin_user.display_name
+                fields["email"] = admin_user.email
+                fields["display_name"] = admin_user.display_name
+                fields["admin_user_id"] = admin_user.id
+
+        # Si es tenant, obtener más info del cliente
+        elif role == "tenant":
+            customer = db.query(Customer).filter(Customer.id == user_id).first()
+            if customer:
+                fields["company_name"] = customer.company_name
+                fields["plan"] = customer.plan
+                fields["onboarding_step"] = customer.onboarding_step
+                fields["onboarding_bypass"] = customer.onboarding_bypass or False
+                fields["onboarding_completed"] = customer.onboarding_completed_at is not None
+                fields["country"] = customer.country
+                fields["requires_ecf"] = customer.requires_ecf
+
+        # Si es partner, obtener info del partner
+        elif role == "partner":
+            partner = db.query(Partner).filter(Partner.id == user_id).first()
+            if partner:
+                fields["company_name"] = partner.company_name
+                fields["partner_id"] = partner.id
+                fields["onboarding_step"] = partner.onboarding_step
+                fields["onboarding_bypass"] = partner.onboarding_bypass or False
+                fields["onboarding_completed"] = partner.onboarding_completed_at is not None
+                fields["stripe_onboarding_complete"] = partner.stripe_onboarding_complete
+                fields["stripe_charges_enabled"] = partner.stripe_charges_enabled
+                fields["commission_rate"] = partner.commission_rate
+                fields["status"] = partner.status.value if partner.status else None
+    finally:
+        db.close()
+    return fields
+
+
+def _get_cached_profile(role: Optional[str], user_id: int) -> dict:
+    key = _profile_cache_key(role, user_id)
+    now = time.monotonic()
+    with _PROFILE_CACHE_LOCK:
+        cached = _PROFILE_CACHE.get(key)
+        if cached and cached[1] > now:
+            return dict(cached[0])
+
+    fields = _load_profile_fields(role, user_id)
+    with _PROFILE_CACHE_LOCK:
+        if len(_PROFILE_CACHE) >= _PROFILE_CACHE_MAX_ENTRIES:
+            _PROFILE_CACHE.clear()
+        _PROFILE_CACHE[key] = (fields, now + _PROFILE_CACHE_TTL_SECONDS)
+    return dict(fields)
+
+
+def invalidate_user_profile(role: Optional[str] = None, user_id: Optional[int] = None) -> None:
+    """Descarta el perfil cacheado de un usuario (o todo el cache si no se indica)."""
+    with _PROFILE_CACHE_LOCK:
+        if role is None or user_id is None:
+            _PROFILE_CACHE.clear()
+        else:
+            _PROFILE_CACHE.pop(_profile_cache_key(role, user_id), None)
+
+
+_PROFILE_PENDING_KEY = "profile_cache_invalidations"
+
+
+def _register_profile_invalidation() -> None:
+    # Se acumula por sesión en el flush y se aplica solo al commit: un cambio
+    # revertido no desaloja el perfil cacheado.
+    for model, role in ((Customer, "tenant"), (Partner, "partner"), (AdminUser, "admin")):
+        def _on_change(mapper, connection, target, _role=role):
+            session = object_session(target)
+            if target.id is not None and session is not None:
+                session.info.setdefault(_PROFILE_PENDING_KEY, set()).add((_role, target.id))
+        sa_event.listen(model, "after_update", _on_change)
+        sa_event.listen(model, "after_delete", _on_change)
+
+    def _on_commit(session):
+        for role, user_id in session.info.pop(_PROFILE_PENDING_KEY, ()):
+            invalidate_user_profile(role, user_id)
+
+    def _on_rollback(session):
+        session.info.pop(_PROFILE_PENDING_KEY, None)
+
+    sa_event.listen(Session, "after_commit", _on_commit)
+    sa_event.listen(Session, "after_rollback", _on_rollback)
+
+
+_register_profile_invalidation()
+
+
 @router.get("/me")
 async def get_current_user(request: Request):
     """
@@ -560,58 +676,8 @@ async def get_current_user(request: Request):
             "tenant_id": payload.get("tenant_id")
         }
 
-        # Si es admin con user_id, buscar en admin_users para obtener display_name
-        if payload.get("role") in ("admin", "operator", "viewer") and payload.get("user_id"):
-            db = SessionLocal()
-            try:
-                admin_user = db.query(AdminUser).filter(
-                    AdminUser.id == payload.get("user_id")
-                ).first()
-                if admin_user:
-                    user_data["username"] = admin_user.display_name
-                    user_data["email"] = admin_user.email
-                    user_data["display_name"] = admin_user.display_name
-                    user_data["admin_user_id"] = admin_user.id
-            finally:
-                db.close()
-        
-        # Si es tenant, obtener más info del cliente
-        if payload.get("role") == "tenant" and payload.get("user_id"):
-            db = SessionLocal()
-            try:
-                customer = db.query(Customer).filter(
-                    Customer.id == payload.get("user_id")
-                ).first()
-                if customer:
-                    user_data["company_name"] = customer.company_name
-                    user_data["plan"] = customer.plan
-                    user_data["onboarding_step"] = customer.onboarding_step
-                    user_data["onboarding_bypass"] = customer.onboarding_bypass or False
-                    user_data["onboarding_completed"] = customer.onboarding_completed_at is not None
-                    user_data["country"] = customer.country
-                    user_data["requires_ecf"] = customer.requires_ecf
-            finally:
-                db.close()
-
-        # Si es partner, obtener info del partner
-        if payload.get("role") == "partner" and payload.get("user_id"):
-            db = SessionLocal()
-            try:
-                partner = db.query(Partner).filter(
-                    Partner.id == payload.get("user_id")
-                ).first()
-                if partner:
-                    user_data["company_name"] = partner.company_name
-                    user_data["partner_id"] = partner.id
-                    user_data["onboarding_step"] = partner.onboarding_step
-                    user_data["onboarding_bypass"] = partner.onboarding_bypass or False
-                    user_data["onboarding_completed"] = partner.onboarding_completed_at is not None
-                    user_data["stripe_onboarding_complete"] = partner.stripe_onboarding_complete
-                    user_data["stripe_charges_enabled"] = partner.stripe_charges_enabled
-                    user_data["commission_rate"] = partner.commission_rate
-                    user_data["status"] = partner.status.value if partner.status else None
-            finally:
-                db.close()
+        if payload.get("user_id"):
+            user_data.update(_get_cached_profile(payload.get("role"), payload.get("user_id")))
         
         return user_data
         
@@ -8,10 +8,12 @@ from datetime import datetime, timedelta, timezone
 from typing import Any, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Cookie
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from sqlalchemy import select, and_, func, desc, or_
+from sqlalchemy import select, and_, case, func, desc, or_
 from sqlalchemy.orm import Session
 
+from ..config import DSAM_LIVE_MAP_MAX_POINTS, DSAM_SESSION_SYNC_MODE, DSAM_STREAM_HEARTBEAT_SECONDS
 from ..models.database import (
     ActiveSession, SessionSecurityRule, SessionGeoEvent,
     AccountSecurityAction, TenantSessionConfig,
@@ -19,11 +21,19 @@ from ..models.database import (
     Customer, get_db,
 )
 from ..services.session_monitor import (
-    sync_sessions_to_db, terminate_redis_session,
+    sync_sessions_to_db, terminate_redis_session, get_scan_metrics,
     get_active_sessions_by_tenant, get_active_sessions_by_user,
     get_session_stats, get_geo_heatmap_data,
 )
-from ..services.seat_events import get_non_billable_logins
+from ..services.session_geo_map import MAX_MAP_ZOOM, get_live_map_clusters
+from ..services.session_keyspace import session_keyspace_listener
+from ..services.session_stream import (
+    SessionStreamSubscriber, format_sse, removal_delta, session_broadcaster,
+)
+from ..services.session_summary import (
+    build_grouped_sessions, list_tenant_summaries, load_customers_by_subdomain,
+    refresh_session_summaries, serialize_session,
+)
 from ..security.session_rules import (
     run_full_security_scan, log_security_action, evaluate_rules_for_session,
 )
@@ -148,102 +158,6 @@ class ResolveActionRequest(BaseModel):
     resolution_note: str
 
 
-def _load_customers_by_subdomain(db: Session, tenant_names: set[str]) -> dict[str, Customer]:
-    if not tenant_names:
-        return {}
-    result = db.execute(select(Customer).where(Customer.subdomain.in_(tenant_names)))
-    return {customer.subdomain: customer for customer in result.scalars().all()}
-
-
-def _classify_account_type(tenant_db: str, login: Optional[str], customer: Optional[Customer]) -> str:
-    normalized_login = (login or "").strip().lower()
-    if not normalized_login:
-        return "unknown"
-    excluded = get_non_billable_logins(
-        tenant_db,
-        customer=customer,
-        admin_email=customer.email if customer else None,
-    )
-    return "operational" if normalized_login in excluded else "billable"
-
-
-def _serialize_session(session: ActiveSession, customer: Optional[Customer]) -> dict[str, Any]:
-    return {
-        "id": session.id,
-        "redis_key": session.redis_session_key,
-        "tenant_db": session.tenant_db,
-        "customer_name": customer.company_name if customer else None,
-        "odoo_login": session.odoo_login,
-        "odoo_uid": session.odoo_uid,
-        "ip_address": session.ip_address,
-        "country": session.geo_country,
-        "country_code": session.geo_country_code,
-        "region": session.geo_region,
-        "city": session.geo_city,
-        "lat": session.geo_lat,
-        "lon": session.geo_lon,
-        "session_start": session.session_start.isoformat() if session.session_start else None,
-        "last_activity": session.last_activity.isoformat() if session.last_activity else None,
-        "first_seen": session.first_seen_at.isoformat() if session.first_seen_at else None,
-        "is_active": session.is_active,
-        "account_type": _classify_account_type(session.tenant_db, session.odoo_login, customer),
-    }
-
-
-def _build_grouped_sessions(sessions: list[ActiveSession], customers_by_subdomain: dict[str, Customer]) -> list[dict[str, Any]]:
-    grouped: dict[str, dict[str, Any]] = {}
-    for session in sessions:
-        tenant_group = grouped.setdefault(
-            session.tenant_db,
-            {
-                "tenant_db": session.tenant_db,
-                "customer_name": customers_by_subdomain.get(session.tenant_db).company_name if customers_by_subdomain.get(session.tenant_db) else None,
-                "total_sessions": 0,
-                "billable_users": 0,
-                "operational_users": 0,
-                "unknown_users": 0,
-                "users": {},
-            },
-        )
-        tenant_group["total_sessions"] += 1
-        account_type = _classify_account_type(session.tenant_db, session.odoo_login, customers_by_subdomain.get(session.tenant_db))
-        user_key = (session.odoo_login or "(sin-login)").strip() or "(sin-login)"
-        user_entry = tenant_group["users"].setdefault(
-            user_key,
-            {
-                "odoo_login": session.odoo_login,
-                "account_type": account_type,
-                "session_count": 0,
-                "ip_addresses": [],
-                "last_activity": None,
-                "country": session.geo_country,
-                "city": session.geo_city,
-                "sessions": [],
-            },
-        )
-        user_entry["session_count"] += 1
-        user_entry["sessions"].append(_serialize_session(session, customers_by_subdomain.get(session.tenant_db)))
-        if session.ip_address and session.ip_address not in user_entry["ip_addresses"]:
-            user_entry["ip_addresses"].append(session.ip_address)
-        if session.last_activity:
-            current_last = user_entry["last_activity"]
-            if current_last is None or session.last_activity.isoformat() > current_last:
-                user_entry["last_activity"] = session.last_activity.isoformat()
-
-    normalized_groups = []
-    for tenant_group in grouped.values():
-        users = list(tenant_group["users"].values())
-        users.sort(key=lambda item: ((item["account_type"] != "billable"), item["odoo_login"] or ""))
-        tenant_group["users"] = users
-        tenant_group["billable_users"] = sum(1 for item in users if item["account_type"] == "billable")
-        tenant_group["operational_users"] = sum(1 for item in users if item["account_type"] == "operational")
-        tenant_group["unknown_users"] = sum(1 for item in users if item["account_type"] == "unknown")
-        normalized_groups.append(tenant_group)
-
-    normalized_groups.sort(key=lambda item: item["total_sessions"], reverse=True)
-    return normalized_groups
-
-
 # ═══════════════════════════════════════════════════════
 # Dashboard & Stats
 # ═══════════════════════════════════════════════════════
@@ -258,27 +172,20 @@ async def get_dashboard(
     _require_admin(request, access_token)
     stats = await get_session_stats(db)
 
-    # Alertas sin resolver
-    unresolved = db.execute(
-        select(func.count(AccountSecurityAction.id)).where(
-            AccountSecurityAction.resolved == False
-        )
-    )
-    critical_unresolved = db.execute(
-        select(func.count(AccountSecurityAction.id)).where(
-            and_(
-                AccountSecurityAction.resolved == False,
-                AccountSecurityAction.severity == SessionAlertSeverity.CRITICAL,
-            )
-        )
-    )
+    # Alertas sin resolver (total y críticas en una sola consulta)
+    unresolved, critical_unresolved = db.execute(
+        select(
+            func.count(AccountSecurityAction.id),
+            func.count(case((AccountSecurityAction.severity == SessionAlertSeverity.CRITICAL, 1))),
+        ).where(AccountSecurityAction.resolved == False)
+    ).one()
 
     return {
         "success": True,
         "data": {
             **stats,
-            "unresolved_alerts": unresolved.scalar() or 0,
-            "critical_alerts": critical_unresolved.scalar() or 0,
+            "unresolved_alerts": unresolved or 0,
+            "critical_alerts": critical_unresolved or 0,
         },
         "meta": {"timestamp": datetime.now(timezone.utc).replace(tzinfo=None).isoformat()},
     }
@@ -297,7 +204,10 @@ async def sync_sessions(
     """Fuerza sincronización de sesiones desde Redis."""
     _require_admin(request, access_token)
     stats = await sync_sessions_to_db(db)
-    return {"success": True, "data": stats, "meta": {}}
+    meta: dict = {"redis_scan": get_scan_metrics(), "stream": session_broadcaster.metrics()}
+    if DSAM_SESSION_SYNC_MODE == "keyspace":
+        meta["keyspace"] = session_keyspace_listener.metrics()
+    return {"success": True, "data": stats, "meta": meta}
 
 
 @router.get("/sessions")
@@ -328,11 +238,11 @@ async def list_all_sessions(
     query = query.order_by(ActiveSession.last_activity.desc()).offset(offset).limit(limit)
     result = db.execute(query)
     sessions = result.scalars().all()
-    customers_by_subdomain = _load_customers_by_subdomain(db, {s.tenant_db for s in sessions})
+    customers_by_subdomain = load_customers_by_subdomain(db, {s.tenant_db for s in sessions})
 
     return {
         "success": True,
-        "data": [_serialize_session(s, customers_by_subdomain.get(s.tenant_db)) for s in sessions],
+        "data": [serialize_session(s, customers_by_subdomain.get(s.tenant_db)) for s in sessions],
         "meta": {"total": total, "page": page, "limit": limit},
     }
 
@@ -343,19 +253,30 @@ async def list_grouped_sessions(
     access_token: str = Cookie(None),
     tenant: Optional[str] = Query(None),
     active_only: bool = Query(True),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=200),
     db: Session = Depends(get_db),
 ):
-    """Lista sesiones agrupadas por tenant y usuario, con IPs distintas por cuenta."""
+    """
+    Lista sesiones agrupadas por tenant y usuario, con IPs distintas por cuenta.
+    Las activas se leen del read model (session_tenant_summaries) paginado por
+    cursor; con active_only=false se agrupa el histórico completo en vivo.
+    """
     _require_admin(request, access_token)
+    if active_only:
+        try:
+            grouped, meta = list_tenant_summaries(db, tenant=tenant, cursor=cursor, limit=limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"success": True, "data": grouped, "meta": meta}
+
     query = select(ActiveSession)
     if tenant:
         query = query.where(ActiveSession.tenant_db.ilike(f"%{tenant.strip()}%"))
-    if active_only:
-        query = query.where(ActiveSession.is_active == True)
 
     sessions = db.execute(query.order_by(ActiveSession.tenant_db, ActiveSession.odoo_login, desc(ActiveSession.last_activity))).scalars().all()
-    customers_by_subdomain = _load_customers_by_subdomain(db, {s.tenant_db for s in sessions})
-    grouped = _build_grouped_sessions(sessions, customers_by_subdomain)
+    customers_by_subdomain = load_customers_by_subdomain(db, {s.tenant_db for s in sessions})
+    grouped = build_grouped_sessions(sessions, customers_by_subdomain)
 
     return {
         "success": True,
@@ -364,6 +285,7 @@ async def list_grouped_sessions(
             "total_tenants": len(grouped),
             "total_sessions": len(sessions),
             "total_users": sum(len(group["users"]) for group in grouped),
+            "next_cursor": None,
         },
     }
 
@@ -378,10 +300,10 @@ async def sessions_by_tenant(
     """Sesiones activas para un tenant específico."""
     _require_admin(request, access_token)
     sessions = await get_active_sessions_by_tenant(db, tenant_db)
-    customers_by_subdomain = _load_customers_by_subdomain(db, {tenant_db})
+    customers_by_subdomain = load_customers_by_subdomain(db, {tenant_db})
     return {
         "success": True,
-        "data": [_serialize_session(s, customers_by_subdomain.get(tenant_db)) for s in sessions],
+        "data": [serialize_session(s, customers_by_subdomain.get(tenant_db)) for s in sessions],
         "meta": {"tenant": tenant_db, "count": len(sessions)},
     }
 
@@ -416,7 +338,9 @@ async def terminate_session(
             details={"reason": body.reason, "session_key": body.session_key},
             actor_username=getattr(admin, "username", None) or getattr(admin, "email", None),
         )
+        refresh_session_summaries(db, {session.tenant_db})
         db.commit()
+        session_broadcaster.publish([removal_delta(session.redis_session_key, session.tenant_db)])
 
     return {
         "success": terminated,
@@ -438,19 +362,16 @@ async def geo_heatmap(
     request: Request,
     access_token: str = Cookie(None),
     days: int = Query(30, ge=1, le=365),
+    tenant: Optional[str] = None,
     db: Session = Depends(get_db),
 ):
-    """Datos de mapa de calor geográfico."""
+    """Datos de mapa de calor geográfico (rollups diarios)."""
     _require_admin(request, access_token)
-    data = await get_geo_heatmap_data(db, days=days)
-    active_total = db.execute(
-        select(func.count(ActiveSession.id)).where(ActiveSession.is_active == True)
-    ).scalar() or 0
-    mapped_total = db.execute(
-        select(func.count(ActiveSession.id)).where(
-            and_(ActiveSession.is_active == True, ActiveSession.geo_lat.isnot(None))
-        )
-    ).scalar() or 0
+    data = await get_geo_heatmap_data(db, days=days, tenant_db=tenant)
+    active_total, mapped_total = db.execute(
+        select(func.count(ActiveSession.id), func.count(ActiveSession.geo_lat))
+        .where(ActiveSession.is_active == True)
+    ).one()
     return {
         "success": True,
         "data": data,
@@ -462,41 +383,101 @@ async def geo_heatmap(
 async def geo_live_map(
     request: Request,
     access_token: str = Cookie(None),
+    zoom: Optional[int] = Query(None, ge=0, le=MAX_MAP_ZOOM),
     db: Session = Depends(get_db),
 ):
-    """Posiciones actuales de sesiones activas para mapa en vivo."""
+    """
+    Posiciones actuales de sesiones activas para mapa en vivo.
+    Con ``zoom`` retorna puntos agrupados en grilla (tope DSAM_LIVE_MAP_MAX_POINTS);
+    sin él, la lista por sesión, limitada a las más recientes.
+    """
     _require_admin(request, access_token)
-    result = db.execute(
-        select(ActiveSession).where(
-            and_(
-                ActiveSession.is_active == True,
-                ActiveSession.geo_lat.isnot(None),
-            )
+    active_total, mapped_total = db.execute(
+        select(func.count(ActiveSession.id), func.count(ActiveSession.geo_lat))
+        .where(ActiveSession.is_active == True)
+    ).one()
+    unmapped = max(0, active_total - mapped_total)
+
+    if zoom is not None:
+        clusters = get_live_map_clusters(db, zoom)
+        return {
+            "success": True,
+            "data": clusters["points"],
+            "meta": {
+                "count": len(clusters["points"]),
+                "sessions": clusters["sessions"],
+                "zoom": clusters["zoom"],
+                "cell_degrees": clusters["cell_degrees"],
+                "truncated": clusters["truncated"],
+                "unmapped_active_sessions": unmapped,
+            },
+        }
+
+    rows = db.execute(
+        select(
+            ActiveSession.redis_session_key,
+            ActiveSession.tenant_db, ActiveSession.odoo_login, ActiveSession.ip_address,
+            ActiveSession.geo_country, ActiveSession.geo_city,
+            ActiveSession.geo_lat, ActiveSession.geo_lon, ActiveSession.last_activity,
         )
-    )
-    sessions = result.scalars().all()
-    total_active = db.execute(
-        select(func.count(ActiveSession.id)).where(ActiveSession.is_active == True)
-    ).scalar() or 0
+        .where(and_(ActiveSession.is_active == True, ActiveSession.geo_lat.isnot(None)))
+        .order_by(ActiveSession.last_activity.desc().nullslast())
+        .limit(DSAM_LIVE_MAP_MAX_POINTS)
+    ).all()
     return {
         "success": True,
         "data": [
             {
-                "tenant_db": s.tenant_db,
-                "odoo_login": s.odoo_login,
-                "ip": s.ip_address,
-                "country": s.geo_country,
-                "city": s.geo_city,
-                "lat": s.geo_lat,
-                "lon": s.geo_lon,
-                "last_activity": s.last_activity.isoformat() if s.last_activity else None,
+                "key": r.redis_session_key,
+                "tenant_db": r.tenant_db,
+                "odoo_login": r.odoo_login,
+                "ip": r.ip_address,
+                "country": r.geo_country,
+                "city": r.geo_city,
+                "lat": r.geo_lat,
+                "lon": r.geo_lon,
+                "last_activity": r.last_activity.isoformat() if r.last_activity else None,
             }
-            for s in sessions
+            for r in rows
         ],
-        "meta": {"count": len(sessions), "unmapped_active_sessions": max(0, total_active - len(sessions))},
+        "meta": {
+            "count": len(rows),
+            "truncated": mapped_total > len(rows),
+            "unmapped_active_sessions": unmapped,
+        },
     }
 
 
+async def _session_event_stream(request: Request, subscriber: SessionStreamSubscriber):
+    try:
+        yield "retry: 5000\n\n"
+        while not await request.is_disconnected():
+            event = await subscriber.get(timeout=DSAM_STREAM_HEARTBEAT_SECONDS)
+            yield format_sse(event) if event is not None else ": ping\n\n"
+    finally:
+        session_broadcaster.unsubscribe(subscriber)
+
+
+@router.get("/stream")
+async def stream_session_changes(
+    request: Request,
+    access_token: str = Cookie(None),
+):
+    """
+    Server-Sent Events con los deltas de sesiones de cada sync (add / move /
+    remove) y un evento "sync" con los contadores del dashboard. No abre
+    sesión de BD: el snapshot inicial sale de /geo/live y /dashboard, y un
+    evento "resync" indica que hay que recargarlo.
+    """
+    _require_admin(request, access_token)
+    subscriber = session_broadcaster.subscribe()
+    return StreamingResponse(
+        _session_event_stream(request, subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/tenants")
 async def list_dsam_tenants(
     request: Request,
@@ -873,11 +854,14 @@ async def lock_account(
         )
     )
     sessions = result.scalars().all()
-    terminated_count = 0
+    terminated = []
     for s in sessions:
         if await terminate_redis_session(s.redis_session_key):
             s.is_active = False
-            terminated_count += 1
+            terminated.append(removal_delta(s.redis_session_key, s.tenant_db))
+    terminated_count = len(terminated)
+    if terminated_count:
+        refresh_session_summaries(db, {body.tenant_db})
 
     # Registrar acción
     log_security_action(
@@ -892,6 +876,7 @@ async def lock_account(
         },
         actor_username=getattr(admin, "username", None) or getattr(admin, "email", None),
     )
+    session_broadcaster.publish(terminated)
 
     # TODO: Notificar Odoo vía webhook para desactivar el usuario
     # (integrar con jeturing_erp_sync cuando esté listo)
@@ -965,11 +950,12 @@ async def run_scan(
 async def audit_seats(
     request: Request,
     access_token: str = Cookie(None),
+    include_logins: bool = Query(False),
     db: Session = Depends(get_db),
 ):
     """Ejecuta auditoría de seats vs sesiones activas."""
     _require_admin(request, access_token)
-    result = await run_seat_audit(db)
+    result = await run_seat_audit(db, include_logins=include_logins)
     return {"success": True, "data": result, "meta": {}}
 
 
@@ -1,12 +1,17 @@
 """
 Audit Logging - Security event tracking and logging
 """
+from collections import deque
 from datetime import datetime, timezone
-from typing import Optional
+from logging.handlers import QueueHandler, QueueListener
+from typing import Deque, Dict, Optional
 from enum import Enum
+import atexit
 import json
 import logging
 import os
+import queue
+import threading
 
 # Configure audit logger
 audit_logger = logging.getLogger("audit")
@@ -24,7 +29,8 @@ audit_file_handler.setLevel(logging.INFO)
 class JSONFormatter(logging.Formatter):
     def format(self, record):
         log_data = {
-            "timestamp": datetime.now(timezone.utc).replace(tzinfo=None).isoformat(),
+            # record.created: hora del evento, no la del hilo que escribe el archivo
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).replace(tzinfo=None).isoformat(),
             "level": record.levelname,
             "message": record.getMessage(),
         }
@@ -32,14 +38,38 @@ class JSONFormatter(logging.Formatter):
             log_data.update(record.audit_data)
         return json.dumps(log_data)
 
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler que nunca bloquea: si la cola está llena descarta y cuenta."""
+
+    def __init__(self, log_queue: "queue.Queue"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
 audit_file_handler.setFormatter(JSONFormatter())
-audit_logger.addHandler(audit_file_handler)
+_audit_output_handlers = [audit_file_handler]
 
 # También log a consola en desarrollo
 if os.getenv("ENVIRONMENT", "development") != "production":
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(JSONFormatter())
-    audit_logger.addHandler(console_handler)
+    _audit_output_handlers.append(console_handler)
+
+# El request path solo encola; el archivo/consola se escriben en el hilo del listener.
+AUDIT_QUEUE_MAX_SIZE = int(os.getenv("AUDIT_LOG_QUEUE_SIZE", "10000"))
+_audit_queue: "queue.Queue" = queue.Queue(maxsize=AUDIT_QUEUE_MAX_SIZE)
+audit_queue_handler = _DroppingQueueHandler(_audit_queue)
+audit_logger.addHandler(audit_queue_handler)
+audit_listener = QueueListener(_audit_queue, *_audit_output_handlers, respect_handler_level=True)
+audit_listener.start()
+atexit.register(audit_listener.stop)
 
 
 class AuditEvent(str, Enum):
@@ -166,6 +196,7 @@ class AuditLogger:
         record.audit_data = audit_data
         
         audit_logger.handle(record)
+        AuditLogStore.store(dict(audit_data))
     
     @staticmethod
     def log_login_success(
@@ -283,22 +314,69 @@ class AuditLogger:
         )
 
 
-# Almacenamiento de logs en BD (opcional)
+# Vista de eventos recientes en memoria (ring buffer) + búsqueda histórica en BD
 class AuditLogStore:
     """
-    Almacena logs de auditoría en la base de datos.
-    Útil para búsquedas y reportes.
+    Ring buffer de tamaño fijo con los eventos de auditoría más recientes,
+    indexado por tipo de evento y username.
+
+    La búsqueda histórica (fuera de la ventana del buffer) se delega a
+    AuditEventRecord en PostgreSQL.
     """
-    
-    _logs = []  # En memoria para demo, usar DB en producción
-    
+
+    MAX_ENTRIES = int(os.getenv("AUDIT_RECENT_BUFFER_SIZE", "5000"))
+
+    _lock = threading.Lock()
+    _seq = 0
+    _logs: Deque[dict] = deque()
+    _by_event: Dict[str, Deque[dict]] = {}
+    _by_username: Dict[str, Deque[dict]] = {}
+
+    @classmethod
+    def _unindex(cls, index: Dict[str, Deque[dict]], key: Optional[str], entry: dict) -> None:
+        if key is None:
+            return
+        bucket = index.get(key)
+        # El evento desalojado siempre es el más antiguo de su bucket.
+        if bucket and bucket[0] is entry:
+            bucket.popleft()
+            if not bucket:
+                del index[key]
+
     @classmethod
     def store(cls, audit_data: dict):
-        """Almacena un log en la BD."""
-        audit_data["id"] = len(cls._logs) + 1
-        audit_data["created_at"] = datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
-        cls._logs.append(audit_data)
-    
+        """Agrega un evento al buffer, desalojando el más antiguo si está lleno."""
+        with cls._lock:
+            cls._seq += 1
+            audit_data["id"] = cls._seq
+            audit_data["created_at"] = datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+
+            if len(cls._logs) >= cls.MAX_ENTRIES:
+                evicted = cls._logs.popleft()
+                cls._unindex(cls._by_event, evicted.get("event"), evicted)
+                cls._unindex(cls._by_username, evicted.get("username"), evicted)
+
+            cls._logs.append(audit_data)
+            if audit_data.get("event") is not None:
+                cls._by_event.setdefault(audit_data["event"], deque()).append(audit_data)
+            if audit_data.get("username") is not None:
+                cls._by_username.setdefault(audit_data["username"], deque()).append(audit_data)
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._seq = 0
+            cls._logs.clear()
+            cls._by_event.clear()
+            cls._by_username.clear()
+
+    @classmethod
+    def oldest_created_at(cls) -> Optional[datetime]:
+        with cls._lock:
+            if not cls._logs:
+                return None
+            return datetime.fromisoformat(cls._logs[0]["created_at"])
+
     @classmethod
     def search(
         cls,
@@ -306,25 +384,97 @@ class AuditLogStore:
         username: str = None,
         start_date: datetime = None,
         end_date: datetime = None,
-        limit: int = 100
+        limit: int = 100,
+        db=None,
     ) -> list:
-        """Busca logs de auditoría."""
+        """
+        Busca logs de auditoría, más recientes primero.
+
+        Se sirve del buffer en memoria usando el índice más selectivo. Si se
+        pasa ``db`` y la ventana pedida empieza antes que el buffer, la
+        búsqueda se delega a AuditEventRecord.
+        """
+        if db is not None and start_date is not None:
+            oldest = cls.oldest_created_at()
+            if oldest is None or start_date < oldest:
+                return cls.search_history(
+                    db, event=event, username=username,
+                    start_date=start_date, end_date=end_date, limit=limit,
+                )
+
+        start_iso = start_date.isoformat() if start_date else None
+        end_iso = end_date.isoformat() if end_date else None
+
+        with cls._lock:
+            candidates = cls._logs
+            if event is not None:
+                candidates = cls._by_event.get(event, ())
+            if username is not None:
+                by_user = cls._by_username.get(username, ())
+                if event is None or len(by_user) < len(candidates):
+                    candidates = by_user
+            candidates = list(candidates)
+
         results = []
-        
-        for log in reversed(cls._logs):
+        for log in reversed(candidates):
             if event and log.get("event") != event:
                 continue
             if username and log.get("username") != username:
                 continue
-            # Agregar filtros de fecha si es necesario
-            
+            if end_iso and log["created_at"] > end_iso:
+                continue
+            if start_iso and log["created_at"] < start_iso:
+                break
             results.append(log)
             if len(results) >= limit:
                 break
-        
+
         return results
-    
+
+    @staticmethod
+    def search_history(
+        db,
+        event: str = None,
+        username: str = None,
+        start_date: datetime = None,
+        end_date: datetime = None,
+        limit: int = 100,
+    ) -> list:
+        """Búsqueda histórica sobre audit_events (usa los índices compuestos por created_at)."""
+        from ..models.database import AuditEventRecord
+
+        q = db.query(AuditEventRecord)
+        if event:
+            q = q.filter(AuditEventRecord.event_type == event)
+        if username:
+            q = q.filter(AuditEventRecord.actor_username == username)
+        if start_date:
+            q = q.filter(AuditEventRecord.created_at >= start_date)
+        if end_date:
+            q = q.filter(AuditEventRecord.created_at <= end_date)
+
+        rows = q.order_by(AuditEventRecord.created_at.desc(), AuditEventRecord.id.desc()).limit(limit).all()
+        return [
+            {
+                "id": r.id,
+                "event": r.event_type,
+                "user_id": r.actor_id,
+                "username": r.actor_username,
+                "role": r.actor_role,
+                "ip_address": r.ip_address,
+                "user_agent": r.user_agent,
+                "resource": r.resource,
+                "action": r.action,
+                "status": r.status,
+                "details": r.details or {},
+                "created_at": r.created_at.isoformat() if r.created_at else None,
+            }
+            for r in rows
+        ]
+
     @classmethod
     def get_recent(cls, limit: int = 50) -> list:
         """Obtiene los logs más recientes."""
-        return list(reversed(cls._logs[-limit:]))
+        with cls._lock:
+            count = min(limit, len(cls._logs))
+            return [cls._logs[-i] for i in range(1, count + 1)]
@@ -22,7 +22,7 @@ from ..config import PROVISIONING_API_KEY, get_runtime_setting
 from ..models.database import get_db
 from ..routes.api_keys import verify_api_key_detailed
 from .api_scopes import ApiAccessLevel, has_level_permission, normalize_level
-from ..services.api_key_audit import log_api_key_event
+from ..services.api_key_audit import enqueue_api_key_event
 from ..services.rate_limiter import consume_rate_limit
 
 logger = logging.getLogger(__name__)
@@ -82,28 +82,24 @@ def _extract_client_ip(request: Request) -> str | None:
 
 
 def _audit_event(
-    db: Session,
     key_id: str,
     auth_mode: str,
     request: Request,
     status_code: int,
     reject_reason: str | None,
 ) -> None:
+    """Encola el evento; la escritura en BD la hace el writer en background."""
     try:
-        client_ip = _extract_client_ip(request)
-        log_api_key_event(
-            db=db,
+        enqueue_api_key_event(
             key_id=key_id,
             auth_mode=auth_mode,
             path=request.url.path,
             method=request.method,
-            ip_address=client_ip,
+            ip_address=_extract_client_ip(request),
             status_code=status_code,
             reject_reason=reject_reason,
         )
-        db.commit()
     except Exception as exc:
-        db.rollback()
         logger.warning("GW-006 audit failed: %s", exc)
 
 
@@ -152,7 +148,6 @@ def require_gateway_api_key(
     raw_key = (x_api_key or request.headers.get("x-api-key") or "").strip()
     if not raw_key:
         _audit_event(
-            db=db,
             key_id="missing",
             auth_mode="unknown",
             request=request,
@@ -173,7 +168,6 @@ def require_gateway_api_key(
         if managed_key is None:
             if reason in {"rate_limit_minute", "rate_limit_day", "quota_month"}:
                 _audit_event(
-                    db=db,
                     key_id="managed-unknown",
                     auth_mode="managed_api_key",
                     request=request,
@@ -183,7 +177,6 @@ def require_gateway_api_key(
                 raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=reason)
             if reason == "expired":
                 _audit_event(
-                    db=db,
                     key_id="managed-unknown",
                     auth_mode="managed_api_key",
                     request=request,
@@ -192,7 +185,6 @@ def require_gateway_api_key(
                 )
                 raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="API key expirada")
             _audit_event(
-                db=db,
                 key_id="managed-unknown",
                 auth_mode="managed_api_key",
                 request=request,
@@ -208,7 +200,6 @@ def require_gateway_api_key(
         )
         if not allowed:
             _audit_event(
-                db=db,
                 key_id=managed_key.key_id,
                 auth_mode="managed_api_key",
                 request=request,
@@ -225,7 +216,6 @@ def require_gateway_api_key(
             "required_level": required_level.value,
         }
         _audit_event(
-            db=db,
             key_id=managed_key.key_id,
             auth_mode="managed_api_key",
             request=request,
@@ -239,7 +229,6 @@ def require_gateway_api_key(
         block_reason = _legacy_gateway_block_reason()
         if block_reason:
             _audit_event(
-                db=db,
                 key_id="legacy-provisioning",
                 auth_mode="legacy_provisioning_key",
                 request=request,
@@ -256,7 +245,6 @@ def require_gateway_api_key(
         )
         if not legacy_decision.allowed:
             _audit_event(
-                db=db,
                 key_id="legacy-provisioning",
                 auth_mode="legacy_provisioning_key",
                 request=request,
@@ -275,7 +263,6 @@ def require_gateway_api_key(
         )
         if not allowed:
             _audit_event(
-                db=db,
                 key_id="legacy-provisioning",
                 auth_mode="legacy_provisioning_key",
                 request=request,
@@ -292,7 +279,6 @@ def require_gateway_api_key(
             "required_level": required_level.value,
         }
         _audit_event(
-            db=db,
             key_id="legacy-provisioning",
             auth_mode="legacy_provisioning_key",
             request=request,
@@ -303,7 +289,6 @@ def require_gateway_api_key(
         return auth_info
 
     _audit_event(
-        db=db,
         key_id="invalid",
         auth_mode="unknown",
         request=request,
@@ -7,12 +7,13 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from collections import defaultdict
 from datetime import datetime, timedelta
 import time
-import re
 import os
 import logging
 import hashlib
 import threading
 
+from .waf_matcher import load_waf_matcher
+
 logger = logging.getLogger(__name__)
 
 # Environment config
@@ -182,80 +183,17 @@ class WAFMiddleware(BaseHTTPMiddleware):
     Detecta y bloquea patrones de ataque comunes.
     """
     
-    # Patrones sospechosos
-    SQL_INJECTION_PATTERNS = [
-        r"(\%27)|(\')|(\-\-)|(\%23)|(#)",
-        r"((\%3D)|(=))[^\n]*((\%27)|(\')|(\-\-)|(\%3B)|(;))",
-        r"\w*((\%27)|(\'))((\%6F)|o|(\%4F))((\%72)|r|(\%52))",
-        r"((\%27)|(\'))union",
-        r"exec(\s|\+)+(s|x)p\w+",
-        r"UNION(\s+)SELECT",
-        r"SELECT.*FROM",
-        r"INSERT(\s+)INTO",
-        r"DELETE(\s+)FROM",
-        r"DROP(\s+)TABLE",
-    ]
-    
-    XSS_PATTERNS = [
-        r"<script[^>]*>",
-        r"javascript:",
-        r"\bon\w+\s*=",
-        r"<iframe",
-        r"<object",
-        r"<embed",
-        r"<link[^>]*href",
-        r"expression\s*\(",
-        r"vbscript:",
-    ]
-    
-    PATH_TRAVERSAL_PATTERNS = [
-        r"\.\./",
-        r"\.\.\\",
-        r"%2e%2e%2f",
-        r"%2e%2e/",
-        r"\.%2e/",
-        r"%2e\./",
-    ]
-    
-    COMMAND_INJECTION_PATTERNS = [
-        r";\s*cat\s+",
-        r";\s*ls\s+",
-        r"\|\s*cat\s+",
-        r"\$\(",
-        r"`.*`",
-        r";\s*wget\s+",
-        r";\s*curl\s+",
-        r";\s*rm\s+",
-    ]
-    
-    def __init__(self, app, enabled: bool = True):
+    # Las reglas (SQLi, XSS, path traversal, command injection) se cargan
+    # versionadas desde waf_rules.json; ver waf_matcher.
+
+    def __init__(self, app, enabled: bool = True, rules_path: str = None):
         super().__init__(app)
         self.enabled = enabled
-        self.compiled_patterns = self._compile_patterns()
-    
-    def _compile_patterns(self) -> dict:
-        """Compila patrones regex para mejor rendimiento."""
-        return {
-            "sql_injection": [re.compile(p, re.IGNORECASE) for p in self.SQL_INJECTION_PATTERNS],
-            "xss": [re.compile(p, re.IGNORECASE) for p in self.XSS_PATTERNS],
-            "path_traversal": [re.compile(p, re.IGNORECASE) for p in self.PATH_TRAVERSAL_PATTERNS],
-            "command_injection": [re.compile(p, re.IGNORECASE) for p in self.COMMAND_INJECTION_PATTERNS],
-        }
-    
-    def _check_patterns(self, value: str, patterns: list) -> tuple[bool, str]:
-        """Verifica si un valor coincide con patrones maliciosos."""
-        for pattern in patterns:
-            if pattern.search(value):
-                return True, pattern.pattern
-        return False, ""
-    
+        self.matcher = load_waf_matcher(rules_path)
+
     def _scan_value(self, value: str) -> tuple[bool, str, str]:
         """Escanea un valor por todos los tipos de ataques."""
-        for attack_type, patterns in self.compiled_patterns.items():
-            is_malicious, matched_pattern = self._check_patterns(value, patterns)
-            if is_malicious:
-                return True, attack_type, matched_pattern
-        return False, "", ""
+        return self.matcher.scan(value)
     
     async def dispatch(self, request: Request, call_next):
         if not self.enabled:
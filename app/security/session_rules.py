@@ -3,11 +3,13 @@ DSAM — Session Security Rules Engine
 Evalúa reglas de seguridad configurables por tenant/usuario.
 Detecta: sesiones concurrentes, viaje imposible, restricciones geo, etc.
 """
+import ipaddress
 import logging
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Any, Optional
+from typing import Any, Optional, Sequence
 
-from sqlalchemy import select, and_, func, desc
+from sqlalchemy import select, func
 from sqlalchemy.orm import Session
 
 from ..config import (
@@ -15,13 +17,14 @@ from ..config import (
     DSAM_IMPOSSIBLE_TRAVEL_MIN_KM,
 )
 from ..models.database import (
-    ActiveSession, SessionSecurityRule, SessionGeoEvent,
+    ActiveSession, SessionSecurityRule,
     AccountSecurityAction, TenantSessionConfig,
     SessionRuleType, SessionActionType, SessionAlertSeverity,
 )
 from ..services.session_monitor import (
     haversine_km, terminate_redis_session, geolocate_ip,
 )
+from ..services.session_locations import LastLocation, last_location_index
 
 logger = logging.getLogger(__name__)
 
@@ -30,109 +33,183 @@ logger = logging.getLogger(__name__)
 # Rule Evaluation
 # ═══════════════════════════════════════════════════════
 
-def evaluate_rules_for_session(
-    db: Session,
-    session: ActiveSession,
-) -> list[dict[str, Any]]:
+# Por encima de este número de tenants/logins las consultas agregadas no filtran
+# (un IN enorme cuesta más que agrupar toda la tabla de sesiones activas).
+_TENANT_FILTER_MAX = 1000
+
+
+@dataclass(frozen=True)
+class _CompiledRule:
+    """Regla precompilada para evaluar muchas sesiones sin tocar la BD."""
+    rule: SessionSecurityRule
+    exempt_users: frozenset
+    exempt_tenants: frozenset
+    networks: tuple = ()
+
+
+class SessionRuleEvaluator:
     """
-    Evalúa TODAS las reglas aplicables a una sesión activa.
-    Retorna lista de violaciones detectadas.
+    Evaluador por lotes de reglas de seguridad.
+
+    Carga una sola vez las reglas habilitadas, las configs de tenant, los
+    conteos de sesiones activas por (tenant, login) con un GROUP BY; la última
+    ubicación por usuario sale del índice en memoria (last_location_index).
+    Después cada sesión se evalúa en memoria.
     """
-    violations: list[dict[str, Any]] = []
 
-    # Cargar reglas globales + del tenant
-    result = db.execute(
-        select(SessionSecurityRule).where(
-            and_(
-                SessionSecurityRule.is_enabled == True,
-                (
-                    (SessionSecurityRule.tenant_db == None) |
-                    (SessionSecurityRule.tenant_db == session.tenant_db)
-                ),
+    def __init__(self, db: Session, sessions: Sequence[ActiveSession], now: Optional[datetime] = None):
+        self.now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+        tenants = {s.tenant_db for s in sessions}
+        logins = {s.odoo_login for s in sessions}
+        tenant_filter = tenants if len(tenants) <= _TENANT_FILTER_MAX else None
+        login_filter = logins if None not in logins and len(logins) <= _TENANT_FILTER_MAX else None
+
+        rules_query = select(SessionSecurityRule).where(SessionSecurityRule.is_enabled == True)
+        if tenant_filter is not None:
+            rules_query = rules_query.where(
+                (SessionSecurityRule.tenant_db == None) |
+                (SessionSecurityRule.tenant_db.in_(tenant_filter))
             )
-        )
-    )
-    rules = result.scalars().all()
-
-    # Cargar config del tenant
-    config_result = db.execute(
-        select(TenantSessionConfig).where(
-            TenantSessionConfig.tenant_db == session.tenant_db
-        )
-    )
-    tenant_config = config_result.scalar_one_or_none()
-
-    for rule in rules:
-        # Check exemptions
-        if session.odoo_login and session.odoo_login in (rule.exempt_users or []):
-            continue
-        if session.tenant_db in (rule.exempt_tenants or []):
-            continue
+        rules = db.execute(rules_query.order_by(SessionSecurityRule.id)).scalars().all()
+        self._global_rules: list[_CompiledRule] = []
+        self._tenant_rules: dict[str, list[_CompiledRule]] = {}
+        for rule in rules:
+            compiled = _compile_rule(rule)
+            if rule.tenant_db is None:
+                self._global_rules.append(compiled)
+            else:
+                self._tenant_rules.setdefault(rule.tenant_db, []).append(compiled)
+        self._rules_cache: dict[str, list[_CompiledRule]] = {}
+
+        configs_query = select(TenantSessionConfig)
+        if tenant_filter is not None:
+            configs_query = configs_query.where(TenantSessionConfig.tenant_db.in_(tenant_filter))
+        self._tenant_configs = {c.tenant_db: c for c in db.execute(configs_query).scalars().all()}
+
+        rule_types = {r.rule.rule_type for r in self._global_rules}
+        rule_types.update(r.rule.rule_type for rs in self._tenant_rules.values() for r in rs)
+
+        self._active_counts: dict[tuple, int] = {}
+        if rule_types & {SessionRuleType.SINGLE_SESSION, SessionRuleType.MAX_SESSIONS}:
+            counts_query = (
+                select(ActiveSession.tenant_db, ActiveSession.odoo_login, func.count(ActiveSession.id))
+                .where(ActiveSession.is_active == True)
+                .group_by(ActiveSession.tenant_db, ActiveSession.odoo_login)
+            )
+            if tenant_filter is not None:
+                counts_query = counts_query.where(ActiveSession.tenant_db.in_(tenant_filter))
+            if login_filter is not None:
+                counts_query = counts_query.where(ActiveSession.odoo_login.in_(login_filter))
+            self._active_counts = {
+                (tenant_db, login): count for tenant_db, login, count in db.execute(counts_query).all()
+            }
+
+        if SessionRuleType.IMPOSSIBLE_TRAVEL in rule_types:
+            last_location_index.ensure_fresh(db)
+
+        self._time_windows: dict[int, Optional[dict[str, Any]]] = {}
+
+    def _rules_for(self, tenant_db: str) -> list[_CompiledRule]:
+        rules = self._rules_cache.get(tenant_db)
+        if rules is None:
+            rules = sorted(
+                [*self._global_rules, *self._tenant_rules.get(tenant_db, ())],
+                key=lambda r: r.rule.id,
+            )
+            rules = [r for r in rules if tenant_db not in r.exempt_tenants]
+            self._rules_cache[tenant_db] = rules
+        return rules
+
+    def evaluate(self, session: ActiveSession) -> list[dict[str, Any]]:
+        """Evalúa todas las reglas aplicables a una sesión (sin consultas)."""
+        violations: list[dict[str, Any]] = []
+        for compiled in self._rules_for(session.tenant_db):
+            if session.odoo_login and session.odoo_login in compiled.exempt_users:
+                continue
+            violation = self._evaluate_single_rule(compiled, session)
+            if violation:
+                violations.append(violation)
+        return violations
+
+    def _evaluate_single_rule(
+        self,
+        compiled: _CompiledRule,
+        session: ActiveSession,
+    ) -> Optional[dict[str, Any]]:
+        rule = compiled.rule
+        if rule.rule_type == SessionRuleType.SINGLE_SESSION:
+            tenant_config = self._tenant_configs.get(session.tenant_db)
+            if tenant_config and tenant_config.allow_multiple_sessions:
+                return None
+            others = self._active_counts.get((session.tenant_db, session.odoo_login), 0)
+            if session.is_active:
+                others -= 1
+            return _single_session_violation(session, others)
+        elif rule.rule_type == SessionRuleType.MAX_SESSIONS:
+            count = self._active_counts.get((session.tenant_db, session.odoo_login), 0)
+            return _max_sessions_violation(rule, session, count)
+        elif rule.rule_type == SessionRuleType.GEO_RESTRICTION:
+            return _check_geo_restriction(rule, session)
+        elif rule.rule_type == SessionRuleType.IMPOSSIBLE_TRAVEL:
+            prev_event = last_location_index.get(session.tenant_db, session.odoo_login)
+            return _impossible_travel_violation(session, prev_event, self.now)
+        elif rule.rule_type == SessionRuleType.IP_WHITELIST:
+            return _check_ip_whitelist(rule, session, compiled.networks)
+        elif rule.rule_type == SessionRuleType.TIME_RESTRICTION:
+            if rule.id not in self._time_windows:
+                self._time_windows[rule.id] = _time_restriction_window(rule)
+            return _time_restriction_violation(rule, session, self._time_windows[rule.id])
+        return None
 
-        violation = _evaluate_single_rule(db, rule, session, tenant_config)
-        if violation:
-            violations.append(violation)
 
-    return violations
+def _compile_rule(rule: SessionSecurityRule) -> _CompiledRule:
+    networks: tuple = ()
+    if rule.rule_type == SessionRuleType.IP_WHITELIST:
+        parsed = []
+        for cidr in (rule.config or {}).get("allowed_ips", []):
+            try:
+                parsed.append(ipaddress.ip_network(cidr, strict=False))
+            except ValueError:
+                logger.warning("Invalid CIDR %r in session rule %s", cidr, rule.id)
+        networks = tuple(parsed)
+    return _CompiledRule(
+        rule=rule,
+        exempt_users=frozenset(rule.exempt_users or ()),
+        exempt_tenants=frozenset(rule.exempt_tenants or ()),
+        networks=networks,
+    )
 
 
-def _evaluate_single_rule(
+def evaluate_rules_for_session(
     db: Session,
-    rule: SessionSecurityRule,
     session: ActiveSession,
-    tenant_config: Optional[TenantSessionConfig],
-) -> Optional[dict[str, Any]]:
-    """Evalúa una regla individual contra una sesión."""
-    if rule.rule_type == SessionRuleType.SINGLE_SESSION:
-        return _check_single_session(db, rule, session, tenant_config)
-    elif rule.rule_type == SessionRuleType.MAX_SESSIONS:
-        return _check_max_sessions(db, rule, session)
-    elif rule.rule_type == SessionRuleType.GEO_RESTRICTION:
-        return _check_geo_restriction(rule, session)
-    elif rule.rule_type == SessionRuleType.IMPOSSIBLE_TRAVEL:
-        return _check_impossible_travel(db, session)
-    elif rule.rule_type == SessionRuleType.IP_WHITELIST:
-        return _check_ip_whitelist(rule, session)
-    elif rule.rule_type == SessionRuleType.TIME_RESTRICTION:
-        return _check_time_restriction(rule, session)
-    return None
+) -> list[dict[str, Any]]:
+    """
+    Evalúa TODAS las reglas aplicables a una sesión activa.
+    Retorna lista de violaciones detectadas.
+    Para muchas sesiones usar SessionRuleEvaluator directamente.
+    """
+    return SessionRuleEvaluator(db, [session]).evaluate(session)
 
 
 # ── Rule Checkers ──
 
-def _check_single_session(
-    db: Session,
-    rule: SessionSecurityRule,
+def _single_session_violation(
     session: ActiveSession,
-    tenant_config: Optional[TenantSessionConfig],
+    other_count: int,
 ) -> Optional[dict[str, Any]]:
     """Verifica que el usuario solo tenga 1 sesión activa."""
-    # Si el tenant permite múltiples sesiones, skip
-    if tenant_config and tenant_config.allow_multiple_sessions:
-        return None
-
-    result = db.execute(
-        select(func.count(ActiveSession.id)).where(
-            and_(
-                ActiveSession.tenant_db == session.tenant_db,
-                ActiveSession.odoo_login == session.odoo_login,
-                ActiveSession.is_active == True,
-                ActiveSession.id != session.id,
-            )
-        )
-    )
-    count = result.scalar() or 0
-    if count > 0:
+    if other_count > 0:
         return {
             "rule_type": SessionRuleType.SINGLE_SESSION.value,
             "severity": SessionAlertSeverity.HIGH.value,
             "action": SessionActionType.CONCURRENT_SESSION_BLOCKED.value,
             "message": (
-                f"Usuario {session.odoo_login} tiene {count + 1} sesiones activas "
+                f"Usuario {session.odoo_login} tiene {other_count + 1} sesiones activas "
                 f"en tenant {session.tenant_db}"
             ),
             "details": {
-                "concurrent_count": count + 1,
+                "concurrent_count": other_count + 1,
                 "session_ip": session.ip_address,
                 "session_country": session.geo_country,
             },
@@ -140,23 +217,13 @@ def _check_single_session(
     return None
 
 
-def _check_max_sessions(
-    db: Session,
+def _max_sessions_violation(
     rule: SessionSecurityRule,
     session: ActiveSession,
+    count: int,
 ) -> Optional[dict[str, Any]]:
     """Verifica límite máximo de sesiones por usuario."""
     max_allowed = (rule.config or {}).get("max", 3)
-    result = db.execute(
-        select(func.count(ActiveSession.id)).where(
-            and_(
-                ActiveSession.tenant_db == session.tenant_db,
-                ActiveSession.odoo_login == session.odoo_login,
-                ActiveSession.is_active == True,
-            )
-        )
-    )
-    count = result.scalar() or 0
     if count > max_allowed:
         return {
             "rule_type": SessionRuleType.MAX_SESSIONS.value,
@@ -197,9 +264,10 @@ def _check_geo_restriction(
     return None
 
 
-def _check_impossible_travel(
-    db: Session,
+def _impossible_travel_violation(
     session: ActiveSession,
+    prev_event: Optional[LastLocation],
+    now: datetime,
 ) -> Optional[dict[str, Any]]:
     """
     Detección de viaje imposible: si la distancia entre la ubicación
@@ -207,21 +275,6 @@ def _check_impossible_travel(
     """
     if not session.geo_lat or not session.geo_lon or not session.odoo_login:
         return None
-
-    # Buscar el evento geo anterior del mismo usuario
-    result = db.execute(
-        select(SessionGeoEvent)
-        .where(
-            and_(
-                SessionGeoEvent.tenant_db == session.tenant_db,
-                SessionGeoEvent.odoo_login == session.odoo_login,
-                SessionGeoEvent.geo_lat.isnot(None),
-            )
-        )
-        .order_by(desc(SessionGeoEvent.event_at))
-        .limit(1)
-    )
-    prev_event = result.scalar_one_or_none()
     if not prev_event or not prev_event.geo_lat:
         return None
 
@@ -229,7 +282,7 @@ def _check_impossible_travel(
         prev_event.geo_lat, prev_event.geo_lon,
         session.geo_lat, session.geo_lon,
     )
-    time_diff = datetime.now(timezone.utc).replace(tzinfo=None) - (prev_event.event_at or datetime.now(timezone.utc).replace(tzinfo=None))
+    time_diff = now - (prev_event.event_at or now)
     hours_diff = time_diff.total_seconds() / 3600
 
     min_hours = DSAM_IMPOSSIBLE_TRAVEL_MIN_HOURS
@@ -267,16 +320,16 @@ def _check_impossible_travel(
 def _check_ip_whitelist(
     rule: SessionSecurityRule,
     session: ActiveSession,
+    networks: Sequence = (),
 ) -> Optional[dict[str, Any]]:
-    """Verifica que la IP esté en la lista blanca."""
-    import ipaddress
+    """Verifica que la IP esté en la lista blanca (redes precompiladas)."""
     allowed_ips = (rule.config or {}).get("allowed_ips", [])
     if not allowed_ips:
         return None
     try:
         ip = ipaddress.ip_address(session.ip_address)
-        for cidr in allowed_ips:
-            if ip in ipaddress.ip_network(cidr, strict=False):
+        for network in networks:
+            if ip in network:
                 return None
     except ValueError:
         pass
@@ -292,11 +345,12 @@ def _check_ip_whitelist(
     }
 
 
-def _check_time_restriction(
-    rule: SessionSecurityRule,
-    session: ActiveSession,
-) -> Optional[dict[str, Any]]:
-    """Verifica restricción de horario laboral."""
+def _time_restriction_window(rule: SessionSecurityRule) -> Optional[dict[str, Any]]:
+    """
+    Estado de la restricción horaria en este momento: None si se está dentro
+    del horario permitido, o los detalles de la violación si no. No depende de
+    la sesión, así que se calcula una vez por regla y escaneo.
+    """
     config = rule.config or {}
     start_str = config.get("start", "07:00")
     end_str = config.get("end", "22:00")
@@ -314,23 +368,34 @@ def _check_time_restriction(
     start_minutes = start_h * 60 + start_m
     end_minutes = end_h * 60 + end_m
 
-    if not (start_minutes <= current_minutes <= end_minutes):
-        return {
-            "rule_type": SessionRuleType.TIME_RESTRICTION.value,
-            "severity": SessionAlertSeverity.MEDIUM.value,
-            "action": SessionActionType.RULE_VIOLATION.value,
-            "message": (
-                f"Acceso fuera de horario permitido ({start_str}–{end_str} {tz_name}) "
-                f"para {session.odoo_login}@{session.tenant_db}"
-            ),
-            "details": {
-                "current_time": now.strftime("%H:%M"),
-                "allowed_start": start_str,
-                "allowed_end": end_str,
-                "timezone": tz_name,
-            },
-        }
-    return None
+    if start_minutes <= current_minutes <= end_minutes:
+        return None
+    return {
+        "current_time": now.strftime("%H:%M"),
+        "allowed_start": start_str,
+        "allowed_end": end_str,
+        "timezone": tz_name,
+    }
+
+
+def _time_restriction_violation(
+    rule: SessionSecurityRule,
+    session: ActiveSession,
+    window: Optional[dict[str, Any]],
+) -> Optional[dict[str, Any]]:
+    """Verifica restricción de horario laboral."""
+    if window is None:
+        return None
+    return {
+        "rule_type": SessionRuleType.TIME_RESTRICTION.value,
+        "severity": SessionAlertSeverity.MEDIUM.value,
+        "action": SessionActionType.RULE_VIOLATION.value,
+        "message": (
+            f"Acceso fuera de horario permitido ({window['allowed_start']}–{window['allowed_end']} "
+            f"{window['timezone']}) para {session.odoo_login}@{session.tenant_db}"
+        ),
+        "details": dict(window),
+    }
 
 
 # ═══════════════════════════════════════════════════════
@@ -439,8 +504,12 @@ async def run_full_security_scan(db: Session) -> dict[str, Any]:
     total_violations = 0
     total_actions = 0
 
-    for session in all_active:
-        violations = evaluate_rules_for_session(db, session)
+    # Evaluar todo antes de aplicar: enforce_violations hace commit y expira
+    # los objetos cargados, lo que forzaría un refresh por sesión.
+    evaluator = SessionRuleEvaluator(db, all_active)
+    flagged = [(session, evaluator.evaluate(session)) for session in all_active]
+
+    for session, violations in flagged:
         if violations:
             actions = await enforce_violations(db, session, violations)
             total_violations += len(violations)
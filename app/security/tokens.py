@@ -2,12 +2,15 @@
 Token Management - Access tokens and Refresh tokens.
 Refresh tokens se persisten en BD (tabla refresh_tokens) para sobrevivir reinicios.
 """
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional, Tuple
 import jwt
 import secrets
 import hashlib
 import logging
+import threading
+import time
 from jwt import ExpiredSignatureError, InvalidTokenError
 
 from ..config import (
@@ -15,6 +18,7 @@ from ..config import (
     get_runtime_int,
     get_runtime_setting,
     require_config_secret,
+    runtime_config_ttl_seconds,
 )
 from ..utils.runtime_security import utc_now, utc_now_naive
 
@@ -26,12 +30,108 @@ def _db():
     from ..models.database import RefreshToken, SessionLocal
     return RefreshToken, SessionLocal()
 
+# Material de firma cacheado con el mismo TTL que la runtime config: una
+# rotación hecha desde el panel (en cualquier worker) se aplica en todos.
+_SIGNING_KEYS_LOCK = threading.Lock()
+_SIGNING_KEYS: Optional[Tuple[str, str]] = None
+_SIGNING_KEYS_EXPIRES_AT = 0.0
+SIGNING_KEY_SETTINGS = ("JWT_SECRET_KEY", "JWT_ALGORITHM")
+
+# Claims ya verificados, indexados por SHA-256 del token.
+_CLAIMS_CACHE_MAX_ENTRIES = 10_000
+_CLAIMS_CACHE_MAX_TTL_SECONDS = 300.0
+_CLAIMS_CACHE_LOCK = threading.Lock()
+_CLAIMS_CACHE: "OrderedDict[str, Tuple[dict, float, Optional[float]]]" = OrderedDict()
+
+
+def get_signing_keys() -> Tuple[str, str]:
+    """
+    Retorna (secret, algorithm) cacheados por RUNTIME_CONFIG_CACHE_TTL_SECONDS.
+    Si al releerlos cambiaron (rotación desde otro worker), se descartan los
+    claims verificados con la clave anterior.
+    """
+    global _SIGNING_KEYS, _SIGNING_KEYS_EXPIRES_AT
+    keys = _SIGNING_KEYS
+    if keys is not None and time.monotonic() < _SIGNING_KEYS_EXPIRES_AT:
+        return keys
+    with _SIGNING_KEYS_LOCK:
+        now = time.monotonic()
+        if _SIGNING_KEYS is None or now >= _SIGNING_KEYS_EXPIRES_AT:
+            secret = require_config_secret(
+                "JWT_SECRET_KEY", get_runtime_setting("JWT_SECRET_KEY", ""), production_only=False
+            )
+            keys = (secret, get_runtime_setting("JWT_ALGORITHM", "HS256"))
+            if _SIGNING_KEYS is not None and keys != _SIGNING_KEYS:
+                clear_claims_cache()
+            _SIGNING_KEYS = keys
+            _SIGNING_KEYS_EXPIRES_AT = now + runtime_config_ttl_seconds()
+        return _SIGNING_KEYS
+
+
+def reset_signing_keys() -> None:
+    """Fuerza a releer el material de firma y descarta los claims cacheados con la clave anterior."""
+    global _SIGNING_KEYS, _SIGNING_KEYS_EXPIRES_AT
+    with _SIGNING_KEYS_LOCK:
+        _SIGNING_KEYS = None
+        _SIGNING_KEYS_EXPIRES_AT = 0.0
+    clear_claims_cache()
+
+
+def clear_claims_cache() -> None:
+    with _CLAIMS_CACHE_LOCK:
+        _CLAIMS_CACHE.clear()
+
+
 def _jwt_secret_key() -> str:
-    return require_config_secret("JWT_SECRET_KEY", get_runtime_setting("JWT_SECRET_KEY", ""), production_only=False)
+    return get_signing_keys()[0]
 
 
 def _jwt_algorithm() -> str:
-    return get_runtime_setting("JWT_ALGORITHM", "HS256")
+    return get_signing_keys()[1]
+
+
+def decode_jwt_cached(token: str) -> dict:
+    """
+    Decodifica y verifica un JWT reutilizando claims verificados previamente.
+
+    La entrada del cache expira con el token (``exp``) y nunca vive más de
+    ``_CLAIMS_CACHE_MAX_TTL_SECONDS``. Solo se cachean tokens válidos.
+
+    Raises:
+        jwt.ExpiredSignatureError: Token expirado
+        jwt.InvalidTokenError: Token inválido
+    """
+    token_hash = hashlib.sha256(token.encode()).hexdigest()
+    now = time.time()
+
+    with _CLAIMS_CACHE_LOCK:
+        cached = _CLAIMS_CACHE.get(token_hash)
+        if cached is not None:
+            payload, cached_until, token_exp = cached
+            if token_exp is not None and now >= token_exp:
+                del _CLAIMS_CACHE[token_hash]
+                raise ExpiredSignatureError("Signature has expired")
+            if now < cached_until:
+                _CLAIMS_CACHE.move_to_end(token_hash)
+                return dict(payload)
+            del _CLAIMS_CACHE[token_hash]
+
+    secret, algorithm = get_signing_keys()
+    payload = jwt.decode(token, secret, algorithms=[algorithm])
+
+    exp = payload.get("exp")
+    token_exp = float(exp) if isinstance(exp, (int, float)) else None
+    cached_until = now + _CLAIMS_CACHE_MAX_TTL_SECONDS
+    if token_exp is not None:
+        cached_until = min(cached_until, token_exp)
+
+    with _CLAIMS_CACHE_LOCK:
+        _CLAIMS_CACHE[token_hash] = (dict(payload), cached_until, token_exp)
+        _CLAIMS_CACHE.move_to_end(token_hash)
+        while len(_CLAIMS_CACHE) > _CLAIMS_CACHE_MAX_ENTRIES:
+            _CLAIMS_CACHE.popitem(last=False)
+
+    return payload
 
 
 def _access_token_expire_minutes() -> int:
@@ -109,7 +209,7 @@ class TokenManager:
             ValueError: Tipo de token incorrecto o rol no autorizado
         """
         try:
-            payload = jwt.decode(token, _jwt_secret_key(), algorithms=[_jwt_algorithm()])
+            payload = decode_jwt_cached(token)
         except ExpiredSignatureError as e:
             raise ValueError("Token expirado") from e
         except InvalidTokenError as e:
@@ -0,0 +1,148 @@
+"""
+WAF rule matcher - reglas versionadas + prefiltro literal.
+
+Las reglas viven en ``waf_rules.json`` (versionado junto al código o apuntado
+con ``WAF_RULES_PATH``). Cada patrón declara los literales que necesita para
+poder coincidir; un valor limpio que no contiene esos literales no evalúa
+ningún regex. Cuando el prefiltro deja pasar reglas, se evalúan en el orden
+original, así que el resultado (tipo de ataque y patrón reportado) es idéntico
+al recorrido patrón por patrón.
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "waf_rules.json")
+
+_FLAG_NAMES = {
+    "IGNORECASE": re.IGNORECASE,
+    "MULTILINE": re.MULTILINE,
+    "DOTALL": re.DOTALL,
+}
+
+
+@dataclass(frozen=True)
+class WAFRule:
+    attack_type: str
+    pattern: str
+    regex: re.Pattern
+    # Grupos AND de alternativas OR (el primero es el ancla); vacío = siempre candidata.
+    prefilter: Tuple[Tuple[str, ...], ...]
+
+
+class WAFMatcher:
+    """
+    Matcher compilado de reglas WAF.
+
+    Prefiltro: una sola pasada de regex (en C) encuentra qué literales de las
+    reglas aparecen en el valor. El primer grupo del prefiltro de cada regla
+    es su "ancla": solo las reglas cuya ancla aparece se consideran, y solo
+    las que además cumplen el resto de grupos evalúan su regex.
+    """
+
+    def __init__(self, rules: Sequence[WAFRule], version: str = "unversioned"):
+        self.rules: Tuple[WAFRule, ...] = tuple(rules)
+        self.version = version
+        self.attack_types: Tuple[str, ...] = tuple(dict.fromkeys(r.attack_type for r in self.rules))
+
+        tokens = {token for rule in self.rules for group in rule.prefilter for token in group}
+        self.tokens: Tuple[str, ...] = tuple(sorted(tokens, key=lambda t: (-len(t), t)))
+        # Lookahead en cada posición; el literal más largo gana y arrastra los
+        # literales que contiene (p. ej. "%2e%2e%2f" implica "%2e%2e").
+        self._token_re = re.compile(
+            "(?=(" + "|".join(re.escape(t) for t in self.tokens) + "))"
+        ) if self.tokens else None
+        self._implied = {t: frozenset(o for o in self.tokens if o in t) for t in self.tokens}
+
+        by_anchor: dict = {}
+        for index, rule in enumerate(self.rules):
+            if rule.prefilter:
+                for token in rule.prefilter[0]:
+                    by_anchor.setdefault(token, []).append(index)
+        self._rules_by_anchor = {t: tuple(ix) for t, ix in by_anchor.items()}
+        self._always_candidates = tuple(i for i, r in enumerate(self.rules) if not r.prefilter)
+
+    def _candidates(self, value: str) -> Sequence[int]:
+        # El prefiltro solo es exacto para ASCII: con IGNORECASE, caracteres
+        # Unicode como 'ſ' o 'K' coinciden con 's'/'k' y str.lower() no los normaliza.
+        if not value.isascii():
+            return range(len(self.rules))
+        if self._token_re is None:
+            return self._always_candidates
+
+        found = self._token_re.findall(value.lower())
+        if not found:
+            return self._always_candidates
+
+        present: set = set()
+        for token in set(found):
+            present |= self._implied[token]
+
+        anchored = set(self._always_candidates)
+        for token in present:
+            anchored.update(self._rules_by_anchor.get(token, ()))
+
+        return [
+            i for i in sorted(anchored)
+            if all(
+                any(token in present for token in group)
+                for group in self.rules[i].prefilter[1:]
+            )
+        ]
+
+    def scan(self, value: str) -> Tuple[bool, str, str]:
+        """Retorna (es_malicioso, tipo_de_ataque, patrón) para el primer patrón que coincide."""
+        for index in self._candidates(value):
+            rule = self.rules[index]
+            if rule.regex.search(value):
+                return True, rule.attack_type, rule.pattern
+        return False, "", ""
+
+
+def _parse_flags(names: Sequence[str]) -> int:
+    flags = 0
+    for name in names:
+        try:
+            flags |= _FLAG_NAMES[name.upper()]
+        except KeyError as exc:
+            raise ValueError(f"Flag de regex WAF desconocido: {name}") from exc
+    return flags
+
+
+def build_matcher(config: dict) -> WAFMatcher:
+    """Construye el matcher a partir del dict de reglas (formato de waf_rules.json)."""
+    flags = _parse_flags(config.get("flags", ["IGNORECASE"]))
+    rules: List[WAFRule] = []
+    for category in config["categories"]:
+        attack_type = category["attack_type"]
+        for raw in category["rules"]:
+            prefilter = tuple(
+                tuple(str(token).lower() for token in group)
+                for group in raw.get("prefilter", [])
+            )
+            if any(not group for group in prefilter):
+                raise ValueError(f"Grupo de prefiltro vacío en regla WAF: {raw['pattern']}")
+            rules.append(
+                WAFRule(
+                    attack_type=attack_type,
+                    pattern=raw["pattern"],
+                    regex=re.compile(raw["pattern"], flags),
+                    prefilter=prefilter,
+                )
+            )
+    return WAFMatcher(rules, version=str(config.get("version", "unversioned")))
+
+
+def load_waf_matcher(path: Optional[str] = None) -> WAFMatcher:
+    """Carga y compila las reglas WAF desde archivo (WAF_RULES_PATH o el default)."""
+    path = path or os.getenv("WAF_RULES_PATH") or DEFAULT_RULES_PATH
+    with open(path, encoding="utf-8") as fh:
+        config = json.load(fh)
+    matcher = build_matcher(config)
+    logger.info(f"WAF rules loaded: version={matcher.version} rules={len(matcher.rules)} path={path}")
+    return matcher
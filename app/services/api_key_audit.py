@@ -1,10 +1,23 @@
-"""API key audit logging helpers."""
+"""API key audit logging helpers.
+
+Gateway events are not written on the request path: ``enqueue_api_key_event``
+puts them on a bounded in-process buffer that a background thread flushes with
+multi-row INSERTs. Repeated identical failures (same key, IP, status and
+reason) inside a flush window are coalesced into one row with ``event_count``.
+"""
 
 from __future__ import annotations
 
+import itertools
 import logging
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
 
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from ..models.database import ApiKeyAuditLog
@@ -38,3 +51,213 @@ def log_api_key_event(
         )
     except Exception as exc:
         logger.warning("Failed to add API key audit event: %s", exc)
+
+
+@dataclass(slots=True)
+class _PendingAuditEvent:
+    key_id: str
+    auth_mode: Optional[str]
+    path: Optional[str]
+    method: Optional[str]
+    ip_address: Optional[str]
+    status_code: int
+    reject_reason: Optional[str]
+    created_at: datetime
+    last_seen_at: datetime
+    event_count: int = 1
+
+    def as_row(self) -> dict[str, Any]:
+        return {
+            "key_id": self.key_id,
+            "auth_mode": self.auth_mode,
+            "path": self.path,
+            "method": self.method,
+            "ip_address": self.ip_address,
+            "status_code": self.status_code,
+            "reject_reason": self.reject_reason,
+            "created_at": self.created_at,
+            "last_seen_at": self.last_seen_at,
+            "event_count": self.event_count,
+        }
+
+
+def _default_session_factory() -> Session:
+    from ..models.database import SessionLocal
+    return SessionLocal()
+
+
+class ApiKeyAuditWriter:
+    """Buffer acotado + escritor en background para ``api_key_audit_logs``."""
+
+    def __init__(
+        self,
+        *,
+        max_pending: int = 10_000,
+        batch_size: int = 500,
+        flush_interval_seconds: float = 2.0,
+        session_factory: Callable[[], Session] | None = None,
+    ) -> None:
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self._session_factory = session_factory or _default_session_factory
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: "OrderedDict[tuple, _PendingAuditEvent]" = OrderedDict()
+        self._seq = itertools.count()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self._metrics = {
+            "enqueued": 0,
+            "coalesced": 0,
+            "dropped": 0,
+            "flushes": 0,
+            "rows_written": 0,
+            "events_written": 0,
+            "flush_failures": 0,
+            "rows_lost": 0,
+            "max_pending_seen": 0,
+            "last_flush_ms": 0.0,
+        }
+
+    # ── Productor (request path) ──
+
+    def submit(
+        self,
+        *,
+        key_id: str,
+        auth_mode: Optional[str],
+        path: Optional[str],
+        method: Optional[str],
+        ip_address: Optional[str],
+        status_code: int,
+        reject_reason: Optional[str] = None,
+    ) -> bool:
+        """Encola un evento. Retorna False si se descartó por backpressure."""
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        if status_code >= 400:
+            key: tuple = ("fail", key_id, auth_mode, ip_address, status_code, reject_reason)
+        else:
+            key = ("ok", next(self._seq))
+
+        with self._lock:
+            existing = self._pending.get(key)
+            if existing is not None:
+                existing.event_count += 1
+                existing.last_seen_at = now
+                self._metrics["coalesced"] += 1
+                return True
+
+            if len(self._pending) >= self.max_pending:
+                self._metrics["dropped"] += 1
+                return False
+
+            self._pending[key] = _PendingAuditEvent(
+                key_id=key_id,
+                auth_mode=auth_mode,
+                path=path,
+                method=method,
+                ip_address=ip_address,
+                status_code=status_code,
+                reject_reason=reject_reason,
+                created_at=now,
+                last_seen_at=now,
+            )
+            self._metrics["enqueued"] += 1
+            depth = len(self._pending)
+            if depth > self._metrics["max_pending_seen"]:
+                self._metrics["max_pending_seen"] = depth
+
+        if depth >= self.batch_size:
+            self._wake.set()
+        self._ensure_started()
+        return True
+
+    # ── Consumidor ──
+
+    def flush(self) -> int:
+        """Escribe todo lo pendiente en INSERTs multi-fila. Retorna filas escritas."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = list(self._pending.values())
+                self._pending = OrderedDict()
+
+            started = time.perf_counter()
+            rows = [event.as_row() for event in batch]
+            db = self._session_factory()
+            try:
+                for offset in range(0, len(rows), self.batch_size):
+                    db.execute(insert(ApiKeyAuditLog).values(rows[offset:offset + self.batch_size]))
+                db.commit()
+            except Exception as exc:
+                db.rollback()
+                with self._lock:
+                    self._metrics["flush_failures"] += 1
+                    self._metrics["rows_lost"] += len(rows)
+                logger.warning("GW-006 audit batch flush failed (%s rows): %s", len(rows), exc)
+                return 0
+            finally:
+                db.close()
+
+            with self._lock:
+                self._metrics["flushes"] += 1
+                self._metrics["rows_written"] += len(rows)
+                self._metrics["events_written"] += sum(event.event_count for event in batch)
+                self._metrics["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            return len(rows)
+
+    def metrics(self) -> dict[str, Any]:
+        with self._lock:
+            data = dict(self._metrics)
+            data["pending"] = len(self._pending)
+        data["max_pending"] = self.max_pending
+        data["running"] = bool(self._thread and self._thread.is_alive())
+        return data
+
+    # ── Ciclo de vida ──
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if self._stopping.is_set():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="api-key-audit-writer", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as exc:  # pragma: no cover - defensivo
+                logger.error("API key audit writer loop error: %s", exc)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Detiene el hilo y garantiza un flush final de lo pendiente."""
+        self._stopping.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self.flush()
+        self._thread = None
+        self._stopping.clear()
+
+
+api_key_audit_writer = ApiKeyAuditWriter()
+
+
+def enqueue_api_key_event(**event: Any) -> bool:
+    """Encola un evento de auditoría del gateway en el writer compartido."""
+    return api_key_audit_writer.submit(**event)
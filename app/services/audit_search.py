@@ -0,0 +1,259 @@
+"""
+Audit Search — búsqueda paginada por keyset sobre audit_events.
+
+- Orden (created_at DESC, id DESC) con cursor opaco: cada página es un
+  range scan del índice, sin OFFSET, a cualquier profundidad.
+- Total estimado: conteo exacto acotado a AUDIT_EXACT_COUNT_LIMIT filas y,
+  por encima, la estimación del planner de PostgreSQL (EXPLAIN) en lugar de
+  un COUNT(*) sobre todo el conjunto filtrado.
+- Búsqueda de texto (recurso / tenant en details) con ILIKE sobre
+  expresiones cubiertas por índices GIN pg_trgm (migración 057); en SQLite
+  la misma consulta corre sin índice.
+- Particionado mensual opcional (migración 057 con AUDIT_EVENTS_PARTITIONED):
+  la retención descarta particiones completas y solo borra filas en la
+  partición del borde; sin particiones, DELETE por lotes.
+"""
+import base64
+import json
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Text, and_, cast, func, or_, select, text, tuple_
+from sqlalchemy.orm import Session
+
+from ..models.database import AuditEventRecord
+
+logger = logging.getLogger(__name__)
+
+AUDIT_EXACT_COUNT_LIMIT = 10_000
+AUDIT_PURGE_BATCH_SIZE = 10_000
+
+_PARTITION_RE = re.compile(r"^audit_events_y(\d{4})m(\d{2})$")
+
+
+# ── Cursor ────────────────────────────────────────────────────────────────
+
+
+def encode_cursor(created_at: datetime, event_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), event_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """(created_at, id) del último evento de la página anterior. ValueError si es inválido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, event_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(event_id)
+    except Exception as e:
+        raise ValueError("cursor inválido") from e
+
+
+# ── Filtros ───────────────────────────────────────────────────────────────
+
+
+def details_text():
+    """details como texto: la misma expresión que indexa ix_audit_details_trgm."""
+    return cast(AuditEventRecord.details, Text)
+
+
+def audit_filters(
+    *,
+    event_type: Optional[str] = None,
+    actor_id: Optional[int] = None,
+    resource: Optional[str] = None,
+    tenant: Optional[str] = None,
+    status: Optional[str] = None,
+) -> list:
+    """Condiciones WHERE compartidas por el listado, la búsqueda y la exportación."""
+    conditions = []
+    if event_type:
+        conditions.append(AuditEventRecord.event_type == event_type)
+    if actor_id is not None:
+        conditions.append(AuditEventRecord.actor_id == actor_id)
+    if resource:
+        conditions.append(AuditEventRecord.resource.ilike(f"%{resource}%"))
+    if status:
+        conditions.append(AuditEventRecord.status == status)
+    if tenant:
+        tenant_like = f"%{tenant}%"
+        conditions.append(or_(
+            AuditEventRecord.resource.ilike(tenant_like),
+            details_text().ilike(tenant_like),
+        ))
+    return conditions
+
+
+def _after_cursor(db: Session, created_at: datetime, event_id: int):
+    if db.get_bind().dialect.name == "postgresql":
+        # Comparación de filas: un solo range scan sobre (created_at, id)
+        return tuple_(AuditEventRecord.created_at, AuditEventRecord.id) < tuple_(created_at, event_id)
+    return or_(
+        AuditEventRecord.created_at < created_at,
+        and_(AuditEventRecord.created_at == created_at, AuditEventRecord.id < event_id),
+    )
+
+
+# ── Conteo estimado ───────────────────────────────────────────────────────
+
+
+def _planner_rows(db: Session, stmt) -> Optional[int]:
+    """Filas estimadas por el planner de PostgreSQL para `stmt` (sin ejecutarlo)."""
+    compiled = stmt.compile(dialect=db.get_bind().dialect)
+    try:
+        plan = db.connection().exec_driver_sql(
+            "EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params
+        ).scalar()
+    except Exception as e:
+        logger.debug(f"EXPLAIN de audit_events falló: {e}")
+        return None
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def estimate_count(db: Session, conditions: list, exact_limit: int = AUDIT_EXACT_COUNT_LIMIT) -> Tuple[int, bool]:
+    """
+    (total, es_estimado). Hasta `exact_limit` filas el conteo es exacto y
+    acotado (COUNT sobre un LIMIT); por encima se usa la estimación del
+    planner en PostgreSQL o el límite en otros motores.
+    """
+    bounded = select(AuditEventRecord.id).where(*conditions).limit(exact_limit + 1).subquery()
+    exact = db.execute(select(func.count()).select_from(bounded)).scalar() or 0
+    if exact <= exact_limit:
+        return exact, False
+    if db.get_bind().dialect.name == "postgresql":
+        planned = _planner_rows(db, select(AuditEventRecord.id).where(*conditions))
+        if planned is not None:
+            return max(planned, exact_limit + 1), True
+    return exact_limit + 1, True
+
+
+# ── Búsqueda ──────────────────────────────────────────────────────────────
+
+
+def search_audit_events(
+    db: Session,
+    *,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+    with_total: bool = True,
+    **filters: Any,
+) -> Dict[str, Any]:
+    """
+    Página de eventos más recientes primero. Con `cursor` (o sin offset) se
+    pagina por keyset; `offset` se mantiene solo por compatibilidad.
+    Retorna {"events", "next_cursor", "has_more", "total", "total_is_estimate"}.
+    """
+    conditions = audit_filters(**filters)
+    q = db.query(AuditEventRecord).filter(*conditions)
+    if cursor:
+        q = q.filter(_after_cursor(db, *decode_cursor(cursor)))
+    q = q.order_by(AuditEventRecord.created_at.desc(), AuditEventRecord.id.desc())
+    if offset and not cursor:
+        q = q.offset(offset)
+
+    rows = q.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    events = rows[:limit]
+    next_cursor = None
+    if has_more and events[-1].created_at is not None:
+        next_cursor = encode_cursor(events[-1].created_at, events[-1].id)
+
+    result: Dict[str, Any] = {"events": events, "next_cursor": next_cursor, "has_more": has_more}
+    if with_total:
+        result["total"], result["total_is_estimate"] = estimate_count(db, conditions)
+    return result
+
+
+# ── Particiones y retención ───────────────────────────────────────────────
+
+
+def _month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(month: datetime) -> datetime:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def is_partitioned(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return bool(db.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('audit_events')"
+    )).scalar())
+
+
+def _partitions(db: Session) -> List[Tuple[str, datetime]]:
+    """(nombre, inicio de mes) de las particiones mensuales existentes."""
+    names = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('audit_events')"
+    )).scalars()
+    result = []
+    for name in names:
+        match = _PARTITION_RE.match(name)
+        if match:
+            result.append((name, datetime(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(result, key=lambda p: p[1])
+
+
+def ensure_audit_partitions(db: Session, now: Optional[datetime] = None, months_ahead: int = 2) -> List[str]:
+    """Crea las particiones mensuales del mes actual y los `months_ahead` siguientes."""
+    if not is_partitioned(db):
+        return []
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    existing = {name for name, _ in _partitions(db)}
+    created = []
+    month = _month_start(now)
+    for _ in range(months_ahead + 1):
+        name = f"audit_events_y{month:%Y}m{month:%m}"
+        if name not in existing:
+            upper = _next_month(month)
+            try:
+                with db.begin_nested():
+                    db.execute(text(
+                        f"CREATE TABLE {name} PARTITION OF audit_events "
+                        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+                    ))
+                created.append(name)
+            except Exception as e:
+                # Filas del rango ya caídas en la partición DEFAULT
+                logger.warning(f"No se pudo crear la partición {name}: {e}")
+        month = _next_month(month)
+    return created
+
+
+def purge_audit_events(db: Session, retention_days: int, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Elimina eventos más antiguos que `retention_days` (hace commit). Con
+    particiones se descartan los meses completos (DROP TABLE) y solo se
+    borra por filas el borde; sin particiones, DELETE por lotes de
+    AUDIT_PURGE_BATCH_SIZE.
+    """
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    cutoff = now - timedelta(days=retention_days)
+    dropped: List[str] = []
+
+    if is_partitioned(db):
+        for name, month in _partitions(db):
+            if _next_month(month) <= cutoff:
+                db.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+        db.commit()
+
+    # Un commit por lote: sin una transacción gigante ni locks prolongados
+    table = AuditEventRecord.__table__
+    deleted = 0
+    while True:
+        ids = select(table.c.id).where(table.c.created_at < cutoff).limit(AUDIT_PURGE_BATCH_SIZE)
+        batch = db.execute(table.delete().where(table.c.id.in_(ids.scalar_subquery()))).rowcount or 0
+        db.commit()
+        deleted += batch
+        if batch < AUDIT_PURGE_BATCH_SIZE:
+            break
+    return {"cutoff": cutoff.isoformat(), "dropped_partitions": dropped, "deleted_rows": deleted}
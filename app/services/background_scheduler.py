@@ -98,6 +98,120 @@ class BackgroundScheduler:
             )
         )
 
+        # Drain del outbox de leads del funnel público — cada 10 segundos
+        self._tasks.append(
+            asyncio.create_task(
+                self._periodic_async_task(
+                    "funnel_outbox_drain",
+                    self._run_funnel_outbox_drain,
+                    interval_seconds=10,
+                    initial_delay=15,
+                )
+            )
+        )
+
+        # Retención y compactación de eventos geo DSAM — cada 24 horas
+        self._tasks.append(
+            asyncio.create_task(
+                self._periodic_task(
+                    "session_geo_event_retention",
+                    self._run_geo_event_retention,
+                    interval_seconds=24 * 3600,
+                    initial_delay=1200,  # 20 min después del startup
+                )
+            )
+        )
+
+        # Foto diaria de revenue (MRR/ARR) + backfill de días faltantes — cada 6 horas
+        self._tasks.append(
+            asyncio.create_task(
+                self._periodic_task(
+                    "revenue_daily_snapshot",
+                    self._run_revenue_snapshot,
+                    interval_seconds=6 * 3600,
+                    initial_delay=900,  # 15 min después del startup
+                )
+            )
+        )
+
+        # Overview de KPIs materializado (/api/reports/overview)
+        from ..config import KPI_SNAPSHOT_REFRESH_SECONDS
+        self._tasks.append(
+            asyncio.create_task(
+                self._periodic_task(
+                    "kpi_overview_snapshot",
+                    self._run_kpi_overview_snapshot,
+                    interval_seconds=KPI_SNAPSHOT_REFRESH_SECONDS,
+                    initial_delay=45,
+                )
+            )
+        )
+
+        # Rollups de métricas de recursos (5m/1h/1d) — cada 5 minutos
+        self._tasks.append(
+            asyncio.create_task(
+                self._periodic_task(
+                    "resource_metric_rollups",
+                    self._run_resource_metric_rollups,
+                    interval_seconds=300,
+                    initial_delay=240,
+                )
+            )
+        )
+
+        # Retención por nivel de métricas de recursos — cada 24 horas
+        self._tasks.append(
+            asyncio.create_task(
+                self._periodic_task(
+                    "resource_metric_retention",
+                    self._run_resource_metric_retention,
+                    interval_seconds=24 * 3600,
+                    initial_delay=1500,  # 25 min después del startup
+                )
+            )
+        )
+
+        # Consistencia del modelo incremental de capacidad de nodos
+        from ..config import NODE_CAPACITY_RESYNC_SECONDS
+        self._tasks.append(
+            asyncio.create_task(
+                self._periodic_task(
+                    "node_capacity_consistency",
+                    self._run_node_capacity_consistency,
+                    interval_seconds=NODE_CAPACITY_RESYNC_SECONDS,
+                    initial_delay=120,
+                )
+            )
+        )
+
+        # Retención y particiones mensuales de audit_events — cada 24 horas
+        self._tasks.append(
+            asyncio.create_task(
+                self._periodic_task(
+                    "audit_events_retention",
+                    self._run_audit_events_retention,
+                    interval_seconds=24 * 3600,
+                    initial_delay=1800,  # 30 min después del startup
+                )
+            )
+        )
+
+        # DSAM sync incremental por keyspace notifications (opcional)
+        from ..config import DSAM_SESSION_SYNC_MODE, DSAM_INCREMENTAL_SYNC_SECONDS
+        if DSAM_SESSION_SYNC_MODE == "keyspace":
+            from ..services.session_keyspace import session_keyspace_listener
+            await session_keyspace_listener.start()
+            self._tasks.append(
+                asyncio.create_task(
+                    self._periodic_async_task(
+                        "dsam_incremental_session_sync",
+                        self._run_dsam_incremental_sync,
+                        interval_seconds=DSAM_INCREMENTAL_SYNC_SECONDS,
+                        initial_delay=30,
+                    )
+                )
+            )
+
         logger.info(f"⏰ Background Scheduler started with {len(self._tasks)} tasks")
 
     async def stop(self):
@@ -108,6 +222,8 @@ class BackgroundScheduler:
         if self._tasks:
             await asyncio.gather(*self._tasks, return_exceptions=True)
         self._tasks.clear()
+        from ..services.session_keyspace import session_keyspace_listener
+        await session_keyspace_listener.stop()
         logger.info("⏰ Background Scheduler stopped")
 
     async def _periodic_task(
@@ -234,6 +350,124 @@ class BackgroundScheduler:
         finally:
             db.close()
 
+    def _run_geo_event_retention(self):
+        """
+        Compacta eventos geo DSAM: los crudos fuera de retención se borran (el
+        mapa de calor ya los tiene en los rollups diarios) y los rollups tienen
+        su propia retención, más larga.
+        """
+        from ..models.database import SessionLocal
+        from ..services.session_geo_map import purge_old_geo_rollups
+        from ..services.session_locations import purge_old_geo_events
+
+        db = SessionLocal()
+        try:
+            deleted = purge_old_geo_events(db)
+            rollups = purge_old_geo_rollups(db)
+            logger.info(f"🗑️ Purged {deleted} DSAM geo events and {rollups} geo rollups past retention")
+        except Exception as e:
+            logger.error(f"Geo event retention failed: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def _run_revenue_snapshot(self):
+        """
+        Reemplaza la foto de revenue de hoy y reconstruye los días faltantes
+        de la ventana REVENUE_SNAPSHOT_BACKFILL_DAYS. Idempotente.
+        """
+        from datetime import timedelta
+        from ..config import REVENUE_SNAPSHOT_BACKFILL_DAYS
+        from ..models.database import SessionLocal
+        from ..services.revenue_snapshots import backfill_revenue_snapshots, capture_revenue_snapshot
+
+        db = SessionLocal()
+        try:
+            cells = capture_revenue_snapshot(db)
+            start = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=REVENUE_SNAPSHOT_BACKFILL_DAYS)
+            backfill = backfill_revenue_snapshots(db, start)
+            db.commit()
+            logger.info(f"📈 Revenue snapshot: {cells} celdas hoy, backfill={backfill}")
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _run_kpi_overview_snapshot(self):
+        """Recalcula el overview de KPIs (comparte single-flight con ?fresh=1)."""
+        from ..models.database import SessionLocal
+        from ..services.kpi_snapshot import refresh_overview_snapshot
+
+        db = SessionLocal()
+        try:
+            refresh_overview_snapshot(db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _run_resource_metric_rollups(self):
+        """Cierra los buckets de 5m/1h/1d pendientes de resource_metrics."""
+        from ..models.database import SessionLocal
+        from ..services.resource_rollups import rollup_resource_metrics
+
+        db = SessionLocal()
+        try:
+            written = rollup_resource_metrics(db)
+            db.commit()
+            if any(written.values()):
+                logger.info(f"📊 Resource metric rollups: {written}")
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _run_resource_metric_retention(self):
+        """Purga muestras crudas y rollups fuera de la retención de su nivel."""
+        from ..services.resource_monitor import ResourceMonitor
+
+        ResourceMonitor.cleanup_old_metrics()
+
+    def _run_node_capacity_consistency(self):
+        """Compara el modelo de capacidad con el recálculo completo y lo reconstruye."""
+        from ..models.database import SessionLocal
+        from ..services.node_capacity_service import capacity_model
+
+        db = SessionLocal()
+        try:
+            drift = capacity_model.check_consistency(db)
+            if drift:
+                logger.warning(f"⚖️ Node capacity model drift ({len(drift)}): {drift[:5]}")
+            capacity_model.rebuild(db)
+            return drift
+        finally:
+            db.close()
+
+    def _run_audit_events_retention(self):
+        """Crea las particiones próximas de audit_events y purga lo vencido."""
+        from ..config import AUDIT_EVENTS_PARTITION_MONTHS_AHEAD, AUDIT_EVENTS_RETENTION_DAYS
+        from ..models.database import SessionLocal
+        from ..services.audit_search import ensure_audit_partitions, purge_audit_events
+
+        db = SessionLocal()
+        try:
+            created = ensure_audit_partitions(db, months_ahead=AUDIT_EVENTS_PARTITION_MONTHS_AHEAD)
+            db.commit()
+            if created:
+                logger.info(f"🗂️ Audit partitions created: {created}")
+            if AUDIT_EVENTS_RETENTION_DAYS > 0:
+                purged = purge_audit_events(db, AUDIT_EVENTS_RETENTION_DAYS)
+                if purged["dropped_partitions"] or purged["deleted_rows"]:
+                    logger.info(f"🧹 Audit events retention: {purged}")
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
     def _run_api_key_lifecycle_cleanup(self):
         """Ejecuta limpieza del ciclo de vida de API keys (GW-009)."""
         from ..models.database import SessionLocal
@@ -372,6 +606,25 @@ class BackgroundScheduler:
         finally:
             db.close()
 
+    async def _run_funnel_outbox_drain(self):
+        """Drena el outbox local de leads del funnel a BDA y sincroniza con Jeturing CRM."""
+        from ..routes.funnel_leads import drain_and_sync_funnel_leads
+
+        await drain_and_sync_funnel_leads()
+
+    async def _run_dsam_incremental_sync(self):
+        """Aplica los cambios de sesión notificados por Redis (o reconcile completo)."""
+        from ..models.database import SessionLocal
+        from ..services.session_keyspace import session_keyspace_listener
+
+        db = SessionLocal()
+        try:
+            stats = await session_keyspace_listener.sync(db)
+            if stats.get("mode") == "full" or stats.get("changed_keys"):
+                logger.info("🔐 DSAM session sync (%s): %s", stats.get("mode"), stats)
+        finally:
+            db.close()
+
     async def _run_migration_worker(self):
         """
         Migration Worker — procesa jobs de migración pendientes (Fase 2).
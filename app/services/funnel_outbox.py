@@ -0,0 +1,422 @@
+"""
+Funnel lead outbox — captura pública desacoplada de PostgreSQL.
+
+POST /api/public/funnel/lead solo agrega el lead a un outbox local en SQLite
+(durable, WAL). Un drenador periódico reclama lotes, los inserta en
+``funnel_leads`` con deduplicación por hash de email/teléfono y actualiza los
+contadores de ``funnel_lead_stats`` en la misma transacción. Si el proceso muere
+entre el commit en PostgreSQL y el borrado del outbox, el lote se reintenta y la
+clave única ``outbox_key`` lo vuelve idempotente (también entre workers). Si el
+lote falla por datos (DataError/IntegrityError), se reintenta fila por fila y
+las que siguen fallando pasan a ``funnel_lead_dead_letter``.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import DataError, IntegrityError
+
+from ..models.database import FunnelLead, FunnelLeadStat, FunnelNiche, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_OUTBOX_PATH = os.path.join(BASE_DIR, "data", "funnel_outbox.sqlite3")
+
+DRAIN_BATCH_SIZE = 500
+CLAIM_TIMEOUT_SECONDS = 300
+
+_NON_DIGITS = re.compile(r"\D+")
+
+
+def email_hash(email: Optional[str]) -> Optional[str]:
+    """SHA-256 del email normalizado (trim + minúsculas)."""
+    normalized = (email or "").strip().lower()
+    return hashlib.sha256(normalized.encode()).hexdigest() if normalized else None
+
+
+def phone_hash(phone: Optional[str]) -> Optional[str]:
+    """SHA-256 de los dígitos del teléfono; None si tiene menos de 7 dígitos."""
+    digits = _NON_DIGITS.sub("", phone or "")
+    return hashlib.sha256(digits.encode()).hexdigest() if len(digits) >= 7 else None
+
+
+class FunnelLeadOutbox:
+    """Outbox SQLite local con reclamo de lotes (seguro entre workers)."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("FUNNEL_OUTBOX_PATH") or DEFAULT_OUTBOX_PATH
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS funnel_lead_outbox (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            payload TEXT NOT NULL,
+                            enqueued_at REAL NOT NULL,
+                            claimed_by TEXT,
+                            claimed_at REAL
+                        )
+                        """
+                    )
+                    conn.execute(
+                        "CREATE INDEX IF NOT EXISTS ix_funnel_outbox_claim "
+                        "ON funnel_lead_outbox (claimed_at, id)"
+                    )
+                    conn.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS funnel_lead_dead_letter (
+                            id INTEGER PRIMARY KEY,
+                            payload TEXT NOT NULL,
+                            enqueued_at REAL NOT NULL,
+                            failed_at REAL NOT NULL,
+                            error TEXT
+                        )
+                        """
+                    )
+                    self._initialized = True
+        return conn
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """Agrega un lead al outbox. Retorna el id local del outbox."""
+        record = {**record, "outbox_key": record.get("outbox_key") or uuid.uuid4().hex}
+        cur = self._conn().execute(
+            "INSERT INTO funnel_lead_outbox (payload, enqueued_at) VALUES (?, ?)",
+            (json.dumps(record, default=str), time.time()),
+        )
+        return cur.lastrowid
+
+    def claim(self, limit: int = DRAIN_BATCH_SIZE) -> Tuple[str, List[Tuple[int, Dict[str, Any]]]]:
+        """Reclama hasta ``limit`` entradas libres (o con reclamo vencido)."""
+        token = uuid.uuid4().hex
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                """
+                UPDATE funnel_lead_outbox SET claimed_by = ?, claimed_at = ?
+                WHERE id IN (
+                    SELECT id FROM funnel_lead_outbox
+                    WHERE claimed_at IS NULL OR claimed_at < ?
+                    ORDER BY id LIMIT ?
+                )
+                """,
+                (token, now, now - CLAIM_TIMEOUT_SECONDS, limit),
+            )
+            rows = conn.execute(
+                "SELECT id, payload FROM funnel_lead_outbox WHERE claimed_by = ? ORDER BY id",
+                (token,),
+            ).fetchall()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return token, [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def ack(self, token: str) -> None:
+        self._conn().execute("DELETE FROM funnel_lead_outbox WHERE claimed_by = ?", (token,))
+
+    def release(self, token: str) -> None:
+        self._conn().execute(
+            "UPDATE funnel_lead_outbox SET claimed_by = NULL, claimed_at = NULL WHERE claimed_by = ?",
+            (token,),
+        )
+
+    def dead_letter(self, row_id: int, error: str) -> None:
+        """Saca del outbox una entrada que no se puede insertar (no se vuelve a reclamar)."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO funnel_lead_dead_letter (id, payload, enqueued_at, failed_at, error) "
+                "SELECT id, payload, enqueued_at, ?, ? FROM funnel_lead_outbox WHERE id = ?",
+                (time.time(), error[:2000], row_id),
+            )
+            conn.execute("DELETE FROM funnel_lead_outbox WHERE id = ?", (row_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def dead_letter_count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM funnel_lead_dead_letter").fetchone()[0]
+
+    def pending_count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM funnel_lead_outbox").fetchone()[0]
+
+
+_outbox: Optional[FunnelLeadOutbox] = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox() -> FunnelLeadOutbox:
+    global _outbox
+    if _outbox is None:
+        with _outbox_lock:
+            if _outbox is None:
+                _outbox = FunnelLeadOutbox()
+    return _outbox
+
+
+def enqueue_funnel_lead(record: Dict[str, Any]) -> int:
+    """Encola un lead ya calificado (dict con las columnas de FunnelLead)."""
+    return get_outbox().append(record)
+
+
+def _niche(value: Optional[str]) -> FunnelNiche:
+    try:
+        return FunnelNiche(value)
+    except ValueError:
+        return FunnelNiche.general
+
+
+def _apply_batch(db, records: List[Dict[str, Any]]) -> List[Tuple[FunnelLead, Dict[str, Any]]]:
+    """Inserta los leads no duplicados del lote y actualiza contadores. No hace commit."""
+    prepared = []
+    for record in records:
+        prepared.append((
+            _niche(record.get("niche")),
+            email_hash(record.get("email")),
+            phone_hash(record.get("phone")),
+            record,
+        ))
+
+    keys = {record["outbox_key"] for record in records if record.get("outbox_key")}
+    drained = set()
+    if keys:
+        drained = {k for (k,) in db.query(FunnelLead.outbox_key).filter(FunnelLead.outbox_key.in_(keys))}
+
+    niches = {p[0] for p in prepared}
+    emails = {p[1] for p in prepared if p[1]}
+    phones = {p[2] for p in prepared if p[2]}
+    seen_email: set = set()
+    seen_phone: set = set()
+    if emails or phones:
+        conditions = []
+        if emails:
+            conditions.append(FunnelLead.email_hash.in_(emails))
+        if phones:
+            conditions.append(FunnelLead.phone_hash.in_(phones))
+        existing = (
+            db.query(FunnelLead.niche, FunnelLead.email_hash, FunnelLead.phone_hash)
+            .filter(FunnelLead.niche.in_(niches), or_(*conditions))
+            .all()
+        )
+        for niche, e_hash, p_hash in existing:
+            if e_hash:
+                seen_email.add((niche, e_hash))
+            if p_hash:
+                seen_phone.add((niche, p_hash))
+
+    inserted: List[Tuple[FunnelLead, Dict[str, Any]]] = []
+    counters: Dict[FunnelNiche, List[int]] = {}
+    for niche, e_hash, p_hash, record in prepared:
+        if record.get("outbox_key") in drained:
+            continue
+        if (e_hash and (niche, e_hash) in seen_email) or (p_hash and (niche, p_hash) in seen_phone):
+            continue
+        if e_hash:
+            seen_email.add((niche, e_hash))
+        if p_hash:
+            seen_phone.add((niche, p_hash))
+
+        created_at = record.get("created_at")
+        row = FunnelLead(
+            niche=niche,
+            full_name=record.get("full_name"),
+            email=record.get("email"),
+            email_hash=e_hash,
+            phone=record.get("phone"),
+            phone_hash=p_hash,
+            company_name=record.get("company_name"),
+            country=record.get("country"),
+            language=record.get("language"),
+            has_entity=record.get("has_entity"),
+            monthly_volume=record.get("monthly_volume"),
+            budget_range=record.get("budget_range"),
+            timeline=record.get("timeline"),
+            client_count=record.get("client_count"),
+            has_sales_team=record.get("has_sales_team"),
+            industry=record.get("industry"),
+            main_goal=record.get("main_goal"),
+            utm_source=record.get("utm_source"),
+            utm_medium=record.get("utm_medium"),
+            utm_campaign=record.get("utm_campaign"),
+            referrer=record.get("referrer"),
+            ip_address=record.get("ip_address"),
+            user_agent=record.get("user_agent"),
+            qualified=record.get("qualified", True),
+            disqualify_reason=record.get("disqualify_reason"),
+            outbox_key=record.get("outbox_key"),
+            created_at=datetime.fromisoformat(created_at) if created_at else None,
+        )
+        db.add(row)
+        inserted.append((row, record))
+        counts = counters.setdefault(niche, [0, 0])
+        counts[0] += 1
+        counts[1] += 1 if row.qualified else 0
+
+    if counters:
+        existing_stats = {
+            s.niche for s in db.query(FunnelLeadStat.niche).filter(FunnelLeadStat.niche.in_(counters)).all()
+        }
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        for niche, (total, qualified) in counters.items():
+            if niche in existing_stats:
+                db.execute(
+                    update(FunnelLeadStat)
+                    .where(FunnelLeadStat.niche == niche)
+                    .values(
+                        lead_count=FunnelLeadStat.lead_count + total,
+                        qualified_count=FunnelLeadStat.qualified_count + qualified,
+                        updated_at=now,
+                    )
+                )
+            else:
+                db.add(FunnelLeadStat(niche=niche, lead_count=total, qualified_count=qualified, updated_at=now))
+
+    db.flush()
+    return inserted
+
+
+def _insert_records(records: List[Dict[str, Any]]) -> List[Tuple[int, Dict[str, Any]]]:
+    """Inserta un lote en su propia transacción. Retorna (id, record) de los leads nuevos."""
+    db = SessionLocal()
+    try:
+        inserted = _apply_batch(db, records)
+        db.commit()
+        return [(row.id, record) for row, record in inserted]
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _insert_one_by_one(
+    outbox: FunnelLeadOutbox,
+    token: str,
+    entries: List[Tuple[int, Dict[str, Any]]],
+) -> Tuple[List[Tuple[int, Dict[str, Any]]], int]:
+    """
+    Reintento de un lote fallido fila por fila: las filas que fallan por datos
+    van a dead-letter; un error de otro tipo (BD caída) libera el reclamo.
+    """
+    new_leads: List[Tuple[int, Dict[str, Any]]] = []
+    dead = 0
+    for row_id, record in entries:
+        try:
+            new_leads.extend(_insert_records([record]))
+        except (DataError, IntegrityError) as e:
+            logger.error("Funnel outbox entry %s dead-lettered: %s", row_id, e)
+            outbox.dead_letter(row_id, str(e))
+            dead += 1
+        except Exception:
+            outbox.release(token)
+            raise
+    return new_leads, dead
+
+
+def drain_funnel_outbox(
+    outbox: Optional[FunnelLeadOutbox] = None,
+    batch_size: int = DRAIN_BATCH_SIZE,
+    max_batches: int = 20,
+) -> Dict[str, Any]:
+    """Drena el outbox hacia PostgreSQL por lotes. Retorna métricas y los leads nuevos."""
+    outbox = outbox or get_outbox()
+    result: Dict[str, Any] = {"claimed": 0, "inserted": 0, "duplicates": 0, "dead_lettered": 0, "new_leads": []}
+
+    for _ in range(max_batches):
+        token, entries = outbox.claim(batch_size)
+        if not entries:
+            break
+        for row_id, record in entries:
+            # Entradas encoladas antes de outbox_key
+            record.setdefault("outbox_key", f"outbox-{row_id}")
+
+        dead = 0
+        try:
+            new_leads = _insert_records([record for _, record in entries])
+        except (DataError, IntegrityError) as e:
+            logger.warning("Funnel outbox batch failed (%s); retrying row by row", e)
+            new_leads, dead = _insert_one_by_one(outbox, token, entries)
+        except Exception:
+            outbox.release(token)
+            raise
+
+        outbox.ack(token)
+        result["new_leads"].extend(new_leads)
+        result["claimed"] += len(entries)
+        result["inserted"] += len(new_leads)
+        result["dead_lettered"] += dead
+        result["duplicates"] += len(entries) - len(new_leads) - dead
+        if len(entries) < batch_size:
+            break
+
+    if result["claimed"]:
+        invalidate_funnel_stats_cache()
+        logger.info(
+            "📥 Funnel outbox drained: claimed=%s inserted=%s duplicates=%s dead_lettered=%s",
+            result["claimed"], result["inserted"], result["duplicates"], result["dead_lettered"],
+        )
+    return result
+
+
+# ── Stats públicas (social proof) ──
+
+_STATS_CACHE_TTL_SECONDS = 30.0
+_stats_cache: Tuple[float, Optional[dict]] = (0.0, None)
+_stats_lock = threading.Lock()
+
+
+def invalidate_funnel_stats_cache() -> None:
+    global _stats_cache
+    with _stats_lock:
+        _stats_cache = (0.0, None)
+
+
+def get_funnel_stats() -> dict:
+    """Stats desde los contadores incrementales (una fila por nicho) con cache corto."""
+    global _stats_cache
+    now = time.monotonic()
+    with _stats_lock:
+        expires_at, cached = _stats_cache
+        if cached is not None and expires_at > now:
+            return cached
+
+    db = SessionLocal()
+    try:
+        rows = db.query(FunnelLeadStat.niche, FunnelLeadStat.lead_count).all()
+    finally:
+        db.close()
+
+    stats = {
+        "total_leads": sum(count or 0 for _, count in rows),
+        "by_niche": {niche.value: count or 0 for niche, count in rows if count},
+    }
+    with _stats_lock:
+        _stats_cache = (now + _STATS_CACHE_TTL_SECONDS, stats)
+    return stats
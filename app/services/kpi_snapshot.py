@@ -0,0 +1,459 @@
+"""
+KPI Snapshot — Overview del panel admin materializado.
+
+compute_overview() arma todos los KPIs de /api/reports/overview con una
+consulta de agregados por tabla (COUNT/SUM ... FILTER (WHERE ...)) más el
+pricing por conjuntos para revenue. El resultado se guarda en kpi_snapshots
+con su `as_of`: la tarea kpi_overview_snapshot del scheduler lo refresca y
+el endpoint lo sirve leyendo una sola fila.
+
+refresh_overview_snapshot() es single-flight: si llegan varios refrescos a
+la vez (scheduler + ?fresh=1 de varios admins), solo uno calcula y el resto
+espera y reutiliza su resultado.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models.database import (
+    Commission, CommissionStatus, ContainerStatus, Customer, CustomerStatus, Invoice, InvoiceStatus,
+    KpiSnapshot, Lead, LeadStatus, LXCContainer, NodeStatus, Partner, PartnerStatus, ProxmoxNode,
+    ReconciliationRun, SettlementPeriod, SettlementStatus, StripeEvent, Subscription, SubscriptionStatus,
+    WorkOrder, WorkOrderStatus,
+)
+from .pricing import PricingCatalog, get_subscription_prices
+
+logger = logging.getLogger(__name__)
+
+KPI_OVERVIEW = "overview"
+
+_ACTIVE_LEAD_STATUSES = (
+    LeadStatus.new, LeadStatus.contacted, LeadStatus.qualified,
+    LeadStatus.in_qualification, LeadStatus.proposal,
+)
+
+
+def _count(condition=None):
+    return func.count().filter(condition) if condition is not None else func.count()
+
+
+def _sum(column, condition=None):
+    total = func.sum(column).filter(condition) if condition is not None else func.sum(column)
+    return func.coalesce(total, 0)
+
+
+def _revenue(db: Session, now: datetime, month_start: datetime) -> dict[str, Any]:
+    thirty_days_ago = now - timedelta(days=30)
+    priced = get_subscription_prices(
+        db,
+        Subscription.status.in_([SubscriptionStatus.active, SubscriptionStatus.pending]),
+        catalog=PricingCatalog.load(db),
+    )
+    active_subs = [(sub, price) for sub, price in priced if sub.status == SubscriptionStatus.active]
+    pending_subs = [(sub, price) for sub, price in priced if sub.status == SubscriptionStatus.pending]
+    cancelled_30d = db.execute(
+        select(func.count()).where(
+            Subscription.status == SubscriptionStatus.cancelled,
+            Subscription.updated_at >= thirty_days_ago,
+        )
+    ).scalar() or 0
+
+    total_mrr = 0.0
+    total_users = 0
+    plan_dist: dict[str, dict[str, Any]] = {}
+    for sub, price in active_subs:
+        plan = sub.plan_name or "basic"
+        users = sub.user_count or 1
+        total_mrr += price
+        total_users += users
+        dist = plan_dist.setdefault(plan, {"count": 0, "revenue": 0.0, "users": 0})
+        dist["count"] += 1
+        dist["revenue"] += price
+        dist["users"] += users
+
+    total_base = len(active_subs) + cancelled_30d
+    return {
+        "mrr": round(total_mrr, 2),
+        "arr": round(total_mrr * 12, 2),
+        "pending_amount": round(sum(price for _, price in pending_subs), 2),
+        "pending_count": len(pending_subs),
+        "churn_rate": round(cancelled_30d / total_base * 100, 1) if total_base else 0,
+        "total_users": total_users,
+        "plan_distribution": plan_dist,
+        "cancelled_30d": cancelled_30d,
+        "active_subscriptions": len(active_subs),
+    }
+
+
+def _customers(db: Session, month_start: datetime) -> dict[str, Any]:
+    row = db.execute(
+        select(
+            _count().label("total"),
+            _count(Customer.status == CustomerStatus.active).label("active"),
+            _count(Customer.status == CustomerStatus.suspended).label("suspended"),
+            _count(Customer.created_at >= month_start).label("new_this_month"),
+        )
+    ).one()
+    return dict(row._mapping)
+
+
+def _partners(db: Session) -> dict[str, Any]:
+    row = db.execute(
+        select(
+            _count().label("total"),
+            _count(Partner.status == PartnerStatus.active).label("active"),
+            _count(Partner.status == PartnerStatus.pending).label("pending"),
+        )
+    ).one()
+
+    # Top 5 por revenue: conteos de leads y sumas de comisiones agrupados por partner
+    leads_by_partner = dict(db.execute(
+        select(Lead.partner_id, func.count()).group_by(Lead.partner_id)
+    ).all())
+    commission_rows = db.execute(
+        select(
+            Commission.partner_id,
+            _sum(Commission.gross_revenue).label("revenue"),
+            _sum(Commission.partner_amount).label("commissions"),
+        ).group_by(Commission.partner_id)
+    ).all()
+    commissions = {r.partner_id: r for r in commission_rows}
+    top = []
+    for partner_id, company_name in db.execute(
+        select(Partner.id, Partner.company_name).where(Partner.status == PartnerStatus.active)
+    ).all():
+        sums = commissions.get(partner_id)
+        top.append({
+            "id": partner_id,
+            "company_name": company_name,
+            "leads": leads_by_partner.get(partner_id, 0),
+            "total_revenue": float(sums.revenue) if sums else 0.0,
+            "total_commissions": float(sums.commissions) if sums else 0.0,
+        })
+    top.sort(key=lambda x: x["total_revenue"], reverse=True)
+    return {**dict(row._mapping), "top": top[:5]}
+
+
+def _leads(db: Session) -> dict[str, Any]:
+    pipeline: dict[str, int] = {}
+    for status, count in db.execute(select(Lead.status, func.count()).group_by(Lead.status)).all():
+        pipeline[status.value if hasattr(status, "value") else str(status)] = count
+    pipeline_value = db.execute(
+        select(_sum(Lead.estimated_monthly_value)).where(Lead.status.in_(_ACTIVE_LEAD_STATUSES))
+    ).scalar() or 0
+    active_keys = {status.value for status in _ACTIVE_LEAD_STATUSES}
+    return {
+        "total": sum(pipeline.values()),
+        "active": sum(v for k, v in pipeline.items() if k in active_keys),
+        "won": pipeline.get("won", 0),
+        "pipeline_value": float(pipeline_value),
+        "pipeline": pipeline,
+    }
+
+
+def _commissions(db: Session) -> dict[str, Any]:
+    row = db.execute(
+        select(
+            _sum(Commission.partner_amount).label("total_partner"),
+            _sum(Commission.partner_amount, Commission.status == CommissionStatus.pending).label("pending"),
+            _sum(Commission.partner_amount, Commission.status == CommissionStatus.paid).label("paid"),
+            _sum(Commission.jeturing_amount).label("jeturing_share"),
+        )
+    ).one()
+    return {key: float(value) for key, value in row._mapping.items()}
+
+
+def _infrastructure(db: Session) -> dict[str, Any]:
+    nodes = db.execute(
+        select(
+            _count().label("total"),
+            _count(ProxmoxNode.status == NodeStatus.online).label("online"),
+            _sum(ProxmoxNode.total_cpu_cores).label("cpu_total"),
+            _sum(ProxmoxNode.used_cpu_percent).label("cpu_used_pct"),
+            _sum(ProxmoxNode.total_ram_gb).label("ram_total"),
+            _sum(ProxmoxNode.used_ram_gb).label("ram_used"),
+            _sum(ProxmoxNode.total_storage_gb).label("disk_total"),
+            _sum(ProxmoxNode.used_storage_gb).label("disk_used"),
+        )
+    ).one()
+    containers = db.execute(
+        select(_count().label("total"), _count(LXCContainer.status == ContainerStatus.running).label("running"))
+    ).one()
+
+    ram_total, ram_used = float(nodes.ram_total), float(nodes.ram_used)
+    disk_total, disk_used = float(nodes.disk_total), float(nodes.disk_used)
+    return {
+        "nodes_total": nodes.total,
+        "nodes_online": nodes.online,
+        "containers_total": containers.total,
+        "containers_running": containers.running,
+        "cpu": {
+            "used": nodes.cpu_used_pct,
+            "total": nodes.cpu_total,
+            "percent": round(nodes.cpu_used_pct / nodes.total, 1) if nodes.total else 0,
+        },
+        "ram": {"used": round(ram_used, 1), "total": round(ram_total, 1),
+                "percent": round(ram_used / ram_total * 100, 1) if ram_total else 0},
+        "disk": {"used": round(disk_used, 1), "total": round(disk_total, 1),
+                 "percent": round(disk_used / disk_total * 100, 1) if disk_total else 0},
+    }
+
+
+def _settlements(db: Session) -> dict[str, Any]:
+    row = db.execute(
+        select(
+            _count(SettlementPeriod.status.in_([SettlementStatus.draft, SettlementStatus.pending_approval])).label("open"),
+            _count(SettlementPeriod.status.in_([SettlementStatus.approved, SettlementStatus.transferred])).label("closed"),
+            _sum(SettlementPeriod.partner_share).label("total_partner_payout"),
+        )
+    ).one()
+    return {"open": row.open, "closed": row.closed, "total_partner_payout": float(row.total_partner_payout)}
+
+
+def _work_orders(db: Session) -> dict[str, Any]:
+    row = db.execute(
+        select(
+            _count().label("total"),
+            _count(WorkOrder.status == WorkOrderStatus.requested).label("requested"),
+            _count(WorkOrder.status == WorkOrderStatus.in_progress).label("in_progress"),
+            _count(WorkOrder.status == WorkOrderStatus.completed).label("completed"),
+        )
+    ).one()
+    return dict(row._mapping)
+
+
+def _reconciliation(db: Session) -> dict[str, Any]:
+    row = db.execute(
+        select(
+            _count().label("total_runs"),
+            _count(ReconciliationRun.status == "clean").label("clean"),
+            _count(ReconciliationRun.status == "issues_found").label("issues"),
+        )
+    ).one()
+    return dict(row._mapping)
+
+
+def _invoices(db: Session) -> dict[str, Any]:
+    # Pendiente de cobro = emitida o vencida (InvoiceStatus no tiene "pending")
+    unpaid = Invoice.status.in_([InvoiceStatus.issued, InvoiceStatus.overdue])
+    row = db.execute(
+        select(
+            _count().label("total"),
+            _count(Invoice.status == InvoiceStatus.paid).label("paid"),
+            _count(unpaid).label("pending"),
+            _sum(Invoice.total).label("total_amount"),
+            _sum(Invoice.total, Invoice.status == InvoiceStatus.paid).label("paid_amount"),
+        )
+    ).one()
+    return {
+        "total": row.total,
+        "paid": row.paid,
+        "pending": row.pending,
+        "total_amount": float(row.total_amount),
+        "paid_amount": float(row.paid_amount),
+    }
+
+
+def _recent_activity(db: Session) -> list[dict[str, Any]]:
+    recent_customers = db.query(Customer).order_by(Customer.created_at.desc()).limit(8).all()
+    recent_subs: dict[int, Any] = {}
+    for sub, price in get_subscription_prices(
+        db, Subscription.customer_id.in_([c.id for c in recent_customers])
+    ):
+        recent_subs.setdefault(sub.customer_id, (sub, price))     # la de menor id por cliente
+    activity = []
+    for c in recent_customers:
+        sub, price = recent_subs.get(c.id, (None, 0))
+        activity.append({
+            "id": c.id,
+            "company_name": c.company_name,
+            "email": c.email,
+            "subdomain": c.subdomain,
+            "status": c.status.value if hasattr(c.status, "value") else str(c.status or "unknown"),
+            "plan": sub.plan_name if sub else "—",
+            "user_count": sub.user_count if sub else 0,
+            "monthly_amount": price,
+            "created_at": c.created_at.isoformat() if c.created_at else None,
+        })
+    return activity
+
+
+def _recent_stripe_events(db: Session) -> list[dict[str, Any]]:
+    events = db.query(StripeEvent).order_by(StripeEvent.created_at.desc()).limit(10).all()
+    return [{
+        "event_id": e.event_id,
+        "event_type": e.event_type,
+        "processed": e.processed,
+        "created_at": e.created_at.isoformat() if e.created_at else None,
+    } for e in events]
+
+
+def _system_health(db: Session, infrastructure: dict[str, Any]) -> list[dict[str, Any]]:
+    health = []
+    try:
+        db.execute(text("SELECT 1"))
+        health.append({"name": "PostgreSQL", "status": "ok", "detail": "Connected"})
+    except Exception:
+        health.append({"name": "PostgreSQL", "status": "error", "detail": "Unreachable"})
+    health.append({"name": "FastAPI", "status": "ok", "detail": "Running v2.0.0"})
+
+    total_nodes, online_nodes = infrastructure["nodes_total"], infrastructure["nodes_online"]
+    if total_nodes > 0:
+        health.append({
+            "name": f"Cluster ({total_nodes} nodos)",
+            "status": "ok" if online_nodes == total_nodes else "warning",
+            "detail": f"{online_nodes}/{total_nodes} online",
+        })
+    else:
+        health.append({"name": "Cluster", "status": "warning", "detail": "No nodes"})
+    running, total = infrastructure["containers_running"], infrastructure["containers_total"]
+    health.append({
+        "name": "Contenedores",
+        "status": "ok" if running > 0 else "warning",
+        "detail": f"{running}/{total} running",
+    })
+    return health
+
+
+def _section(name: str, compute: Callable[[], Any], default: Any) -> Any:
+    """Una sección que falla no tumba el overview completo."""
+    try:
+        return compute()
+    except Exception as e:
+        logger.error(f"KPI overview: sección {name} falló: {e}")
+        return default
+
+
+def compute_overview(db: Session) -> dict[str, Any]:
+    """Calcula el payload completo de /api/reports/overview (sin persistirlo)."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    revenue = _revenue(db, now, month_start)
+    customers = _customers(db, month_start)
+    revenue["new_this_month"] = customers.pop("new_this_month")
+    customers["active_subscriptions"] = revenue.pop("active_subscriptions")
+    infrastructure = _infrastructure(db)
+
+    return {
+        "generated_at": now.isoformat(),
+        "revenue": revenue,
+        "customers": customers,
+        "partners": _section("partners", lambda: _partners(db), {"total": 0, "active": 0, "pending": 0, "top": []}),
+        "leads": _section("leads", lambda: _leads(db), {
+            "total": 0, "active": 0, "won": 0, "pipeline_value": 0.0, "pipeline": {},
+        }),
+        "commissions": _section("commissions", lambda: _commissions(db), {
+            "total_partner": 0.0, "pending": 0.0, "paid": 0.0, "jeturing_share": 0.0,
+        }),
+        "infrastructure": infrastructure,
+        "settlements": _section("settlements", lambda: _settlements(db), {
+            "open": 0, "closed": 0, "total_partner_payout": 0.0,
+        }),
+        "work_orders": _section("work_orders", lambda: _work_orders(db), {
+            "total": 0, "requested": 0, "in_progress": 0, "completed": 0,
+        }),
+        "reconciliation": _section("reconciliation", lambda: _reconciliation(db), {
+            "total_runs": 0, "clean": 0, "issues": 0,
+        }),
+        "invoices": _section("invoices", lambda: _invoices(db), {
+            "total": 0, "paid": 0, "pending": 0, "total_amount": 0.0, "paid_amount": 0.0,
+        }),
+        "system_health": _system_health(db, infrastructure),
+        "recent_activity": _recent_activity(db),
+        "recent_stripe_events": _section("recent_stripe_events", lambda: _recent_stripe_events(db), []),
+    }
+
+
+def _serve(snapshot: KpiSnapshot) -> dict[str, Any]:
+    return {**snapshot.payload, "as_of": snapshot.as_of.isoformat()}
+
+
+def get_overview_snapshot(db: Session) -> Optional[dict[str, Any]]:
+    """Último overview materializado (una fila) o None si aún no se calculó."""
+    snapshot = db.query(KpiSnapshot).filter(KpiSnapshot.name == KPI_OVERVIEW).first()
+    return _serve(snapshot) if snapshot else None
+
+
+def _store(db: Session, payload: dict[str, Any], as_of: datetime, compute_ms: int) -> KpiSnapshot:
+    values = {"payload": payload, "as_of": as_of, "compute_ms": compute_ms}
+    for attempt in range(2):
+        snapshot = db.query(KpiSnapshot).filter(KpiSnapshot.name == KPI_OVERVIEW).first()
+        if snapshot is None:
+            snapshot = KpiSnapshot(name=KPI_OVERVIEW, **values)
+            db.add(snapshot)
+        else:
+            for key, value in values.items():
+                setattr(snapshot, key, value)
+        try:
+            db.commit()
+            return snapshot
+        except IntegrityError:
+            # Otro worker insertó la fila a la vez: se reintenta como UPDATE
+            db.rollback()
+            if attempt:
+                raise
+    return snapshot
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+
+
+class _SingleFlight:
+    """Coalesce llamadas concurrentes: quien llega con una en curso espera su resultado."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flight: Optional[_Flight] = None
+
+    def run(self, func: Callable[[], dict[str, Any]]) -> dict[str, Any]:
+        with self._lock:
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = func()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flight = None
+            flight.done.set()
+
+
+_overview_flight = _SingleFlight()
+
+
+def refresh_overview_snapshot(db: Session) -> dict[str, Any]:
+    """
+    Recalcula y persiste el overview (single-flight dentro del proceso).
+    Bloqueante: desde código async llamarlo con asyncio.to_thread.
+    """
+    def _refresh() -> dict[str, Any]:
+        started = time.monotonic()
+        payload = compute_overview(db)
+        compute_ms = int((time.monotonic() - started) * 1000)
+        snapshot = _store(db, payload, datetime.fromisoformat(payload["generated_at"]), compute_ms)
+        logger.info(f"📊 KPI overview recalculado en {compute_ms} ms")
+        return _serve(snapshot)
+
+    return _overview_flight.run(_refresh)
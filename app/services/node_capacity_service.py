@@ -11,15 +11,26 @@ Scoring formula (0-100):
 Auto-drain: when a node crosses a critical threshold the service sets
 `can_host_tenants = False` and creates a `scale_out` alert, signaling
 the provisioning system to skip the node for new tenants.
+
+Placement model: `capacity_model` keeps per-node snapshots, active tenant
+counts and a ranked heap in memory. ORM writes to TenantDeployment
+(provision, deprovision, migration) and ProxmoxNode (metrics, status,
+policy) are applied as deltas after commit; bulk statements invalidate the
+model and the next read rebuilds it. get_best_node pops the heap in
+O(log n) and re-reads only the winner to confirm it.
 """
+import heapq
 import logging
+import threading
 from datetime import datetime, timezone
-from typing import Dict, Any, List, Optional
+from types import SimpleNamespace
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 
-from sqlalchemy import and_
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, event, func, inspect
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.sql import ClauseElement
 
-from ..models.database import SessionLocal, ProxmoxNode, NodeStatus
+from ..models.database import SessionLocal, ProxmoxNode, NodeStatus, TenantDeployment
 
 logger = logging.getLogger(__name__)
 
@@ -229,9 +240,6 @@ class NodeCapacityService:
             db = SessionLocal()
 
         try:
-            from sqlalchemy import func
-            from ..models.database import TenantDeployment
-
             nodes = db.query(ProxmoxNode).filter(
                 ProxmoxNode.is_database_node == False
             ).all()
@@ -262,8 +270,8 @@ class NodeCapacityService:
                 slots = cls.available_slots(node, active)
                 total_slots += slots
 
-                # Persist score
-                db.query(ProxmoxNode).filter_by(id=nid).update({
+                # Persist score (not part of the placement model)
+                db.query(ProxmoxNode).filter_by(id=nid).execution_options(capacity_tracked=True).update({
                     ProxmoxNode.capacity_score: score
                 })
 
@@ -373,7 +381,9 @@ class NodeCapacityService:
     def get_best_node(cls, db: Optional[Session] = None) -> Optional[Dict[str, Any]]:
         """
         Select the best node for a new tenant deployment.
-        Uses dynamic scoring instead of static priority.
+        Uses dynamic scoring instead of static priority, answered from the
+        placement heap; the winner is re-read (row + tenant count) and, if
+        the model was stale for it, corrected and the heap consulted again.
         Returns node info dict or None if no capacity.
         """
         own_session = db is None
@@ -381,49 +391,49 @@ class NodeCapacityService:
             db = SessionLocal()
 
         try:
-            from sqlalchemy import func
-            from ..models.database import TenantDeployment
-
-            nodes = db.query(ProxmoxNode).filter(
-                ProxmoxNode.status == NodeStatus.online,
-                ProxmoxNode.is_database_node == False,
-                ProxmoxNode.can_host_tenants == True,
-            ).all()
-
-            tenant_counts: Dict[int, int] = dict(
-                db.query(
-                    TenantDeployment.active_node_id,
-                    func.count(TenantDeployment.id),
-                )
-                .filter(TenantDeployment.active_node_id.isnot(None))
-                .group_by(TenantDeployment.active_node_id)
-                .all()
-            )
-
-            best = None
-            best_score = -1
-
-            for node in nodes:
-                active = tenant_counts.get(node.id, 0)
-                slots = cls.available_slots(node, active)
-                if slots <= 0:
+            capacity_model.ensure_loaded(db)
+            for _ in range(capacity_model.size() + 1):
+                pick = capacity_model.peek_best()
+                if pick is None:
+                    return None
+                node_id, score, active = pick
+
+                node = db.get(ProxmoxNode, node_id, populate_existing=True)
+                fresh_active = _count_active_tenants(db, node_id)
+                if node is None or not capacity_model.matches(node, fresh_active):
+                    capacity_model.apply_node(node_id, _node_snapshot(node) if node else None)
+                    capacity_model.set_tenant_count(node_id, fresh_active)
                     continue
-                score = cls.compute_score(node, active)
-                if score > best_score:
-                    best_score = score
-                    best = {
-                        "node": node,
-                        "score": score,
-                        "active_tenants": active,
-                        "available_slots": slots,
-                    }
 
-            return best
+                return {
+                    "node": node,
+                    "score": score,
+                    "active_tenants": active,
+                    "available_slots": cls.available_slots(node, active),
+                }
+            return None
 
         finally:
             if own_session:
                 db.close()
 
+    @classmethod
+    def _best_node_full(cls, nodes: Iterable[Any], tenant_counts: Dict[int, int]) -> Optional[Tuple[int, float]]:
+        """Full recomputation of the placement choice (reference for the heap)."""
+        best = None
+        best_score = -1
+        for node in nodes:
+            if not _is_placeable(node):
+                continue
+            active = tenant_counts.get(node.id, 0)
+            if cls.available_slots(node, active) <= 0:
+                continue
+            score = cls.compute_score(node, active)
+            if score > best_score:
+                best_score = score
+                best = (node.id, score)
+        return best
+
     @classmethod
     def get_rebalance_recommendations(cls, db: Optional[Session] = None) -> List[Dict[str, Any]]:
         """
@@ -436,29 +446,14 @@ class NodeCapacityService:
             db = SessionLocal()
 
         try:
-            from sqlalchemy import func
-            from ..models.database import TenantDeployment
-
-            nodes = db.query(ProxmoxNode).filter(
-                ProxmoxNode.is_database_node == False,
-                ProxmoxNode.status == NodeStatus.online,
-            ).all()
-
-            tenant_counts: Dict[int, int] = dict(
-                db.query(
-                    TenantDeployment.active_node_id,
-                    func.count(TenantDeployment.id),
-                )
-                .filter(TenantDeployment.active_node_id.isnot(None))
-                .group_by(TenantDeployment.active_node_id)
-                .all()
-            )
+            capacity_model.ensure_loaded(db)
 
-            # Classify nodes
+            # Classify nodes (snapshots + counts from the capacity model)
             overloaded = []
             available = []
-            for node in nodes:
-                active = tenant_counts.get(node.id, 0)
+            for node, active in capacity_model.nodes():
+                if node.is_database_node or node.status != NodeStatus.online:
+                    continue
                 max_t = cls.effective_max_tenants(node)
                 score = cls.compute_score(node, active)
                 info = {
@@ -590,3 +585,329 @@ class NodeCapacityService:
                     )
                 except Exception as e:
                     logger.warning(f"Could not resolve alert: {e}")
+
+
+# ── Incremental placement model ──────────────────────────────────────────
+
+_SNAPSHOT_FIELDS = (
+    "name", "hostname", "vmid", "status", "is_database_node", "can_host_tenants",
+    "total_cpu_cores", "total_ram_gb", "used_ram_gb", "total_storage_gb", "used_storage_gb",
+    "used_cpu_percent", "io_max_tenants", "tenant_ram_mb", "system_overhead_mb",
+    "max_tenants_override", "storage_type", "auto_drain",
+    "cpu_threshold_warning", "cpu_threshold_critical",
+    "ram_threshold_warning", "ram_threshold_critical",
+    "storage_threshold_warning", "storage_threshold_critical",
+)
+_TRACKED_TABLES = {ProxmoxNode.__tablename__, TenantDeployment.__tablename__}
+_PENDING_KEY = "node_capacity_changes"
+
+
+def _node_snapshot(node: Any) -> SimpleNamespace:
+    return SimpleNamespace(id=node.id, **{f: getattr(node, f, None) for f in _SNAPSHOT_FIELDS})
+
+
+def _is_placeable(node: Any) -> bool:
+    return (
+        node.status == NodeStatus.online
+        and not node.is_database_node
+        and bool(node.can_host_tenants)
+    )
+
+
+def _count_active_tenants(db: Session, node_id: int) -> int:
+    return db.query(func.count(TenantDeployment.id)).filter(
+        TenantDeployment.active_node_id == node_id
+    ).scalar() or 0
+
+
+def _tenant_counts(db: Session, node_ids: Optional[Iterable[int]] = None) -> Dict[int, int]:
+    query = db.query(TenantDeployment.active_node_id, func.count(TenantDeployment.id)).filter(
+        TenantDeployment.active_node_id.isnot(None)
+    )
+    if node_ids is not None:
+        query = query.filter(TenantDeployment.active_node_id.in_(list(node_ids)))
+    return dict(query.group_by(TenantDeployment.active_node_id).all())
+
+
+class _CapacityModel:
+    """
+    In-memory placement state: node snapshots, active tenant counts and a
+    max-heap of (score, node) with lazy invalidation by version. Changes
+    arrive as deltas after commit (see the ORM hooks below); anything the
+    hooks can't describe marks nodes stale or invalidates the whole model.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._loaded = False
+            self._nodes: Dict[int, SimpleNamespace] = {}
+            self._counts: Dict[int, int] = {}
+            self._versions: Dict[int, int] = {}
+            self._scores: Dict[int, float] = {}
+            self._heap: List[Tuple[float, int, int]] = []
+            self._stale: set = set()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded = False
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._nodes)
+
+    # ── Loading ──────────────────────────────────────────────────────────
+
+    def rebuild(self, db: Session) -> None:
+        nodes = db.query(ProxmoxNode).order_by(ProxmoxNode.id).all()
+        counts = _tenant_counts(db)
+        with self._lock:
+            self.reset()
+            for node in nodes:
+                self._nodes[node.id] = _node_snapshot(node)
+            self._counts = {nid: n for nid, n in counts.items() if n}
+            for nid in self._nodes:
+                self._rescore(nid)
+            self._loaded = True
+
+    def ensure_loaded(self, db: Session) -> None:
+        with self._lock:
+            loaded, stale = self._loaded, set(self._stale)
+        if not loaded:
+            self.rebuild(db)
+            return
+        if stale:
+            rows = db.query(ProxmoxNode).filter(ProxmoxNode.id.in_(stale)).all()
+            counts = _tenant_counts(db, stale)
+            with self._lock:
+                self._stale -= stale
+                found = {row.id for row in rows}
+                for nid in stale - found:
+                    self._drop(nid)
+                for row in rows:
+                    self._nodes[row.id] = _node_snapshot(row)
+                    self._counts[row.id] = counts.get(row.id, 0)
+                    self._rescore(row.id)
+
+    # ── Deltas ───────────────────────────────────────────────────────────
+
+    def apply(self, changes: List[Tuple]) -> None:
+        """Apply the committed changes of one transaction."""
+        with self._lock:
+            if not self._loaded:
+                return
+            for change in changes:
+                kind = change[0]
+                if kind == "invalidate":
+                    self._loaded = False
+                    return
+                if kind == "tenants":
+                    _, nid, delta = change
+                    self._counts[nid] = max(0, self._counts.get(nid, 0) + delta)
+                    if nid in self._nodes:
+                        self._rescore(nid)
+                elif kind == "node":
+                    _, nid, fields = change
+                    node = self._nodes.get(nid)
+                    if fields is None or node is None and len(fields) < len(_SNAPSHOT_FIELDS):
+                        self._stale.add(nid)
+                    elif node is None:
+                        self._nodes[nid] = SimpleNamespace(id=nid, **fields)
+                        self._rescore(nid)
+                    else:
+                        for key, value in fields.items():
+                            setattr(node, key, value)
+                        self._rescore(nid)
+                elif kind == "node_deleted":
+                    self._drop(change[1])
+
+    def apply_node(self, node_id: int, snapshot: Optional[SimpleNamespace]) -> None:
+        with self._lock:
+            if snapshot is None:
+                self._drop(node_id)
+            else:
+                self._nodes[node_id] = snapshot
+                self._rescore(node_id)
+
+    def set_tenant_count(self, node_id: int, count: int) -> None:
+        with self._lock:
+            self._counts[node_id] = count
+            if node_id in self._nodes:
+                self._rescore(node_id)
+
+    def _drop(self, node_id: int) -> None:
+        self._nodes.pop(node_id, None)
+        self._scores.pop(node_id, None)
+        self._versions[node_id] = self._versions.get(node_id, 0) + 1
+
+    def _rescore(self, node_id: int) -> None:
+        node = self._nodes[node_id]
+        active = self._counts.get(node_id, 0)
+        version = self._versions.get(node_id, 0) + 1
+        self._versions[node_id] = version
+        self._scores.pop(node_id, None)
+        if _is_placeable(node) and NodeCapacityService.available_slots(node, active) > 0:
+            score = NodeCapacityService.compute_score(node, active)
+            self._scores[node_id] = score
+            heapq.heappush(self._heap, (-score, node_id, version))
+        if len(self._heap) > 2 * len(self._nodes) + 16:
+            self._heap = [
+                (-score, nid, self._versions[nid]) for nid, score in self._scores.items()
+            ]
+            heapq.heapify(self._heap)
+
+    # ── Queries ──────────────────────────────────────────────────────────
+
+    def peek_best(self) -> Optional[Tuple[int, float, int]]:
+        """(node_id, score, active_tenants) of the best placeable node, or None."""
+        with self._lock:
+            while self._heap:
+                neg_score, nid, version = self._heap[0]
+                if self._versions.get(nid) == version and nid in self._scores:
+                    return nid, -neg_score, self._counts.get(nid, 0)
+                heapq.heappop(self._heap)
+            return None
+
+    def matches(self, node: ProxmoxNode, active: int) -> bool:
+        with self._lock:
+            snapshot = self._nodes.get(node.id)
+            if snapshot is None or self._counts.get(node.id, 0) != active:
+                return False
+            return all(getattr(snapshot, f) == getattr(node, f, None) for f in _SNAPSHOT_FIELDS)
+
+    def nodes(self) -> List[Tuple[SimpleNamespace, int]]:
+        with self._lock:
+            return [(self._nodes[nid], self._counts.get(nid, 0)) for nid in sorted(self._nodes)]
+
+    def check_consistency(self, db: Session) -> List[str]:
+        """
+        Compare the model with a full recomputation from the database.
+        Returns human readable differences (empty when consistent).
+        """
+        self.ensure_loaded(db)
+        nodes = db.query(ProxmoxNode).order_by(ProxmoxNode.id).all()
+        counts = _tenant_counts(db)
+        drift: List[str] = []
+        with self._lock:
+            if set(self._nodes) != {n.id for n in nodes}:
+                drift.append(f"nodes: model={sorted(self._nodes)} db={sorted(n.id for n in nodes)}")
+            for node in nodes:
+                active = counts.get(node.id, 0)
+                if self._counts.get(node.id, 0) != active:
+                    drift.append(f"node {node.id}: tenants model={self._counts.get(node.id, 0)} db={active}")
+                expected = None
+                if _is_placeable(node) and NodeCapacityService.available_slots(node, active) > 0:
+                    expected = NodeCapacityService.compute_score(node, active)
+                if self._scores.get(node.id) != expected:
+                    drift.append(f"node {node.id}: score model={self._scores.get(node.id)} db={expected}")
+        full = NodeCapacityService._best_node_full(nodes, counts)
+        best = self.peek_best()
+        if (best[0] if best else None) != (full[0] if full else None):
+            drift.append(f"best node: model={best and best[0]} db={full and full[0]}")
+        return drift
+
+
+capacity_model = _CapacityModel()
+
+
+# ── ORM hooks ────────────────────────────────────────────────────────────
+
+
+def _pending(session: Optional[Session]) -> Optional[List[Tuple]]:
+    if session is None:
+        return None
+    return session.info.setdefault(_PENDING_KEY, [])
+
+
+def record_node_fields(db: Session, node_id: int, fields: Dict[str, Any]) -> None:
+    """Queue a node field change made with a Core statement (capacity_tracked)."""
+    _pending(db).append(("node", node_id, dict(fields)))
+
+
+def _on_tenant_insert(_mapper, _conn, target):
+    if target.active_node_id is not None:
+        _pending(object_session(target)).append(("tenants", target.active_node_id, 1))
+
+
+def _on_tenant_update(_mapper, _conn, target):
+    history = inspect(target).attrs.active_node_id.history
+    if not history.has_changes():
+        return
+    pending = _pending(object_session(target))
+    for old in history.deleted or ():
+        if old is not None:
+            pending.append(("tenants", old, -1))
+    for new in history.added or ():
+        if new is not None:
+            pending.append(("tenants", new, 1))
+
+
+def _on_tenant_delete(_mapper, _conn, target):
+    if target.active_node_id is not None:
+        _pending(object_session(target)).append(("tenants", target.active_node_id, -1))
+
+
+def _on_node_insert(_mapper, _conn, target):
+    state = inspect(target)
+    # Columns not populated by the INSERT (server defaults) -> reload the node lazily
+    complete = all(name in state.dict for name in _SNAPSHOT_FIELDS)
+    fields = {name: state.dict[name] for name in _SNAPSHOT_FIELDS} if complete else None
+    _pending(object_session(target)).append(("node", target.id, fields))
+
+
+def _on_node_update(_mapper, _conn, target):
+    state = inspect(target)
+    fields = {}
+    for name in _SNAPSHOT_FIELDS:
+        added = state.attrs[name].history.added
+        if added and isinstance(added[0], ClauseElement):
+            fields = None  # SQL expression: the value is only known after reloading
+            break
+        if added:
+            fields[name] = added[0]
+    if fields is None or fields:
+        _pending(object_session(target)).append(("node", target.id, fields))
+
+
+def _on_node_delete(_mapper, _conn, target):
+    _pending(object_session(target)).append(("node_deleted", target.id))
+
+
+def _on_orm_execute(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    if orm_execute_state.execution_options.get("capacity_tracked"):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if getattr(table, "name", None) in _TRACKED_TABLES:
+        _pending(orm_execute_state.session).append(("invalidate",))
+
+
+def _on_commit(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if changes:
+        capacity_model.apply(changes)
+
+
+def _on_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _register_capacity_hooks():
+    # Load the previous active_node_id on assignment so migrations know their source node
+    event.listen(TenantDeployment.active_node_id, "set", lambda *args: None, active_history=True)
+    event.listen(TenantDeployment, "after_insert", _on_tenant_insert)
+    event.listen(TenantDeployment, "after_update", _on_tenant_update)
+    event.listen(TenantDeployment, "before_delete", _on_tenant_delete)
+    event.listen(ProxmoxNode, "after_insert", _on_node_insert)
+    event.listen(ProxmoxNode, "after_update", _on_node_update)
+    event.listen(ProxmoxNode, "after_delete", _on_node_delete)
+    event.listen(Session, "do_orm_execute", _on_orm_execute)
+    event.listen(Session, "after_commit", _on_commit)
+    event.listen(Session, "after_rollback", _on_rollback)
+
+
+_register_capacity_hooks()
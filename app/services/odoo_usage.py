@@ -0,0 +1,320 @@
+"""
+Odoo Usage — uso real (websites, companies, storage_mb) de las BDs de tenants.
+
+Recolector con un pool acotado por nodo Odoo: a lo sumo
+ODOO_USAGE_MAX_CONNECTIONS_PER_NODE conexiones abiertas a la vez contra un
+mismo servidor y hasta ODOO_USAGE_IDLE_CONNECTIONS_PER_NODE engines por BD
+retenidos para reutilizar (LRU). Cada tenant se resuelve en un solo round
+trip (subconsultas escalares), los tenants se consultan en paralelo
+(ODOO_USAGE_CONCURRENCY) y el resultado se cachea ODOO_USAGE_CACHE_SECONDS.
+
+El psql por subproceso (un proceso por servidor con \\connect por BD) queda
+solo como respaldo para los tenants que el pool no pudo consultar.
+"""
+import logging
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote_plus
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger(__name__)
+
+TENANT_DB_RE = re.compile(r"[a-z0-9_]{3,63}")
+ODOO_USAGE_DEFAULT = {"websites": 1, "companies": 1, "storage_mb": 0}
+
+_USAGE_SQL = text(
+    "SELECT (SELECT COUNT(*) FROM res_company), (SELECT COUNT(*) FROM website), "
+    "pg_database_size(current_database()) / 1024 / 1024"
+)
+# Tenants sin el módulo website: se conserva el valor por defecto (1)
+_USAGE_SQL_NO_WEBSITE = text(
+    "SELECT (SELECT COUNT(*) FROM res_company), NULL, "
+    "pg_database_size(current_database()) / 1024 / 1024"
+)
+
+EngineFactory = Callable[[str, str], Engine]
+
+
+def _default_host() -> str:
+    from ..config import CT105_IP
+    return CT105_IP
+
+
+def default_engine_factory(host: str, db_name: str) -> Engine:
+    """Engine psycopg2 de una BD de tenant: una conexión retenida, sin overflow propio."""
+    from ..config import ODOO_DB_USER, ODOO_DB_PASSWORD, ODOO_USAGE_MAX_CONNECTIONS_PER_NODE
+
+    user = quote_plus(ODOO_DB_USER or "")
+    pwd = quote_plus(ODOO_DB_PASSWORD or "")
+    return create_engine(
+        f"postgresql+psycopg2://{user}:{pwd}@{host}:5432/{db_name}",
+        pool_size=1,
+        max_overflow=ODOO_USAGE_MAX_CONNECTIONS_PER_NODE,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+        connect_args={"connect_timeout": 5},
+    )
+
+
+class _NodePool:
+    """Conexiones a las BDs de un nodo: semáforo de conexiones abiertas + LRU de engines por BD."""
+
+    def __init__(self, host: str, engine_factory: EngineFactory, max_connections: int, max_idle: int):
+        self.host = host
+        self._factory = engine_factory
+        self._slots = threading.BoundedSemaphore(max(1, max_connections))
+        self._max_idle = max(1, max_idle)
+        self._engines: "OrderedDict[str, Engine]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _engine(self, db_name: str) -> Engine:
+        with self._lock:
+            engine = self._engines.pop(db_name, None)
+            if engine is None:
+                engine = self._factory(self.host, db_name)
+            self._engines[db_name] = engine
+            while len(self._engines) > self._max_idle:
+                # Las conexiones en uso del engine desalojado se cierran al devolverse
+                _, evicted = self._engines.popitem(last=False)
+                evicted.dispose()
+            return engine
+
+    @contextmanager
+    def connect(self, db_name: str):
+        with self._slots:
+            with self._engine(db_name).connect() as conn:
+                yield conn
+
+    def dispose(self) -> None:
+        with self._lock:
+            for engine in self._engines.values():
+                engine.dispose()
+            self._engines.clear()
+
+
+class OdooUsageCollector:
+    """Uso Odoo de varios tenants con pool por nodo, fan-out acotado y caché TTL."""
+
+    def __init__(
+        self,
+        engine_factory: EngineFactory = default_engine_factory,
+        *,
+        max_connections_per_node: int = 8,
+        idle_connections_per_node: int = 16,
+        concurrency: int = 8,
+        ttl_seconds: float = 120,
+        fallback: Optional[Callable[..., Dict[str, Dict[str, int]]]] = None,
+    ):
+        self._engine_factory = engine_factory
+        self._max_connections = max_connections_per_node
+        self._max_idle = idle_connections_per_node
+        self._concurrency = max(1, concurrency)
+        self._ttl = ttl_seconds
+        self._fallback = fallback or collect_usage_psql
+        self._nodes: Dict[str, _NodePool] = {}
+        self._cache: Dict[Tuple[str, str], Tuple[float, Dict[str, int]]] = {}
+        self._lock = threading.Lock()
+
+    def _node(self, host: str) -> _NodePool:
+        with self._lock:
+            pool = self._nodes.get(host)
+            if pool is None:
+                pool = _NodePool(host, self._engine_factory, self._max_connections, self._max_idle)
+                self._nodes[host] = pool
+            return pool
+
+    def collect(
+        self,
+        tenant_dbs: Iterable[str],
+        host: Optional[str] = None,
+        *,
+        refresh: bool = False,
+    ) -> Dict[str, Dict[str, int]]:
+        """
+        Uso por BD de tenant. Nombres inválidos se descartan; los tenants que
+        no responden por el pool pasan al respaldo psql (sin cachear).
+        """
+        host = host or _default_host()
+        names = sorted({name for name in tenant_dbs if TENANT_DB_RE.fullmatch(name or "")})
+        result: Dict[str, Dict[str, int]] = {}
+        now = time.monotonic()
+        pending: List[str] = []
+        with self._lock:
+            for name in names:
+                cached = None if refresh else self._cache.get((host, name))
+                if cached and cached[0] > now:
+                    result[name] = dict(cached[1])
+                else:
+                    pending.append(name)
+        if not pending:
+            return result
+
+        pool = self._node(host)
+        workers = min(self._concurrency, len(pending))
+        if workers == 1:
+            fetched = [self._query(pool, name) for name in pending]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="odoo-usage") as executor:
+                fetched = list(executor.map(lambda name: self._query(pool, name), pending))
+
+        failed = []
+        expires_at = time.monotonic() + self._ttl
+        with self._lock:
+            for name, usage in zip(pending, fetched):
+                if usage is None:
+                    failed.append(name)
+                    continue
+                result[name] = usage
+                self._cache[(host, name)] = (expires_at, dict(usage))
+        if failed:
+            result.update(self._fallback(failed, host))
+        return result
+
+    def _query(self, pool: _NodePool, db_name: str) -> Optional[Dict[str, int]]:
+        try:
+            with pool.connect(db_name) as conn:
+                try:
+                    row = conn.execute(_USAGE_SQL).one()
+                except DBAPIError:
+                    conn.rollback()
+                    row = conn.execute(_USAGE_SQL_NO_WEBSITE).one()
+        except Exception as e:
+            logger.warning(f"Uso Odoo de {db_name} en {pool.host} no disponible por el pool: {e}")
+            return None
+        companies, websites, storage_mb = row
+        return {
+            "websites": ODOO_USAGE_DEFAULT["websites"] if websites is None else int(websites),
+            "companies": int(companies),
+            "storage_mb": int(storage_mb or 0),
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            nodes = list(self._nodes.values())
+            self._nodes.clear()
+            self._cache.clear()
+        for pool in nodes:
+            pool.dispose()
+
+
+_collector: Optional[OdooUsageCollector] = None
+_collector_lock = threading.Lock()
+
+
+def get_odoo_usage_collector() -> OdooUsageCollector:
+    """Recolector compartido del proceso, configurado desde app.config."""
+    global _collector
+    with _collector_lock:
+        if _collector is None:
+            from ..config import (
+                ODOO_USAGE_CACHE_SECONDS, ODOO_USAGE_CONCURRENCY,
+                ODOO_USAGE_IDLE_CONNECTIONS_PER_NODE, ODOO_USAGE_MAX_CONNECTIONS_PER_NODE,
+            )
+            _collector = OdooUsageCollector(
+                max_connections_per_node=ODOO_USAGE_MAX_CONNECTIONS_PER_NODE,
+                idle_connections_per_node=ODOO_USAGE_IDLE_CONNECTIONS_PER_NODE,
+                concurrency=ODOO_USAGE_CONCURRENCY,
+                ttl_seconds=ODOO_USAGE_CACHE_SECONDS,
+            )
+        return _collector
+
+
+# ── Respaldo psql ─────────────────────────────────────────────────────────
+
+
+def _usage_psql_script(tenant_dbs: List[str]) -> str:
+    """
+    Script psql para un servidor: tamaños desde pg_database y, por cada BD,
+    una marca 'connected' más el conteo de websites y companies. Si un
+    \\connect falla, psql (no interactivo) cierra la conexión y todas las
+    consultas siguientes fallan: la marca permite saber dónde se cortó.
+    """
+    names = ", ".join(f"'{name}'" for name in tenant_dbs)
+    lines = [
+        "SELECT 'storage_mb', datname, pg_database_size(datname) / 1024 / 1024 "
+        f"FROM pg_database WHERE datname IN ({names});"
+    ]
+    for name in tenant_dbs:
+        lines.append(f"\\connect {name}")
+        lines.append("SELECT 'connected', current_database(), 1;")
+        lines.append("SELECT 'companies', current_database(), COUNT(*) FROM res_company;")
+        lines.append("SELECT 'websites', current_database(), COUNT(*) FROM website;")
+    return "\n".join(lines) + "\n"
+
+
+def collect_usage_psql(tenant_dbs: Iterable[str], host: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+    """
+    Uso Odoo de varios tenants con un solo proceso psql contra el servidor de
+    BD. Los tenants sin respuesta quedan con los valores por defecto
+    (1 website, 1 company, 0 MB). Desde el primer \\connect sin marca
+    'connected' el resto del script se da por fallido: esas BDs conservan solo
+    el tamaño, leído antes sobre la conexión a postgres.
+    """
+    from ..config import ODOO_DB_USER, ODOO_DB_PASSWORD
+
+    names = sorted({name for name in tenant_dbs if TENANT_DB_RE.fullmatch(name or "")})
+    result = {name: dict(ODOO_USAGE_DEFAULT) for name in names}
+    if not names:
+        return result
+
+    env = {**os.environ, "PGPASSWORD": ODOO_DB_PASSWORD or ""}
+    try:
+        proc = subprocess.run(
+            [
+                "psql",
+                "-h", host or _default_host(),
+                "-p", "5432",
+                "-U", ODOO_DB_USER,
+                "-d", "postgres",
+                "-X", "-q", "-t", "-A", "-F", "|",
+            ],
+            input=_usage_psql_script(names),
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=5 + len(names) * 0.2,
+        )
+    except Exception as e:
+        logger.warning(f"No se pudo consultar uso Odoo de {len(names)} tenants: {e}")
+        return result
+
+    rows: Dict[str, Dict[str, int]] = {name: {} for name in names}
+    for line in proc.stdout.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or parts[1] not in rows:
+            continue
+        try:
+            rows[parts[1]][parts[0]] = int(parts[2])
+        except ValueError:
+            continue
+
+    failed: List[str] = []
+    for name in names:
+        values = rows[name]
+        if "storage_mb" in values:
+            result[name]["storage_mb"] = values["storage_mb"]
+        if failed or "connected" not in values:
+            failed.append(name)
+            continue
+        for key in ("companies", "websites"):
+            if key in values:
+                result[name][key] = values[key]
+    if failed:
+        logger.warning(
+            f"psql: \\connect a {failed[0]} falló; {len(failed)} tenants quedan con uso por defecto"
+        )
+    return result
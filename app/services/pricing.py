@@ -13,11 +13,20 @@ Auto-upgrade por users:
   actual y retorna el plan correcto (siguiente tier). Se integra en
   get_effective_plan_snapshot() para que el pricing siempre refleje el plan
   correcto según la cantidad de usuarios activos del tenant.
+
+Pricing por conjuntos:
+  get_effective_plan_snapshots() / get_subscription_prices() resuelven un
+  conjunto de suscripciones con una sola consulta (suscripción ⨝ cliente ⨝
+  overrides activos del partner) más el catálogo de planes activos
+  (PricingCatalog); tiers y overrides se resuelven en memoria con la misma
+  lógica que get_effective_plan_snapshot().
 """
 import logging
-from typing import Optional
+from typing import Any, Callable, Optional
+
+from sqlalchemy import and_, func, select
 
-from ..models.database import Customer, PartnerPricingOverride, Plan, SessionLocal
+from ..models.database import Customer, PartnerPricingOverride, Plan, SessionLocal, Subscription
 
 logger = logging.getLogger(__name__)
 
@@ -80,12 +89,8 @@ def resolve_auto_plan(db, current_plan: Plan, user_count: int) -> Plan:
     if current_plan is None:
         return current_plan
 
-    # max_users=0 = ilimitado → el plan actual siempre es suficiente
-    if (current_plan.max_users or 0) == 0:
-        return current_plan
-
-    # Si cabe en el plan actual, no hay upgrade
-    if user_count <= current_plan.max_users:
+    # Ilimitado (max_users=0) o cabe en el plan actual: no hay upgrade
+    if not _needs_upgrade(current_plan, user_count):
         return current_plan
 
     # Cargar todos los planes activos ordenados por sort_order, luego por orden canónico
@@ -95,14 +100,19 @@ def resolve_auto_plan(db, current_plan: Plan, user_count: int) -> Plan:
         .order_by(Plan.sort_order, Plan.id)
         .all()
     )
+    return _upgrade_plan(current_plan, user_count, all_plans)
+
+
+def _plan_rank(p: Plan) -> int:
+    """Posición en el orden canónico; planes no reconocidos van al final."""
+    try:
+        return _PLAN_UPGRADE_ORDER.index(p.name.lower())
+    except ValueError:
+        return len(_PLAN_UPGRADE_ORDER)
 
-    # Ordenar según el orden canónico conocido; planes no reconocidos van al final
-    def _plan_rank(p: Plan) -> int:
-        try:
-            return _PLAN_UPGRADE_ORDER.index(p.name.lower())
-        except ValueError:
-            return len(_PLAN_UPGRADE_ORDER)
 
+def _upgrade_plan(current_plan: Plan, user_count: int, all_plans: list[Plan]) -> Plan:
+    """Selección de tier de resolve_auto_plan sobre planes activos ya cargados (sort_order, id)."""
     ordered = sorted(all_plans, key=_plan_rank)
     current_rank = _plan_rank(current_plan)
 
@@ -122,47 +132,37 @@ def resolve_auto_plan(db, current_plan: Plan, user_count: int) -> Plan:
     return ordered[-1] if ordered else current_plan
 
 
-def get_effective_plan_snapshot(
-    db,
-    sub,
-    *,
-    customer: Optional[Customer] = None,
-    plan: Optional[Plan] = None,
-    user_count: Optional[int] = None,
-) -> dict:
-    """
-    Resuelve el pricing efectivo de una suscripción usando override de partner si aplica.
+def _needs_upgrade(plan: Plan, user_count: int) -> bool:
+    # max_users=0 = ilimitado → el plan actual siempre es suficiente
+    return (plan.max_users or 0) != 0 and user_count > plan.max_users
 
-    Returns:
-        {
-            plan, customer, partner_id, user_count,
-            base_price, price_per_user, included_users,
-            extra_users, total, pricing_source
-        }
-    """
-    customer = get_subscription_customer(db, sub, customer=customer)
-    plan = plan or db.query(Plan).filter(
-        Plan.name == sub.plan_name,
-        Plan.is_active == True,
-    ).first()
 
+def _normalize_user_count(sub, customer: Optional[Customer], user_count: Optional[int]) -> int:
     normalized_users = user_count
     if normalized_users is None:
         normalized_users = getattr(sub, "user_count", None) or (customer.user_count if customer else None) or 1
     try:
-        normalized_users = max(1, int(normalized_users))
+        return max(1, int(normalized_users))
     except (TypeError, ValueError):
-        normalized_users = 1
+        return 1
 
-    # Auto-upgrade: si user_count supera max_users del plan asignado, subir al tier correcto
-    if plan is not None:
-        plan = resolve_auto_plan(db, plan, normalized_users)
 
+def _build_plan_snapshot(
+    sub,
+    *,
+    customer: Optional[Customer],
+    plan: Optional[Plan],
+    partner_id: Optional[int],
+    user_count: int,
+    find_override: Callable[[int, str], Optional[PartnerPricingOverride]],
+    plan_prices: Callable[[], dict],
+) -> dict:
+    """Arma el snapshot con el plan ya resuelto (tier incluido); común al pricing unitario y por conjuntos."""
     snapshot = {
         "plan": plan,
         "customer": customer,
-        "partner_id": resolve_subscription_partner_id(db, sub, customer=customer),
-        "user_count": normalized_users,
+        "partner_id": partner_id,
+        "user_count": user_count,
         "base_price": 0.0,
         "price_per_user": 0.0,
         "included_users": 1,
@@ -173,7 +173,7 @@ def get_effective_plan_snapshot(
     }
 
     if not plan:
-        fallback_prices = get_plan_prices(db)
+        fallback_prices = plan_prices()
         fallback_total = float(getattr(sub, "monthly_amount", 0) or fallback_prices.get(sub.plan_name or "basic", 160))
         snapshot.update({
             "base_price": fallback_total,
@@ -187,13 +187,8 @@ def get_effective_plan_snapshot(
     included_users = int(plan.included_users or 1)
     pricing_source = "plan_default"
 
-    partner_id = snapshot["partner_id"]
     if partner_id:
-        override = db.query(PartnerPricingOverride).filter(
-            PartnerPricingOverride.partner_id == partner_id,
-            PartnerPricingOverride.plan_name == plan.name,
-            PartnerPricingOverride.is_active == True,
-        ).first()
+        override = find_override(partner_id, plan.name)
         if override:
             if override.base_price_override is not None:
                 base_price = float(override.base_price_override)
@@ -204,7 +199,7 @@ def get_effective_plan_snapshot(
             pricing_source = "partner_override"
             snapshot["override"] = override
 
-    extra_users = max(0, normalized_users - included_users)
+    extra_users = max(0, user_count - included_users)
     total = base_price + (extra_users * price_per_user)
 
     snapshot.update({
@@ -218,6 +213,176 @@ def get_effective_plan_snapshot(
     return snapshot
 
 
+def get_effective_plan_snapshot(
+    db,
+    sub,
+    *,
+    customer: Optional[Customer] = None,
+    plan: Optional[Plan] = None,
+    user_count: Optional[int] = None,
+) -> dict:
+    """
+    Resuelve el pricing efectivo de una suscripción usando override de partner si aplica.
+
+    Returns:
+        {
+            plan, customer, partner_id, user_count,
+            base_price, price_per_user, included_users,
+            extra_users, total, pricing_source
+        }
+    """
+    customer = get_subscription_customer(db, sub, customer=customer)
+    plan = plan or db.query(Plan).filter(
+        Plan.name == sub.plan_name,
+        Plan.is_active == True,
+    ).first()
+
+    normalized_users = _normalize_user_count(sub, customer, user_count)
+
+    # Auto-upgrade: si user_count supera max_users del plan asignado, subir al tier correcto
+    if plan is not None:
+        plan = resolve_auto_plan(db, plan, normalized_users)
+
+    def _find_override(partner_id: int, plan_name: str) -> Optional[PartnerPricingOverride]:
+        return db.query(PartnerPricingOverride).filter(
+            PartnerPricingOverride.partner_id == partner_id,
+            PartnerPricingOverride.plan_name == plan_name,
+            PartnerPricingOverride.is_active == True,
+        ).order_by(PartnerPricingOverride.id.desc()).first()
+
+    return _build_plan_snapshot(
+        sub,
+        customer=customer,
+        plan=plan,
+        partner_id=resolve_subscription_partner_id(db, sub, customer=customer),
+        user_count=normalized_users,
+        find_override=_find_override,
+        plan_prices=lambda: get_plan_prices(db),
+    )
+
+
+class PricingCatalog:
+    """Planes activos precargados (una consulta) para resolver tiers en memoria."""
+
+    def __init__(self, plans: list[Plan]):
+        self.plans = plans
+        self.by_name = {plan.name: plan for plan in plans}
+
+    @classmethod
+    def load(cls, db) -> "PricingCatalog":
+        return cls(
+            db.query(Plan)
+            .filter(Plan.is_active == True)
+            .order_by(Plan.sort_order, Plan.id)
+            .all()
+        )
+
+    def plan_prices(self) -> dict:
+        """Equivalente a get_plan_prices() sobre el catálogo cargado."""
+        if self.plans:
+            return {p.name: p.base_price for p in self.plans}
+        logger.warning("No se encontraron planes activos en BD, usando fallback")
+        return {"basic": 160, "pro": 200, "enterprise": 400}
+
+    def resolve(self, plan: Plan, user_count: int) -> Plan:
+        """Equivalente a resolve_auto_plan() sin volver a consultar planes."""
+        if not _needs_upgrade(plan, user_count):
+            return plan
+        return _upgrade_plan(plan, user_count, self.plans)
+
+
+_PricingRow = tuple[Subscription, Optional[Customer], dict[str, PartnerPricingOverride]]
+
+
+def load_subscription_pricing_rows(db, *criteria: Any) -> list[_PricingRow]:
+    """
+    Una consulta: suscripción ⨝ cliente ⨝ overrides activos del partner
+    efectivo, agrupada como [(suscripción, cliente, {plan_name: override})]
+    ordenado por id. El override aplicable depende del plan ya resuelto
+    (tier incluido), por eso se entregan todos los del partner.
+    """
+    partner_id = func.coalesce(Subscription.owner_partner_id, Customer.partner_id)
+    rows = db.execute(
+        select(Subscription, Customer, PartnerPricingOverride)
+        .outerjoin(Customer, Customer.id == Subscription.customer_id)
+        .outerjoin(
+            PartnerPricingOverride,
+            and_(PartnerPricingOverride.partner_id == partner_id, PartnerPricingOverride.is_active == True),
+        )
+        .where(*criteria)
+        .order_by(Subscription.id, PartnerPricingOverride.id.desc())
+    ).all()
+
+    grouped: dict[int, _PricingRow] = {}
+    for sub, customer, override in rows:
+        entry = grouped.get(sub.id)
+        if entry is None:
+            entry = grouped[sub.id] = (sub, customer, {})
+        if override is not None:
+            # Mismo desempate que _find_override (id DESC) si hubiera más de uno por plan
+            entry[2].setdefault(override.plan_name, override)
+    return list(grouped.values())
+
+
+def build_catalog_snapshot(
+    catalog: "PricingCatalog",
+    row: _PricingRow,
+    user_count: Optional[int] = None,
+) -> dict:
+    """Snapshot de una fila de load_subscription_pricing_rows(); `user_count` permite valorar otro conteo de usuarios."""
+    sub, customer, overrides = row
+    normalized_users = _normalize_user_count(sub, customer, user_count)
+    plan = catalog.by_name.get(sub.plan_name)
+    if plan is not None:
+        plan = catalog.resolve(plan, normalized_users)
+    return _build_plan_snapshot(
+        sub,
+        customer=customer,
+        plan=plan,
+        partner_id=sub.owner_partner_id or (customer.partner_id if customer else None),
+        user_count=normalized_users,
+        find_override=lambda _partner_id, plan_name: overrides.get(plan_name),
+        plan_prices=catalog.plan_prices,
+    )
+
+
+def get_effective_plan_snapshots(
+    db,
+    *criteria: Any,
+    catalog: Optional[PricingCatalog] = None,
+) -> list[tuple[Subscription, dict]]:
+    """
+    Versión por conjuntos de get_effective_plan_snapshot() para las
+    suscripciones que cumplen `criteria` (pueden filtrar por Customer, que va
+    en el join). Retorna [(suscripción, snapshot)] ordenado por id.
+    """
+    catalog = catalog or PricingCatalog.load(db)
+    return [
+        (row[0], build_catalog_snapshot(catalog, row))
+        for row in load_subscription_pricing_rows(db, *criteria)
+    ]
+
+
+def subscription_price(snapshot: dict) -> float:
+    """Precio mensual a reportar: cuentas admin exentas, si no el total efectivo."""
+    customer = snapshot["customer"]
+    if customer and customer.is_admin_account:
+        return 0.0
+    return float(snapshot["total"])
+
+
+def get_subscription_prices(
+    db,
+    *criteria: Any,
+    catalog: Optional[PricingCatalog] = None,
+) -> list[tuple[Subscription, float]]:
+    """Equivalente por conjuntos de get_plan_price_for_sub(): [(suscripción, precio)]."""
+    return [
+        (sub, subscription_price(snapshot))
+        for sub, snapshot in get_effective_plan_snapshots(db, *criteria, catalog=catalog)
+    ]
+
+
 def calculate_effective_subscription_amount(
     db,
     sub,
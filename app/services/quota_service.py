@@ -15,16 +15,29 @@ Convenciones:
   - 0 = ilimitado (excepto max_domains donde 0 = sin dominios)
   - -1 = ilimitado (para max_domains, backward compat)
   - Enforcement: check_quota() lanza HTTPException 403 si se excede
+
+Vista de todos los clientes:
+  get_all_customers_quotas() evalúa el conjunto completo con consultas
+  agrupadas (suscripciones, planes, dominios, deployments, overrides) y trae
+  el uso Odoo de todos los tenants en una pasada (collect_odoo_usage: pool
+  por nodo, tenants en paralelo, caché TTL). get_quota_table() sirve ese
+  resultado cacheado, paginado y ordenable.
 """
 
 import logging
-from typing import Dict, Any, Optional, List
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, Iterable, Optional, List
+
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
 from ..models.database import (
     Customer, Subscription, SubscriptionStatus,
     Plan, CustomDomain, TenantDeployment, PartnerPricingOverride,
 )
+from .odoo_usage import ODOO_USAGE_DEFAULT, TENANT_DB_RE, get_odoo_usage_collector
 
 logger = logging.getLogger("quota_service")
 
@@ -68,8 +81,6 @@ class QuotaService:
             limit = limits.get(resource, getattr(plan, field, 0) if plan else 0)
             used = usage.get(resource, 0)
             unlimited = self._is_unlimited(resource, limit)
-            status = self._quota_status(plan, used, limit, unlimited)
-
             quotas[resource] = {
                 "limit": limit,
                 "used": used,
@@ -78,7 +89,7 @@ class QuotaService:
                 "unlimited": unlimited,
                 "can_add": unlimited or used < limit,
                 "exceeded": not unlimited and used > limit,
-                "status": status,
+                "status": self._quota_status(plan, used, limit, unlimited),
             }
 
         return {
@@ -145,57 +156,134 @@ class QuotaService:
     # ── Resumen multi-cliente (admin) ─────────────────────────────────────
 
     def get_all_customers_quotas(self) -> List[Dict[str, Any]]:
-        """Retorna resumen de cuotas de todos los clientes (para admin dashboard)."""
+        """
+        Retorna resumen de cuotas de todos los clientes (para admin dashboard).
+        Consultas agrupadas para todo el conjunto + una pasada de uso Odoo;
+        mismo resultado que evaluar cliente por cliente.
+        """
         customers = self.db.query(Customer).order_by(Customer.company_name).all()
-        result = []
 
-        for c in customers:
-            plan, plan_name = self._get_active_plan(c.id)
-            usage = self._get_current_usage(c.id)
-            limits = self._get_effective_limits(c, plan, plan_name)
-
-            summary = {
-                "customer_id": c.id,
-                "company_name": c.company_name,
-                "subdomain": c.subdomain,
-                "plan_name": plan.display_name if plan else plan_name,
-                "plan_key": plan_name,
-                "fair_use_enabled": bool(getattr(c, "fair_use_enabled", False)),
-                "resources": {},
-            }
+        active_subs: Dict[int, Subscription] = {}
+        for sub in self.db.query(Subscription).filter(
+            Subscription.status == SubscriptionStatus.active,
+        ).order_by(Subscription.id):
+            active_subs.setdefault(sub.customer_id, sub)
+
+        plans = {p.name: p for p in self.db.query(Plan).filter(Plan.is_active == True)}
+        domain_counts = dict(self.db.execute(
+            select(CustomDomain.customer_id, func.count()).group_by(CustomDomain.customer_id)
+        ).all())
+
+        deployments: Dict[int, TenantDeployment] = {}
+        for deployment in self.db.query(TenantDeployment).filter(
+            TenantDeployment.customer_id.isnot(None),
+        ).order_by(TenantDeployment.id):
+            deployments.setdefault(deployment.customer_id, deployment)
+
+        overrides = {
+            (o.partner_id, o.plan_name): o
+            for o in self.db.query(PartnerPricingOverride).filter(PartnerPricingOverride.is_active == True)
+        }
 
-            for resource, field in QUOTA_FIELDS.items():
-                limit = limits.get(resource, getattr(plan, field, 0) if plan else 0)
-                used = usage.get(resource, 0)
-                unlimited = self._is_unlimited(resource, limit)
-                summary["resources"][resource] = {
-                    "used": used,
-                    "limit": limit,
-                    "unlimited": unlimited,
-                    "exceeded": not unlimited and used > limit,
-                    "status": self._quota_status(plan, used, limit, unlimited),
-                }
+        odoo_usage = self._collect_odoo_usage(
+            d.database_name for d in deployments.values() if d.database_name
+        )
 
-            result.append(summary)
+        result = []
+        for c in customers:
+            sub = active_subs.get(c.id)
+            plan_name = self._plan_name_for(c, sub)
+            plan = plans.get(plan_name)
+            deployment = deployments.get(c.id)
+            usage = self._usage_for(
+                c, sub, domain_counts.get(c.id, 0),
+                odoo_usage.get(deployment.database_name) if deployment and deployment.database_name else None,
+                has_tenant_db=bool(deployment and deployment.database_name),
+            )
+            override = overrides.get((c.partner_id, plan_name)) if c.partner_id and plan_name else None
+            limits = self._apply_override(self._plan_limits(plan), override)
+            result.append(self._summary_row(c, plan, plan_name, usage, limits))
 
         return result
 
+    def _summary_row(
+        self,
+        customer: Customer,
+        plan: Optional[Plan],
+        plan_name: str,
+        usage: Dict[str, int],
+        limits: Dict[str, int],
+    ) -> Dict[str, Any]:
+        summary = {
+            "customer_id": customer.id,
+            "company_name": customer.company_name,
+            "subdomain": customer.subdomain,
+            "plan_name": plan.display_name if plan else plan_name,
+            "plan_key": plan_name,
+            "fair_use_enabled": bool(getattr(customer, "fair_use_enabled", False)),
+            "resources": {},
+        }
+        for resource, field in QUOTA_FIELDS.items():
+            limit = limits.get(resource, getattr(plan, field, 0) if plan else 0)
+            used = usage.get(resource, 0)
+            unlimited = self._is_unlimited(resource, limit)
+            summary["resources"][resource] = {
+                "used": used,
+                "limit": limit,
+                "percentage": 0 if unlimited or limit == 0 else round(used / limit * 100, 1),
+                "unlimited": unlimited,
+                "exceeded": not unlimited and used > limit,
+                "status": self._quota_status(plan, used, limit, unlimited),
+            }
+        return summary
+
+    def get_quota_table(
+        self,
+        *,
+        sort: str = "top_usage",
+        order: str = "desc",
+        limit: int = 50,
+        offset: int = 0,
+        search: Optional[str] = None,
+        refresh: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Tabla de cuotas paginada y ordenable sobre el resumen cacheado
+        (QUOTA_TABLE_CACHE_SECONDS). sort: company_name | plan | top_usage |
+        <recurso> (por % de uso). ValueError si sort/order no son válidos.
+        """
+        if sort not in _TABLE_SORTS and sort not in QUOTA_FIELDS:
+            raise ValueError(f"sort inválido: {sort}")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"order inválido: {order}")
+
+        rows, as_of = _quota_table_cache.get(self.get_all_customers_quotas, refresh=refresh)
+        if search:
+            needle = search.strip().lower()
+            rows = [
+                r for r in rows
+                if any(needle in (r.get(field) or "").lower() for field in ("company_name", "subdomain", "plan_name"))
+            ]
+        key = _TABLE_SORTS.get(sort) or (lambda r, resource=sort: r["resources"][resource]["percentage"])
+        ordered = sorted(rows, key=key, reverse=order == "desc")
+        return {
+            "success": True,
+            "total": len(ordered),
+            "limit": limit,
+            "offset": offset,
+            "sort": sort,
+            "order": order,
+            "as_of": as_of.isoformat(),
+            "customers": ordered[offset:offset + limit],
+        }
+
     # ── Helpers internos ──────────────────────────────────────────────────
 
     def _get_active_plan(self, customer_id: int):
         """Retorna (Plan, plan_name) del cliente."""
-        sub = self.db.query(Subscription).filter(
-            Subscription.customer_id == customer_id,
-            Subscription.status == SubscriptionStatus.active,
-        ).first()
-
-        plan_name = "basic"
-        if sub:
-            plan_name = sub.plan_name
-        else:
-            customer = self.db.query(Customer).filter(Customer.id == customer_id).first()
-            if customer and customer.plan:
-                plan_name = customer.plan.value
+        sub = self._get_active_subscription(customer_id)
+        customer = None if sub else self.db.query(Customer).filter(Customer.id == customer_id).first()
+        plan_name = self._plan_name_for(customer, sub)
 
         plan = self.db.query(Plan).filter(
             Plan.name == plan_name, Plan.is_active == True
@@ -203,33 +291,59 @@ class QuotaService:
 
         return plan, plan_name
 
+    def _get_active_subscription(self, customer_id: int) -> Optional[Subscription]:
+        return self.db.query(Subscription).filter(
+            Subscription.customer_id == customer_id,
+            Subscription.status == SubscriptionStatus.active,
+        ).order_by(Subscription.id).first()
+
+    @staticmethod
+    def _plan_name_for(customer: Optional[Customer], sub: Optional[Subscription]) -> str:
+        if sub:
+            return sub.plan_name
+        if customer and customer.plan:
+            return customer.plan.value
+        return "basic"
+
     def _get_current_usage(self, customer_id: int) -> Dict[str, int]:
         """Calcula el uso actual de todos los recursos del cliente."""
-        usage = {}
         customer = self.db.query(Customer).filter(Customer.id == customer_id).first()
-
-        # Dominios custom
-        usage["domains"] = self.db.query(CustomDomain).filter(
+        domains = self.db.query(CustomDomain).filter(
             CustomDomain.customer_id == customer_id,
         ).count()
-
-        # Usuarios (de la suscripción activa)
-        sub = self.db.query(Subscription).filter(
-            Subscription.customer_id == customer_id,
-            Subscription.status == SubscriptionStatus.active,
-        ).first()
-        usage["users"] = sub.user_count if sub else 1
-        usage["stock_sku"] = max(0, int(getattr(customer, "stock_sku_count", 0) or 0))
+        sub = self._get_active_subscription(customer_id)
 
         # Websites, companies, storage — requieren consulta a Odoo
-        # Por ahora usamos valores por defecto; se pueden enriquecer con
-        # consultas reales a la BD del tenant cuando sea necesario
         deployment = self.db.query(TenantDeployment).filter(
             TenantDeployment.customer_id == customer_id,
-        ).first()
-
+        ).order_by(TenantDeployment.id).first()
+        odoo_usage = None
         if deployment and deployment.database_name:
             odoo_usage = self._get_odoo_usage(deployment.database_name)
+
+        return self._usage_for(
+            customer, sub, domains, odoo_usage,
+            has_tenant_db=bool(deployment and deployment.database_name),
+        )
+
+    @staticmethod
+    def _usage_for(
+        customer: Optional[Customer],
+        sub: Optional[Subscription],
+        domains: int,
+        odoo_usage: Optional[Dict[str, int]],
+        *,
+        has_tenant_db: bool,
+    ) -> Dict[str, int]:
+        """Arma el uso de un cliente a partir de datos ya consultados."""
+        usage = {
+            "domains": domains,
+            # Usuarios (de la suscripción activa)
+            "users": sub.user_count if sub else 1,
+            "stock_sku": max(0, int(getattr(customer, "stock_sku_count", 0) or 0)),
+        }
+        if has_tenant_db:
+            odoo_usage = odoo_usage or ODOO_USAGE_DEFAULT
             usage["websites"] = odoo_usage.get("websites", 1)
             usage["companies"] = odoo_usage.get("companies", 1)
             usage["storage_mb"] = odoo_usage.get("storage_mb", 0)
@@ -240,14 +354,29 @@ class QuotaService:
 
         usage["backups"] = 0  # TODO: integrar con sistema de backups
         usage["api_calls"] = 0  # TODO: integrar con rate limiter
-
         return usage
 
-    def _get_effective_limits(self, customer: Customer, plan: Optional[Plan], plan_name: str) -> Dict[str, int]:
-        limits = {
+    @staticmethod
+    def _plan_limits(plan: Optional[Plan]) -> Dict[str, int]:
+        return {
             resource: getattr(plan, field, 0) if plan else 0
             for resource, field in QUOTA_FIELDS.items()
         }
+
+    @staticmethod
+    def _apply_override(limits: Dict[str, int], override: Optional[PartnerPricingOverride]) -> Dict[str, int]:
+        if not override:
+            return limits
+        if override.max_users_override is not None:
+            limits["users"] = int(override.max_users_override)
+        if override.max_storage_mb_override is not None:
+            limits["storage_mb"] = int(override.max_storage_mb_override)
+        if override.max_stock_sku_override is not None:
+            limits["stock_sku"] = int(override.max_stock_sku_override)
+        return limits
+
+    def _get_effective_limits(self, customer: Customer, plan: Optional[Plan], plan_name: str) -> Dict[str, int]:
+        limits = self._plan_limits(plan)
         if not customer:
             return limits
 
@@ -260,16 +389,7 @@ class QuotaService:
             PartnerPricingOverride.plan_name == plan_name,
             PartnerPricingOverride.is_active == True,
         ).first()
-        if not override:
-            return limits
-
-        if override.max_users_override is not None:
-            limits["users"] = int(override.max_users_override)
-        if override.max_storage_mb_override is not None:
-            limits["storage_mb"] = int(override.max_storage_mb_override)
-        if override.max_stock_sku_override is not None:
-            limits["stock_sku"] = int(override.max_stock_sku_override)
-        return limits
+        return self._apply_override(limits, override)
 
     @staticmethod
     def _quota_status(plan: Optional[Plan], used: int, limit: int, unlimited: bool) -> str:
@@ -289,55 +409,14 @@ class QuotaService:
 
     def _get_odoo_usage(self, tenant_db: str) -> Dict[str, int]:
         """Consulta uso real desde la BD Odoo del tenant."""
-        import os
-        import re
-        import subprocess
-        from ..config import CT105_IP, ODOO_DB_USER, ODOO_DB_PASSWORD
-
-        result = {"websites": 1, "companies": 1, "storage_mb": 0}
-        if not re.fullmatch(r"[a-z0-9_]{3,63}", tenant_db or ""):
+        if not TENANT_DB_RE.fullmatch(tenant_db or ""):
             logger.warning("Tenant DB inválida para consulta de cuotas")
-            return result
-
-        def _run_scalar(sql: str):
-            env = {**os.environ, "PGPASSWORD": ODOO_DB_PASSWORD or ""}
-            return subprocess.run(
-                [
-                    "psql",
-                    "-h", CT105_IP,
-                    "-p", "5432",
-                    "-U", ODOO_DB_USER,
-                    "-d", tenant_db,
-                    "-t",
-                    "-A",
-                    "-c", sql,
-                ],
-                env=env,
-                capture_output=True,
-                text=True,
-                timeout=5,
-            )
-
-        try:
-            # Websites count
-            r = _run_scalar("SELECT COUNT(*) FROM website;")
-            if r.returncode == 0 and r.stdout.strip():
-                result["websites"] = int(r.stdout.strip())
-
-            # Companies count
-            r2 = _run_scalar("SELECT COUNT(*) FROM res_company;")
-            if r2.returncode == 0 and r2.stdout.strip():
-                result["companies"] = int(r2.stdout.strip())
+            return dict(ODOO_USAGE_DEFAULT)
+        return collect_odoo_usage([tenant_db]).get(tenant_db, dict(ODOO_USAGE_DEFAULT))
 
-            # DB size in MB
-            r3 = _run_scalar("SELECT pg_database_size(current_database()) / 1024 / 1024;")
-            if r3.returncode == 0 and r3.stdout.strip():
-                result["storage_mb"] = int(r3.stdout.strip())
-
-        except Exception as e:
-            logger.warning(f"No se pudo consultar uso Odoo para {tenant_db}: {e}")
-
-        return result
+    def _collect_odoo_usage(self, tenant_dbs: Iterable[str]) -> Dict[str, Dict[str, int]]:
+        """Uso Odoo de varios tenants; punto de extensión para tests y benchmarks."""
+        return collect_odoo_usage(tenant_dbs)
 
     @staticmethod
     def _is_unlimited(resource: str, limit: int) -> bool:
@@ -345,3 +424,69 @@ class QuotaService:
         if resource == "domains":
             return limit == -1
         return limit == 0 or limit == -1
+
+
+# ── Uso Odoo por lotes ────────────────────────────────────────────────────
+
+
+def collect_odoo_usage(tenant_dbs: Iterable[str], host: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+    """
+    Uso Odoo (websites, companies, storage_mb) de varios tenants vía el
+    recolector con pool por nodo (services.odoo_usage); por defecto contra
+    CT105_IP, donde viven todas las BDs de tenants.
+    """
+    return get_odoo_usage_collector().collect(tenant_dbs, host)
+
+
+# ── Caché de la tabla de cuotas ───────────────────────────────────────────
+
+
+def _top_usage(row: Dict[str, Any]) -> float:
+    return max((r.get("percentage") or 0 for r in row["resources"].values()), default=0)
+
+
+_TABLE_SORTS = {
+    "company_name": lambda r: (r.get("company_name") or "").lower(),
+    "plan": lambda r: (r.get("plan_key") or "", (r.get("company_name") or "").lower()),
+    "top_usage": _top_usage,
+}
+
+
+class _QuotaTableCache:
+    """Resumen de cuotas cacheado; un solo cálculo a la vez (los demás esperan el lock)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows: Optional[List[Dict[str, Any]]] = None
+        self._as_of: Optional[datetime] = None
+        self._loaded_at = 0.0
+
+    def _fresh(self) -> bool:
+        from ..config import QUOTA_TABLE_CACHE_SECONDS
+        return self._rows is not None and time.monotonic() - self._loaded_at < QUOTA_TABLE_CACHE_SECONDS
+
+    def get(self, compute, *, refresh: bool = False):
+        requested_at = time.monotonic()
+        if not refresh and self._fresh():
+            return self._rows, self._as_of
+        with self._lock:
+            # Otro request recalculó mientras se esperaba el lock
+            if self._rows is not None and self._loaded_at >= requested_at:
+                return self._rows, self._as_of
+            if refresh or not self._fresh():
+                rows = compute()
+                for row in rows:
+                    row["top_usage_percent"] = _top_usage(row)
+                self._rows = rows
+                self._as_of = datetime.now(timezone.utc).replace(tzinfo=None)
+                self._loaded_at = time.monotonic()
+            return self._rows, self._as_of
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows = None
+            self._as_of = None
+            self._loaded_at = 0.0
+
+
+_quota_table_cache = _QuotaTableCache()
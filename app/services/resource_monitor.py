@@ -1,105 +1,244 @@
 """
 Resource Monitor - Monitoreo de recursos de nodos y contenedores
+
+El escaneo completo consulta nodos y contenedores en paralelo: cada sonda
+SSH corre en un hilo, acotada por un semáforo por nodo
+(RESOURCE_SCAN_PER_NODE_CONCURRENCY) y un timeout por objetivo
+(RESOURCE_SCAN_TIMEOUT_SECONDS). Los resultados se escriben al final en una
+sola transacción (updates en lote + un INSERT de ResourceMetric) y cada
+objetivo reporta su latencia.
 """
 import subprocess
 import logging
 import asyncio
-from datetime import datetime, timedelta, timezone
-from typing import Dict, Any, List, Optional, cast
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Sequence, Tuple, cast
+
+from sqlalchemy import bindparam
 
 from ..models.database import (
     SessionLocal, db_session, ProxmoxNode, LXCContainer, ResourceMetric,
     NodeStatus, ContainerStatus
 )
+from .node_capacity_service import record_node_fields
 
 logger = logging.getLogger(__name__)
 
+# (id, estado, métricas) de una sonda ya resuelta
+_ProbeOutcome = Tuple[Any, str, Optional[Dict[str, float]]]
+
 
 class ResourceMonitor:
     """Monitorea recursos de nodos Proxmox y contenedores LXC"""
-    
+
+    # ── Sondas (síncronas, corren en hilos) ───────────────────────────────
+
+    @staticmethod
+    def _ssh_base(node: ProxmoxNode) -> List[str]:
+        return [
+            "ssh",
+            "-p", str(node.ssh_port),
+            "-o", "ConnectTimeout=5",
+            f"{node.ssh_user}@{node.hostname}",
+        ]
+
+    @classmethod
+    def _probe_node(cls, node: ProxmoxNode) -> Dict[str, float]:
+        """CPU, RAM y disco de un nodo vía SSH. Lanza TimeoutExpired si no responde."""
+        ssh_base = cls._ssh_base(node)
+        # Obtener uso de CPU
+        cpu_cmd = [*ssh_base, "grep 'cpu ' /proc/stat | awk '{usage=($2+$4)*100/($2+$4+$5)} END {print usage}'"]
+
+        # Obtener uso de RAM
+        ram_cmd = [*ssh_base, "free -g | awk 'NR==2{print $3}'"]
+
+        # Obtener uso de disco
+        disk_cmd = [*ssh_base, "df -BG /var/lib/vz | awk 'NR==2{gsub(\"G\",\"\"); print $3}'"]
+
+        # Ejecutar comandos
+        cpu_result = subprocess.run(cpu_cmd, capture_output=True, text=True, timeout=15)
+        ram_result = subprocess.run(ram_cmd, capture_output=True, text=True, timeout=15)
+        disk_result = subprocess.run(disk_cmd, capture_output=True, text=True, timeout=15)
+
+        return {
+            "cpu_percent": float(cpu_result.stdout.strip()) if cpu_result.returncode == 0 else 0,
+            "ram_used_gb": float(ram_result.stdout.strip()) if ram_result.returncode == 0 else 0,
+            "disk_used_gb": float(disk_result.stdout.strip()) if disk_result.returncode == 0 else 0,
+        }
+
+    @classmethod
+    def _probe_container(cls, node: ProxmoxNode, container: LXCContainer) -> Optional[Dict[str, float]]:
+        """Métricas de un contenedor vía pct en su nodo; None si no está corriendo."""
+        cmd = [
+            *cls._ssh_base(node),
+            (
+                f"pct status {container.vmid} && pct exec {container.vmid} -- "
+                "sh -c 'echo CPU:$(cat /proc/loadavg | cut -d\" \" -f1) "
+                "RAM:$(free -m | awk '\\''NR==2{print $3}'\\'') "
+                "DISK:$(df -BM / | awk '\\''NR==2{gsub(\"M\",\"\"); print $3}'\\'')'"
+            ),
+        ]
+
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=15)
+        if result.returncode != 0 or "running" not in result.stdout.lower():
+            return None
+
+        # Parsear salida
+        output = result.stdout
+        cpu_usage = 0.0
+        ram_usage = 0.0
+        disk_usage = 0.0
+
+        if "CPU:" in output:
+            try:
+                cpu_part = output.split("CPU:")[1].split()[0]
+                cpu_cores = int(getattr(container, "cpu_cores", 1) or 1)
+                cpu_usage = float(cpu_part) * 100 / cpu_cores
+            except Exception:
+                pass
+
+        if "RAM:" in output:
+            try:
+                ram_part = output.split("RAM:")[1].split()[0]
+                ram_usage = float(ram_part)
+            except Exception:
+                pass
+
+        if "DISK:" in output:
+            try:
+                disk_part = output.split("DISK:")[1].split()[0]
+                disk_usage = float(disk_part) / 1024  # MB a GB
+            except Exception:
+                pass
+
+        return {"cpu_percent": cpu_usage, "ram_mb": ram_usage, "disk_gb": disk_usage}
+
+    # ── Escritura en lote ─────────────────────────────────────────────────
+
+    @classmethod
+    def _persist(cls, db, nodes: List[_ProbeOutcome], containers: List[_ProbeOutcome]) -> int:
+        """
+        Aplica los resultados de un escaneo: un UPDATE por tipo de cambio
+        (executemany) y un solo INSERT de ResourceMetric. Retorna las métricas
+        insertadas.
+        """
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        node_table = ProxmoxNode.__table__
+        container_table = LXCContainer.__table__
+
+        online, offline, running, stopped, metrics = [], [], [], [], []
+        for nid, status, m in nodes:
+            if status == "online" and m is not None:
+                online.append({
+                    "_id": nid,
+                    "used_cpu_percent": round(float(m["cpu_percent"]), 2),
+                    "used_ram_gb": float(m["ram_used_gb"]),
+                    "used_storage_gb": float(m["disk_used_gb"]),
+                    "last_health_check": now,
+                })
+                metrics.append({
+                    "node_id": nid, "container_id": None, "cpu_percent": float(m["cpu_percent"]),
+                    "ram_mb": float(m["ram_used_gb"]) * 1024, "disk_gb": float(m["disk_used_gb"]),
+                    "recorded_at": now,
+                })
+            elif status in ("timeout", "error"):
+                offline.append({"_id": nid})
+        for cid, status, m in containers:
+            if status == "running" and m is not None:
+                running.append({
+                    "_id": cid,
+                    "cpu_usage_percent": min(100, round(float(m["cpu_percent"]), 2)),
+                    "ram_usage_mb": float(m["ram_mb"]),
+                    "disk_usage_gb": float(m["disk_gb"]),
+                })
+                metrics.append({
+                    "node_id": None, "container_id": cid, "cpu_percent": float(m["cpu_percent"]),
+                    "ram_mb": float(m["ram_mb"]), "disk_gb": float(m["disk_gb"]), "recorded_at": now,
+                })
+            elif status == "stopped":
+                stopped.append({"_id": cid})
+
+        # El modelo de capacidad recibe los cambios de nodo como deltas al commit
+        tracked = {"capacity_tracked": True}
+        if online:
+            db.execute(
+                node_table.update().where(node_table.c.id == bindparam("_id")).values(
+                    used_cpu_percent=bindparam("used_cpu_percent"),
+                    used_ram_gb=bindparam("used_ram_gb"),
+                    used_storage_gb=bindparam("used_storage_gb"),
+                    last_health_check=bindparam("last_health_check"),
+                    status=NodeStatus.online,
+                ),
+                online,
+                execution_options=tracked,
+            )
+            for row in online:
+                record_node_fields(db, row["_id"], {
+                    "used_cpu_percent": row["used_cpu_percent"],
+                    "used_ram_gb": row["used_ram_gb"],
+                    "used_storage_gb": row["used_storage_gb"],
+                    "status": NodeStatus.online,
+                })
+        if offline:
+            db.execute(
+                node_table.update().where(node_table.c.id == bindparam("_id")).values(status=NodeStatus.offline),
+                offline,
+                execution_options=tracked,
+            )
+            for row in offline:
+                record_node_fields(db, row["_id"], {"status": NodeStatus.offline})
+        if running:
+            db.execute(
+                container_table.update().where(container_table.c.id == bindparam("_id")).values(
+                    cpu_usage_percent=bindparam("cpu_usage_percent"),
+                    ram_usage_mb=bindparam("ram_usage_mb"),
+                    disk_usage_gb=bindparam("disk_usage_gb"),
+                    status=ContainerStatus.running,
+                ),
+                running,
+            )
+        if stopped:
+            db.execute(
+                container_table.update().where(container_table.c.id == bindparam("_id")).values(
+                    status=ContainerStatus.stopped,
+                ),
+                stopped,
+            )
+
+        if metrics:
+            db.execute(ResourceMetric.__table__.insert(), metrics)
+        db.commit()
+        return len(metrics)
+
+    # ── Objetivos individuales ────────────────────────────────────────────
+
     @classmethod
     async def update_node_metrics(cls, node: ProxmoxNode) -> Dict[str, Any]:
         """Actualiza métricas de un nodo específico"""
         try:
-            # Obtener uso de CPU
-            ssh_base = [
-                "ssh",
-                "-p", str(node.ssh_port),
-                "-o", "ConnectTimeout=5",
-                f"{node.ssh_user}@{node.hostname}",
-            ]
-            cpu_cmd = [*ssh_base, "grep 'cpu ' /proc/stat | awk '{usage=($2+$4)*100/($2+$4+$5)} END {print usage}'"]
-            
-            # Obtener uso de RAM
-            ram_cmd = [*ssh_base, "free -g | awk 'NR==2{print $3}'"]
-            
-            # Obtener uso de disco
-            disk_cmd = [*ssh_base, "df -BG /var/lib/vz | awk 'NR==2{gsub(\"G\",\"\"); print $3}'"]
-            
-            # Ejecutar comandos
-            cpu_result = subprocess.run(cpu_cmd, capture_output=True, text=True, timeout=15)
-            ram_result = subprocess.run(ram_cmd, capture_output=True, text=True, timeout=15)
-            disk_result = subprocess.run(disk_cmd, capture_output=True, text=True, timeout=15)
-            
-            cpu_percent = float(cpu_result.stdout.strip()) if cpu_result.returncode == 0 else 0
-            ram_used = float(ram_result.stdout.strip()) if ram_result.returncode == 0 else 0
-            disk_used = float(disk_result.stdout.strip()) if disk_result.returncode == 0 else 0
-            
-            # Actualizar en BD (usar update para evitar conflictos con tipos de Column)
-            with db_session() as db:
-                db_node = db.query(ProxmoxNode).filter_by(id=node.id).first()
-                if db_node:
-                    nid = getattr(db_node, "id")
-                    db.query(ProxmoxNode).filter_by(id=nid).update({
-                        ProxmoxNode.used_cpu_percent: round(float(cpu_percent), 2),
-                        ProxmoxNode.used_ram_gb: float(ram_used),
-                        ProxmoxNode.used_storage_gb: float(disk_used),
-                        ProxmoxNode.last_health_check: datetime.now(timezone.utc).replace(tzinfo=None),
-                        ProxmoxNode.status: NodeStatus.online,
-                    })
-
-                    # Guardar métrica histórica
-                    metric = ResourceMetric(
-                        node_id=nid,
-                        cpu_percent=float(cpu_percent),
-                        ram_mb=float(ram_used) * 1024,
-                        disk_gb=float(disk_used)
-                    )
-                    db.add(metric)
-                    db.commit()
-
-                return {
-                    "node": getattr(node, "name", None),
-                    "status": "online",
-                    "cpu_percent": cpu_percent,
-                    "ram_used_gb": ram_used,
-                    "disk_used_gb": disk_used
-                }
-                
+            metrics = await asyncio.to_thread(cls._probe_node, node)
         except subprocess.TimeoutExpired:
-            nid = getattr(node, "id", None)
-            if nid is not None:
-                cls._mark_node_offline(nid)
+            cls._persist_single(nodes=[(node.id, "timeout", None)])
             return {"node": node.name, "status": "timeout"}
         except Exception as e:
             logger.error(f"Error monitoreando nodo {node.name}: {e}")
-            nid = getattr(node, "id", None)
-            if nid is not None:
-                cls._mark_node_offline(nid)
+            cls._persist_single(nodes=[(node.id, "error", None)])
             return {"node": node.name, "status": "error", "error": str(e)}
-    
+
+        cls._persist_single(nodes=[(node.id, "online", metrics)])
+        return {"node": getattr(node, "name", None), "status": "online", **metrics}
+
+    @classmethod
+    def _persist_single(cls, nodes: Sequence[_ProbeOutcome] = (), containers: Sequence[_ProbeOutcome] = ()):
+        with db_session() as db:
+            cls._persist(db, list(nodes), list(containers))
+
     @classmethod
     def _mark_node_offline(cls, node_id: Any):
         """Marca un nodo como offline"""
-        with db_session() as db:
-            # Usar update para evitar problemas de tipado en analizadores estáticos
-            updated = db.query(ProxmoxNode).filter_by(id=node_id).update({
-                ProxmoxNode.status: NodeStatus.offline
-            })
-            if updated:
-                db.commit()
-    
+        cls._persist_single(nodes=[(node_id, "error", None)])
+
     @classmethod
     async def update_container_metrics(cls, container: LXCContainer) -> Dict[str, Any]:
         """Actualiza métricas de un contenedor específico"""
@@ -107,125 +246,116 @@ class ResourceMonitor:
             node = container.node
             if not node or node.status != NodeStatus.online:
                 return {"container": container.hostname, "status": "node_offline"}
-            
-            # Obtener métricas via pct
-            cmd = [
-                "ssh",
-                "-p", str(node.ssh_port),
-                "-o", "ConnectTimeout=5",
-                f"{node.ssh_user}@{node.hostname}",
-                (
-                    f"pct status {container.vmid} && pct exec {container.vmid} -- "
-                    "sh -c 'echo CPU:$(cat /proc/loadavg | cut -d\" \" -f1) "
-                    "RAM:$(free -m | awk '\\''NR==2{print $3}'\\'') "
-                    "DISK:$(df -BM / | awk '\\''NR==2{gsub(\"M\",\"\"); print $3}'\\'')'"
-                ),
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=15)
-            
-            if result.returncode == 0 and "running" in result.stdout.lower():
-                # Parsear salida
-                output = result.stdout
-                
-                cpu_usage = 0
-                ram_usage = 0
-                disk_usage = 0
-                
-                if "CPU:" in output:
-                    try:
-                        cpu_part = output.split("CPU:")[1].split()[0]
-                        cpu_cores = int(getattr(container, "cpu_cores", 1) or 1)
-                        cpu_usage = float(cpu_part) * 100 / cpu_cores
-                    except Exception:
-                        pass
-                
-                if "RAM:" in output:
-                    try:
-                        ram_part = output.split("RAM:")[1].split()[0]
-                        ram_usage = float(ram_part)
-                    except Exception:
-                        pass
-                
-                if "DISK:" in output:
-                    try:
-                        disk_part = output.split("DISK:")[1].split()[0]
-                        disk_usage = float(disk_part) / 1024  # MB a GB
-                    except Exception:
-                        pass
-                
-                # Actualizar en BD (usar update para evitar conflictos de tipado)
-                with db_session() as db:
-                    db_container = db.query(LXCContainer).filter_by(id=container.id).first()
-                    if db_container:
-                        cid = getattr(db_container, "id")
-                        db.query(LXCContainer).filter_by(id=cid).update({
-                            LXCContainer.cpu_usage_percent: min(100, round(float(cpu_usage), 2)),
-                            LXCContainer.ram_usage_mb: float(ram_usage),
-                            LXCContainer.disk_usage_gb: float(disk_usage),
-                            LXCContainer.status: ContainerStatus.running,
-                        })
-
-                        # Guardar métrica histórica
-                        metric = ResourceMetric(
-                            container_id=cid,
-                            cpu_percent=float(cpu_usage),
-                            ram_mb=float(ram_usage),
-                            disk_gb=float(disk_usage)
-                        )
-                        db.add(metric)
-                        db.commit()
-                
-                return {
-                    "container": container.hostname,
-                    "status": "running",
-                    "cpu_percent": cpu_usage,
-                    "ram_mb": ram_usage,
-                    "disk_gb": disk_usage
-                }
-            else:
-                # Contenedor no está corriendo
-                with db_session() as db:
-                    db.query(LXCContainer).filter_by(id=container.id).update({
-                        LXCContainer.status: ContainerStatus.stopped
-                    })
-                    db.commit()
-                
-                return {"container": container.hostname, "status": "stopped"}
-                
+
+            metrics = await asyncio.to_thread(cls._probe_container, node, container)
         except Exception as e:
             logger.error(f"Error monitoreando contenedor {container.hostname}: {e}")
             return {"container": container.hostname, "status": "error", "error": str(e)}
-    
+
+        if metrics is None:
+            # Contenedor no está corriendo
+            cls._persist_single(containers=[(container.id, "stopped", None)])
+            return {"container": container.hostname, "status": "stopped"}
+
+        cls._persist_single(containers=[(container.id, "running", metrics)])
+        return {"container": container.hostname, "status": "running", **metrics}
+
+    # ── Escaneo completo ──────────────────────────────────────────────────
+
     @classmethod
-    async def run_full_scan(cls) -> Dict[str, Any]:
-        """Ejecuta un escaneo completo de todos los nodos y contenedores"""
+    async def run_full_scan(
+        cls,
+        per_node_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Escaneo completo de nodos y contenedores en paralelo. Los contenedores
+        de un nodo se consultan solo si el nodo respondió; un nodo lento solo
+        retrasa a sus propios contenedores.
+        """
+        from ..config import RESOURCE_SCAN_PER_NODE_CONCURRENCY, RESOURCE_SCAN_TIMEOUT_SECONDS
+
+        per_node = max(1, per_node_concurrency or RESOURCE_SCAN_PER_NODE_CONCURRENCY)
+        timeout = timeout or RESOURCE_SCAN_TIMEOUT_SECONDS
+        started = time.perf_counter()
+
         db = SessionLocal()
         try:
-            nodes = db.query(ProxmoxNode).all()
-            
-            node_results = []
-            container_results = []
-            
-            for node in nodes:
-                # Actualizar métricas del nodo
-                node_result = await cls.update_node_metrics(node)
-                node_results.append(node_result)
-                
-                # Si el nodo está online, actualizar sus contenedores
-                if node_result.get("status") == "online":
-                    containers = db.query(LXCContainer).filter_by(node_id=node.id).all()
-                    for container in containers:
-                        container_result = await cls.update_container_metrics(container)
-                        container_results.append(container_result)
-            
+            nodes = db.query(ProxmoxNode).order_by(ProxmoxNode.id).all()
+            containers_by_node: Dict[Any, List[LXCContainer]] = {}
+            for container in db.query(LXCContainer).filter(
+                LXCContainer.node_id.in_([n.id for n in nodes]),
+            ).order_by(LXCContainer.id):
+                containers_by_node.setdefault(container.node_id, []).append(container)
+
+            def _release(semaphore: asyncio.Semaphore, future: asyncio.Future):
+                if not future.cancelled():
+                    future.exception()  # una sonda abandonada por timeout no deja error sin leer
+                semaphore.release()
+
+            async def _probe(semaphore: asyncio.Semaphore, fn, *args):
+                # El hilo SSH/API no se puede cancelar: el cupo del nodo se libera
+                # cuando el hilo termina, no cuando vence el timeout
+                await semaphore.acquire()
+                probe_started = time.perf_counter()
+                future = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+                future.add_done_callback(lambda done: _release(semaphore, done))
+                try:
+                    value = await asyncio.wait_for(asyncio.shield(future), timeout)
+                    outcome = "ok"
+                except (asyncio.TimeoutError, subprocess.TimeoutExpired):
+                    value, outcome = None, "timeout"
+                except Exception as e:
+                    value, outcome = e, "error"
+                return outcome, value, round((time.perf_counter() - probe_started) * 1000, 1)
+
+            async def _scan_container(semaphore, node, container):
+                outcome, value, latency_ms = await _probe(semaphore, cls._probe_container, node, container)
+                result = {"container": container.hostname, "latency_ms": latency_ms}
+                if outcome == "ok" and value is None:
+                    return (container.id, "stopped", None), {**result, "status": "stopped"}
+                if outcome == "ok":
+                    return (container.id, "running", value), {**result, "status": "running", **value}
+                if outcome == "error":
+                    logger.error(f"Error monitoreando contenedor {container.hostname}: {value}")
+                    return (container.id, "error", None), {**result, "status": "error", "error": str(value)}
+                return (container.id, "timeout", None), {**result, "status": "timeout"}
+
+            async def _scan_node(node):
+                semaphore = asyncio.Semaphore(per_node)
+                outcome, value, latency_ms = await _probe(semaphore, cls._probe_node, node)
+                result = {"node": node.name, "latency_ms": latency_ms}
+                if outcome == "timeout":
+                    return (node.id, "timeout", None), {**result, "status": "timeout"}, []
+                if outcome == "error":
+                    logger.error(f"Error monitoreando nodo {node.name}: {value}")
+                    return (node.id, "error", None), {**result, "status": "error", "error": str(value)}, []
+                scanned = await asyncio.gather(*[
+                    _scan_container(semaphore, node, container)
+                    for container in containers_by_node.get(node.id, [])
+                ])
+                return (node.id, "online", value), {**result, "status": "online", **value}, scanned
+
+            scans = await asyncio.gather(*[_scan_node(node) for node in nodes])
+
+            node_outcomes = [outcome for outcome, _, _ in scans]
+            container_outcomes = [outcome for _, _, scanned in scans for outcome, _ in scanned]
+            metrics_written = cls._persist(db, node_outcomes, container_outcomes)
+
+            node_results = [result for _, result, _ in scans]
+            container_results = [result for _, _, scanned in scans for _, result in scanned]
             return {
                 "timestamp": datetime.now(timezone.utc).replace(tzinfo=None).isoformat(),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
                 "nodes_scanned": len(node_results),
                 "containers_scanned": len(container_results),
+                "metrics_written": metrics_written,
                 "node_results": node_results,
                 "container_results": container_results
             }
+        except Exception:
+            db.rollback()
+            raise
         finally:
             db.close()
     
@@ -318,49 +448,52 @@ class ResourceMonitor:
         cls,
         node_id: Optional[int] = None,
         container_id: Optional[int] = None,
-        hours: int = 24
+        hours: int = 24,
+        points: Optional[int] = None,
+        resolution: str = "auto",
     ) -> List[Dict[str, Any]]:
-        """Obtiene métricas históricas para gráficos"""
+        """
+        Obtiene métricas históricas para gráficos: crudas o desde rollups
+        según la ventana, reducidas a `points` con LTTB.
+        """
+        return cls.get_metric_series(node_id, container_id, hours, points, resolution)["data"]
+
+    @classmethod
+    def get_metric_series(
+        cls,
+        node_id: Optional[int] = None,
+        container_id: Optional[int] = None,
+        hours: int = 24,
+        points: Optional[int] = None,
+        resolution: str = "auto",
+        metric: str = "cpu_percent",
+    ) -> Dict[str, Any]:
+        """Serie histórica con la resolución elegida (ver services.resource_rollups)."""
+        from .resource_rollups import get_metric_series
+
         db = SessionLocal()
         try:
-            since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=hours)
-            
-            query = db.query(ResourceMetric).filter(
-                ResourceMetric.recorded_at >= since
-            )
-            
-            if node_id:
-                query = query.filter(ResourceMetric.node_id == node_id)
-            if container_id:
-                query = query.filter(ResourceMetric.container_id == container_id)
-            
-            metrics = query.order_by(ResourceMetric.recorded_at.asc()).all()
-            
-            return [
-                {
-                    "timestamp": m.recorded_at.isoformat(),
-                    "cpu_percent": m.cpu_percent,
-                    "ram_mb": m.ram_mb,
-                    "disk_gb": m.disk_gb,
-                    "network_in_mb": m.network_in_mb,
-                    "network_out_mb": m.network_out_mb
-                }
-                for m in metrics
-            ]
+            return get_metric_series(db, node_id, container_id, hours, points, resolution, metric)
         finally:
             db.close()
-    
+
     @classmethod
-    def cleanup_old_metrics(cls, days: int = 30):
-        """Limpia métricas antiguas"""
+    def cleanup_old_metrics(cls, days: Optional[int] = None):
+        """
+        Cierra los rollups pendientes y aplica la retención de cada nivel;
+        `days` reemplaza la retención de las muestras crudas.
+        """
+        from .resource_rollups import purge_resource_metrics, rollup_resource_metrics
+
         db = SessionLocal()
         try:
-            cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
-            deleted = db.query(ResourceMetric).filter(
-                ResourceMetric.recorded_at < cutoff
-            ).delete()
+            rollup_resource_metrics(db)
+            deleted = purge_resource_metrics(db, raw_days=days)
             db.commit()
-            logger.info(f"Eliminadas {deleted} métricas antiguas")
-            return deleted
+            logger.info(f"Eliminadas métricas antiguas por nivel: {deleted}")
+            return deleted.get("raw", 0)
+        except Exception:
+            db.rollback()
+            raise
         finally:
             db.close()
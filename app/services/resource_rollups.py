@@ -0,0 +1,311 @@
+"""
+Resource Rollups — historial de métricas de nodos/contenedores por resolución.
+
+- rollup_resource_metrics() cierra los buckets de 5m, 1h y 1d pendientes
+  desde la última corrida (marca de agua = último bucket guardado por
+  resolución) y calcula min/avg/max/p95 desde las muestras crudas. Cada
+  ventana se reemplaza completa, así que re-ejecutar es idempotente.
+- get_metric_series() elige la resolución según la ventana pedida y la
+  retención de cada nivel, completa el tramo aún no cerrado con las muestras
+  crudas y reduce a un presupuesto de puntos con LTTB.
+  En PostgreSQL las corridas concurrentes (varios workers) se serializan con
+  un advisory lock de transacción; ux_resource_rollups_target_bucket impide
+  duplicar un bucket.
+- purge_resource_metrics() aplica la retención de cada nivel: las muestras
+  crudas se purgan pronto sin perder el historial largo.
+"""
+import logging
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, delete, func, select, text
+from sqlalchemy.orm import Session
+
+from ..models.database import ResourceMetric, ResourceMetricRollup
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_STEPS = {
+    "5m": timedelta(minutes=5),
+    "1h": timedelta(hours=1),
+    "1d": timedelta(days=1),
+}
+RESOLUTIONS = ("raw", *ROLLUP_STEPS)
+METRICS = ("cpu_percent", "ram_mb", "disk_gb")
+# Ventana máxima (horas) que sirve cada resolución en modo auto
+_AUTO_MAX_HOURS = {"raw": 6, "5m": 72, "1h": 24 * 90, "1d": math.inf}
+# Tamaño de cada lote de muestras crudas al cerrar buckets
+_ROLLUP_CHUNK = {"5m": timedelta(days=1), "1h": timedelta(days=1), "1d": timedelta(days=7)}
+
+_SampleRow = Tuple[Optional[int], Optional[int], datetime, Optional[float], Optional[float], Optional[float]]
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def bucket_start(value: datetime, resolution: str) -> datetime:
+    """Inicio del bucket de `resolution` que contiene `value`."""
+    if resolution == "5m":
+        return value.replace(minute=value.minute - value.minute % 5, second=0, microsecond=0)
+    if resolution == "1h":
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _retention_days() -> Dict[str, int]:
+    from ..config import (
+        RESOURCE_METRIC_1D_RETENTION_DAYS, RESOURCE_METRIC_1H_RETENTION_DAYS,
+        RESOURCE_METRIC_5M_RETENTION_DAYS, RESOURCE_METRIC_RAW_RETENTION_DAYS,
+    )
+    return {
+        "raw": RESOURCE_METRIC_RAW_RETENTION_DAYS,
+        "5m": RESOURCE_METRIC_5M_RETENTION_DAYS,
+        "1h": RESOURCE_METRIC_1H_RETENTION_DAYS,
+        "1d": RESOURCE_METRIC_1D_RETENTION_DAYS,
+    }
+
+
+# ── Agregación ────────────────────────────────────────────────────────────
+
+
+def _summary(values: List[float]) -> Tuple[float, float, float, float]:
+    """min, avg, max y p95 (nearest-rank) de una lista no vacía."""
+    ordered = sorted(values)
+    p95 = ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+    return ordered[0], sum(ordered) / len(ordered), ordered[-1], p95
+
+
+def _rollup_rows(samples: Iterable[_SampleRow], resolution: str) -> List[Dict[str, Any]]:
+    """Agrupa muestras crudas por (bucket, nodo, contenedor) en filas de rollup."""
+    groups: Dict[tuple, List[_SampleRow]] = defaultdict(list)
+    for sample in samples:
+        groups[(bucket_start(sample[2], resolution), sample[0], sample[1])].append(sample)
+
+    rows = []
+    for (start, node_id, container_id), group in sorted(groups.items(), key=lambda item: item[0][0]):
+        row: Dict[str, Any] = {
+            "resolution": resolution, "bucket_start": start, "node_id": node_id,
+            "container_id": container_id, "samples": len(group),
+        }
+        for position, metric in enumerate(METRICS, start=3):
+            values = [s[position] for s in group if s[position] is not None]
+            stats = _summary(values) if values else (None, None, None, None)
+            for suffix, value in zip(("min", "avg", "max", "p95"), stats):
+                row[f"{metric}_{suffix}"] = value
+        rows.append(row)
+    return rows
+
+
+def _samples(db: Session, start: datetime, end: datetime, *criteria) -> List[_SampleRow]:
+    return db.execute(
+        select(
+            ResourceMetric.node_id, ResourceMetric.container_id, ResourceMetric.recorded_at,
+            ResourceMetric.cpu_percent, ResourceMetric.ram_mb, ResourceMetric.disk_gb,
+        )
+        .where(ResourceMetric.recorded_at >= start, ResourceMetric.recorded_at < end, *criteria)
+        .order_by(ResourceMetric.recorded_at)
+    ).all()
+
+
+def _next_sample_bucket(db: Session, start: datetime, resolution: str) -> Optional[datetime]:
+    first = db.scalar(select(func.min(ResourceMetric.recorded_at)).where(ResourceMetric.recorded_at >= start))
+    return bucket_start(first, resolution) if first else None
+
+
+def _watermark(db: Session, resolution: str) -> Optional[datetime]:
+    """Inicio del primer bucket aún no cerrado para `resolution` (None si no hay rollups)."""
+    last = db.scalar(
+        select(func.max(ResourceMetricRollup.bucket_start)).where(ResourceMetricRollup.resolution == resolution)
+    )
+    return last + ROLLUP_STEPS[resolution] if last else None
+
+
+def rollup_resource_metrics(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Cierra los buckets completos pendientes de cada resolución. Salta los
+    huecos sin muestras. No hace commit. Retorna filas escritas por resolución.
+    """
+    now = now or _utcnow()
+    if db.get_bind().dialect.name == "postgresql":
+        # Hasta el commit: el siguiente worker ve la marca de agua ya avanzada
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext('resource_metric_rollups'))"))
+    written = {}
+    for resolution in ROLLUP_STEPS:
+        end = bucket_start(now, resolution)
+        start = _watermark(db, resolution) or datetime.min
+        count = 0
+        while start < end:
+            start = _next_sample_bucket(db, start, resolution)
+            if start is None or start >= end:
+                break
+            chunk_end = min(end, bucket_start(start + _ROLLUP_CHUNK[resolution], resolution))
+            rows = _rollup_rows(_samples(db, start, chunk_end), resolution)
+            db.execute(
+                delete(ResourceMetricRollup).where(
+                    ResourceMetricRollup.resolution == resolution,
+                    ResourceMetricRollup.bucket_start >= start,
+                    ResourceMetricRollup.bucket_start < chunk_end,
+                )
+            )
+            if rows:
+                db.execute(ResourceMetricRollup.__table__.insert(), rows)
+            count += len(rows)
+            start = chunk_end
+        written[resolution] = count
+    return written
+
+
+def purge_resource_metrics(db: Session, now: Optional[datetime] = None, raw_days: Optional[int] = None) -> Dict[str, int]:
+    """
+    Retención por nivel (0 = sin límite). Las muestras crudas solo se borran
+    hasta el inicio del día en curso: lo anterior ya está en los rollups si
+    rollup_resource_metrics corrió antes. No hace commit.
+    """
+    now = now or _utcnow()
+    retention = _retention_days()
+    if raw_days is not None:
+        retention["raw"] = raw_days
+
+    deleted = {}
+    if retention["raw"]:
+        cutoff = min(now - timedelta(days=retention["raw"]), bucket_start(now, "1d"))
+        result = db.execute(delete(ResourceMetric).where(ResourceMetric.recorded_at < cutoff))
+        deleted["raw"] = result.rowcount or 0
+    for resolution in ROLLUP_STEPS:
+        if not retention[resolution]:
+            continue
+        result = db.execute(
+            delete(ResourceMetricRollup).where(
+                ResourceMetricRollup.resolution == resolution,
+                ResourceMetricRollup.bucket_start < now - timedelta(days=retention[resolution]),
+            )
+        )
+        deleted[resolution] = result.rowcount or 0
+    return deleted
+
+
+# ── Series para gráficos ──────────────────────────────────────────────────
+
+
+def choose_resolution(hours: float) -> str:
+    """Resolución más fina que cubre la ventana sin exceder su retención."""
+    retention = _retention_days()
+    for resolution in RESOLUTIONS:
+        days = retention[resolution]
+        if hours <= _AUTO_MAX_HOURS[resolution] and (not days or hours <= days * 24):
+            return resolution
+    return "1d"
+
+
+def lttb(rows: Sequence[Any], threshold: int, x: Callable[[Any], float], y: Callable[[Any], float]) -> List[Any]:
+    """
+    Largest-Triangle-Three-Buckets: reduce `rows` (ordenadas por x) a
+    `threshold` puntos conservando primero, último y la forma de la curva.
+    """
+    n = len(rows)
+    if threshold >= n or n <= 2:
+        return list(rows)
+    if threshold < 3:
+        return [rows[0], rows[-1]][:max(threshold, 1)]
+
+    sampled = [rows[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(x(rows[j]) for j in range(avg_start, avg_end)) / (avg_end - avg_start)
+        avg_y = sum(y(rows[j]) for j in range(avg_start, avg_end)) / (avg_end - avg_start)
+
+        ax, ay = x(rows[a]), y(rows[a])
+        best_area, best = -1.0, int(i * every) + 1
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (y(rows[j]) - ay) - (ax - x(rows[j])) * (avg_y - ay))
+            if area > best_area:
+                best_area, best = area, j
+        sampled.append(rows[best])
+        a = best
+    sampled.append(rows[-1])
+    return sampled
+
+
+def _raw_point(m) -> Dict[str, Any]:
+    return {
+        "timestamp": m.recorded_at.isoformat(),
+        "cpu_percent": m.cpu_percent,
+        "ram_mb": m.ram_mb,
+        "disk_gb": m.disk_gb,
+        "network_in_mb": m.network_in_mb,
+        "network_out_mb": m.network_out_mb,
+    }
+
+
+def _rollup_point(row: Dict[str, Any]) -> Dict[str, Any]:
+    point: Dict[str, Any] = {"timestamp": row["bucket_start"].isoformat(), "samples": row["samples"]}
+    for metric in METRICS:
+        point[metric] = row[f"{metric}_avg"]
+        for suffix in ("min", "max", "p95"):
+            point[f"{metric}_{suffix}"] = row[f"{metric}_{suffix}"]
+    point["network_in_mb"] = point["network_out_mb"] = None
+    return point
+
+
+def get_metric_series(
+    db: Session,
+    node_id: Optional[int] = None,
+    container_id: Optional[int] = None,
+    hours: float = 24,
+    points: Optional[int] = None,
+    resolution: str = "auto",
+    metric: str = "cpu_percent",
+) -> Dict[str, Any]:
+    """
+    Serie histórica de un nodo/contenedor. resolution: auto | raw | 5m | 1h | 1d.
+    `points` acota la respuesta con LTTB sobre `metric`. ValueError si
+    resolution o metric no son válidos.
+    """
+    if resolution != "auto" and resolution not in RESOLUTIONS:
+        raise ValueError(f"resolution inválida: {resolution}")
+    if metric not in METRICS:
+        raise ValueError(f"metric inválida: {metric}")
+    if resolution == "auto":
+        resolution = choose_resolution(hours)
+
+    since = _utcnow() - timedelta(hours=hours)
+    if resolution == "raw":
+        query = db.query(ResourceMetric).filter(ResourceMetric.recorded_at >= since)
+        if node_id:
+            query = query.filter(ResourceMetric.node_id == node_id)
+        if container_id:
+            query = query.filter(ResourceMetric.container_id == container_id)
+        data = [_raw_point(m) for m in query.order_by(ResourceMetric.recorded_at.asc()).all()]
+    else:
+        first_bucket = bucket_start(since, resolution)
+        filters = [ResourceMetricRollup.resolution == resolution, ResourceMetricRollup.bucket_start >= first_bucket]
+        raw_filters = []
+        if node_id:
+            filters.append(ResourceMetricRollup.node_id == node_id)
+            raw_filters.append(ResourceMetric.node_id == node_id)
+        if container_id:
+            filters.append(ResourceMetricRollup.container_id == container_id)
+            raw_filters.append(ResourceMetric.container_id == container_id)
+
+        table = ResourceMetricRollup.__table__
+        stored = db.execute(
+            select(table).where(and_(*filters)).order_by(table.c.bucket_start, table.c.id)
+        ).mappings().all()
+        # Tramo todavía sin cerrar: se agrega al vuelo desde las muestras crudas
+        tail_from = max(_watermark(db, resolution) or first_bucket, first_bucket)
+        tail = _rollup_rows(_samples(db, tail_from, datetime.max, *raw_filters), resolution)
+        data = [_rollup_point(row) for row in [*stored, *tail]]
+
+    if points and len(data) > points:
+        data = lttb(
+            data, points,
+            x=lambda p: datetime.fromisoformat(p["timestamp"]).timestamp(),
+            y=lambda p: p.get(metric) or 0.0,
+        )
+    return {"resolution": resolution, "points": len(data), "data": data}
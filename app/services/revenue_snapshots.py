@@ -0,0 +1,399 @@
+"""
+Revenue — Fotos diarias de MRR/ARR (revenue_daily_snapshots).
+
+capture_revenue_snapshot() guarda el estado del día con el pricing efectivo
+(pricing por conjuntos) agregado por plan, partner, estado y cohorte de alta
+del cliente. backfill_revenue_snapshots() reconstruye días pasados:
+- existencia: la suscripción se creó antes del fin del día;
+- estado: no hay historial de estados, así que una suscripción cancelada
+  cuenta como activa hasta su updated_at (momento de la cancelación) y las
+  demás conservan su estado actual;
+- asientos: high-water mark del día (o el último anterior); si no hay, user_count;
+- MRR: subtotal de la factura de suscripción emitida cuyo período cubre el
+  día; si no hay, el precio efectivo con los asientos de ese día.
+
+Comparaciones, tendencias y cohortes se responden con rangos de días sobre
+las fotos (get_mrr_on, get_revenue_series, get_cohort_retention) en vez de
+estimar a partir del estado actual.
+"""
+import bisect
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from ..models.database import (
+    Customer, Invoice, InvoiceStatus, InvoiceType, RevenueDailySnapshot, SeatHighWater,
+    Subscription, SubscriptionStatus,
+)
+from .pricing import PricingCatalog, build_catalog_snapshot, load_subscription_pricing_rows, subscription_price
+from .stripe_sync import JETURING_INTERNAL_EMAILS
+
+logger = logging.getLogger(__name__)
+
+DIRECT_PARTNER_ID = 0
+# Estados que suman al MRR reportado (mismo criterio que /billing/metrics)
+MRR_STATUSES = (SubscriptionStatus.active.value,)
+_BILLED_INVOICE_STATUSES = (InvoiceStatus.issued, InvoiceStatus.paid, InvoiceStatus.overdue)
+# Cuánto antes del rango se buscan high-water marks para arrastrar el último conocido
+_HWM_CARRY_DAYS = 35
+_GROUP_COLUMNS = {
+    "plan": RevenueDailySnapshot.plan_name,
+    "partner": RevenueDailySnapshot.partner_id,
+    "status": RevenueDailySnapshot.status,
+    "cohort": RevenueDailySnapshot.cohort_month,
+}
+
+_CellKey = tuple[str, int, str, str]
+
+
+def _day(value: Optional[datetime] = None) -> datetime:
+    value = value or datetime.now(timezone.utc).replace(tzinfo=None)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _billable_criteria() -> tuple:
+    return (Customer.is_admin_account == False, ~Customer.email.in_(JETURING_INTERNAL_EMAILS))
+
+
+def _cohort_month(sub: Subscription, customer: Optional[Customer]) -> str:
+    created = (customer.created_at if customer else None) or sub.created_at
+    return created.strftime("%Y-%m") if created else ""
+
+
+class _Cells:
+    """Acumula suscripciones de un día por (plan, partner, estado, cohorte)."""
+
+    def __init__(self):
+        self._cells: dict[_CellKey, dict[str, Any]] = {}
+
+    def add(self, sub: Subscription, snapshot: dict, status: str, mrr: float) -> None:
+        customer = snapshot["customer"]
+        plan = snapshot["plan"]
+        key = (
+            plan.name if plan else sub.plan_name,
+            snapshot["partner_id"] or DIRECT_PARTNER_ID,
+            status,
+            _cohort_month(sub, customer),
+        )
+        cell = self._cells.get(key)
+        if cell is None:
+            cell = self._cells[key] = {"subscriptions": 0, "customers": set(), "seats": 0, "mrr": 0.0}
+        cell["subscriptions"] += 1
+        cell["customers"].add(sub.customer_id)
+        cell["seats"] += int(snapshot["user_count"])
+        cell["mrr"] += float(mrr)
+
+    def rows(self, day: datetime, source: str) -> list[dict[str, Any]]:
+        captured_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        return [
+            {
+                "day": day, "plan_name": plan_name, "partner_id": partner_id, "status": status,
+                "cohort_month": cohort, "subscriptions": cell["subscriptions"],
+                "customers": len(cell["customers"]), "seats": cell["seats"],
+                "mrr": round(cell["mrr"], 2), "source": source, "captured_at": captured_at,
+            }
+            for (plan_name, partner_id, status, cohort), cell in self._cells.items()
+        ]
+
+
+def _lock_snapshots(db: Session) -> None:
+    """
+    En PostgreSQL serializa capturas y backfills concurrentes (varios workers
+    del scheduler) hasta el commit: sin esto, dos borrados+inserciones del
+    mismo día chocan en uq_revenue_snapshot_cell.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext('revenue_daily_snapshots'))"))
+
+
+def _replace_days(db: Session, days: Iterable[datetime], rows: list[dict[str, Any]]) -> int:
+    days = list(days)
+    if days:
+        db.execute(delete(RevenueDailySnapshot).where(RevenueDailySnapshot.day.in_(days)))
+    if rows:
+        db.execute(insert(RevenueDailySnapshot), rows)
+    return len(rows)
+
+
+def capture_revenue_snapshot(
+    db: Session,
+    day: Optional[datetime] = None,
+    *,
+    catalog: Optional[PricingCatalog] = None,
+) -> int:
+    """
+    Foto del día con el pricing efectivo actual. Reemplaza las filas del día
+    (se puede correr varias veces; gana la última). No hace commit.
+    Retorna las celdas escritas.
+    """
+    day = _day(day)
+    _lock_snapshots(db)
+    catalog = catalog or PricingCatalog.load(db)
+    cells = _Cells()
+    for row in load_subscription_pricing_rows(
+        db, Subscription.status != SubscriptionStatus.cancelled, *_billable_criteria()
+    ):
+        sub = row[0]
+        snapshot = build_catalog_snapshot(catalog, row)
+        status = (sub.status or SubscriptionStatus.pending).value
+        cells.add(sub, snapshot, status, subscription_price(snapshot))
+    return _replace_days(db, [day], cells.rows(day, "live"))
+
+
+def _load_high_water(db: Session, first_day: datetime, end: datetime) -> dict[int, tuple[list, list]]:
+    """{subscription_id: (días ordenados, hwm)} desde un mes antes del rango."""
+    rows = db.execute(
+        select(SeatHighWater.subscription_id, SeatHighWater.period_date, SeatHighWater.hwm_count)
+        .where(
+            SeatHighWater.period_date >= first_day - timedelta(days=_HWM_CARRY_DAYS),
+            SeatHighWater.period_date < end,
+        )
+        .order_by(SeatHighWater.subscription_id, SeatHighWater.period_date)
+    ).all()
+    marks: dict[int, tuple[list, list]] = {}
+    for subscription_id, period_date, hwm_count in rows:
+        days, counts = marks.setdefault(subscription_id, ([], []))
+        days.append(_day(period_date))
+        counts.append(hwm_count)
+    return marks
+
+
+def _load_billed_periods(db: Session, first_day: datetime, end: datetime) -> dict[int, list[tuple]]:
+    """{subscription_id: [(period_start, period_end, subtotal)]} de facturas de suscripción emitidas."""
+    rows = db.execute(
+        select(Invoice.subscription_id, Invoice.period_start, Invoice.period_end, Invoice.subtotal)
+        .where(
+            Invoice.invoice_type == InvoiceType.SUBSCRIPTION,
+            Invoice.status.in_(_BILLED_INVOICE_STATUSES),
+            Invoice.subscription_id.isnot(None),
+            Invoice.period_start < end,
+            Invoice.period_end > first_day,
+        )
+        .order_by(Invoice.subscription_id, Invoice.period_start)
+    ).all()
+    periods: dict[int, list[tuple]] = defaultdict(list)
+    for subscription_id, period_start, period_end, subtotal in rows:
+        periods[subscription_id].append((period_start, period_end, float(subtotal or 0)))
+    return periods
+
+
+def _status_on(sub: Subscription, day_end: datetime) -> Optional[str]:
+    if sub.status == SubscriptionStatus.cancelled:
+        if sub.updated_at is None or sub.updated_at < day_end:
+            return None
+        return SubscriptionStatus.active.value
+    return (sub.status or SubscriptionStatus.pending).value
+
+
+def backfill_revenue_snapshots(
+    db: Session,
+    start: datetime,
+    end: Optional[datetime] = None,
+    *,
+    overwrite: bool = False,
+) -> dict[str, int]:
+    """
+    Reconstruye las fotos de [start, end] (por defecto hasta ayer) con las
+    reglas del encabezado del módulo. Los días que ya tienen fotos se saltan;
+    con overwrite=True se rehacen los reconstruidos, nunca los capturados en
+    vivo. Lee todo con consultas de rango (catálogo, suscripciones, HWM y
+    facturas), no por día. No hace commit.
+    """
+    first_day = _day(start)
+    last_day = _day(end) if end else _day() - timedelta(days=1)
+    if last_day < first_day:
+        return {"days": 0, "rows": 0, "skipped": 0}
+    range_end = last_day + timedelta(days=1)
+
+    _lock_snapshots(db)
+    existing = db.execute(
+        select(RevenueDailySnapshot.day, func.max(RevenueDailySnapshot.source))
+        .where(RevenueDailySnapshot.day >= first_day, RevenueDailySnapshot.day < range_end)
+        .group_by(RevenueDailySnapshot.day)
+    ).all()
+    # max(source) = "live" si el día tiene alguna fila capturada en vivo
+    skip = {_day(day) for day, source in existing if not overwrite or source == "live"}
+
+    days = []
+    day = first_day
+    while day <= last_day:
+        if day not in skip:
+            days.append(day)
+        day += timedelta(days=1)
+    if not days:
+        return {"days": 0, "rows": 0, "skipped": len(skip)}
+
+    catalog = PricingCatalog.load(db)
+    pricing_rows = load_subscription_pricing_rows(
+        db,
+        Subscription.created_at < range_end,
+        *_billable_criteria(),
+    )
+    high_water = _load_high_water(db, first_day, range_end)
+    billed = _load_billed_periods(db, first_day, range_end)
+
+    snapshots: dict[tuple[int, Optional[int]], dict] = {}
+    rows: list[dict[str, Any]] = []
+    for day in days:
+        day_end = day + timedelta(days=1)
+        cells = _Cells()
+        for row in pricing_rows:
+            sub = row[0]
+            if sub.created_at is not None and sub.created_at >= day_end:
+                continue
+            status = _status_on(sub, day_end)
+            if status is None:
+                continue
+
+            seats = None
+            if sub.id in high_water:
+                mark_days, counts = high_water[sub.id]
+                index = bisect.bisect_right(mark_days, day) - 1
+                if index >= 0:
+                    seats = counts[index]
+            cache_key = (sub.id, seats)
+            snapshot = snapshots.get(cache_key)
+            if snapshot is None:
+                snapshot = snapshots[cache_key] = build_catalog_snapshot(catalog, row, seats)
+
+            mrr = subscription_price(snapshot)
+            for period_start, period_end, subtotal in billed.get(sub.id, ()):
+                if period_start <= day < period_end:
+                    mrr = subtotal
+                    break
+            cells.add(sub, snapshot, status, mrr)
+        rows.extend(cells.rows(day, "backfill"))
+
+    _replace_days(db, days, rows)
+    logger.info(f"📈 Revenue backfill: {len(days)} días, {len(rows)} celdas ({len(skip)} días ya existentes)")
+    return {"days": len(days), "rows": len(rows), "skipped": len(skip)}
+
+
+def _totals(row) -> dict[str, Any]:
+    mrr = round(float(row.mrr or 0), 2)
+    return {
+        "mrr": mrr,
+        "arr": round(mrr * 12, 2),
+        "subscriptions": int(row.subscriptions or 0),
+        "customers": int(row.customers or 0),
+        "seats": int(row.seats or 0),
+    }
+
+
+def _sums():
+    return (
+        func.sum(RevenueDailySnapshot.mrr).label("mrr"),
+        func.sum(RevenueDailySnapshot.subscriptions).label("subscriptions"),
+        func.sum(RevenueDailySnapshot.customers).label("customers"),
+        func.sum(RevenueDailySnapshot.seats).label("seats"),
+    )
+
+
+def get_mrr_on(db: Session, day: datetime) -> Optional[dict[str, Any]]:
+    """MRR/ARR de la última foto en o antes de `day`; None si no hay historia."""
+    snapshot_day = db.execute(
+        select(func.max(RevenueDailySnapshot.day)).where(RevenueDailySnapshot.day <= _day(day))
+    ).scalar()
+    if snapshot_day is None:
+        return None
+    row = db.execute(
+        select(*_sums()).where(
+            RevenueDailySnapshot.day == snapshot_day,
+            RevenueDailySnapshot.status.in_(MRR_STATUSES),
+        )
+    ).one()
+    return {"day": _day(snapshot_day).date().isoformat(), **_totals(row)}
+
+
+def get_revenue_series(
+    db: Session,
+    start: datetime,
+    end: Optional[datetime] = None,
+    group_by: Optional[str] = None,
+) -> list[dict[str, Any]]:
+    """
+    Serie diaria de MRR/ARR en [start, end]. group_by: plan | partner |
+    status | cohort. Salvo al agrupar por estado, solo cuentan MRR_STATUSES.
+    customers es la suma por celda (un cliente con dos planes cuenta dos veces).
+    """
+    if group_by is not None and group_by not in _GROUP_COLUMNS:
+        raise ValueError(f"group_by inválido: {group_by}")
+    columns = [RevenueDailySnapshot.day]
+    if group_by:
+        columns.append(_GROUP_COLUMNS[group_by].label("key"))
+    stmt = (
+        select(*columns, *_sums())
+        .where(RevenueDailySnapshot.day >= _day(start), RevenueDailySnapshot.day <= _day(end))
+        .group_by(*columns)
+        .order_by(*columns)
+    )
+    if group_by != "status":
+        stmt = stmt.where(RevenueDailySnapshot.status.in_(MRR_STATUSES))
+
+    series = []
+    for row in db.execute(stmt):
+        point = {"day": _day(row.day).date().isoformat(), **_totals(row)}
+        if group_by:
+            point["key"] = row.key
+        series.append(point)
+    return series
+
+
+def get_cohort_retention(db: Session, months: int = 12) -> list[dict[str, Any]]:
+    """
+    Retención de MRR por cohorte de alta: para cada mes se toma la última foto
+    del mes y se compara el MRR de cada cohorte contra su primer mes observado.
+    """
+    today = _day()
+    first_month = today.replace(day=1)
+    for _ in range(max(1, months) - 1):
+        first_month = (first_month - timedelta(days=1)).replace(day=1)
+
+    days = db.execute(
+        select(RevenueDailySnapshot.day)
+        .where(RevenueDailySnapshot.day >= first_month)
+        .group_by(RevenueDailySnapshot.day)
+    ).scalars().all()
+    month_ends: dict[str, datetime] = {}
+    for day in days:
+        key = day.strftime("%Y-%m")
+        if key not in month_ends or day > month_ends[key]:
+            month_ends[key] = day
+    if not month_ends:
+        return []
+
+    rows = db.execute(
+        select(
+            RevenueDailySnapshot.day,
+            RevenueDailySnapshot.cohort_month,
+            func.sum(RevenueDailySnapshot.mrr).label("mrr"),
+            func.sum(RevenueDailySnapshot.subscriptions).label("subscriptions"),
+        )
+        .where(
+            RevenueDailySnapshot.day.in_(list(month_ends.values())),
+            RevenueDailySnapshot.status.in_(MRR_STATUSES),
+        )
+        .group_by(RevenueDailySnapshot.day, RevenueDailySnapshot.cohort_month)
+        .order_by(RevenueDailySnapshot.cohort_month, RevenueDailySnapshot.day)
+    ).all()
+
+    cohorts: dict[str, list[dict[str, Any]]] = defaultdict(list)
+    for day, cohort, mrr, subscriptions in rows:
+        cohorts[cohort].append({
+            "month": day.strftime("%Y-%m"),
+            "mrr": round(float(mrr or 0), 2),
+            "subscriptions": int(subscriptions or 0),
+        })
+
+    result = []
+    for cohort in sorted(cohorts):
+        points = cohorts[cohort]
+        base = points[0]["mrr"]
+        for point in points:
+            point["mrr_retention"] = round(point["mrr"] / base * 100, 1) if base else None
+        result.append({"cohort": cohort, "months": points})
+    return result
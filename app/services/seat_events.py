@@ -4,8 +4,9 @@ Seat Events Service — helpers reutilizables para HWM y exclusión de cuentas n
 from __future__ import annotations
 
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Any, Optional
 
+from sqlalchemy import case, func, insert, literal, or_, select, update
 from sqlalchemy.orm import Session
 
 from ..models.database import (
@@ -18,6 +19,11 @@ from ..models.database import (
 )
 
 
+# Logins internos fijos; además <subdominio>@sajet.us y el email del cliente.
+NON_BILLABLE_LOGINS = ("admin", "__system__")
+NON_BILLABLE_LOGIN_DOMAIN = "@sajet.us"
+
+
 def get_non_billable_logins(
     subdomain: str,
     *,
@@ -26,9 +32,8 @@ def get_non_billable_logins(
 ) -> set[str]:
     """Cuentas internas que no deben cobrarse como seat."""
     logins = {
-        "admin",
-        "__system__",
-        f"{(subdomain or '').strip().lower()}@sajet.us",
+        *NON_BILLABLE_LOGINS,
+        f"{(subdomain or '').strip().lower()}{NON_BILLABLE_LOGIN_DOMAIN}",
     }
 
     if customer and customer.email:
@@ -39,6 +44,18 @@ def get_non_billable_logins(
     return {item for item in logins if item}
 
 
+def non_billable_login_clause(login: Any, subdomain: Any, email: Any) -> Any:
+    """
+    Equivalente SQL de get_non_billable_logins para un login ya normalizado
+    (lower/trim): permite filtrar cuentas internas dentro de la consulta.
+    """
+    return or_(
+        login.in_(NON_BILLABLE_LOGINS),
+        login == func.lower(func.trim(subdomain)) + literal(NON_BILLABLE_LOGIN_DOMAIN),
+        login == func.lower(func.trim(func.coalesce(email, ""))),
+    )
+
+
 def is_billable_user(
     subdomain: str,
     *,
@@ -71,12 +88,19 @@ def is_partner_metered(subscription: Subscription) -> bool:
     )
 
 
-def update_hwm(db: Session, subscription_id: int, count: int) -> SeatHighWater:
-    """Actualiza o crea el snapshot diario del high-water mark."""
-    today = datetime.now(timezone.utc).replace(tzinfo=None).replace(hour=0, minute=0, second=0, microsecond=0)
+def _today() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _supports_hwm_upsert(db: Session) -> bool:
+    return db.get_bind().dialect.name in ("postgresql", "sqlite")
+
+
+def _update_hwm_row(db: Session, subscription_id: int, period_date: datetime, count: int) -> SeatHighWater:
+    """Read-modify-write del HWM (dialectos sin ON CONFLICT)."""
     hwm = db.query(SeatHighWater).filter(
         SeatHighWater.subscription_id == subscription_id,
-        SeatHighWater.period_date == today,
+        SeatHighWater.period_date == period_date,
     ).first()
 
     if hwm:
@@ -85,7 +109,7 @@ def update_hwm(db: Session, subscription_id: int, count: int) -> SeatHighWater:
     else:
         hwm = SeatHighWater(
             subscription_id=subscription_id,
-            period_date=today,
+            period_date=period_date,
             hwm_count=count,
         )
         db.add(hwm)
@@ -93,6 +117,243 @@ def update_hwm(db: Session, subscription_id: int, count: int) -> SeatHighWater:
     return hwm
 
 
+def _upsert_hwm_rows(db: Session, rows: list[dict[str, Any]]) -> None:
+    """
+    INSERT … ON CONFLICT (subscription_id, period_date) DO UPDATE con
+    GREATEST(actual, nuevo): escritores concurrentes nunca pierden un pico.
+    Cada fila: subscription_id, period_date, hwm_count.
+    """
+    if not rows:
+        return
+    if not _supports_hwm_upsert(db):
+        for row in rows:
+            _update_hwm_row(db, row["subscription_id"], row["period_date"], row["hwm_count"])
+        return
+
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        greatest = func.greatest
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        greatest = func.max     # max() escalar de SQLite con 2 argumentos
+    stmt = dialect_insert(SeatHighWater)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SeatHighWater.subscription_id, SeatHighWater.period_date],
+        set_={
+            "hwm_count": greatest(SeatHighWater.hwm_count, stmt.excluded.hwm_count),
+            # Un pico nuevo vuelve a quedar pendiente para el sync diario de Stripe
+            "stripe_qty_updated": case(
+                (stmt.excluded.hwm_count > SeatHighWater.hwm_count, False),
+                else_=SeatHighWater.stripe_qty_updated,
+            ),
+        },
+    )
+    db.execute(stmt, rows)
+
+
+def update_hwm(db: Session, subscription_id: int, count: int) -> SeatHighWater:
+    """Actualiza o crea el snapshot diario del high-water mark."""
+    today = _today()
+    if not _supports_hwm_upsert(db):
+        return _update_hwm_row(db, subscription_id, today, count)
+
+    _upsert_hwm_rows(db, [{"subscription_id": subscription_id, "period_date": today, "hwm_count": count}])
+    return db.execute(
+        select(SeatHighWater)
+        .where(SeatHighWater.subscription_id == subscription_id, SeatHighWater.period_date == today)
+        .execution_options(populate_existing=True)
+    ).scalar_one()
+
+
+def upsert_hwm_counts(
+    db: Session,
+    counts: dict[int, int],
+    period_date: Optional[datetime] = None,
+) -> None:
+    """Sube el HWM diario (GREATEST) de varias suscripciones en un solo upsert."""
+    period_date = period_date or _today()
+    _upsert_hwm_rows(db, [
+        {"subscription_id": subscription_id, "period_date": period_date, "hwm_count": count}
+        for subscription_id, count in counts.items()
+    ])
+
+
+def record_hwm_snapshots(
+    db: Session,
+    snapshots: list[dict[str, Any]],
+    *,
+    source: str = "snapshot",
+) -> None:
+    """
+    Versión por lotes de record_hwm_snapshot. Cada snapshot es un dict con
+    subscription_id, customer_id, user_count_after y metadata opcional.
+    Un INSERT multi-fila de seat_events, un upsert de HWM y dos UPDATE por
+    lotes (subscriptions / customers) en vez de leer y escribir por suscripción.
+    """
+    if not snapshots:
+        return
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    db.execute(insert(SeatEvent), [
+        {
+            "subscription_id": snap["subscription_id"],
+            "event_type": SeatEventType.HWM_SNAPSHOT,
+            "user_count_after": snap["user_count_after"],
+            "is_billable": False,
+            "source": source,
+            "metadata_json": snap.get("metadata") or {},
+            "created_at": now,
+        }
+        for snap in snapshots
+    ])
+
+    counts: dict[int, int] = {}
+    for snap in snapshots:
+        subscription_id = snap["subscription_id"]
+        counts[subscription_id] = max(counts.get(subscription_id, 0), snap["user_count_after"])
+    upsert_hwm_counts(db, counts)
+
+    db.execute(update(Subscription), [
+        {"id": subscription_id, "user_count": count, "updated_at": now}
+        for subscription_id, count in counts.items()
+    ])
+    customer_counts = {
+        snap["customer_id"]: snap["user_count_after"] for snap in snapshots if snap.get("customer_id")
+    }
+    if customer_counts:
+        db.execute(update(Customer), [
+            {"id": customer_id, "user_count": count} for customer_id, count in customer_counts.items()
+        ])
+
+
+def _billing_flags(
+    partner_metered: bool,
+    event_type: SeatEventType,
+    occurred_at: datetime,
+) -> tuple[bool, Optional[datetime]]:
+    """(is_billable, grace_expires_at) según el modo de facturación (Épica 3 / Épica 4)."""
+    if partner_metered:
+        if event_type == SeatEventType.FIRST_LOGIN:
+            return True, occurred_at + timedelta(hours=8)
+        return False, None
+    return event_type in (
+        SeatEventType.USER_CREATED,
+        SeatEventType.USER_REACTIVATED,
+        SeatEventType.FIRST_LOGIN,
+    ), None
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def ingest_seat_events(
+    db: Session,
+    items: list[dict[str, Any]],
+    *,
+    source: str = "webhook",
+) -> dict[str, Any]:
+    """
+    Ingesta por lotes de cambios de asientos.
+
+    Cada item: subscription_id, event_type (SeatEventType o su valor) y
+    user_count_after o delta (±n sobre el conteo corriente de la suscripción);
+    opcionales odoo_user_id, odoo_login, occurred_at, source y metadata.
+    Los items se aplican en orden de occurred_at. Un INSERT multi-fila de
+    seat_events; luego una consulta recalcula el máximo conteo corriente por
+    suscripción y día sobre seat_events (incluye escritores concurrentes) y se
+    aplica con upsert GREATEST. No hace commit.
+    """
+    if not items:
+        return {"inserted": 0, "subscriptions": {}}
+
+    sub_ids = {int(item["subscription_id"]) for item in items}
+    subs = {
+        row.id: row
+        for row in db.execute(
+            select(Subscription.id, Subscription.user_count, Subscription.billing_mode, Subscription.customer_id)
+            .where(Subscription.id.in_(sub_ids))
+        )
+    }
+    missing = sorted(sub_ids - set(subs))
+    if missing:
+        raise ValueError(f"Subscriptions not found: {missing}")
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    ordered = sorted(
+        enumerate(items),
+        key=lambda pair: (_naive_utc(pair[1].get("occurred_at")) or now, pair[0]),
+    )
+    running = {sub_id: subs[sub_id].user_count or 0 for sub_id in sub_ids}
+    rows: list[dict[str, Any]] = []
+    for _, item in ordered:
+        sub_id = int(item["subscription_id"])
+        event_type = SeatEventType(item["event_type"])
+        if item.get("user_count_after") is not None:
+            count = int(item["user_count_after"])
+        else:
+            count = running[sub_id] + int(item.get("delta") or 0)
+        count = max(0, count)
+        running[sub_id] = count
+        occurred_at = _naive_utc(item.get("occurred_at")) or now
+        is_billable, grace_expires = _billing_flags(is_partner_metered(subs[sub_id]), event_type, occurred_at)
+        rows.append({
+            "subscription_id": sub_id,
+            "event_type": event_type,
+            "odoo_user_id": item.get("odoo_user_id"),
+            "odoo_login": item.get("odoo_login"),
+            "user_count_after": count,
+            "is_billable": is_billable,
+            "grace_expires_at": grace_expires,
+            "source": item.get("source") or source,
+            "metadata_json": item.get("metadata") or {},
+            "created_at": occurred_at,
+        })
+    db.execute(insert(SeatEvent), rows)
+
+    # Máximo conteo corriente por (suscripción, día) de los días tocados
+    days = {row["created_at"].replace(hour=0, minute=0, second=0, microsecond=0) for row in rows}
+    period = func.date(SeatEvent.created_at)
+    peaks = (
+        select(
+            SeatEvent.subscription_id,
+            period.label("period"),
+            func.max(SeatEvent.user_count_after).over(
+                partition_by=(SeatEvent.subscription_id, period),
+            ).label("peak"),
+        )
+        .where(
+            SeatEvent.subscription_id.in_(sub_ids),
+            SeatEvent.created_at >= min(days),
+            SeatEvent.created_at < max(days) + timedelta(days=1),
+        )
+        .distinct()
+    )
+    hwm_rows = []
+    for sub_id, day, peak in db.execute(peaks):
+        period_date = datetime.fromisoformat(str(day))
+        if period_date in days:
+            hwm_rows.append({"subscription_id": sub_id, "period_date": period_date, "hwm_count": peak})
+    _upsert_hwm_rows(db, hwm_rows)
+
+    db.execute(update(Subscription), [
+        {"id": sub_id, "user_count": count, "updated_at": now} for sub_id, count in running.items()
+    ])
+    customer_counts = {subs[sub_id].customer_id: count for sub_id, count in running.items() if subs[sub_id].customer_id}
+    if customer_counts:
+        db.execute(update(Customer), [
+            {"id": customer_id, "user_count": count} for customer_id, count in customer_counts.items()
+        ])
+
+    summary: dict[int, dict[str, Any]] = {
+        sub_id: {"user_count": count, "peaks": {}} for sub_id, count in running.items()
+    }
+    for row in hwm_rows:
+        summary[row["subscription_id"]]["peaks"][row["period_date"].date().isoformat()] = row["hwm_count"]
+    return {"inserted": len(rows), "subscriptions": summary}
+
+
 def record_seat_event(
     db: Session,
     subscription: Subscription,
@@ -105,21 +366,9 @@ def record_seat_event(
     metadata: Optional[dict] = None,
 ) -> tuple[SeatEvent, SeatHighWater]:
     """Registra un seat event y actualiza HWM local."""
-    partner_metered = is_partner_metered(subscription)
-    is_billable = False
-    grace_expires = None
-
-    if partner_metered:
-        if event_type == SeatEventType.FIRST_LOGIN:
-            is_billable = True
-            grace_expires = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=8)
-    else:
-        if event_type in (
-            SeatEventType.USER_CREATED,
-            SeatEventType.USER_REACTIVATED,
-            SeatEventType.FIRST_LOGIN,
-        ):
-            is_billable = True
+    is_billable, grace_expires = _billing_flags(
+        is_partner_metered(subscription), event_type, datetime.now(timezone.utc).replace(tzinfo=None),
+    )
 
     event = SeatEvent(
         subscription_id=subscription.id,
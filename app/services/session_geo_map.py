@@ -0,0 +1,224 @@
+"""
+DSAM — Agregados geográficos para los mapas del panel admin.
+
+- Mapa de calor: session_geo_daily_rollups se incrementa al registrar eventos
+  geo (sync DSAM) y se sirve con una suma por rango de días, sin agrupar
+  session_geo_events en cada carga. Los eventos crudos se compactan por
+  retención (purge_old_geo_events) sin perder el histórico agregado.
+- Mapa en vivo: las sesiones activas se agrupan en una grilla cuyo tamaño de
+  celda depende del zoom, con un tope de puntos por respuesta.
+"""
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import Integer, and_, cast, delete, func, select, update
+from sqlalchemy.orm import Session
+
+from ..config import DSAM_GEO_ROLLUP_RETENTION_DAYS, DSAM_LIVE_MAP_MAX_POINTS
+from ..models.database import ActiveSession, SessionGeoDailyRollup
+
+logger = logging.getLogger(__name__)
+
+# 2 decimales ≈ 1 km: suficiente para un mapa de calor con GeoIP a nivel ciudad.
+GEO_ROLLUP_PRECISION = 2
+# Celdas de la grilla del mapa en vivo: ~1/4 de tile (256 px) por zoom.
+_CELLS_PER_TILE = 4
+MAX_MAP_ZOOM = 18
+
+_RollupKey = tuple[datetime, str, str, str, float, float]
+
+
+def _day(value: Optional[datetime]) -> datetime:
+    value = value or datetime.now(timezone.utc).replace(tzinfo=None)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _rollup_rows(events: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Agrupa eventos por celda de rollup; una fila por clave (requisito de ON CONFLICT)."""
+    counts: Counter = Counter()
+    countries: dict[_RollupKey, Optional[str]] = {}
+    for event in events:
+        if event.get("geo_lat") is None or event.get("geo_lon") is None:
+            continue
+        key: _RollupKey = (
+            _day(event.get("event_at")),
+            event["tenant_db"],
+            event.get("geo_country_code") or "",
+            event.get("geo_city") or "",
+            round(event["geo_lat"], GEO_ROLLUP_PRECISION),
+            round(event["geo_lon"], GEO_ROLLUP_PRECISION),
+        )
+        counts[key] += 1
+        countries.setdefault(key, event.get("geo_country"))
+    rows = []
+    for key, count in counts.items():
+        day, tenant, code, city, lat, lon = key
+        rows.append({
+            "day": day, "tenant_db": tenant, "geo_country_code": code, "geo_country": countries[key],
+            "geo_city": city, "geo_lat": lat, "geo_lon": lon, "event_count": count,
+        })
+    return rows
+
+
+def record_geo_rollups(db: Session, events: Iterable[dict[str, Any]]) -> int:
+    """
+    Incrementa los rollups diarios con los eventos geo recién registrados
+    (dicts con columnas de SessionGeoEvent). No hace commit: va en la misma
+    transacción que inserta los eventos. Retorna las celdas tocadas.
+    """
+    rows = _rollup_rows(events)
+    if not rows:
+        return 0
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(SessionGeoDailyRollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[
+                SessionGeoDailyRollup.day, SessionGeoDailyRollup.tenant_db,
+                SessionGeoDailyRollup.geo_country_code, SessionGeoDailyRollup.geo_city,
+                SessionGeoDailyRollup.geo_lat, SessionGeoDailyRollup.geo_lon,
+            ],
+            set_={"event_count": SessionGeoDailyRollup.event_count + stmt.excluded.event_count},
+        )
+        db.execute(stmt, rows)
+        return len(rows)
+
+    # Fallback: UPDATE y, si no existía la celda, INSERT
+    for row in rows:
+        result = db.execute(
+            update(SessionGeoDailyRollup)
+            .where(
+                SessionGeoDailyRollup.day == row["day"],
+                SessionGeoDailyRollup.tenant_db == row["tenant_db"],
+                SessionGeoDailyRollup.geo_country_code == row["geo_country_code"],
+                SessionGeoDailyRollup.geo_city == row["geo_city"],
+                SessionGeoDailyRollup.geo_lat == row["geo_lat"],
+                SessionGeoDailyRollup.geo_lon == row["geo_lon"],
+            )
+            .values(event_count=SessionGeoDailyRollup.event_count + row["event_count"])
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            db.add(SessionGeoDailyRollup(**row))
+    return len(rows)
+
+
+def get_geo_heatmap_rollup(
+    db: Session,
+    days: int = 30,
+    tenant_db: Optional[str] = None,
+    limit: int = 500,
+) -> list[dict[str, Any]]:
+    """Suma de rollups diarios en el rango [hoy - days, hoy], top `limit` celdas."""
+    cutoff = _day(datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days))
+    total = func.sum(SessionGeoDailyRollup.event_count).label("count")
+    filters = [SessionGeoDailyRollup.day >= cutoff]
+    if tenant_db:
+        filters.append(SessionGeoDailyRollup.tenant_db == tenant_db)
+    result = db.execute(
+        select(
+            SessionGeoDailyRollup.geo_country_code,
+            func.max(SessionGeoDailyRollup.geo_country),
+            SessionGeoDailyRollup.geo_city,
+            SessionGeoDailyRollup.geo_lat,
+            SessionGeoDailyRollup.geo_lon,
+            total,
+        )
+        .where(and_(*filters))
+        .group_by(
+            SessionGeoDailyRollup.geo_country_code,
+            SessionGeoDailyRollup.geo_city,
+            SessionGeoDailyRollup.geo_lat,
+            SessionGeoDailyRollup.geo_lon,
+        )
+        .order_by(total.desc())
+        .limit(limit)
+    )
+    return [
+        {
+            "country_code": cc or None, "country": cn, "city": city or None,
+            "lat": lat, "lon": lon, "count": int(cnt),
+        }
+        for cc, cn, city, lat, lon, cnt in result.fetchall()
+    ]
+
+
+def purge_old_geo_rollups(db: Session, retention_days: int = DSAM_GEO_ROLLUP_RETENTION_DAYS) -> int:
+    """Retención de rollups (más larga que la de eventos crudos)."""
+    cutoff = _day(datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=retention_days))
+    result = db.execute(delete(SessionGeoDailyRollup).where(SessionGeoDailyRollup.day < cutoff))
+    db.commit()
+    return result.rowcount or 0
+
+
+# ── Mapa en vivo ──
+
+def live_map_cell_degrees(zoom: int) -> float:
+    """Tamaño de celda (grados) para un zoom estilo slippy map (tile = 360°/2^zoom)."""
+    return 360.0 / (2 ** zoom) / _CELLS_PER_TILE
+
+
+def _cell_index(db: Session, column, offset: float, cell: float):
+    value = (column + offset) / cell      # siempre ≥ 0
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(func.floor(value), Integer)
+    return cast(value, Integer)           # SQLite trunca al castear (= floor para ≥ 0)
+
+
+def get_live_map_clusters(
+    db: Session,
+    zoom: int,
+    max_points: int = DSAM_LIVE_MAP_MAX_POINTS,
+) -> dict[str, Any]:
+    """
+    Agrupa las sesiones activas con coordenadas en celdas de la grilla del zoom
+    pedido. Si resultan más de `max_points` celdas se baja el zoom hasta que
+    entren. Cada punto lleva el centroide, el total y país/ciudad/tenant de
+    referencia de la celda.
+    """
+    zoom = max(0, min(zoom, MAX_MAP_ZOOM))
+    located = and_(ActiveSession.is_active == True, ActiveSession.geo_lat.isnot(None))
+    while True:
+        cell = live_map_cell_degrees(zoom)
+        lat_cell = _cell_index(db, ActiveSession.geo_lat, 90.0, cell).label("lat_cell")
+        lon_cell = _cell_index(db, ActiveSession.geo_lon, 180.0, cell).label("lon_cell")
+        count = func.count(ActiveSession.id).label("count")
+        rows = db.execute(
+            select(
+                lat_cell, lon_cell, count,
+                func.avg(ActiveSession.geo_lat), func.avg(ActiveSession.geo_lon),
+                func.max(ActiveSession.geo_country), func.max(ActiveSession.geo_city),
+                func.count(func.distinct(ActiveSession.tenant_db)),
+                func.max(ActiveSession.tenant_db),
+            )
+            .where(located)
+            .group_by(lat_cell, lon_cell)
+            .order_by(count.desc())
+            .limit(max_points + 1)
+        ).fetchall()
+        if len(rows) <= max_points or zoom == 0:
+            break
+        zoom -= 1
+
+    points = [
+        {
+            "lat": round(lat, 5), "lon": round(lon, 5), "count": cnt,
+            "country": country, "city": city, "tenants": tenants,
+            "tenant_db": tenant if tenants == 1 else None,
+        }
+        for _, _, cnt, lat, lon, country, city, tenants, tenant in rows[:max_points]
+    ]
+    return {
+        "points": points,
+        "zoom": zoom,
+        "cell_degrees": cell,
+        "sessions": sum(p["count"] for p in points),
+        "truncated": len(rows) > max_points,
+    }
@@ -0,0 +1,192 @@
+"""
+DSAM — Sync incremental de sesiones vía keyspace notifications de Redis.
+
+Modo opcional (DSAM_SESSION_SYNC_MODE=keyspace): un listener por fuente se
+suscribe a ``__keyspace@<db>__:<pattern>`` y acumula las claves tocadas
+(set / expire / del / expired / evicted) en un dirty set. Cada ciclo solo se
+releen y aplican esas claves. Un reconcile completo (sync_sessions_to_db)
+corre periódicamente y siempre que el listener pudo haber perdido eventos
+(arranque, reconexión, dirty set desbordado).
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Optional
+
+from sqlalchemy.orm import Session
+
+from ..config import DSAM_FULL_RECONCILE_SECONDS
+from .session_monitor import (
+    RedisSessionSource,
+    _get_session_sources,
+    apply_changed_sessions,
+    get_redis_client,
+    sync_sessions_to_db,
+)
+
+logger = logging.getLogger(__name__)
+
+# Flags mínimos de notify-keyspace-events: K (keyspace), g (del/expire/rename),
+# $ (set) y x (expired). "A" equivale a "g$lshzxetd".
+_REQUIRED_NOTIFY_FLAGS = ("g", "$", "x")
+_MAX_DIRTY_KEYS = 200_000
+_RECONNECT_BACKOFF_SECONDS = (1, 2, 5, 10, 30)
+
+
+def _notifications_enabled(flags: str) -> bool:
+    if "K" not in flags:
+        return False
+    expanded = flags.replace("A", "g$lshzxetd")
+    return all(flag in expanded for flag in _REQUIRED_NOTIFY_FLAGS)
+
+
+class SessionKeyspaceListener:
+    """Listener de keyspace notifications + dirty set por fuente."""
+
+    def __init__(self, sources: Optional[list[RedisSessionSource]] = None):
+        self._sources = sources
+        self._tasks: list[asyncio.Task] = []
+        self._dirty: dict[RedisSessionSource, set[str]] = {}
+        self._dirty_count = 0
+        self._needs_full = True
+        self._last_full: float = 0.0
+        self._metrics = {"events": 0, "incremental_syncs": 0, "full_syncs": 0, "overflows": 0, "reconnects": 0}
+
+    @property
+    def sources(self) -> list[RedisSessionSource]:
+        return self._sources if self._sources is not None else _get_session_sources()
+
+    # ── Listener ──
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._needs_full = True
+        for source in self.sources:
+            self._tasks.append(asyncio.create_task(self._listen(source)))
+        logger.info("DSAM keyspace listener started for %s sources", len(self._tasks))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _listen(self, source: RedisSessionSource) -> None:
+        prefix = f"__keyspace@{source.redis_db}__:"
+        attempt = 0
+        while True:
+            pubsub = None
+            try:
+                client = await get_redis_client(source.redis_db)
+                await self._check_notify_config(client, source)
+                pubsub = client.pubsub()
+                await pubsub.psubscribe(prefix + source.match_pattern)
+                # Lo ocurrido antes de suscribirse (o durante una desconexión) no llegó.
+                self._needs_full = True
+                attempt = 0
+                async for message in pubsub.listen():
+                    if message.get("type") == "pmessage":
+                        self.handle_message(source, message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._needs_full = True
+                self._metrics["reconnects"] += 1
+                delay = _RECONNECT_BACKOFF_SECONDS[min(attempt, len(_RECONNECT_BACKOFF_SECONDS) - 1)]
+                attempt += 1
+                logger.warning(
+                    "DSAM keyspace listener db=%s (%s) disconnected: %s — retrying in %ss",
+                    source.redis_db, source.app_name, e, delay,
+                )
+                await asyncio.sleep(delay)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
+    async def _check_notify_config(self, client: Any, source: RedisSessionSource) -> None:
+        try:
+            config = await client.config_get("notify-keyspace-events")
+        except Exception:
+            return  # CONFIG deshabilitado (p. ej. Redis gestionado): confiar en el operador
+        flags = (config or {}).get("notify-keyspace-events", "")
+        if not _notifications_enabled(flags):
+            logger.warning(
+                "DSAM keyspace mode: Redis db=%s (%s) has notify-keyspace-events=%r; "
+                "set it to at least 'Kg$x'. Only the periodic full reconcile will catch changes.",
+                source.redis_db, source.app_name, flags,
+            )
+
+    def handle_message(self, source: RedisSessionSource, message: dict[str, Any]) -> None:
+        """Registra la clave de un pmessage de keyspace en el dirty set."""
+        channel = message.get("channel") or ""
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        _, _, key = channel.partition("__:")
+        if not key:
+            return
+        self._metrics["events"] += 1
+        keys = self._dirty.setdefault(source, set())
+        if key in keys:
+            return
+        if self._dirty_count >= _MAX_DIRTY_KEYS:
+            # Demasiados cambios: más barato un reconcile completo.
+            self._dirty.clear()
+            self._dirty_count = 0
+            self._needs_full = True
+            self._metrics["overflows"] += 1
+            return
+        keys.add(key)
+        self._dirty_count += 1
+
+    def take_dirty(self) -> dict[RedisSessionSource, set[str]]:
+        dirty, self._dirty, self._dirty_count = self._dirty, {}, 0
+        return dirty
+
+    # ── Sync ──
+
+    async def sync(self, db: Session) -> dict[str, Any]:
+        """Aplica los cambios pendientes, o un reconcile completo si toca."""
+        now = time.monotonic()
+        if self._needs_full or now - self._last_full >= DSAM_FULL_RECONCILE_SECONDS:
+            # Lo que llegue durante el scan queda en el dirty set y se reaplica luego.
+            self._needs_full = False
+            self.take_dirty()
+            try:
+                stats: dict[str, Any] = await sync_sessions_to_db(db)
+            except Exception:
+                self._needs_full = True
+                raise
+            self._last_full = now
+            self._metrics["full_syncs"] += 1
+            stats["mode"] = "full"
+            return stats
+
+        changed = self.take_dirty()
+        try:
+            stats = await apply_changed_sessions(db, changed)
+        except Exception:
+            # Reencolar para el próximo ciclo
+            for source, keys in changed.items():
+                self._dirty.setdefault(source, set()).update(keys)
+                self._dirty_count += len(keys)
+            raise
+        self._metrics["incremental_syncs"] += 1
+        stats["mode"] = "incremental"
+        stats["changed_keys"] = sum(len(keys) for keys in changed.values())
+        return stats
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            **self._metrics,
+            "pending_keys": self._dirty_count,
+            "needs_full_reconcile": self._needs_full,
+            "listening": sum(1 for task in self._tasks if not task.done()),
+        }
+
+
+session_keyspace_listener = SessionKeyspaceListener()
@@ -0,0 +1,200 @@
+"""
+DSAM — Índice en memoria de última ubicación conocida por usuario.
+
+La detección de viaje imposible compara cada sesión contra el último evento
+geo (con coordenadas) de su usuario. En vez de consultar session_geo_events
+por sesión, el índice se carga una vez (DISTINCT ON en PostgreSQL) y se
+mantiene al día:
+  - sync_sessions_to_db le pasa los eventos geo que registra (observe), y
+  - refresh() lee solo los eventos con id mayor al último visto, lo que cubre
+    eventos escritos por otros workers/procesos.
+"""
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import delete, desc, func, select
+from sqlalchemy.orm import Session
+
+from ..config import DSAM_GEO_EVENT_RETENTION_DAYS
+from ..models.database import SessionGeoEvent
+
+logger = logging.getLogger(__name__)
+
+# Un warm load completo periódico corrige cualquier deriva (p. ej. retención).
+_FULL_RELOAD_SECONDS = 6 * 3600
+
+
+@dataclass(frozen=True, slots=True)
+class LastLocation:
+    """Última ubicación con coordenadas de un usuario (mismos nombres que SessionGeoEvent)."""
+    geo_lat: float
+    geo_lon: float
+    event_at: Optional[datetime]
+    geo_country: Optional[str] = None
+    geo_city: Optional[str] = None
+
+
+def _is_newer(candidate: LastLocation, current: Optional[LastLocation]) -> bool:
+    if current is None:
+        return True
+    if candidate.event_at is None:
+        return current.event_at is None
+    return current.event_at is None or candidate.event_at >= current.event_at
+
+
+class LastLocationIndex:
+    """(tenant_db, odoo_login) → LastLocation, con lookups O(1)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locations: dict[tuple[str, str], LastLocation] = {}
+        self._max_event_id = 0
+        self._loaded_at: Optional[datetime] = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._locations.clear()
+            self._max_event_id = 0
+            self._loaded_at = None
+
+    def get(self, tenant_db: str, odoo_login: Optional[str]) -> Optional[LastLocation]:
+        return self._locations.get((tenant_db, odoo_login))
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def _apply(self, key: tuple[str, str], location: LastLocation) -> None:
+        if _is_newer(location, self._locations.get(key)):
+            self._locations[key] = location
+
+    def observe(self, events: Iterable[dict[str, Any]]) -> None:
+        """Incorpora eventos geo recién registrados (dicts con columnas de SessionGeoEvent)."""
+        with self._lock:
+            for event in events:
+                if event.get("geo_lat") is None:
+                    continue
+                self._apply(
+                    (event["tenant_db"], event["odoo_login"]),
+                    LastLocation(
+                        geo_lat=event["geo_lat"],
+                        geo_lon=event["geo_lon"],
+                        event_at=event.get("event_at"),
+                        geo_country=event.get("geo_country"),
+                        geo_city=event.get("geo_city"),
+                    ),
+                )
+
+    def ensure_fresh(self, db: Session) -> None:
+        """Warm load si hace falta; si no, solo los eventos nuevos (id > último visto)."""
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        if self._loaded_at is None or (now - self._loaded_at).total_seconds() > _FULL_RELOAD_SECONDS:
+            self.warm_load(db)
+        else:
+            self.refresh(db)
+
+    def warm_load(self, db: Session) -> None:
+        """Carga la última ubicación por usuario dentro de la ventana de retención."""
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=DSAM_GEO_EVENT_RETENTION_DAYS)
+        max_id = db.execute(select(func.max(SessionGeoEvent.id))).scalar() or 0
+        cols = (
+            SessionGeoEvent.tenant_db, SessionGeoEvent.odoo_login, SessionGeoEvent.geo_lat,
+            SessionGeoEvent.geo_lon, SessionGeoEvent.event_at, SessionGeoEvent.geo_country,
+            SessionGeoEvent.geo_city,
+        )
+        located = (
+            SessionGeoEvent.geo_lat.isnot(None),
+            SessionGeoEvent.event_at >= cutoff,
+            SessionGeoEvent.id <= max_id,
+        )
+
+        if db.get_bind().dialect.name == "postgresql":
+            query = (
+                select(*cols)
+                .where(*located)
+                .distinct(SessionGeoEvent.tenant_db, SessionGeoEvent.odoo_login)
+                # Todo DESC: recorrido hacia atrás de ix_geo_events_user_located
+                .order_by(
+                    desc(SessionGeoEvent.tenant_db), desc(SessionGeoEvent.odoo_login),
+                    desc(SessionGeoEvent.event_at), desc(SessionGeoEvent.id),
+                )
+            )
+        else:
+            ranked = (
+                select(
+                    *cols,
+                    func.row_number().over(
+                        partition_by=(SessionGeoEvent.tenant_db, SessionGeoEvent.odoo_login),
+                        order_by=(desc(SessionGeoEvent.event_at), desc(SessionGeoEvent.id)),
+                    ).label("rn"),
+                )
+                .where(*located)
+                .subquery()
+            )
+            query = select(*(ranked.c[col.key] for col in cols)).where(ranked.c.rn == 1)
+
+        locations = {
+            (row.tenant_db, row.odoo_login): LastLocation(
+                geo_lat=row.geo_lat, geo_lon=row.geo_lon, event_at=row.event_at,
+                geo_country=row.geo_country, geo_city=row.geo_city,
+            )
+            for row in db.execute(query)
+        }
+        with self._lock:
+            self._locations = locations
+            self._max_event_id = max_id
+            self._loaded_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        logger.info("DSAM last-location index loaded: users=%s max_event_id=%s", len(locations), max_id)
+
+    def refresh(self, db: Session) -> int:
+        """Aplica eventos con coordenadas posteriores al último id visto."""
+        rows = db.execute(
+            select(
+                SessionGeoEvent.id, SessionGeoEvent.tenant_db, SessionGeoEvent.odoo_login,
+                SessionGeoEvent.geo_lat, SessionGeoEvent.geo_lon, SessionGeoEvent.event_at,
+                SessionGeoEvent.geo_country, SessionGeoEvent.geo_city,
+            )
+            .where(SessionGeoEvent.id > self._max_event_id)
+            .order_by(SessionGeoEvent.id)
+        ).all()
+        if not rows:
+            return 0
+        with self._lock:
+            for row in rows:
+                if row.geo_lat is not None:
+                    self._apply(
+                        (row.tenant_db, row.odoo_login),
+                        LastLocation(
+                            geo_lat=row.geo_lat, geo_lon=row.geo_lon, event_at=row.event_at,
+                            geo_country=row.geo_country, geo_city=row.geo_city,
+                        ),
+                    )
+            self._max_event_id = max(self._max_event_id, rows[-1].id)
+        return len(rows)
+
+
+last_location_index = LastLocationIndex()
+
+
+def purge_old_geo_events(
+    db: Session,
+    retention_days: int = DSAM_GEO_EVENT_RETENTION_DAYS,
+    batch_size: int = 5000,
+) -> int:
+    """Retención de session_geo_events: borra por lotes lo anterior a la ventana."""
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=retention_days)
+    deleted = 0
+    while True:
+        ids = db.execute(
+            select(SessionGeoEvent.id).where(SessionGeoEvent.event_at < cutoff).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        db.execute(delete(SessionGeoEvent).where(SessionGeoEvent.id.in_(ids)))
+        db.commit()
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            break
+    return deleted
@@ -3,14 +3,17 @@ DSAM — Session Monitor Service
 Escanea Redis (PCT 149) para capturar sesiones activas de Odoo,
 geolocaliza IPs y sincroniza snapshots a la BD de ERP Core.
 """
+import asyncio
+import hashlib
 import json
 import logging
 import math
+import time
 from dataclasses import dataclass
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 from typing import Any, Optional
 
-from sqlalchemy import select, delete, and_
+from sqlalchemy import select, delete, and_, or_, func, insert, update, true, false
 from sqlalchemy.orm import Session
 
 try:
@@ -25,6 +28,10 @@ from ..config import (
 from ..models.database import (
     ActiveSession, SessionGeoEvent, TenantSessionConfig,
 )
+from .session_geo_map import get_geo_heatmap_rollup, record_geo_rollups
+from .session_locations import last_location_index
+from .session_stream import removal_delta, session_broadcaster, session_delta
+from .session_summary import get_summary_stats, refresh_session_summaries
 
 logger = logging.getLogger(__name__)
 
@@ -220,6 +227,28 @@ def _get_session_sources() -> list[RedisSessionSource]:
 # Redis Session Scanner
 # ═══════════════════════════════════════════════════════
 
+_SCAN_PAGE_SIZE = 500
+_REDIS_MAX_CONNECTIONS = 20
+# Tolerancia al comparar el vencimiento absoluto (ahora + PTTL) entre escaneos.
+_TTL_JITTER_MS = 1500
+
+# Clientes persistentes por DB; los clientes async quedan ligados a su event loop.
+_redis_clients: dict[int, tuple[Any, Any]] = {}
+
+
+@dataclass(frozen=True)
+class _ScannedSession:
+    """Estado de una clave de sesión en el último escaneo."""
+    expires_at_ms: Optional[float]
+    digest: bytes
+    entry: Optional[dict[str, Any]]   # None = sesión anónima/ilegible (se ignora)
+
+
+# (redis_db, pattern) -> {redis_key: _ScannedSession}
+_scan_cache: dict[tuple[int, str], dict[str, _ScannedSession]] = {}
+_last_scan_metrics: dict[str, Any] = {}
+
+
 async def get_redis_pool(redis_db: Optional[int] = None) -> Any:
     """Crea pool async de Redis."""
     if aioredis is None:
@@ -236,62 +265,175 @@ async def get_redis_pool(redis_db: Optional[int] = None) -> Any:
     )
 
 
-async def scan_redis_sessions() -> list[dict[str, Any]]:
+async def get_redis_client(redis_db: Optional[int] = None) -> Any:
     """
-    Escanea todas las claves configuradas de sesiones Odoo en Redis.
-    Retorna lista de dicts con la data de cada sesión.
-    Soporta múltiples DB/prefix por versión de Odoo.
+    Cliente Redis compartido (pool persistente) por DB.
+    No cerrar: el pool se reutiliza entre escaneos; ver close_redis_clients().
     """
-    sessions = []
-    for source in _get_session_sources():
+    if aioredis is None:
+        raise RuntimeError("redis package is not installed")
+
+    db_index = REDIS_DB if redis_db is None else redis_db
+    loop = asyncio.get_running_loop()
+    cached = _redis_clients.get(db_index)
+    if cached is not None and cached[0] is loop:
+        return cached[1]
+
+    pool = aioredis.ConnectionPool(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        password=REDIS_PASSWORD,
+        db=db_index,
+        decode_responses=True,
+        socket_connect_timeout=5,
+        socket_timeout=5,
+        max_connections=_REDIS_MAX_CONNECTIONS,
+    )
+    client = aioredis.Redis(connection_pool=pool)
+    _redis_clients[db_index] = (loop, client)
+    return client
+
+
+async def close_redis_clients() -> None:
+    """Cierra los pools persistentes (shutdown de la app)."""
+    clients = list(_redis_clients.values())
+    _redis_clients.clear()
+    for _, client in clients:
         try:
-            r = await get_redis_pool(source.redis_db)
+            await client.aclose()
+            await client.connection_pool.disconnect()
         except Exception as e:
-            logger.error("Cannot connect to Redis source db=%s (%s): %s", source.redis_db, source.app_name, e)
-            continue
+            logger.debug("Error closing Redis client: %s", e)
 
-        cursor = "0"
-        source_count = 0
-        try:
-            while True:
-                cursor, keys = await r.scan(cursor=cursor, match=source.match_pattern, count=200)
-                for key in keys:
+
+def _build_session_entry(key: str, raw: str, source: RedisSessionSource) -> Optional[dict[str, Any]]:
+    """Parsea el payload de una clave de sesión; None si no es una sesión autenticada."""
+    data = json.loads(raw) if isinstance(raw, str) else raw
+    if not isinstance(data, dict) or not _is_authenticated_session(data):
+        return None
+    return {
+        "redis_key": key,
+        "tenant_db": data.get("db") or "unknown",
+        "session_id": key.rsplit(":", 1)[-1],
+        "source_db": source.redis_db,
+        "source_app": source.app_name,
+        "source_pattern": source.match_pattern,
+        "data": data,
+    }
+
+
+async def _scan_source(source: RedisSessionSource) -> list[dict[str, Any]]:
+    """
+    Escanea una fuente: por cada página de SCAN un pipeline de PTTL y un MGET
+    solo de las claves cuyo vencimiento cambió (o nuevas). Las claves cuyo valor
+    tiene el mismo hash que en el escaneo anterior reutilizan el parseo previo.
+    """
+    r = await get_redis_client(source.redis_db)
+    cache_key = (source.redis_db, source.match_pattern)
+    previous = _scan_cache.get(cache_key, {})
+    current: dict[str, _ScannedSession] = {}
+    metrics = {"keys": 0, "fetched": 0, "parsed": 0, "unchanged": 0}
+
+    cursor: Any = 0
+    while True:
+        cursor, keys = await r.scan(cursor=cursor, match=source.match_pattern, count=_SCAN_PAGE_SIZE)
+        keys = [key for key in keys if key not in current]
+        if keys:
+            pipe = r.pipeline(transaction=False)
+            for key in keys:
+                pipe.pttl(key)
+            ttls = await pipe.execute()
+            now_ms = time.time() * 1000
+
+            to_fetch: list[tuple[str, Optional[float]]] = []
+            for key, ttl in zip(keys, ttls):
+                if ttl == -2:
+                    continue  # expiró entre SCAN y PTTL
+                expires_at = now_ms + ttl if ttl >= 0 else None
+                cached = previous.get(key)
+                if (
+                    cached is not None
+                    and expires_at is not None
+                    and cached.expires_at_ms is not None
+                    and abs(cached.expires_at_ms - expires_at) <= _TTL_JITTER_MS
+                ):
+                    current[key] = cached
+                    metrics["unchanged"] += 1
+                else:
+                    to_fetch.append((key, expires_at))
+
+            if to_fetch:
+                values = await r.mget([key for key, _ in to_fetch])
+                metrics["fetched"] += len(to_fetch)
+                for (key, expires_at), raw in zip(to_fetch, values):
+                    if not raw:
+                        continue
+                    digest = hashlib.blake2b(
+                        raw.encode() if isinstance(raw, str) else raw, digest_size=16
+                    ).digest()
+                    cached = previous.get(key)
+                    if cached is not None and cached.digest == digest:
+                        current[key] = _ScannedSession(expires_at, digest, cached.entry)
+                        metrics["unchanged"] += 1
+                        continue
                     try:
-                        raw = await r.get(key)
-                        if not raw:
-                            continue
-                        data = json.loads(raw) if isinstance(raw, str) else raw
-                        if not isinstance(data, dict) or not _is_authenticated_session(data):
-                            continue
-                        tenant_db = data.get("db") or "unknown"
-                        session_id = key.rsplit(":", 1)[-1]
-                        sessions.append({
-                            "redis_key": key,
-                            "tenant_db": tenant_db,
-                            "session_id": session_id,
-                            "source_db": source.redis_db,
-                            "source_app": source.app_name,
-                            "source_pattern": source.match_pattern,
-                            "data": data,
-                        })
-                        source_count += 1
+                        entry = _build_session_entry(key, raw, source)
                     except Exception as e:
                         logger.debug("Error parsing session key %s from %s: %s", key, source.app_name, e)
-                if cursor == 0 or cursor == "0":
-                    break
-            logger.info(
-                "DSAM scanned Redis source db=%s app=%s pattern=%s sessions=%s",
-                source.redis_db,
-                source.app_name,
-                source.match_pattern,
-                source_count,
-            )
-        finally:
-            await r.aclose()
+                        entry = None
+                    current[key] = _ScannedSession(expires_at, digest, entry)
+                    metrics["parsed"] += 1
+
+        if cursor == 0 or cursor == "0":
+            break
+
+    _scan_cache[cache_key] = current
+    sessions = [scanned.entry for scanned in current.values() if scanned.entry is not None]
+    metrics["keys"] = len(current)
+    metrics["sessions"] = len(sessions)
+    _last_scan_metrics[f"{source.redis_db}|{source.match_pattern}"] = {"app": source.app_name, **metrics}
+    logger.info(
+        "DSAM scanned Redis source db=%s app=%s pattern=%s sessions=%s fetched=%s parsed=%s",
+        source.redis_db,
+        source.app_name,
+        source.match_pattern,
+        len(sessions),
+        metrics["fetched"],
+        metrics["parsed"],
+    )
+    return sessions
 
+
+async def scan_redis_sessions(
+    failed_sources: Optional[list[RedisSessionSource]] = None,
+) -> list[dict[str, Any]]:
+    """
+    Escanea todas las claves configuradas de sesiones Odoo en Redis.
+    Retorna lista de dicts con la data de cada sesión.
+    Soporta múltiples DB/prefix por versión de Odoo; las fuentes se escanean
+    en paralelo. Una fuente que falla se omite y se agrega a `failed_sources`:
+    sus sesiones no se deben dar de baja por no haberse visto.
+    """
+    sources = _get_session_sources()
+    results = await asyncio.gather(
+        *(_scan_source(source) for source in sources), return_exceptions=True
+    )
+    sessions: list[dict[str, Any]] = []
+    for source, result in zip(sources, results):
+        if isinstance(result, BaseException):
+            logger.error("Cannot scan Redis source db=%s (%s): %s", source.redis_db, source.app_name, result)
+            if failed_sources is not None:
+                failed_sources.append(source)
+            continue
+        sessions.extend(result)
     return sessions
 
 
+def get_scan_metrics() -> dict[str, Any]:
+    """Métricas del último escaneo por fuente (claves, MGET, parseos, sin cambios)."""
+    return {source: dict(metrics) for source, metrics in _last_scan_metrics.items()}
+
+
 def parse_session_data(session: dict) -> dict[str, Any]:
     """Extrae campos relevantes del payload de sesión Odoo en Redis."""
     data = session.get("data", {})
@@ -318,6 +460,324 @@ def parse_session_data(session: dict) -> dict[str, Any]:
         "session_start": session_start,
         "last_activity": last_activity,
     }
+
+
+def _apply_parsed_session(
+    db: Session,
+    parsed: dict[str, Any],
+    existing: Optional[ActiveSession],
+    now: datetime,
+    stats: dict[str, int],
+    deltas: Optional[list[dict[str, Any]]] = None,
+) -> Optional[dict[str, Any]]:
+    """
+    Upsert de una sesión parseada en active_sessions (+ evento geo si es nueva
+    o cambió la IP real). Retorna los valores del evento geo registrado, si hubo.
+    Si se pasa `deltas`, agrega ahí los cambios para el canal push.
+    """
+    geo = geolocate_ip(parsed["ip_address"])
+
+    if existing:
+        reactivated = not existing.is_active
+        existing.last_polled_at = now
+        existing.last_activity = parsed.get("last_activity")
+        existing.is_active = True
+        existing.odoo_uid = parsed.get("odoo_uid")
+        existing.odoo_login = parsed.get("odoo_login")
+        if parsed.get("user_agent"):
+            existing.user_agent = parsed.get("user_agent")
+
+        should_refresh_ip = not _is_placeholder_ip(parsed["ip_address"])
+        should_backfill_geo = (
+            not _is_placeholder_ip(existing.ip_address)
+            and existing.geo_lat is None
+            and geo["lat"] is not None
+        )
+
+        # Actualizar geo si cambió la IP real o si faltaba geo previamente
+        if should_refresh_ip and existing.ip_address != parsed["ip_address"]:
+            existing.ip_address = parsed["ip_address"]
+            existing.geo_country = geo["country"]
+            existing.geo_country_code = geo["country_code"]
+            existing.geo_region = geo["region"]
+            existing.geo_city = geo["city"]
+            existing.geo_lat = geo["lat"]
+            existing.geo_lon = geo["lon"]
+            geo_event = _geo_event_values(parsed, geo, now)
+            db.add(SessionGeoEvent(**geo_event))
+            stats["updated"] += 1
+            if deltas is not None:
+                deltas.append(session_delta("add" if reactivated else "move", existing))
+            return geo_event
+        elif should_backfill_geo:
+            existing.geo_country = geo["country"]
+            existing.geo_country_code = geo["country_code"]
+            existing.geo_region = geo["region"]
+            existing.geo_city = geo["city"]
+            existing.geo_lat = geo["lat"]
+            existing.geo_lon = geo["lon"]
+        stats["updated"] += 1
+        if deltas is not None and reactivated:
+            deltas.append(session_delta("add", existing))
+        return None
+
+    new_session = ActiveSession(
+        redis_session_key=parsed["redis_session_key"],
+        tenant_db=parsed["tenant_db"],
+        odoo_uid=parsed["odoo_uid"],
+        odoo_login=parsed["odoo_login"],
+        ip_address=parsed["ip_address"],
+        user_agent=parsed.get("user_agent"),
+        geo_country=geo["country"],
+        geo_country_code=geo["country_code"],
+        geo_region=geo["region"],
+        geo_city=geo["city"],
+        geo_lat=geo["lat"],
+        geo_lon=geo["lon"],
+        session_start=parsed.get("session_start"),
+        last_activity=parsed.get("last_activity"),
+        first_seen_at=now,
+        last_polled_at=now,
+        is_active=True,
+    )
+    db.add(new_session)
+    stats["created"] += 1
+    if deltas is not None:
+        deltas.append(session_delta("add", new_session))
+
+    # Registrar evento geo
+    geo_event = _geo_event_values(parsed, geo, now)
+    db.add(SessionGeoEvent(**geo_event))
+    return geo_event
+
+
+def _publish_session_changes(
+    db: Session,
+    deltas: Optional[list[dict[str, Any]]],
+    stats: dict[str, int],
+) -> None:
+    """
+    Tras el commit: reparte los deltas del ciclo y los contadores del
+    dashboard (una lectura del read model por sync, haya los suscriptores
+    que haya). `deltas` es None cuando nadie estaba suscrito.
+    """
+    if deltas is None:
+        return
+    try:
+        session_broadcaster.publish([*deltas, {"type": "sync", "stats": dict(stats), "dashboard": get_summary_stats(db)}])
+    except Exception as e:
+        logger.warning("Error publishing DSAM session deltas: %s", e)
+
+
+def _stream_deltas() -> Optional[list[dict[str, Any]]]:
+    return [] if session_broadcaster.subscriber_count else None
+
+
+def _geo_event_values(parsed: dict[str, Any], geo: dict[str, Any], now: datetime) -> dict[str, Any]:
+    return {
+        "tenant_db": parsed["tenant_db"],
+        "odoo_login": parsed["odoo_login"] or "unknown",
+        "ip_address": parsed["ip_address"],
+        "geo_country": geo["country"],
+        "geo_country_code": geo["country_code"],
+        "geo_region": geo["region"],
+        "geo_city": geo["city"],
+        "geo_lat": geo["lat"],
+        "geo_lon": geo["lon"],
+        "event_at": now,
+    }
+
+
+# ── Bulk upsert (PostgreSQL / SQLite: INSERT … ON CONFLICT) ──
+
+_BULK_CHUNK_SIZE = 1000
+
+
+def _supports_bulk_upsert(db: Session) -> bool:
+    return db.get_bind().dialect.name in ("postgresql", "sqlite")
+
+
+def _dialect_insert(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert
+
+
+def _chunks(items: list, size: int = _BULK_CHUNK_SIZE):
+    for offset in range(0, len(items), size):
+        yield items[offset:offset + size]
+
+
+def _bulk_upsert_sessions(
+    db: Session,
+    parsed_sessions: list[dict[str, Any]],
+    now: datetime,
+    stats: dict[str, int],
+    deltas: Optional[list[dict[str, Any]]] = None,
+) -> list[dict[str, Any]]:
+    """
+    Upsert de todas las sesiones con INSERT … ON CONFLICT (redis_session_key)
+    DO UPDATE por lotes, más un INSERT multi-fila de eventos geo. Mismas reglas
+    que _apply_parsed_session: la IP/geo solo cambia con una IP real nueva o
+    para completar geo faltante; first_seen_at, session_start y tenant_db no se
+    tocan en filas existentes. Retorna los eventos geo insertados y, si se
+    pasa `deltas`, agrega ahí los cambios para el canal push.
+    """
+    by_key = {parsed["redis_session_key"]: parsed for parsed in parsed_sessions}
+    if not by_key:
+        return []
+
+    current_cols = (
+        ActiveSession.redis_session_key, ActiveSession.ip_address,
+        ActiveSession.geo_country, ActiveSession.geo_country_code, ActiveSession.geo_region,
+        ActiveSession.geo_city, ActiveSession.geo_lat, ActiveSession.geo_lon,
+        ActiveSession.is_active,
+    )
+    existing: dict[str, Any] = {}
+    for chunk in _chunks(list(by_key)):
+        for row in db.execute(select(*current_cols).where(ActiveSession.redis_session_key.in_(chunk))):
+            existing[row.redis_session_key] = row
+
+    geo_by_ip: dict[str, dict[str, Any]] = {}
+    rows: list[dict[str, Any]] = []
+    geo_events: list[dict[str, Any]] = []
+    for key, parsed in by_key.items():
+        ip = parsed["ip_address"]
+        geo = geo_by_ip.get(ip)
+        if geo is None:
+            geo = geo_by_ip[ip] = geolocate_ip(ip)
+        geo_values = {
+            "geo_country": geo["country"], "geo_country_code": geo["country_code"],
+            "geo_region": geo["region"], "geo_city": geo["city"],
+            "geo_lat": geo["lat"], "geo_lon": geo["lon"],
+        }
+
+        current = existing.get(key)
+        delta_kind = None
+        if current is None:
+            stats["created"] += 1
+            geo_events.append(_geo_event_values(parsed, geo, now))
+            delta_kind = "add"
+        else:
+            stats["updated"] += 1
+            if not current.is_active:
+                delta_kind = "add"
+            if not _is_placeholder_ip(ip) and current.ip_address != ip:
+                geo_events.append(_geo_event_values(parsed, geo, now))
+                delta_kind = delta_kind or "move"
+            elif (
+                not _is_placeholder_ip(current.ip_address)
+                and current.geo_lat is None
+                and geo["lat"] is not None
+            ):
+                ip = current.ip_address
+            else:
+                ip = current.ip_address
+                geo_values = {
+                    "geo_country": current.geo_country, "geo_country_code": current.geo_country_code,
+                    "geo_region": current.geo_region, "geo_city": current.geo_city,
+                    "geo_lat": current.geo_lat, "geo_lon": current.geo_lon,
+                }
+
+        rows.append({
+            "redis_session_key": key,
+            "tenant_db": parsed["tenant_db"],
+            "odoo_uid": parsed["odoo_uid"],
+            "odoo_login": parsed["odoo_login"],
+            "ip_address": ip,
+            "user_agent": parsed.get("user_agent"),
+            **geo_values,
+            "session_start": parsed.get("session_start"),
+            "last_activity": parsed.get("last_activity"),
+            "first_seen_at": now,
+            "last_polled_at": now,
+            "is_active": True,
+        })
+        if deltas is not None and delta_kind:
+            deltas.append(session_delta(delta_kind, rows[-1]))
+
+    # executemany de una sentencia compilada una vez: en PostgreSQL SQLAlchemy
+    # la agrupa en INSERT … VALUES multi-fila (insertmanyvalues).
+    stmt = _dialect_insert(db)(ActiveSession)
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ActiveSession.redis_session_key],
+        set_={
+            "odoo_uid": excluded.odoo_uid,
+            "odoo_login": excluded.odoo_login,
+            "ip_address": excluded.ip_address,
+            "user_agent": func.coalesce(func.nullif(excluded.user_agent, ""), ActiveSession.user_agent),
+            "geo_country": excluded.geo_country,
+            "geo_country_code": excluded.geo_country_code,
+            "geo_region": excluded.geo_region,
+            "geo_city": excluded.geo_city,
+            "geo_lat": excluded.geo_lat,
+            "geo_lon": excluded.geo_lon,
+            "last_activity": excluded.last_activity,
+            "last_polled_at": excluded.last_polled_at,
+            "is_active": True,
+        },
+    )
+    for chunk in _chunks(rows):
+        db.execute(stmt, chunk)
+
+    if geo_events:
+        db.execute(insert(SessionGeoEvent), geo_events)
+    return geo_events
+
+
+def _glob_to_like(pattern: str) -> Optional[str]:
+    """Patrón MATCH de Redis como LIKE (escape '\\'); None si usa clases [...] o escapes."""
+    if "[" in pattern or "\\" in pattern:
+        return None
+    escaped = pattern.replace("%", "\\%").replace("_", "\\_")
+    return escaped.replace("*", "%").replace("?", "_")
+
+
+def _scanned_clean_condition(failed_sources: list[RedisSessionSource]):
+    """
+    Condición que excluye de las bajas las claves de fuentes que no se pudieron
+    escanear (Redis caído, timeout). None si no hay forma de acotarlas: en ese
+    caso no se da de baja nada en este sync.
+    """
+    conditions = []
+    for source in failed_sources:
+        like = _glob_to_like(source.match_pattern)
+        if like is None:
+            return None
+        conditions.append(~ActiveSession.redis_session_key.like(like, escape="\\"))
+    return and_(true(), *conditions)
+
+
+def _deactivate_unseen_sessions(
+    db: Session,
+    now: datetime,
+    failed_sources: Optional[list[RedisSessionSource]] = None,
+) -> list[tuple[str, str]]:
+    """
+    Un solo UPDATE … RETURNING: activas que no se vieron en este sync
+    (last_polled_at < now), salvo las de fuentes que fallaron.
+    Retorna (redis_session_key, tenant_db) de cada baja.
+    """
+    scanned = _scanned_clean_condition(failed_sources or [])
+    if scanned is None:
+        return []
+    result = db.execute(
+        update(ActiveSession)
+        .where(
+            ActiveSession.is_active == True,
+            or_(ActiveSession.last_polled_at.is_(None), ActiveSession.last_polled_at < now),
+            scanned,
+        )
+        .values(is_active=False)
+        .returning(ActiveSession.redis_session_key, ActiveSession.tenant_db)
+        .execution_options(synchronize_session=False)
+    )
+    return [(key, tenant) for key, tenant in result]
+
+
 async def sync_sessions_to_db(db: Session) -> dict[str, int]:
     """
     Escanea Redis → geolocaliza → upsert en active_sessions.
@@ -327,15 +787,31 @@ async def sync_sessions_to_db(db: Session) -> dict[str, int]:
     """
     stats = {"scanned": 0, "created": 0, "updated": 0, "removed": 0}
     try:
-        raw_sessions = await scan_redis_sessions()
+        failed_sources: list[RedisSessionSource] = []
+        raw_sessions = await scan_redis_sessions(failed_sources=failed_sources)
         stats["scanned"] = len(raw_sessions)
         now = datetime.now(timezone.utc).replace(tzinfo=None)
+        parsed_sessions = [parse_session_data(sess) for sess in raw_sessions]
+        deltas = _stream_deltas()
+
+        if _supports_bulk_upsert(db):
+            geo_events = _bulk_upsert_sessions(db, parsed_sessions, now, stats, deltas)
+            removed = _deactivate_unseen_sessions(db, now, failed_sources)
+            stats["removed"] = len(removed)
+            if deltas is not None:
+                deltas.extend(removal_delta(key, tenant) for key, tenant in removed)
+            record_geo_rollups(db, geo_events)
+            refresh_session_summaries(db)
+            db.commit()
+            last_location_index.observe(geo_events)
+            _publish_session_changes(db, deltas, stats)
+            return stats
+
+        # Fallback fila por fila (dialectos sin ON CONFLICT)
         active_keys: set[str] = set()
-
-        for sess in raw_sessions:
-            parsed = parse_session_data(sess)
+        geo_events = []
+        for parsed in parsed_sessions:
             active_keys.add(parsed["redis_session_key"])
-            geo = geolocate_ip(parsed["ip_address"])
 
             # Upsert active_sessions
             result = db.execute(
@@ -343,85 +819,18 @@ async def sync_sessions_to_db(db: Session) -> dict[str, int]:
                     ActiveSession.redis_session_key == parsed["redis_session_key"]
                 )
             )
-            existing = result.scalar_one_or_none()
-
-            if existing:
-                existing.last_polled_at = now
-                existing.last_activity = parsed.get("last_activity")
-                existing.is_active = True
-                existing.odoo_uid = parsed.get("odoo_uid")
-                existing.odoo_login = parsed.get("odoo_login")
-                if parsed.get("user_agent"):
-                    existing.user_agent = parsed.get("user_agent")
-
-                should_refresh_ip = not _is_placeholder_ip(parsed["ip_address"])
-                should_backfill_geo = (
-                    not _is_placeholder_ip(existing.ip_address)
-                    and existing.geo_lat is None
-                    and geo["lat"] is not None
-                )
+            geo_event = _apply_parsed_session(db, parsed, result.scalar_one_or_none(), now, stats, deltas)
+            if geo_event:
+                geo_events.append(geo_event)
 
-                # Actualizar geo si cambió la IP real o si faltaba geo previamente
-                if should_refresh_ip and existing.ip_address != parsed["ip_address"]:
-                    existing.ip_address = parsed["ip_address"]
-                    existing.geo_country = geo["country"]
-                    existing.geo_country_code = geo["country_code"]
-                    existing.geo_region = geo["region"]
-                    existing.geo_city = geo["city"]
-                    existing.geo_lat = geo["lat"]
-                    existing.geo_lon = geo["lon"]
-                elif should_backfill_geo:
-                    existing.geo_country = geo["country"]
-                    existing.geo_country_code = geo["country_code"]
-                    existing.geo_region = geo["region"]
-                    existing.geo_city = geo["city"]
-                    existing.geo_lat = geo["lat"]
-                    existing.geo_lon = geo["lon"]
-                stats["updated"] += 1
-            else:
-                new_session = ActiveSession(
-                    redis_session_key=parsed["redis_session_key"],
-                    tenant_db=parsed["tenant_db"],
-                    odoo_uid=parsed["odoo_uid"],
-                    odoo_login=parsed["odoo_login"],
-                    ip_address=parsed["ip_address"],
-                    user_agent=parsed.get("user_agent"),
-                    geo_country=geo["country"],
-                    geo_country_code=geo["country_code"],
-                    geo_region=geo["region"],
-                    geo_city=geo["city"],
-                    geo_lat=geo["lat"],
-                    geo_lon=geo["lon"],
-                    session_start=parsed.get("session_start"),
-                    last_activity=parsed.get("last_activity"),
-                    first_seen_at=now,
-                    last_polled_at=now,
-                    is_active=True,
-                )
-                db.add(new_session)
-                stats["created"] += 1
-
-                # Registrar evento geo
-                geo_event = SessionGeoEvent(
-                    tenant_db=parsed["tenant_db"],
-                    odoo_login=parsed["odoo_login"] or "unknown",
-                    ip_address=parsed["ip_address"],
-                    geo_country=geo["country"],
-                    geo_country_code=geo["country_code"],
-                    geo_region=geo["region"],
-                    geo_city=geo["city"],
-                    geo_lat=geo["lat"],
-                    geo_lon=geo["lon"],
-                    event_at=now,
-                )
-                db.add(geo_event)
-
-        # Marcar inactivas las sesiones que ya no están en Redis
+        # Marcar inactivas las sesiones que ya no están en Redis (solo de fuentes escaneadas)
+        scanned = _scanned_clean_condition(failed_sources)
         stale_result = db.execute(
             select(ActiveSession).where(
                 and_(
                     ActiveSession.is_active == True,
                     ActiveSession.redis_session_key.notin_(active_keys) if active_keys else ActiveSession.is_active == True,
+                    scanned if scanned is not None else false(),
                 )
             )
         )
@@ -429,8 +838,14 @@ async def sync_sessions_to_db(db: Session) -> dict[str, int]:
             if stale.redis_session_key not in active_keys:
                 stale.is_active = False
                 stats["removed"] += 1
+                if deltas is not None:
+                    deltas.append(removal_delta(stale.redis_session_key, stale.tenant_db))
 
+        record_geo_rollups(db, geo_events)
+        refresh_session_summaries(db)
         db.commit()
+        last_location_index.observe(geo_events)
+        _publish_session_changes(db, deltas, stats)
     except Exception as e:
         logger.error("Error syncing sessions: %s", e)
         db.rollback()
@@ -439,12 +854,92 @@ async def sync_sessions_to_db(db: Session) -> dict[str, int]:
     return stats
 
 
+async def apply_changed_sessions(
+    db: Session,
+    changed: dict[RedisSessionSource, set[str]],
+) -> dict[str, int]:
+    """
+    Sync incremental: relee solo las claves indicadas (MGET por fuente) y
+    aplica upsert o baja. Una clave que ya no existe (del/expired) o que dejó
+    de ser una sesión autenticada se marca inactiva.
+    Retorna stats: {scanned, created, updated, removed}.
+    """
+    stats = {"scanned": 0, "created": 0, "updated": 0, "removed": 0}
+    present: dict[str, dict[str, Any]] = {}
+    gone: set[str] = set()
+
+    for source, keys in changed.items():
+        if not keys:
+            continue
+        r = await get_redis_client(source.redis_db)
+        ordered = sorted(keys)
+        for offset in range(0, len(ordered), _SCAN_PAGE_SIZE):
+            chunk = ordered[offset:offset + _SCAN_PAGE_SIZE]
+            values = await r.mget(chunk)
+            for key, raw in zip(chunk, values):
+                entry = None
+                if raw:
+                    try:
+                        entry = _build_session_entry(key, raw, source)
+                    except Exception as e:
+                        logger.debug("Error parsing session key %s from %s: %s", key, source.app_name, e)
+                if entry is None:
+                    gone.add(key)
+                else:
+                    present[key] = entry
+
+    stats["scanned"] = len(present)
+    if not present and not gone:
+        return stats
+
+    try:
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        bulk = _supports_bulk_upsert(db)
+        lookup = gone if bulk else set(present) | gone
+        existing_rows = db.execute(
+            select(ActiveSession).where(ActiveSession.redis_session_key.in_(lookup))
+        ).scalars().all() if lookup else []
+        existing = {row.redis_session_key: row for row in existing_rows}
+
+        parsed = {key: parse_session_data(entry) for key, entry in present.items()}
+        touched_tenants = {item["tenant_db"] for item in parsed.values()}
+        deltas = _stream_deltas()
+        geo_events: list[dict[str, Any]] = []
+        if bulk:
+            geo_events = _bulk_upsert_sessions(db, list(parsed.values()), now, stats, deltas)
+        else:
+            for key, item in parsed.items():
+                geo_event = _apply_parsed_session(db, item, existing.get(key), now, stats, deltas)
+                if geo_event:
+                    geo_events.append(geo_event)
+
+        for key in gone:
+            row = existing.get(key)
+            if row is not None and row.is_active:
+                row.is_active = False
+                touched_tenants.add(row.tenant_db)
+                stats["removed"] += 1
+                if deltas is not None:
+                    deltas.append(removal_delta(key, row.tenant_db))
+
+        record_geo_rollups(db, geo_events)
+        refresh_session_summaries(db, touched_tenants)
+        db.commit()
+        last_location_index.observe(geo_events)
+        _publish_session_changes(db, deltas, stats)
+    except Exception as e:
+        logger.error("Error applying incremental session sync: %s", e)
+        db.rollback()
+        raise
+
+    return stats
+
+
 async def terminate_redis_session(session_key: str) -> bool:
     """Elimina una sesión de Redis para forzar logout."""
     try:
-        r = await get_redis_pool()
+        r = await get_redis_client()
         deleted = await r.delete(session_key)
-        await r.aclose()
         return deleted > 0
     except Exception as e:
         logger.error("Error terminating session %s: %s", session_key, e)
@@ -480,77 +975,12 @@ async def get_active_sessions_by_user(
 
 
 async def get_session_stats(db: Session) -> dict[str, Any]:
-    """Dashboard global stats."""
-    from sqlalchemy import func
-    total = db.execute(
-        select(func.count(ActiveSession.id)).where(ActiveSession.is_active == True)
-    )
-    by_tenant = db.execute(
-        select(
-            ActiveSession.tenant_db,
-            func.count(ActiveSession.id).label("count"),
-        )
-        .where(ActiveSession.is_active == True)
-        .group_by(ActiveSession.tenant_db)
-        .order_by(func.count(ActiveSession.id).desc())
-    )
-    by_country = db.execute(
-        select(
-            ActiveSession.geo_country_code,
-            ActiveSession.geo_country,
-            func.count(ActiveSession.id).label("count"),
-        )
-        .where(and_(ActiveSession.is_active == True, ActiveSession.geo_country_code.isnot(None)))
-        .group_by(ActiveSession.geo_country_code, ActiveSession.geo_country)
-        .order_by(func.count(ActiveSession.id).desc())
-    )
-    return {
-        "total_active": total.scalar() or 0,
-        "by_tenant": [
-            {"tenant": t, "count": c} for t, c in by_tenant.fetchall()
-        ],
-        "by_country": [
-            {"code": code, "country": name, "count": c}
-            for code, name, c in by_country.fetchall()
-        ],
-    }
+    """Dashboard global stats (read model session_tenant_summaries)."""
+    return get_summary_stats(db)
 
 
 async def get_geo_heatmap_data(
-    db: Session, days: int = 30
+    db: Session, days: int = 30, tenant_db: Optional[str] = None
 ) -> list[dict[str, Any]]:
-    """Datos para mapa de calor geográfico."""
-    from sqlalchemy import func
-    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
-    result = db.execute(
-        select(
-            SessionGeoEvent.geo_country_code,
-            SessionGeoEvent.geo_country,
-            SessionGeoEvent.geo_city,
-            SessionGeoEvent.geo_lat,
-            SessionGeoEvent.geo_lon,
-            func.count(SessionGeoEvent.id).label("count"),
-        )
-        .where(
-            and_(
-                SessionGeoEvent.event_at >= cutoff,
-                SessionGeoEvent.geo_lat.isnot(None),
-            )
-        )
-        .group_by(
-            SessionGeoEvent.geo_country_code,
-            SessionGeoEvent.geo_country,
-            SessionGeoEvent.geo_city,
-            SessionGeoEvent.geo_lat,
-            SessionGeoEvent.geo_lon,
-        )
-        .order_by(func.count(SessionGeoEvent.id).desc())
-        .limit(500)
-    )
-    return [
-        {
-            "country_code": cc, "country": cn, "city": city,
-            "lat": lat, "lon": lon, "count": cnt,
-        }
-        for cc, cn, city, lat, lon, cnt in result.fetchall()
-    ]
+    """Datos para mapa de calor geográfico (suma de rollups diarios)."""
+    return get_geo_heatmap_rollup(db, days=days, tenant_db=tenant_db)
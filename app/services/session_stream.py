@@ -0,0 +1,149 @@
+"""
+DSAM — Canal push de sesiones en vivo (Server-Sent Events).
+
+El sync DSAM produce deltas (add / move / remove) y un evento "sync" con los
+contadores del dashboard; session_broadcaster los reparte en proceso a cada
+admin conectado. El costo en BD es por sync, no por suscriptor: los
+clientes no consultan active_sessions mientras están conectados.
+
+Backpressure: cada suscriptor tiene una cola acotada. Si un cliente lento
+la llena se descartan sus eventos pendientes y recibe un único "resync"
+(debe recargar el snapshot vía /geo/live y /dashboard); los demás clientes
+no se ven afectados.
+"""
+import asyncio
+import json
+import logging
+import threading
+from typing import Any, Optional
+
+from ..config import DSAM_STREAM_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStreamSubscriber:
+    """Cola acotada de un cliente, ligada al event loop donde se suscribió."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.resyncs = 0
+
+    def offer(self, events: list[dict[str, Any]]) -> None:
+        """Encola un lote; se ejecuta en el loop del suscriptor."""
+        for event in events:
+            if self.queue.full():
+                self._overflow()
+                return
+            self.queue.put_nowait(event)
+
+    def _overflow(self) -> None:
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.resyncs += 1
+        self.queue.put_nowait({"type": "resync"})
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict[str, Any]]:
+        """Siguiente evento, o None si vence `timeout` (para heartbeats)."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class SessionBroadcaster:
+    """Fan-out en proceso de los deltas de sesiones a los suscriptores SSE."""
+
+    def __init__(self, queue_size: int = DSAM_STREAM_QUEUE_SIZE):
+        self._queue_size = queue_size
+        self._subscribers: set[SessionStreamSubscriber] = set()
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._metrics = {"published": 0, "batches": 0}
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> SessionStreamSubscriber:
+        """Registra un cliente; debe llamarse dentro de su event loop."""
+        subscriber = SessionStreamSubscriber(asyncio.get_running_loop(), self._queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: SessionStreamSubscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, events: list[dict[str, Any]]) -> int:
+        """
+        Numera y reparte un lote de eventos sin bloquear (seguro desde otros
+        hilos). Retorna a cuántos suscriptores se entregó.
+        """
+        if not events:
+            return 0
+        with self._lock:
+            batch = []
+            for event in events:
+                self._seq += 1
+                batch.append({"id": self._seq, **event})
+            subscribers = list(self._subscribers)
+            self._metrics["published"] += len(batch)
+            self._metrics["batches"] += 1
+
+        delivered = 0
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, batch)
+                delivered += 1
+            except RuntimeError:
+                # Loop cerrado: el cliente ya no existe
+                self.unsubscribe(subscriber)
+        return delivered
+
+    def metrics(self) -> dict[str, Any]:
+        subscribers = list(self._subscribers)
+        return {
+            **self._metrics,
+            "subscribers": len(subscribers),
+            "dropped": sum(s.dropped for s in subscribers),
+            "resyncs": sum(s.resyncs for s in subscribers),
+        }
+
+
+_DELTA_FIELDS = (
+    "tenant_db", "odoo_login", "ip_address", "geo_country", "geo_country_code",
+    "geo_city", "geo_lat", "geo_lon",
+)
+
+
+def session_delta(kind: str, session: Any) -> dict[str, Any]:
+    """Delta add/move con la posición actual (ActiveSession o dict de columnas)."""
+    if isinstance(session, dict):
+        values = {field: session.get(field) for field in _DELTA_FIELDS}
+        key = session["redis_session_key"]
+    else:
+        values = {field: getattr(session, field) for field in _DELTA_FIELDS}
+        key = session.redis_session_key
+    return {"type": kind, "key": key, **values}
+
+
+def removal_delta(key: str, tenant_db: str) -> dict[str, Any]:
+    return {"type": "remove", "key": key, "tenant_db": tenant_db}
+
+
+def format_sse(event: dict[str, Any]) -> str:
+    """Serializa un evento al formato text/event-stream."""
+    lines = []
+    if "id" in event:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event.get('type', 'message')}")
+    lines.append(f"data: {json.dumps(event, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+session_broadcaster = SessionBroadcaster()
@@ -0,0 +1,276 @@
+"""
+DSAM — Read model de sesiones activas para el dashboard y la vista agrupada.
+
+session_tenant_summaries guarda, por tenant, los contadores (sesiones,
+usuarios facturables/operativos/desconocidos), las sesiones por país y la
+vista agrupada por usuario. El ciclo de sync la recalcula solo para los
+tenants tocados, dentro de la misma transacción que actualiza
+active_sessions; el dashboard y /sessions/grouped la leen en O(tenants)
+con paginación por cursor (total_sessions DESC, tenant_db ASC).
+"""
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import and_, delete, desc, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from ..models.database import ActiveSession, Customer, SessionTenantSummary
+from .seat_events import get_non_billable_logins
+
+logger = logging.getLogger(__name__)
+
+
+def load_customers_by_subdomain(db: Session, tenant_names: set[str]) -> dict[str, Customer]:
+    if not tenant_names:
+        return {}
+    result = db.execute(select(Customer).where(Customer.subdomain.in_(tenant_names)))
+    return {customer.subdomain: customer for customer in result.scalars().all()}
+
+
+def classify_account_type(tenant_db: str, login: Optional[str], customer: Optional[Customer]) -> str:
+    normalized_login = (login or "").strip().lower()
+    if not normalized_login:
+        return "unknown"
+    excluded = get_non_billable_logins(
+        tenant_db,
+        customer=customer,
+        admin_email=customer.email if customer else None,
+    )
+    return "operational" if normalized_login in excluded else "billable"
+
+
+def serialize_session(session: ActiveSession, customer: Optional[Customer]) -> dict[str, Any]:
+    return {
+        "id": session.id,
+        "redis_key": session.redis_session_key,
+        "tenant_db": session.tenant_db,
+        "customer_name": customer.company_name if customer else None,
+        "odoo_login": session.odoo_login,
+        "odoo_uid": session.odoo_uid,
+        "ip_address": session.ip_address,
+        "country": session.geo_country,
+        "country_code": session.geo_country_code,
+        "region": session.geo_region,
+        "city": session.geo_city,
+        "lat": session.geo_lat,
+        "lon": session.geo_lon,
+        "session_start": session.session_start.isoformat() if session.session_start else None,
+        "last_activity": session.last_activity.isoformat() if session.last_activity else None,
+        "first_seen": session.first_seen_at.isoformat() if session.first_seen_at else None,
+        "is_active": session.is_active,
+        "account_type": classify_account_type(session.tenant_db, session.odoo_login, customer),
+    }
+
+
+def build_grouped_sessions(sessions: list[ActiveSession], customers_by_subdomain: dict[str, Customer]) -> list[dict[str, Any]]:
+    grouped: dict[str, dict[str, Any]] = {}
+    for session in sessions:
+        tenant_group = grouped.setdefault(
+            session.tenant_db,
+            {
+                "tenant_db": session.tenant_db,
+                "customer_name": customers_by_subdomain.get(session.tenant_db).company_name if customers_by_subdomain.get(session.tenant_db) else None,
+                "total_sessions": 0,
+                "billable_users": 0,
+                "operational_users": 0,
+                "unknown_users": 0,
+                "users": {},
+            },
+        )
+        tenant_group["total_sessions"] += 1
+        account_type = classify_account_type(session.tenant_db, session.odoo_login, customers_by_subdomain.get(session.tenant_db))
+        user_key = (session.odoo_login or "(sin-login)").strip() or "(sin-login)"
+        user_entry = tenant_group["users"].setdefault(
+            user_key,
+            {
+                "odoo_login": session.odoo_login,
+                "account_type": account_type,
+                "session_count": 0,
+                "ip_addresses": [],
+                "last_activity": None,
+                "country": session.geo_country,
+                "city": session.geo_city,
+                "sessions": [],
+            },
+        )
+        user_entry["session_count"] += 1
+        user_entry["sessions"].append(serialize_session(session, customers_by_subdomain.get(session.tenant_db)))
+        if session.ip_address and session.ip_address not in user_entry["ip_addresses"]:
+            user_entry["ip_addresses"].append(session.ip_address)
+        if session.last_activity:
+            current_last = user_entry["last_activity"]
+            if current_last is None or session.last_activity.isoformat() > current_last:
+                user_entry["last_activity"] = session.last_activity.isoformat()
+
+    normalized_groups = []
+    for tenant_group in grouped.values():
+        users = list(tenant_group["users"].values())
+        users.sort(key=lambda item: ((item["account_type"] != "billable"), item["odoo_login"] or ""))
+        tenant_group["users"] = users
+        tenant_group["billable_users"] = sum(1 for item in users if item["account_type"] == "billable")
+        tenant_group["operational_users"] = sum(1 for item in users if item["account_type"] == "operational")
+        tenant_group["unknown_users"] = sum(1 for item in users if item["account_type"] == "unknown")
+        normalized_groups.append(tenant_group)
+
+    normalized_groups.sort(key=lambda item: item["total_sessions"], reverse=True)
+    return normalized_groups
+
+
+def _country_counts(sessions: list[ActiveSession]) -> dict[str, list[dict[str, Any]]]:
+    counts: dict[str, Counter] = {}
+    for session in sessions:
+        if session.geo_country_code is None:
+            continue
+        counts.setdefault(session.tenant_db, Counter())[(session.geo_country_code, session.geo_country)] += 1
+    return {
+        tenant: [
+            {"code": code, "country": country, "count": count}
+            for (code, country), count in counter.most_common()
+        ]
+        for tenant, counter in counts.items()
+    }
+
+
+def refresh_session_summaries(db: Session, tenants: Optional[Iterable[str]] = None) -> int:
+    """
+    Recalcula el read model para `tenants` (None = todos) desde las sesiones
+    activas. Los tenants sin sesiones activas pierden su fila. No hace
+    commit: va en la transacción del sync. Retorna las filas escritas.
+    """
+    scope = None if tenants is None else {tenant for tenant in tenants if tenant}
+    if scope is not None and not scope:
+        return 0
+
+    db.flush()
+    query = select(ActiveSession).where(ActiveSession.is_active == True)
+    purge = delete(SessionTenantSummary)
+    if scope is not None:
+        query = query.where(ActiveSession.tenant_db.in_(scope))
+        purge = purge.where(SessionTenantSummary.tenant_db.in_(scope))
+
+    sessions = db.execute(
+        query.order_by(ActiveSession.tenant_db, ActiveSession.odoo_login, desc(ActiveSession.last_activity))
+    ).scalars().all()
+    customers_by_subdomain = load_customers_by_subdomain(db, {s.tenant_db for s in sessions})
+    countries = _country_counts(sessions)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    rows = [
+        {
+            "tenant_db": group["tenant_db"],
+            "customer_name": group["customer_name"],
+            "total_sessions": group["total_sessions"],
+            "billable_users": group["billable_users"],
+            "operational_users": group["operational_users"],
+            "unknown_users": group["unknown_users"],
+            "countries": countries.get(group["tenant_db"], []),
+            "users": group["users"],
+            "refreshed_at": now,
+        }
+        for group in build_grouped_sessions(sessions, customers_by_subdomain)
+    ]
+
+    db.execute(purge.execution_options(synchronize_session=False))
+    if rows:
+        db.execute(insert(SessionTenantSummary), rows)
+    return len(rows)
+
+
+def get_summary_stats(db: Session) -> dict[str, Any]:
+    """Totales, sesiones por tenant y por país a partir del read model."""
+    rows = db.execute(
+        select(SessionTenantSummary.tenant_db, SessionTenantSummary.total_sessions, SessionTenantSummary.countries)
+        .order_by(SessionTenantSummary.total_sessions.desc(), SessionTenantSummary.tenant_db)
+    ).fetchall()
+    by_country: Counter = Counter()
+    for _, _, countries in rows:
+        for item in countries or []:
+            by_country[(item["code"], item["country"])] += item["count"]
+    return {
+        "total_active": sum(total for _, total, _ in rows),
+        "by_tenant": [{"tenant": tenant, "count": total} for tenant, total, _ in rows],
+        "by_country": [
+            {"code": code, "country": name, "count": count}
+            for (code, name), count in by_country.most_common()
+        ],
+    }
+
+
+def encode_summary_cursor(total_sessions: int, tenant_db: str) -> str:
+    return f"{total_sessions}:{tenant_db}"
+
+
+def decode_summary_cursor(cursor: str) -> tuple[int, str]:
+    """Cursor `total_sessions:tenant_db`; ValueError si está mal formado."""
+    total, sep, tenant = cursor.partition(":")
+    if not sep or not tenant:
+        raise ValueError(f"Cursor inválido: {cursor!r}")
+    return int(total), tenant
+
+
+def list_tenant_summaries(
+    db: Session,
+    tenant: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+    """
+    Página de la vista agrupada (mismo formato que build_grouped_sessions)
+    ordenada por total_sessions DESC, tenant_db ASC. Retorna (grupos, meta)
+    con los totales del filtro y `next_cursor`.
+    """
+    filters = []
+    if tenant:
+        filters.append(SessionTenantSummary.tenant_db.ilike(f"%{tenant.strip()}%"))
+
+    total_tenants, total_sessions, total_users = db.execute(
+        select(
+            func.count(SessionTenantSummary.id),
+            func.coalesce(func.sum(SessionTenantSummary.total_sessions), 0),
+            func.coalesce(func.sum(
+                SessionTenantSummary.billable_users
+                + SessionTenantSummary.operational_users
+                + SessionTenantSummary.unknown_users
+            ), 0),
+        ).where(*filters)
+    ).one()
+
+    page_filters = list(filters)
+    if cursor:
+        after_total, after_tenant = decode_summary_cursor(cursor)
+        page_filters.append(or_(
+            SessionTenantSummary.total_sessions < after_total,
+            and_(SessionTenantSummary.total_sessions == after_total, SessionTenantSummary.tenant_db > after_tenant),
+        ))
+    summaries = db.execute(
+        select(SessionTenantSummary)
+        .where(*page_filters)
+        .order_by(SessionTenantSummary.total_sessions.desc(), SessionTenantSummary.tenant_db)
+        .limit(limit + 1)
+    ).scalars().all()
+
+    page = summaries[:limit]
+    groups = [
+        {
+            "tenant_db": row.tenant_db,
+            "customer_name": row.customer_name,
+            "total_sessions": row.total_sessions,
+            "billable_users": row.billable_users,
+            "operational_users": row.operational_users,
+            "unknown_users": row.unknown_users,
+            "users": row.users or [],
+        }
+        for row in page
+    ]
+    next_cursor = (
+        encode_summary_cursor(page[-1].total_sessions, page[-1].tenant_db)
+        if len(summaries) > limit else None
+    )
+    return groups, {
+        "total_tenants": total_tenants,
+        "total_sessions": int(total_sessions),
+        "total_users": int(total_users),
+        "limit": limit,
+        "next_cursor": next_cursor,
+    }
@@ -5,77 +5,118 @@ Fallback para contabilizar seats cuando Odoo no reporta correctamente.
 """
 import logging
 from datetime import datetime, timezone
-from typing import Any
+from typing import Any, Optional
 
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, func, and_, case, update
 from sqlalchemy.orm import Session
 
 from ..models.database import (
     ActiveSession, Subscription, SeatHighWater,
     TenantSessionConfig, SubscriptionStatus, Customer,
 )
-from ..services.seat_events import get_non_billable_logins, record_hwm_snapshot
+from ..services.seat_events import non_billable_login_clause, record_hwm_snapshots
 
 logger = logging.getLogger(__name__)
 
+_AUDITED_STATUSES = (
+    SubscriptionStatus.active,
+    SubscriptionStatus.trialing,
+    SubscriptionStatus.past_due,
+)
+_IN_CHUNK = 1000
+
+
+def _normalized_login():
+    return func.lower(func.trim(func.coalesce(ActiveSession.odoo_login, "")))
+
 
-async def run_seat_audit(db: Session) -> dict[str, Any]:
+def _tenant_seat_counts(db: Session, tenant_db: Optional[str] = None) -> dict[str, tuple[int, int, int]]:
     """
-    Ejecuta auditoría de seats:
-    1. Cuenta sesiones activas por tenant desde active_sessions
-    2. Compara con el HWM registrado y la suscripción
-    3. Registra discrepancias
+    Una consulta: por tenant (subdominio de cliente), logins distintos
+    facturables, logins operativos (no facturables) y total de sesiones activas.
     """
-    # Sesiones activas por tenant
-    active_sessions = db.execute(
-        select(ActiveSession).where(ActiveSession.is_active == True)
-    ).scalars().all()
-
-    tenant_logins: dict[str, set[str]] = {}
-    tenant_total_sessions: dict[str, int] = {}
-    for session in active_sessions:
-        tenant_total_sessions[session.tenant_db] = tenant_total_sessions.get(session.tenant_db, 0) + 1
-        login = (session.odoo_login or "").strip().lower()
-        if login:
-            tenant_logins.setdefault(session.tenant_db, set()).add(login)
-
-    # Cargar suscripciones activas
-    subs_result = db.execute(
-        select(Subscription).where(
-            Subscription.status.in_([
-                SubscriptionStatus.ACTIVE,
-                SubscriptionStatus.TRIALING,
-                SubscriptionStatus.PAST_DUE,
-            ])
+    login = _normalized_login()
+    internal = non_billable_login_clause(login, Customer.subdomain, Customer.email)
+    query = (
+        select(
+            ActiveSession.tenant_db,
+            func.count(func.distinct(case((and_(login != "", ~internal), login)))),
+            func.count(func.distinct(case((and_(login != "", internal), login)))),
+            func.count(ActiveSession.id),
         )
+        .join(Customer, Customer.subdomain == ActiveSession.tenant_db)
+        .where(ActiveSession.is_active == True)
+        .group_by(ActiveSession.tenant_db)
+    )
+    if tenant_db:
+        query = query.where(ActiveSession.tenant_db == tenant_db)
+    return {tenant: (billable, operational, total) for tenant, billable, operational, total in db.execute(query)}
+
+
+def _tenant_logins(db: Session, tenant_db: Optional[str] = None) -> dict[str, tuple[list[str], list[str]]]:
+    """Logins distintos por tenant separados en (facturables, operativos), ya filtrados en SQL."""
+    login = _normalized_login()
+    internal = non_billable_login_clause(login, Customer.subdomain, Customer.email)
+    query = (
+        select(ActiveSession.tenant_db, login.label("login"), internal.label("internal"))
+        .join(Customer, Customer.subdomain == ActiveSession.tenant_db)
+        .where(ActiveSession.is_active == True, login != "")
+        .group_by(ActiveSession.tenant_db, login, internal)
+        .order_by(ActiveSession.tenant_db, login)
     )
-    subscriptions = subs_result.scalars().all()
+    if tenant_db:
+        query = query.where(ActiveSession.tenant_db == tenant_db)
+    result: dict[str, tuple[list[str], list[str]]] = {}
+    for tenant, name, is_internal in db.execute(query):
+        billable, operational = result.setdefault(tenant, ([], []))
+        (operational if is_internal else billable).append(name)
+    return result
+
+
+def _audited_subscriptions(db: Session, tenant_db: Optional[str] = None) -> list[Any]:
+    """Suscripciones auditables con los campos del cliente necesarios (join, sin lazy loads)."""
+    query = (
+        select(
+            Subscription.id, Subscription.user_count, Subscription.plan_name, Subscription.status,
+            Customer.id.label("customer_id"), Customer.subdomain, Customer.company_name,
+            Customer.user_count.label("customer_user_count"),
+        )
+        .join(Customer, Customer.id == Subscription.customer_id)
+        .where(Subscription.status.in_(_AUDITED_STATUSES), Customer.subdomain.isnot(None), Customer.subdomain != "")
+        .order_by(Subscription.id)
+    )
+    if tenant_db:
+        query = query.where(Customer.subdomain == tenant_db)
+    return db.execute(query).all()
+
+
+async def run_seat_audit(db: Session, include_logins: bool = False) -> dict[str, Any]:
+    """
+    Ejecuta auditoría de seats:
+    1. Cuenta logins distintos por tenant en SQL (sin cuentas internas)
+    2. Compara con la suscripción
+    3. Registra HWM de todas las suscripciones en lote y marca la auditoría
+       en tenant_session_configs con un UPDATE por lote
+    Con include_logins=True agrega las listas de logins a cada entrada.
+    """
+    counts = _tenant_seat_counts(db)
+    logins = _tenant_logins(db) if include_logins else {}
+    subscriptions = _audited_subscriptions(db)
 
     audit_results = []
+    snapshots = []
     now = datetime.now(timezone.utc).replace(tzinfo=None)
     for sub in subscriptions:
-        customer = sub.customer
-        tenant_db = customer.subdomain if customer and customer.subdomain else None
+        tenant_db = sub.subdomain
+        unique_users, operational_users, total_sessions = counts.get(tenant_db, (0, 0, 0))
 
-        if not tenant_db:
-            continue
-
-        logins = tenant_logins.get(tenant_db, set())
-        excluded_logins = get_non_billable_logins(tenant_db, customer=customer, admin_email=customer.email if customer else None)
-        billable_logins = {login for login in logins if login not in excluded_logins}
-        operational_logins = {login for login in logins if login in excluded_logins}
-
-        unique_users = len(billable_logins)
-        operational_users = len(operational_logins)
-        total_sessions = tenant_total_sessions.get(tenant_db, 0)
-
-        seats_purchased = sub.user_count or (customer.user_count if customer else 0) or 1
+        seats_purchased = sub.user_count or sub.customer_user_count or 1
         seats_diff = unique_users - seats_purchased
 
         audit_entry = {
             "tenant_db": tenant_db,
             "subscription_id": sub.id,
-            "customer_name": customer.company_name if customer else None,
+            "customer_name": sub.company_name,
             "seats_purchased": seats_purchased,
             "unique_active_users": unique_users,
             "operational_users": operational_users,
@@ -83,31 +124,23 @@ async def run_seat_audit(db: Session) -> dict[str, Any]:
             "seats_diff": seats_diff,
             "over_limit": seats_diff > 0,
             "plan": sub.plan_name,
-            "active_logins": sorted(billable_logins),
-            "operational_logins": sorted(operational_logins),
         }
+        if include_logins:
+            billable_logins, operational_logins = logins.get(tenant_db, ([], []))
+            audit_entry["active_logins"] = billable_logins
+            audit_entry["operational_logins"] = operational_logins
         audit_results.append(audit_entry)
 
-        try:
-            config = db.execute(
-                select(TenantSessionConfig).where(TenantSessionConfig.tenant_db == tenant_db)
-            ).scalar_one_or_none()
-            if config:
-                config.last_seat_audit_at = now
-
-            record_hwm_snapshot(
-                db,
-                sub,
-                user_count_after=unique_users,
-                source="dsam-seat-audit",
-                metadata={
-                    "tenant_db": tenant_db,
-                    "operational_users": operational_users,
-                    "total_sessions": total_sessions,
-                },
-            )
-        except Exception:
-            logger.exception("Error registrando HWM de auditoría para tenant=%s subscription=%s", tenant_db, sub.id)
+        snapshots.append({
+            "subscription_id": sub.id,
+            "customer_id": sub.customer_id,
+            "user_count_after": unique_users,
+            "metadata": {
+                "tenant_db": tenant_db,
+                "operational_users": operational_users,
+                "total_sessions": total_sessions,
+            },
+        })
 
         if seats_diff > 0:
             logger.warning(
@@ -115,7 +148,20 @@ async def run_seat_audit(db: Session) -> dict[str, Any]:
                 tenant_db, unique_users, seats_purchased, seats_diff,
             )
 
-    db.commit()
+    try:
+        tenants = sorted({entry["tenant_db"] for entry in audit_results})
+        for offset in range(0, len(tenants), _IN_CHUNK):
+            db.execute(
+                update(TenantSessionConfig)
+                .where(TenantSessionConfig.tenant_db.in_(tenants[offset:offset + _IN_CHUNK]))
+                .values(last_seat_audit_at=now)
+                .execution_options(synchronize_session=False)
+            )
+        record_hwm_snapshots(db, snapshots, source="dsam-seat-audit")
+        db.commit()
+    except Exception:
+        logger.exception("Error registrando HWM de auditoría (%s suscripciones)", len(snapshots))
+        db.rollback()
 
     return {
         "timestamp": now.isoformat(),
@@ -131,66 +177,53 @@ async def get_seat_reconciliation_report(
 ) -> dict[str, Any]:
     """
     Reporte de reconciliación de seats para un tenant o todos.
-    Combina datos de active_sessions + seat_events + subscriptions.
+    Combina datos de active_sessions + seat_high_water + subscriptions, con
+    una consulta por fuente (el último HWM por suscripción vía row_number).
     """
-    subscriptions_query = select(Subscription).where(
-        Subscription.status.in_([
-            SubscriptionStatus.ACTIVE,
-            SubscriptionStatus.TRIALING,
-            SubscriptionStatus.PAST_DUE,
-        ])
-    )
-    subscriptions = db.execute(subscriptions_query).scalars().all()
-
-    active_sessions = db.execute(
-        select(ActiveSession).where(ActiveSession.is_active == True)
-    ).scalars().all()
-
-    tenant_logins: dict[str, set[str]] = {}
-    tenant_total_sessions: dict[str, int] = {}
-    for session in active_sessions:
-        tenant_total_sessions[session.tenant_db] = tenant_total_sessions.get(session.tenant_db, 0) + 1
-        login = (session.odoo_login or "").strip().lower()
-        if login:
-            tenant_logins.setdefault(session.tenant_db, set()).add(login)
+    subscriptions = _audited_subscriptions(db, tenant_db)
+    counts = _tenant_seat_counts(db, tenant_db)
+    logins = _tenant_logins(db, tenant_db)
+
+    latest_hwm: dict[int, Any] = {}
+    sub_ids = [sub.id for sub in subscriptions]
+    for offset in range(0, len(sub_ids), _IN_CHUNK):
+        ranked = (
+            select(
+                SeatHighWater.subscription_id, SeatHighWater.hwm_count,
+                SeatHighWater.period_date, SeatHighWater.created_at,
+                func.row_number().over(
+                    partition_by=SeatHighWater.subscription_id,
+                    order_by=(SeatHighWater.period_date.desc(), SeatHighWater.created_at.desc()),
+                ).label("rn"),
+            )
+            .where(SeatHighWater.subscription_id.in_(sub_ids[offset:offset + _IN_CHUNK]))
+            .subquery()
+        )
+        for row in db.execute(select(ranked).where(ranked.c.rn == 1)):
+            latest_hwm[row.subscription_id] = row
 
     data = []
     for sub in subscriptions:
-        customer = sub.customer
-        current_tenant = customer.subdomain if customer and customer.subdomain else None
-        if not current_tenant:
-            continue
-        if tenant_db and current_tenant != tenant_db:
-            continue
-
-        excluded_logins = get_non_billable_logins(current_tenant, customer=customer, admin_email=customer.email if customer else None)
-        active_logins = tenant_logins.get(current_tenant, set())
-        billable_logins = sorted(login for login in active_logins if login not in excluded_logins)
-        operational_logins = sorted(login for login in active_logins if login in excluded_logins)
-
-        hwm = db.execute(
-            select(SeatHighWater)
-            .where(SeatHighWater.subscription_id == sub.id)
-            .order_by(SeatHighWater.period_date.desc(), SeatHighWater.created_at.desc())
-            .limit(1)
-        ).scalar_one_or_none()
-
-        seats_purchased = sub.user_count or (customer.user_count if customer else 0) or 1
-        active_users = len(billable_logins)
+        current_tenant = sub.subdomain
+        billable_logins, operational_logins = logins.get(current_tenant, ([], []))
+        hwm = latest_hwm.get(sub.id)
+
+        seats_purchased = sub.user_count or sub.customer_user_count or 1
+        active_users = counts.get(current_tenant, (0, 0, 0))[0]
 
         data.append({
             "tenant_db": current_tenant,
-            "customer_name": customer.company_name if customer else None,
+            "customer_name": sub.company_name,
             "subscription_id": sub.id,
             "plan": sub.plan_name,
             "subscription_status": sub.status.value if sub.status else None,
             "seats_purchased": seats_purchased,
             "active_users": active_users,
             "operational_users": len(operational_logins),
-            "active_sessions": tenant_total_sessions.get(current_tenant, 0),
+            "active_sessions": counts.get(current_tenant, (0, 0, 0))[2],
             "hwm_value": hwm.hwm_count if hwm else None,
             "hwm_date": hwm.period_date.isoformat() if hwm else None,
-            "last_snapshot_at": hwm.created_at.isoformat() if hwm else None,
+            "last_snapshot_at": hwm.created_at.isoformat() if hwm and hwm.created_at else None,
             "seats_diff": active_users - seats_purchased,
             "over_limit": active_users > seats_purchased,
             "billable_logins": billable_logins,
@@ -22,6 +22,8 @@ export const auditApi = {
     status?: string;
     limit?: number;
     offset?: number;
+    /** next_cursor de la página anterior (paginación keyset) */
+    cursor?: string;
   }): Promise<AuditEventsResponse> {
     const qs = new URLSearchParams();
     if (params?.event_type) qs.set('event_type', params.event_type);
@@ -31,10 +33,41 @@ export const auditApi = {
     if (params?.status) qs.set('status', params.status);
     if (params?.limit) qs.set('limit', String(params.limit));
     if (params?.offset) qs.set('offset', String(params.offset));
+    if (params?.cursor) qs.set('cursor', params.cursor);
     const q = qs.toString();
     return api.get<AuditEventsResponse>(`/api/audit${q ? '?' + q : ''}`);
   },
 
+  /** Eventos de seguridad recientes (login, WAF, 2FA) del buffer en memoria del backend. */
+  async recentSecurity(params?: {
+    event?: string;
+    username?: string;
+    start_date?: string;
+    limit?: number;
+  }): Promise<{ items: Record<string, unknown>[]; total: number }> {
+    const qs = new URLSearchParams();
+    if (params?.event) qs.set('event', params.event);
+    if (params?.username) qs.set('username', params.username);
+    if (params?.start_date) qs.set('start_date', params.start_date);
+    if (params?.limit) qs.set('limit', String(params.limit));
+    const q = qs.toString();
+    return api.get(`/api/audit/security/recent${q ? '?' + q : ''}`);
+  },
+
+  /** URL de descarga con los mismos filtros que list() (sin paginación). */
+  exportUrl(
+    params?: { event_type?: string; actor_id?: number; resource?: string; tenant?: string; status?: string },
+    format: 'csv' | 'xlsx' = 'csv',
+  ): string {
+    const qs = new URLSearchParams({ format });
+    if (params?.event_type) qs.set('event_type', params.event_type);
+    if (params?.actor_id) qs.set('actor_id', String(params.actor_id));
+    if (params?.resource) qs.set('resource', params.resource);
+    if (params?.tenant) qs.set('tenant', params.tenant);
+    if (params?.status) qs.set('status', params.status);
+    return `${import.meta.env.VITE_API_URL || ''}/api/audit/export?${qs}`;
+  },
+
   async get(id: number): Promise<AuditEvent> {
     return api.get(`/api/audit/${id}`);
   },
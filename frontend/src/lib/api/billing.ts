@@ -20,6 +20,22 @@ export interface BillingComparison {
   previous_revenue: number;
   new_customers: number;
   lost_customers: number;
+  previous_snapshot_day: string | null;
+}
+
+export interface RevenuePoint {
+  day: string;
+  key?: string | number;
+  mrr: number;
+  arr: number;
+  subscriptions: number;
+  customers: number;
+  seats: number;
+}
+
+export interface RevenueCohort {
+  cohort: string;
+  months: Array<{ month: string; mrr: number; subscriptions: number; mrr_retention: number | null }>;
 }
 
 export const billingApi = {
@@ -32,6 +48,13 @@ export const billingApi = {
     return api.get<BillingInvoicesResponse>(`/api/billing/invoices?limit=${limit}&offset=${offset}`);
   },
 
+  /** URL de descarga de todas las facturas/pagos (status: paid | pending | failed). */
+  invoicesExportUrl(format: 'csv' | 'xlsx' = 'csv', status?: string): string {
+    const qs = new URLSearchParams({ format });
+    if (status) qs.set('status', status);
+    return `${import.meta.env.VITE_API_URL || ''}/api/billing/invoices/export?${qs}`;
+  },
+
   async getSubscriptions(limit = 20, offset = 0): Promise<BillingSubscriptionsResponse> {
     return api.get<BillingSubscriptionsResponse>(`/api/billing/subscriptions?limit=${limit}&offset=${offset}`);
   },
@@ -40,6 +63,15 @@ export const billingApi = {
     return api.get<BillingComparison>('/api/billing/comparison');
   },
 
+  async getRevenueTrend(days = 90, groupBy?: 'plan' | 'partner' | 'status' | 'cohort'): Promise<{ days: number; group_by: string | null; items: RevenuePoint[] }> {
+    const qs = groupBy ? `&group_by=${groupBy}` : '';
+    return api.get(`/api/billing/trend?days=${days}${qs}`);
+  },
+
+  async getRevenueCohorts(months = 12): Promise<{ months: number; items: RevenueCohort[] }> {
+    return api.get(`/api/billing/cohorts?months=${months}`);
+  },
+
   async getStripeEvents(limit = 20): Promise<StripeEventsResponse> {
     return api.get<StripeEventsResponse>(`/api/billing/stripe-events?limit=${limit}`);
   },
@@ -71,6 +103,13 @@ export const billingApi = {
     return api.get<CustomersResponse>(`/api/customers${qs}`);
   },
 
+  /** URL de descarga (streaming en el servidor) del listado de clientes. */
+  customersExportUrl(format: 'csv' | 'xlsx' = 'csv', partnerId?: number): string {
+    const qs = new URLSearchParams({ format });
+    if (partnerId) qs.set('partner_id', String(partnerId));
+    return `${import.meta.env.VITE_API_URL || ''}/api/customers/export?${qs}`;
+  },
+
   // Partners
   async getPartners(): Promise<{
     items: Array<{
@@ -20,6 +20,7 @@ export interface PlanDistItem {
 
 export interface ReportsOverview {
   generated_at: string;
+  as_of: string;
 
   revenue: {
     mrr: number;
@@ -140,8 +141,8 @@ export const dashboardApi = {
     return api.get<DashboardAll>('/api/dashboard/all');
   },
 
-  async getOverview(): Promise<ReportsOverview> {
-    return api.get<ReportsOverview>('/api/reports/overview');
+  async getOverview(fresh = false): Promise<ReportsOverview> {
+    return api.get<ReportsOverview>(`/api/reports/overview${fresh ? '?fresh=1' : ''}`);
   },
 };
 
@@ -122,6 +122,7 @@ export interface GeoPoint {
 }
 
 export interface LiveSession {
+  key?: string;
   tenant_db: string;
   odoo_login: string;
   ip: string;
@@ -132,6 +133,35 @@ export interface LiveSession {
   last_activity: string | null;
 }
 
+export interface SessionStreamEvent {
+  id: number;
+  type: 'add' | 'move' | 'remove' | 'sync' | 'resync';
+  key?: string;
+  tenant_db?: string;
+  odoo_login?: string | null;
+  ip_address?: string;
+  geo_country?: string | null;
+  geo_country_code?: string | null;
+  geo_city?: string | null;
+  geo_lat?: number | null;
+  geo_lon?: number | null;
+  stats?: Record<string, number>;
+  dashboard?: Pick<DashboardStats, 'total_active' | 'by_tenant' | 'by_country'>;
+}
+
+/** Zoom máximo de /geo/live?zoom= (services.session_geo_map.MAX_MAP_ZOOM) */
+export const MAX_MAP_ZOOM = 18;
+
+export interface GeoCluster {
+  lat: number;
+  lon: number;
+  count: number;
+  country: string | null;
+  city: string | null;
+  tenants: number;
+  tenant_db: string | null;
+}
+
 export interface SeatAuditEntry {
   tenant_db: string;
   subscription_id: number;
@@ -209,10 +239,14 @@ export const dsamApi = {
   async listGroupedSessions(params?: {
     tenant?: string;
     active_only?: boolean;
+    cursor?: string;
+    limit?: number;
   }): Promise<ApiResponse<GroupedSessionTenant[]>> {
     const query = new URLSearchParams();
     if (params?.tenant) query.set('tenant', params.tenant);
     if (params?.active_only !== undefined) query.set('active_only', String(params.active_only));
+    if (params?.cursor) query.set('cursor', params.cursor);
+    if (params?.limit) query.set('limit', String(params.limit));
     const qs = query.toString();
     return api.get(`/api/dsam/sessions/grouped${qs ? '?' + qs : ''}`);
   },
@@ -234,6 +268,19 @@ export const dsamApi = {
     return api.get('/api/dsam/geo/live');
   },
 
+  async getGeoLiveClusters(zoom: number): Promise<ApiResponse<GeoCluster[]>> {
+    return api.get(`/api/dsam/geo/live?zoom=${zoom}`);
+  },
+
+  /** Canal SSE con los deltas de cada sync DSAM. Retorna el EventSource para cerrarlo. */
+  streamSessions(onEvent: (event: SessionStreamEvent) => void): EventSource {
+    const source = new EventSource(`${import.meta.env.VITE_API_URL || ''}/api/dsam/stream`, { withCredentials: true });
+    for (const type of ['add', 'move', 'remove', 'sync', 'resync']) {
+      source.addEventListener(type, (message) => onEvent(JSON.parse((message as MessageEvent).data)));
+    }
+    return source;
+  },
+
   async listTenants(): Promise<ApiResponse<DsamTenantOption[]>> {
     return api.get('/api/dsam/tenants');
   },
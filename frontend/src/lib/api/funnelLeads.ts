@@ -25,7 +25,8 @@ export interface FunnelLeadPayload {
 }
 
 export interface FunnelLeadResponse {
-  id: number;
+  id: number | null;   // null mientras el lead está en el outbox
+  status: string;
   qualified: boolean;
   redirect: string;
 }
@@ -27,7 +27,7 @@ export type { DispersionStatus, PayoutRequest, CreatePayoutBody } from './disper
 export { plansApi } from './plans';
 export type { Plan } from './plans';
 export { dsamApi } from './dsam';
-export type { SessionEntry, DashboardStats, SecurityRule, SecurityAction, TenantSessionConfig, GeoPoint, LiveSession } from './dsam';
+export type { SessionEntry, DashboardStats, SecurityRule, SecurityAction, TenantSessionConfig, GeoPoint, LiveSession, GeoCluster } from './dsam';
 export { developerPortalApi } from './developerPortal';
 export { apiKeysApi } from './apiKeys';
 export type { ApiKeyItem, ApiKeyListResponse, ApiKeyCreateRequest, ApiKeyUpdateRequest, ApiKeyStatus, ApiKeyScope, ApiKeyTier, TierInfo } from './apiKeys';
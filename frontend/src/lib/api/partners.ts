@@ -100,6 +100,13 @@ export const partnersApi = {
     return api.get<CommissionsResponse>(`/api/commissions${qs ? '?' + qs : ''}`);
   },
 
+  commissionsExportUrl(format: 'csv' | 'xlsx' = 'csv', partnerId?: number, statusFilter?: string): string {
+    const params = new URLSearchParams({ format });
+    if (partnerId) params.set('partner_id', String(partnerId));
+    if (statusFilter) params.set('status_filter', statusFilter);
+    return `${import.meta.env.VITE_API_URL || ''}/api/commissions/export?${params}`;
+  },
+
   async createCommission(data: {
     partner_id: number;
     subscription_id?: number;
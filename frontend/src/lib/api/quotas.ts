@@ -29,9 +29,11 @@ export interface CustomerQuotaSummary {
   plan_name: string;
   plan_key: string;
   fair_use_enabled?: boolean;
+  top_usage_percent?: number;
   resources: Record<string, {
     used: number;
     limit: number;
+    percentage?: number;
     unlimited: boolean;
     exceeded: boolean;
     status?: 'ok' | 'warning' | 'critical' | 'exceeded' | string;
@@ -41,9 +43,23 @@ export interface CustomerQuotaSummary {
 export interface AllQuotasResponse {
   success: boolean;
   total: number;
+  limit: number;
+  offset: number;
+  sort: string;
+  order: 'asc' | 'desc';
+  as_of: string;
   customers: CustomerQuotaSummary[];
 }
 
+export interface QuotaTableQuery {
+  limit?: number;
+  offset?: number;
+  sort?: string;
+  order?: 'asc' | 'desc';
+  search?: string;
+  refresh?: boolean;
+}
+
 export interface CustomerEmailLimits {
   success: boolean;
   customer_id: number;
@@ -76,8 +92,13 @@ export const quotasApi = {
   },
 
   /** Get quota summary for all customers (admin dashboard) */
-  async getAllQuotas(): Promise<AllQuotasResponse> {
-    return api.get<AllQuotasResponse>('/api/quotas');
+  async getAllQuotas(query: QuotaTableQuery = {}): Promise<AllQuotasResponse> {
+    const params = new URLSearchParams();
+    for (const [key, value] of Object.entries(query)) {
+      if (value !== undefined && value !== '' && value !== false) params.set(key, String(value));
+    }
+    const qs = params.toString();
+    return api.get<AllQuotasResponse>(`/api/quotas${qs ? `?${qs}` : ''}`);
   },
 
   async getCustomerEmailLimits(customerId: number): Promise<CustomerEmailLimits> {
@@ -1522,7 +1522,11 @@ export interface AuditEvent {
 
 export interface AuditEventsResponse {
   items: AuditEvent[];
+  /** Exacto hasta 10.000; por encima, estimación del planner */
   total: number;
+  total_is_estimate?: boolean;
+  next_cursor?: string | null;
+  has_more?: boolean;
 }
 
 // ── Branding Types (Épica 10) ──
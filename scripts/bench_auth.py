@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark de overhead de autenticación por request.
+
+Compara la verificación JWT sin cache (jwt.decode en cada llamada) contra
+TokenManager.verify_access_token con cache de claims, y mide /api/auth/me
+con y sin cache de perfil sobre SQLite en memoria.
+
+Uso:
+    python3 scripts/bench_auth.py [--iterations 20000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret-key")
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+
+def _timeit(label: str, fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    per_call_us = elapsed / iterations * 1_000_000
+    print(f"{label:<42} {per_call_us:>10.2f} µs/req")
+    return per_call_us
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    import jwt
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    from app.models import database as db_module
+    from app.models.database import Base, Customer
+    from app.routes import secure_auth
+    from app.security import tokens
+    from app.security.tokens import TokenManager
+
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    db_module._engine = engine
+    db_module._SessionLocal = sessionmaker(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    db = db_module._SessionLocal()
+    customer = Customer(email="bench@example.com", full_name="Bench", company_name="Bench", subdomain="bench")
+    db.add(customer)
+    db.commit()
+    customer_id = customer.id
+    db.close()
+
+    token = TokenManager.create_access_token("bench@example.com", "tenant", user_id=customer_id)
+    secret, algorithm = tokens.get_signing_keys()
+
+    print(f"Iteraciones: {args.iterations}")
+    uncached = _timeit(
+        "jwt.decode sin cache",
+        lambda: jwt.decode(token, secret, algorithms=[algorithm]),
+        args.iterations,
+    )
+    cached = _timeit(
+        "verify_access_token (claims cacheados)",
+        lambda: TokenManager.verify_access_token(token),
+        args.iterations,
+    )
+
+    profile_iterations = max(1, args.iterations // 10)
+    secure_auth.invalidate_user_profile()
+    profile_db = _timeit(
+        "perfil /me desde BD",
+        lambda: secure_auth._load_profile_fields("tenant", customer_id),
+        profile_iterations,
+    )
+    profile_cached = _timeit(
+        "perfil /me cacheado",
+        lambda: secure_auth._get_cached_profile("tenant", customer_id),
+        profile_iterations,
+    )
+
+    print(f"\nSpeedup verificación: {uncached / cached:.1f}x")
+    print(f"Speedup perfil:       {profile_db / profile_cached:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
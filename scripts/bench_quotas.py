@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la vista de cuotas de todos los clientes sobre 2k tenants.
+
+Crea en SQLite (archivo temporal) o en la URL indicada 2k clientes con
+suscripción activa, dominios custom, deployments y overrides de partner.
+Compara el recorrido anterior (por cliente: suscripción, plan, dominios,
+deployment, override + tres procesos psql por tenant) contra
+get_all_customers_quotas (consultas agrupadas + un psql por servidor de BD).
+El psql se simula con una latencia fija por proceso (--psql-ms). Reporta
+tiempo, sentencias SQL y procesos psql, y verifica que ambos resúmenes son
+iguales.
+
+Uso:
+    python3 scripts/bench_quotas.py [--customers 2000] [--psql-ms 15] [--db-url postgresql://...]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.models.database import (  # noqa: E402
+    Base, Customer, CustomDomain, Partner, PartnerPricingOverride, Plan, Subscription,
+    SubscriptionStatus, TenantDeployment,
+)
+from app.services import quota_service  # noqa: E402
+from app.services.quota_service import QuotaService  # noqa: E402
+
+
+def _seed(db, n_customers: int) -> None:
+    rng = random.Random(7)
+    db.execute(Plan.__table__.insert(), [
+        {"id": i + 1, "name": name, "display_name": name.title(), "base_price": 10 * (i + 1),
+         "max_users": users, "max_domains": domains, "max_storage_mb": storage, "is_active": True}
+        for i, (name, users, domains, storage) in enumerate([
+            ("basic", 3, 1, 1024), ("pro", 10, 5, 10240), ("enterprise", 0, -1, 0),
+        ])
+    ])
+    db.execute(Partner.__table__.insert(), [
+        {"id": i + 1, "company_name": f"P{i}", "contact_email": f"p{i}@x.com", "partner_code": f"P{i}"}
+        for i in range(20)
+    ])
+    db.execute(PartnerPricingOverride.__table__.insert(), [
+        {"partner_id": i + 1, "plan_name": "pro", "max_users_override": 15, "is_active": True}
+        for i in range(0, 20, 2)
+    ])
+    db.execute(Customer.__table__.insert(), [
+        {"id": i + 1, "email": f"owner@t{i}.com", "full_name": f"T{i}", "company_name": f"T{i:05d}",
+         "subdomain": f"t{i}", "partner_id": rng.randrange(1, 21) if i % 3 == 0 else None}
+        for i in range(n_customers)
+    ])
+    db.execute(Subscription.__table__.insert(), [
+        {"id": i + 1, "customer_id": i + 1, "plan_name": rng.choice(["basic", "pro", "enterprise"]),
+         "status": SubscriptionStatus.active.name, "user_count": rng.randint(1, 20)}
+        for i in range(n_customers)
+    ])
+    db.execute(TenantDeployment.__table__.insert(), [
+        {"subscription_id": i + 1, "container_id": 1, "customer_id": i + 1, "subdomain": f"t{i}",
+         "database_name": f"t{i:04d}"}
+        for i in range(n_customers)
+    ])
+    domains = [
+        {"customer_id": i + 1, "external_domain": f"d{j}.t{i}.com", "sajet_subdomain": f"t{i}d{j}"}
+        for i in range(n_customers) for j in range(rng.randint(0, 4))
+    ]
+    db.execute(CustomDomain.__table__.insert(), domains)
+    db.commit()
+
+
+def _fake_collector(processes: list, psql_seconds: float, per_call: int):
+    """psql simulado: `per_call` procesos por llamada, cada uno con latencia fija."""
+    def _collect(tenant_dbs, host=None):
+        names = sorted(set(tenant_dbs))
+        processes.append(per_call)
+        time.sleep(psql_seconds * per_call)
+        return {name: {"websites": 1, "companies": 1 + len(name) % 2, "storage_mb": 5 * len(name)} for name in names}
+    return _collect
+
+
+def _legacy_quotas(db) -> list:
+    """Recorrido anterior al resumen por lotes (una vuelta completa por cliente)."""
+    svc = QuotaService(db)
+    rows = []
+    for customer in db.query(Customer).order_by(Customer.company_name).all():
+        plan, plan_name = svc._get_active_plan(customer.id)
+        usage = svc._get_current_usage(customer.id)
+        limits = svc._get_effective_limits(customer, plan, plan_name)
+        rows.append(svc._summary_row(customer, plan, plan_name, usage, limits))
+    return rows
+
+
+def _timed(engine, SessionLocal, fn, collector):
+    statements = []
+
+    def _count(*_args):
+        statements.append(1)
+
+    original = quota_service.collect_odoo_usage
+    quota_service.collect_odoo_usage = collector
+    db = SessionLocal()
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        started = time.perf_counter()
+        result = fn(db)
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+        quota_service.collect_odoo_usage = original
+        db.close()
+    return elapsed, len(statements), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--customers", type=int, default=2000)
+    parser.add_argument("--psql-ms", type=float, default=15.0)
+    parser.add_argument("--db-url", default=None)
+    args = parser.parse_args()
+    psql_seconds = args.psql_ms / 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(args.db_url or f"sqlite:///{tmp}/bench.sqlite3")
+        tables = [Plan.__table__, Partner.__table__, PartnerPricingOverride.__table__, Customer.__table__,
+                  Subscription.__table__, TenantDeployment.__table__, CustomDomain.__table__]
+        Base.metadata.create_all(engine, tables=tables)
+        SessionLocal = sessionmaker(bind=engine, autoflush=False)
+        db = SessionLocal()
+        _seed(db, args.customers)
+        db.close()
+        print(f"customers={args.customers} psql={args.psql_ms:.0f}ms/proceso")
+
+        legacy_procs, new_procs = [], []
+        legacy_time, legacy_stmts, legacy_rows = _timed(
+            engine, SessionLocal, _legacy_quotas, _fake_collector(legacy_procs, psql_seconds, per_call=3),
+        )
+        new_time, new_stmts, new_rows = _timed(
+            engine, SessionLocal, lambda db: QuotaService(db).get_all_customers_quotas(),
+            _fake_collector(new_procs, psql_seconds, per_call=1),
+        )
+
+        assert new_rows == legacy_rows, "los resúmenes difieren"
+        print(f"{'legacy':<10} {legacy_time:>8.2f}s {legacy_stmts:>8} statements {sum(legacy_procs):>6} psql")
+        print(f"{'batched':<10} {new_time:>8.2f}s {new_stmts:>8} statements {sum(new_procs):>6} psql")
+        print(f"speedup x{legacy_time / new_time:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark del escáner de sesiones DSAM contra un redis-server local.
+
+Carga N sesiones Odoo sintéticas (JSON, con TTL) en una o más DBs y compara:
+  - legacy: SCAN + un GET por clave, fuente por fuente (cliente nuevo por fuente)
+  - pipelined: scan_redis_sessions() (pool persistente, PTTL en pipeline y MGET
+    por página, fuentes en paralelo), en frío y en caliente (sin cambios)
+
+Requiere un redis-server accesible (REDIS_HOST/REDIS_PORT, por defecto
+localhost:6379). Usa DBs 14 y 15 y las vacía al terminar.
+
+Uso:
+    redis-server --port 6379 &
+    python3 scripts/bench_redis_sessions.py [--sessions 50000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ["DSAM_REDIS_SESSION_SOURCES"] = "14|session:*|odoo17,15|odoo19:session:*|odoo19"
+
+from app.services import session_monitor  # noqa: E402
+from app.services.session_monitor import _get_session_sources, get_redis_pool, scan_redis_sessions  # noqa: E402
+
+SOURCES = [(14, "session:"), (15, "odoo19:session:")]
+
+
+async def _seed(n_sessions: int) -> None:
+    rng = random.Random(3)
+    for db_index, prefix in SOURCES:
+        r = await get_redis_pool(db_index)
+        await r.flushdb()
+        pipe = r.pipeline(transaction=False)
+        for i in range(n_sessions // len(SOURCES)):
+            tenant = f"tenant{rng.randrange(300)}"
+            payload = {
+                "db": tenant, "uid": rng.randrange(1, 80), "login": f"user{rng.randrange(80)}@{tenant}",
+                "create_time": time.time() - rng.randrange(86400),
+                "_trace": [{"ip_address": f"181.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}",
+                            "browser": "chrome", "platform": "windows"}],
+                "context": {"lang": "es_DO", "tz": "America/Santo_Domingo"},
+            }
+            pipe.set(f"{prefix}{i:08x}", json.dumps(payload), ex=7 * 86400)
+            if i % 1000 == 999:
+                await pipe.execute()
+        await pipe.execute()
+        await r.aclose()
+
+
+async def _legacy_scan() -> int:
+    count = 0
+    for source in _get_session_sources():
+        r = await get_redis_pool(source.redis_db)
+        cursor = "0"
+        try:
+            while True:
+                cursor, keys = await r.scan(cursor=cursor, match=source.match_pattern, count=200)
+                for key in keys:
+                    raw = await r.get(key)
+                    if raw:
+                        json.loads(raw)
+                        count += 1
+                if cursor == 0 or cursor == "0":
+                    break
+        finally:
+            await r.aclose()
+    return count
+
+
+async def _timed(label: str, coro_factory) -> None:
+    started = time.perf_counter()
+    result = await coro_factory()
+    elapsed = time.perf_counter() - started
+    count = result if isinstance(result, int) else len(result)
+    print(f"{label:<18}: {elapsed:7.2f}s  sessions={count:<7} {count / elapsed:10.0f} sessions/s")
+
+
+async def main(n_sessions: int) -> None:
+    await _seed(n_sessions)
+    try:
+        await _timed("legacy GET/key", _legacy_scan)
+        await _timed("pipelined (cold)", scan_redis_sessions)
+        await _timed("pipelined (warm)", scan_redis_sessions)
+        print("scan metrics:", session_monitor.get_scan_metrics())
+    finally:
+        for db_index, _ in SOURCES:
+            r = await get_redis_pool(db_index)
+            await r.flushdb()
+            await r.aclose()
+        await session_monitor.close_redis_clients()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=50000)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions))
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la auditoría de seats DSAM sobre 5k tenants.
+
+Crea en SQLite (archivo temporal) o en la URL indicada 5k clientes con
+suscripción activa, ~20 sesiones activas por tenant (con cuentas internas
+mezcladas) y configs DSAM. Compara el recorrido anterior (todas las sesiones
+como ORM + por suscripción: lazy load del cliente, config, SELECT/INSERT de
+HWM) contra run_seat_audit (conteos en SQL + HWM en lote). Reporta tiempo y
+sentencias SQL, y verifica que ambos cuentan lo mismo.
+
+Uso:
+    python3 scripts/bench_seat_audit.py [--tenants 5000] [--sessions-per-tenant 20] [--db-url postgresql://...]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, delete, event, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.models.database import (  # noqa: E402
+    ActiveSession, Base, Customer, SeatEvent, SeatHighWater, Subscription,
+    SubscriptionStatus, TenantSessionConfig,
+)
+from app.services.seat_events import get_non_billable_logins, record_hwm_snapshot  # noqa: E402
+from app.tasks.seat_audit import run_seat_audit  # noqa: E402
+
+
+def _seed(db, n_tenants: int, per_tenant: int) -> None:
+    rng = random.Random(11)
+    db.execute(Customer.__table__.insert(), [
+        {"id": i + 1, "email": f"owner@t{i}.com", "full_name": f"T{i}", "company_name": f"T{i}",
+         "subdomain": f"t{i}", "user_count": 10}
+        for i in range(n_tenants)
+    ])
+    db.execute(Subscription.__table__.insert(), [
+        {"id": i + 1, "customer_id": i + 1, "plan_name": "pro", "status": SubscriptionStatus.active.name,
+         "user_count": 10}
+        for i in range(n_tenants)
+    ])
+    db.execute(TenantSessionConfig.__table__.insert(), [
+        {"tenant_db": f"t{i}"} for i in range(0, n_tenants, 2)
+    ])
+    sessions = []
+    for i in range(n_tenants):
+        internal = ["admin", f"owner@t{i}.com", f"t{i}@sajet.us"]
+        for j in range(per_tenant):
+            login = rng.choice(internal) if j % 7 == 0 else f"user{rng.randrange(per_tenant)}@t{i}.com"
+            sessions.append({
+                "redis_session_key": f"t{i}:{j}", "tenant_db": f"t{i}", "odoo_login": login,
+                "ip_address": "10.0.0.1", "is_active": True,
+            })
+    for offset in range(0, len(sessions), 10000):
+        db.execute(ActiveSession.__table__.insert(), sessions[offset:offset + 10000])
+    db.commit()
+
+
+async def _legacy_audit(db) -> dict[str, int]:
+    """Recorrido anterior a los conteos en SQL (una vuelta por suscripción)."""
+    tenant_logins: dict[str, set[str]] = {}
+    for session in db.execute(select(ActiveSession).where(ActiveSession.is_active == True)).scalars():
+        login = (session.odoo_login or "").strip().lower()
+        if login:
+            tenant_logins.setdefault(session.tenant_db, set()).add(login)
+
+    subscriptions = db.execute(
+        select(Subscription).where(Subscription.status.in_([
+            SubscriptionStatus.active, SubscriptionStatus.trialing, SubscriptionStatus.past_due,
+        ]))
+    ).scalars().all()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    counts = {}
+    for sub in subscriptions:
+        customer = sub.customer
+        tenant_db = customer.subdomain
+        excluded = get_non_billable_logins(tenant_db, customer=customer, admin_email=customer.email)
+        billable = {login for login in tenant_logins.get(tenant_db, set()) if login not in excluded}
+        counts[tenant_db] = len(billable)
+        config = db.execute(
+            select(TenantSessionConfig).where(TenantSessionConfig.tenant_db == tenant_db)
+        ).scalar_one_or_none()
+        if config:
+            config.last_seat_audit_at = now
+        record_hwm_snapshot(db, sub, user_count_after=len(billable), source="dsam-seat-audit")
+    db.commit()
+    return counts
+
+
+def _timed(engine, SessionLocal, fn):
+    statements = []
+
+    def _count(*_args):
+        statements.append(1)
+
+    db = SessionLocal()
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        started = time.perf_counter()
+        result = asyncio.run(fn(db))
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+        db.close()
+    return elapsed, len(statements), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenants", type=int, default=5000)
+    parser.add_argument("--sessions-per-tenant", type=int, default=20)
+    parser.add_argument("--db-url", default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(args.db_url or f"sqlite:///{tmp}/bench.sqlite3")
+        tables = [Customer.__table__, Subscription.__table__, ActiveSession.__table__,
+                  TenantSessionConfig.__table__, SeatEvent.__table__, SeatHighWater.__table__]
+        Base.metadata.create_all(engine, tables=tables)
+        SessionLocal = sessionmaker(bind=engine, autoflush=False)
+        db = SessionLocal()
+        _seed(db, args.tenants, args.sessions_per_tenant)
+        db.close()
+        print(f"tenants={args.tenants} sessions={args.tenants * args.sessions_per_tenant}")
+
+        legacy_time, legacy_stmts, legacy_counts = _timed(engine, SessionLocal, _legacy_audit)
+        with engine.begin() as conn:
+            conn.execute(delete(SeatEvent))
+            conn.execute(delete(SeatHighWater))
+        new_time, new_stmts, result = _timed(engine, SessionLocal, run_seat_audit)
+
+        new_counts = {d["tenant_db"]: d["unique_active_users"] for d in result["details"]}
+        assert new_counts == legacy_counts, "los conteos difieren"
+        print(f"{'legacy':<10} {legacy_time:>8.2f}s {legacy_stmts:>8} statements")
+        print(f"{'batched':<10} {new_time:>8.2f}s {new_stmts:>8} statements")
+        print(f"speedup x{legacy_time / new_time:.1f}")
+
+
+if __name__ == "__main__":
+    main()
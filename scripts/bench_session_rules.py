@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Benchmark del motor de reglas DSAM sobre una flota sintética.
+
+Crea en SQLite (archivo temporal) ~20k sesiones activas repartidas en 200
+tenants, reglas globales y por tenant, e historial geo. Compara el recorrido
+sesión por sesión (reglas + config + COUNT + último evento geo por sesión, como
+hacía run_full_security_scan) contra SessionRuleEvaluator (carga única +
+GROUP BY + evaluación en memoria). Verifica que ambos detectan lo mismo.
+
+Uso:
+    python3 scripts/bench_session_rules.py [--sessions 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, create_engine, desc, event, func, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.models.database import (  # noqa: E402
+    ActiveSession, Base, SessionGeoEvent, SessionRuleType, SessionSecurityRule, TenantSessionConfig,
+)
+from app.security import session_rules  # noqa: E402
+from app.security.session_rules import SessionRuleEvaluator  # noqa: E402
+
+CITIES = [(18.48, -69.93), (40.41, -3.70), (25.76, -80.19), (19.43, -99.13), (4.71, -74.07)]
+
+
+def _seed(db, n_sessions: int) -> None:
+    rng = random.Random(7)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    tenants = [f"tenant{i:03d}" for i in range(200)]
+
+    db.add_all([
+        SessionSecurityRule(rule_type=SessionRuleType.SINGLE_SESSION, config={}, exempt_users=["admin@sajet.us"]),
+        SessionSecurityRule(rule_type=SessionRuleType.MAX_SESSIONS, config={"max": 3}),
+        SessionSecurityRule(rule_type=SessionRuleType.IMPOSSIBLE_TRAVEL, config={}),
+        SessionSecurityRule(rule_type=SessionRuleType.GEO_RESTRICTION, config={"allowed_countries": ["DO", "US"]}),
+    ])
+    for tenant in tenants[:20]:
+        db.add(SessionSecurityRule(
+            rule_type=SessionRuleType.IP_WHITELIST, tenant_db=tenant,
+            config={"allowed_ips": ["10.0.0.0/8", "192.168.0.0/16"]},
+        ))
+    for tenant in tenants[::4]:
+        db.add(TenantSessionConfig(tenant_db=tenant, allow_multiple_sessions=True))
+
+    sessions, events = [], []
+    for i in range(n_sessions):
+        tenant = rng.choice(tenants)
+        login = f"user{rng.randrange(60)}@{tenant}"
+        lat, lon = rng.choice(CITIES)
+        sessions.append({
+            "redis_session_key": f"session:{tenant}:{i}",
+            "tenant_db": tenant,
+            "odoo_login": login,
+            "ip_address": f"{rng.choice([10, 181, 200])}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}",
+            "geo_country_code": rng.choice(["DO", "DO", "US", "ES"]),
+            "geo_lat": lat,
+            "geo_lon": lon,
+            "is_active": True,
+        })
+        for _ in range(2):
+            plat, plon = rng.choice(CITIES)
+            events.append({
+                "tenant_db": tenant, "odoo_login": login, "ip_address": "1.1.1.1",
+                "geo_lat": plat, "geo_lon": plon,
+                "event_at": now - timedelta(minutes=rng.randrange(10, 60 * 24 * 3)),
+            })
+    db.execute(ActiveSession.__table__.insert(), sessions)
+    db.execute(SessionGeoEvent.__table__.insert(), events)
+    db.commit()
+
+
+def _legacy_evaluate(db, session):
+    """Recorrido previo: consultas por sesión y por regla."""
+    rules = db.execute(
+        select(SessionSecurityRule).where(and_(
+            SessionSecurityRule.is_enabled == True,
+            (SessionSecurityRule.tenant_db == None) | (SessionSecurityRule.tenant_db == session.tenant_db),
+        )).order_by(SessionSecurityRule.id)
+    ).scalars().all()
+    tenant_config = db.execute(
+        select(TenantSessionConfig).where(TenantSessionConfig.tenant_db == session.tenant_db)
+    ).scalar_one_or_none()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    violations = []
+    for rule in rules:
+        if session.odoo_login and session.odoo_login in (rule.exempt_users or []):
+            continue
+        if session.tenant_db in (rule.exempt_tenants or []):
+            continue
+        v = None
+        if rule.rule_type == SessionRuleType.SINGLE_SESSION:
+            if not (tenant_config and tenant_config.allow_multiple_sessions):
+                count = db.execute(select(func.count(ActiveSession.id)).where(and_(
+                    ActiveSession.tenant_db == session.tenant_db,
+                    ActiveSession.odoo_login == session.odoo_login,
+                    ActiveSession.is_active == True,
+                    ActiveSession.id != session.id,
+                ))).scalar() or 0
+                v = session_rules._single_session_violation(session, count)
+        elif rule.rule_type == SessionRuleType.MAX_SESSIONS:
+            count = db.execute(select(func.count(ActiveSession.id)).where(and_(
+                ActiveSession.tenant_db == session.tenant_db,
+                ActiveSession.odoo_login == session.odoo_login,
+                ActiveSession.is_active == True,
+            ))).scalar() or 0
+            v = session_rules._max_sessions_violation(rule, session, count)
+        elif rule.rule_type == SessionRuleType.IMPOSSIBLE_TRAVEL:
+            prev = db.execute(
+                select(SessionGeoEvent).where(and_(
+                    SessionGeoEvent.tenant_db == session.tenant_db,
+                    SessionGeoEvent.odoo_login == session.odoo_login,
+                    SessionGeoEvent.geo_lat.isnot(None),
+                )).order_by(desc(SessionGeoEvent.event_at), desc(SessionGeoEvent.id)).limit(1)
+            ).scalar_one_or_none()
+            v = session_rules._impossible_travel_violation(session, prev, now)
+        elif rule.rule_type == SessionRuleType.GEO_RESTRICTION:
+            v = session_rules._check_geo_restriction(rule, session)
+        elif rule.rule_type == SessionRuleType.IP_WHITELIST:
+            v = session_rules._check_ip_whitelist(rule, session, session_rules._compile_rule(rule).networks)
+        if v:
+            violations.append(v)
+    return violations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.sqlite3")
+        Base.metadata.create_all(engine, tables=[
+            ActiveSession.__table__, SessionGeoEvent.__table__,
+            SessionSecurityRule.__table__, TenantSessionConfig.__table__,
+        ])
+        SessionLocal = sessionmaker(bind=engine, autoflush=False)
+        db = SessionLocal()
+        _seed(db, args.sessions)
+
+        queries = [0]
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _count(*_args, **_kwargs):
+            queries[0] += 1
+
+        sessions = db.execute(select(ActiveSession).where(ActiveSession.is_active == True)).scalars().all()
+
+        queries[0] = 0
+        started = time.perf_counter()
+        legacy = [_legacy_evaluate(db, s) for s in sessions]
+        legacy_s = time.perf_counter() - started
+        legacy_q = queries[0]
+
+        queries[0] = 0
+        started = time.perf_counter()
+        evaluator = SessionRuleEvaluator(db, sessions)
+        batch = [evaluator.evaluate(s) for s in sessions]
+        batch_s = time.perf_counter() - started
+        batch_q = queries[0]
+
+        def _key(result):
+            return [sorted(v["rule_type"] for v in vs) for vs in result]
+
+        assert _key(legacy) == _key(batch), "batch and per-session results differ"
+        flagged = sum(1 for vs in batch if vs)
+
+        print(f"sessions: {len(sessions)}  flagged: {flagged}")
+        print(f"per-session : {legacy_s:8.2f}s  queries={legacy_q}")
+        print(f"batch       : {batch_s:8.2f}s  queries={batch_q}")
+        print(f"speedup     : {legacy_s / batch_s:8.1f}x")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark de sync_sessions_to_db: upsert masivo vs fila por fila.
+
+Para 1k, 10k y 50k sesiones sintéticas (scan de Redis simulado) mide un
+primer sync (todo INSERT) y un segundo sync (UPDATE + 5% de sesiones nuevas
+y 5% que desaparecen) en SQLite (archivo temporal) o en la URL indicada.
+
+Uso:
+    python3 scripts/bench_session_sync.py [--sizes 1000,10000,50000] [--db-url postgresql://...]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, delete  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.models.database import ActiveSession, Base, SessionGeoEvent  # noqa: E402
+from app.services import session_monitor  # noqa: E402
+
+
+def _raw_sessions(n: int, offset: int = 0) -> list[dict]:
+    rng = random.Random(n + offset)
+    sessions = []
+    for i in range(offset, offset + n):
+        tenant = f"tenant{i % 300}"
+        ip = f"181.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+        sessions.append({
+            "redis_key": f"odoo17:session:{i:08x}",
+            "tenant_db": tenant,
+            "data": {"db": tenant, "uid": i % 80, "login": f"user{i % 80}@{tenant}", "ip": ip,
+                     "user_agent": "Mozilla/5.0", "create_time": 1760000000 + i},
+        })
+    return sessions
+
+
+def _geo(ip: str) -> dict:
+    octet = int(ip.split(".")[1])
+    return {"country": "Dominican Republic", "country_code": "DO", "region": None,
+            "city": f"city{octet % 20}", "lat": 18.0 + octet / 100, "lon": -69.0 - octet / 100}
+
+
+async def _sync_with(SessionLocal, raw_sessions):
+    async def _scan():
+        return raw_sessions
+    session_monitor.scan_redis_sessions = _scan
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        stats = await session_monitor.sync_sessions_to_db(db)
+        return time.perf_counter() - started, stats
+    finally:
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--db-url", default=None)
+    args = parser.parse_args()
+
+    session_monitor.geolocate_ip = _geo
+    bulk_check = session_monitor._supports_bulk_upsert
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(args.db_url or f"sqlite:///{tmp}/bench.sqlite3")
+        Base.metadata.create_all(engine, tables=[ActiveSession.__table__, SessionGeoEvent.__table__])
+        SessionLocal = sessionmaker(bind=engine, autoflush=False)
+
+        print(f"{'sessions':>9} {'mode':<9} {'1st sync':>10} {'2nd sync':>10}")
+        for size in [int(x) for x in args.sizes.split(",")]:
+            first = _raw_sessions(size)
+            churn = size // 20
+            second = first[churn:] + _raw_sessions(churn, offset=size)
+            for mode in ("row", "bulk"):
+                with engine.begin() as conn:
+                    conn.execute(delete(ActiveSession))
+                    conn.execute(delete(SessionGeoEvent))
+                session_monitor._supports_bulk_upsert = bulk_check if mode == "bulk" else (lambda _db: False)
+                t1, _ = asyncio.run(_sync_with(SessionLocal, first))
+                t2, stats = asyncio.run(_sync_with(SessionLocal, second))
+                print(f"{size:>9} {mode:<9} {t1:>9.2f}s {t2:>9.2f}s  {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark del matcher WAF sobre tráfico realista.
+
+Genera requests sintéticos (path, query params, User-Agent, Referer) con ~1%
+de payloads maliciosos y compara el recorrido patrón por patrón contra
+WAFMatcher (prefiltro literal + reglas candidatas). Verifica además que ambos
+producen exactamente las mismas detecciones.
+
+Uso:
+    python3 scripts/bench_waf.py [--requests 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.security.waf_matcher import load_waf_matcher  # noqa: E402
+
+PATHS = [
+    "/api/customers", "/api/billing/invoices", "/api/dashboard/all", "/api/tenants",
+    "/api/auth/me", "/api/session-monitoring/dashboard", "/dashboard/customer/{id}",
+    "/api/partners/{id}/commissions", "/static/assets/index-{id}.js", "/api/public/pricing",
+]
+PARAMS = [
+    ("page", "{n}"), ("limit", "50"), ("search", "acme corp"), ("status", "active"),
+    ("sort", "created_at"), ("tenant", "tenant{n}"), ("from", "2026-01-01"), ("plan", "pro"),
+    ("lang", "es"), ("utm_source", "google"), ("utm_campaign", "summer sale"),
+]
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_5) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Safari/605.1.15",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148",
+    "python-httpx/0.27.2", "curl/8.5.0",
+]
+REFERERS = ["", "https://sajet.us/", "https://www.google.com/", "https://sajet.us/pricing?plan=pro"]
+ATTACKS = [
+    "1' OR '1'='1", "1 UNION SELECT password FROM users", "<script>alert(1)</script>",
+    "../../etc/passwd", "$(id)", "a; cat /etc/passwd",
+]
+
+
+def synth_requests(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    requests = []
+    for _ in range(count):
+        path = rng.choice(PATHS).format(id=rng.randint(1, 99999))
+        params = [(k, v.format(n=rng.randint(1, 500))) for k, v in rng.sample(PARAMS, rng.randint(0, 4))]
+        if rng.random() < 0.01:
+            key, _ = params[0] if params else ("q", "")
+            params.append((key, rng.choice(ATTACKS)))
+        fields = [path] + [f"{k}={v}" for k, v in params]
+        fields.append(rng.choice(USER_AGENTS))
+        referer = rng.choice(REFERERS)
+        if referer:
+            fields.append(referer)
+        requests.append(fields)
+    return requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    matcher = load_waf_matcher()
+    traffic = synth_requests(args.requests)
+
+    def legacy(value):
+        for rule in matcher.rules:
+            if rule.regex.search(value):
+                return True, rule.attack_type, rule.pattern
+        return False, "", ""
+
+    results = {}
+    for label, scan in (("patrón por patrón", legacy), ("WAFMatcher", matcher.scan)):
+        start = time.perf_counter()
+        out = [[scan(value) for value in fields] for fields in traffic]
+        elapsed = time.perf_counter() - start
+        results[label] = (elapsed, out)
+        blocked = sum(1 for fields in out if any(r[0] for r in fields))
+        print(f"{label:<20} {elapsed / len(traffic) * 1e6:>9.2f} µs/request  bloqueados={blocked}")
+
+    legacy_time, legacy_out = results["patrón por patrón"]
+    matcher_time, matcher_out = results["WAFMatcher"]
+    print(f"\nReglas: versión {matcher.version}, {len(matcher.rules)} patrones")
+    print(f"Speedup: {legacy_time / matcher_time:.1f}x")
+    print(f"Detecciones idénticas: {legacy_out == matcher_out}")
+
+
+if __name__ == "__main__":
+    main()
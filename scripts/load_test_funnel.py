@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Load Testing Script - Funnel público (pico de campaña)
+Modela un pico de tráfico de una campaña: muchos visitantes cargan la landing
+(GET /api/public/funnel/stats) y una fracción envía el formulario
+(POST /api/public/funnel/lead), incluyendo reenvíos del mismo email.
+Target: P95 < 150ms en ambos endpoints, error rate < 0.5% durante el pico.
+
+Uso:
+  locust -f scripts/load_test_funnel.py --host http://localhost:4443 --headless
+"""
+
+import random
+import uuid
+
+from locust import HttpUser, LoadTestShape, between, task
+
+NICHES = ["mpos", "build", "partners", "cpa", "smb", "general"]
+UTM_CAMPAIGNS = ["launch_q4", "retargeting", "partners_webinar"]
+
+
+class FunnelVisitor(HttpUser):
+    """Visitante de la landing: ve las stats y a veces deja sus datos."""
+
+    wait_time = between(0.5, 2)
+
+    def on_start(self):
+        self.niche = random.choice(NICHES)
+        self.email = f"lead-{uuid.uuid4().hex[:12]}@example.com"
+
+    @task(8)
+    def landing_stats(self):
+        """Social proof en cada carga de página (8x frecuencia)."""
+        with self.client.get(
+            "/api/public/funnel/stats",
+            name="/api/public/funnel/stats",
+            catch_response=True,
+        ) as response:
+            if response.status_code == 200 and "total_leads" in response.json():
+                response.success()
+            else:
+                response.failure(f"HTTP {response.status_code}")
+
+    @task(2)
+    def submit_lead(self):
+        """Envío del formulario; ~20% reenvía el mismo email (doble click, volver atrás)."""
+        if random.random() > 0.2:
+            self.email = f"lead-{uuid.uuid4().hex[:12]}@example.com"
+        payload = {
+            "niche": self.niche,
+            "full_name": "Load Test",
+            "email": self.email,
+            "phone": f"+1 809 555 {random.randint(1000, 9999)}",
+            "has_entity": random.random() > 0.1,
+            "client_count": random.randint(0, 20),
+            "utm_source": "facebook",
+            "utm_medium": "paid",
+            "utm_campaign": random.choice(UTM_CAMPAIGNS),
+        }
+        with self.client.post(
+            "/api/public/funnel/lead",
+            json=payload,
+            name="/api/public/funnel/lead",
+            catch_response=True,
+        ) as response:
+            if response.status_code == 200 and response.json().get("redirect"):
+                response.success()
+            else:
+                response.failure(f"HTTP {response.status_code}")
+
+
+class CampaignSpikeShape(LoadTestShape):
+    """
+    Tráfico base → pico de campaña (envío de email / post pagado) → cola larga.
+    Cada etapa: (segundos acumulados, usuarios, spawn rate).
+    """
+
+    stages = [
+        (60, 20, 5),        # tráfico orgánico
+        (120, 500, 50),     # lanzamiento: rampa rápida
+        (300, 500, 50),     # pico sostenido
+        (420, 150, 20),     # cola larga
+        (480, 20, 10),      # vuelta a la normalidad
+    ]
+
+    def tick(self):
+        run_time = self.get_run_time()
+        for end, users, spawn_rate in self.stages:
+            if run_time < end:
+                return users, spawn_rate
+        return None
@@ -0,0 +1,89 @@
+from sqlalchemy import event
+
+from app.models.database import ApiKeyAuditLog
+from app.services.api_key_audit import ApiKeyAuditWriter
+
+from tests.conftest import TestingSessionLocal, engine
+
+
+def _event(**overrides):
+    data = {
+        "key_id": "invalid",
+        "auth_mode": "unknown",
+        "path": "/api/gateway/tenants",
+        "method": "GET",
+        "ip_address": "203.0.113.7",
+        "status_code": 401,
+        "reject_reason": "invalid_api_key",
+    }
+    data.update(overrides)
+    return data
+
+
+def test_identical_failures_are_coalesced_into_one_counted_row(db_session):
+    writer = ApiKeyAuditWriter(session_factory=TestingSessionLocal)
+    for _ in range(50):
+        writer.submit(**_event())
+    writer.submit(**_event(ip_address="198.51.100.1"))
+    writer.submit(**_event(key_id="sk_ok", status_code=200, reject_reason=None))
+    writer.submit(**_event(key_id="sk_ok", status_code=200, reject_reason=None))
+
+    assert writer.flush() == 4
+    rows = db_session.query(ApiKeyAuditLog).order_by(ApiKeyAuditLog.id).all()
+    assert [(r.ip_address, r.status_code, r.event_count) for r in rows] == [
+        ("203.0.113.7", 401, 50),
+        ("198.51.100.1", 401, 1),
+        ("203.0.113.7", 200, 1),
+        ("203.0.113.7", 200, 1),
+    ]
+    assert rows[0].last_seen_at >= rows[0].created_at
+
+    metrics = writer.metrics()
+    assert metrics["coalesced"] == 49
+    assert metrics["events_written"] == 53
+    assert metrics["pending"] == 0
+
+
+def test_flush_uses_multi_row_insert(db_session):
+    statements = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO API_KEY_AUDIT_LOGS"):
+            statements.append(statement)
+
+    writer = ApiKeyAuditWriter(session_factory=TestingSessionLocal, batch_size=100)
+    for i in range(250):
+        writer.submit(**_event(ip_address=f"10.0.{i // 256}.{i % 256}"))
+
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        assert writer.flush() == 250
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+
+    assert len(statements) == 3
+    assert db_session.query(ApiKeyAuditLog).count() == 250
+
+
+def test_full_buffer_drops_new_keys_but_still_counts_repeats(db_session):
+    writer = ApiKeyAuditWriter(session_factory=TestingSessionLocal, max_pending=2)
+    assert writer.submit(**_event(ip_address="10.0.0.1"))
+    assert writer.submit(**_event(ip_address="10.0.0.2"))
+    assert not writer.submit(**_event(ip_address="10.0.0.3"))
+    assert writer.submit(**_event(ip_address="10.0.0.1"))
+
+    metrics = writer.metrics()
+    assert metrics["dropped"] == 1
+    assert metrics["pending"] == 2
+    writer.stop()
+
+
+def test_stop_flushes_pending_events(db_session):
+    writer = ApiKeyAuditWriter(session_factory=TestingSessionLocal, flush_interval_seconds=60)
+    writer.submit(**_event())
+    assert writer.metrics()["running"]
+
+    writer.stop()
+
+    assert db_session.query(ApiKeyAuditLog).count() == 1
+    assert not writer.metrics()["running"]
@@ -0,0 +1,90 @@
+"""
+Tests de la búsqueda de auditoría por keyset, el total estimado y la retención.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.database import AuditEventRecord
+from app.services import audit_search
+from app.services.audit_search import (
+    audit_filters, decode_cursor, encode_cursor, ensure_audit_partitions, estimate_count, is_partitioned,
+    purge_audit_events, search_audit_events,
+)
+
+BASE = datetime(2026, 10, 1)
+
+
+def _seed(db, n=500):
+    # Muchos empates en created_at: el desempate por id debe mantener el orden estable
+    db.execute(AuditEventRecord.__table__.insert(), [
+        {"event_type": "login" if i % 3 else "tenant.deleted", "actor_id": i % 5, "actor_username": f"u{i}",
+         "resource": f"tenant/acme{i % 4}", "status": "success" if i % 2 else "failure",
+         "details": {"tenant": f"globex{i % 7}", "i": i}, "created_at": BASE + timedelta(minutes=i // 10)}
+        for i in range(n)
+    ])
+    db.commit()
+
+
+def _ordered(db, **filters):
+    return [e.id for e in db.query(AuditEventRecord).filter(*audit_filters(**filters))
+            .order_by(AuditEventRecord.created_at.desc(), AuditEventRecord.id.desc())]
+
+
+def test_keyset_pages_cover_the_ordered_set_without_gaps(db_session):
+    _seed(db_session)
+    for filters in ({}, {"event_type": "login", "status": "failure"}):
+        expected = _ordered(db_session, **filters)
+        seen, cursor = [], None
+        while True:
+            page = search_audit_events(db_session, limit=37, cursor=cursor, **filters)
+            seen.extend(e.id for e in page["events"])
+            if not page["has_more"]:
+                assert page["next_cursor"] is None
+                break
+            cursor = page["next_cursor"]
+        assert seen == expected
+
+        offset_page = search_audit_events(db_session, limit=37, offset=74, **filters)
+        assert [e.id for e in offset_page["events"]] == expected[74:111]
+
+
+def test_cursor_round_trip_and_invalid_cursor():
+    at = datetime(2026, 10, 19, 12, 30, 5, 123456)
+    assert decode_cursor(encode_cursor(at, 42)) == (at, 42)
+    for bad in ("not-a-cursor", encode_cursor(at, 1)[:-3], ""):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+
+def test_total_is_exact_under_the_limit_and_estimated_above(db_session):
+    _seed(db_session, 120)
+    conditions = audit_filters(status="failure")
+    assert estimate_count(db_session, conditions, exact_limit=100) == (60, False)
+    assert estimate_count(db_session, [], exact_limit=100) == (101, True)
+
+    page = search_audit_events(db_session, limit=10)
+    assert (page["total"], page["total_is_estimate"]) == (120, False)
+
+
+def test_tenant_filter_matches_resource_and_details(db_session):
+    _seed(db_session, 140)
+    in_details = search_audit_events(db_session, limit=500, tenant="GLOBEX3")["events"]
+    assert len(in_details) == 20 and all(e.details["tenant"] == "globex3" for e in in_details)
+    in_resource = search_audit_events(db_session, limit=500, tenant="acme1")["events"]
+    assert {e.resource for e in in_resource} == {"tenant/acme1"}
+
+
+def test_purge_deletes_expired_rows_in_batches(db_session, monkeypatch):
+    monkeypatch.setattr(audit_search, "AUDIT_PURGE_BATCH_SIZE", 7)
+    _seed(db_session, 200)
+    now = BASE + timedelta(days=30)
+
+    assert not is_partitioned(db_session)
+    assert ensure_audit_partitions(db_session, now) == []
+
+    # Corte en BASE + 10 min: caen los 100 eventos de los primeros 10 minutos
+    result = purge_audit_events(db_session, 30, now + timedelta(minutes=10))
+    assert (result["deleted_rows"], result["dropped_partitions"]) == (100, [])
+    assert db_session.query(AuditEventRecord).count() == 100
+    assert min(e.created_at for e in db_session.query(AuditEventRecord)) == BASE + timedelta(minutes=10)
@@ -0,0 +1,95 @@
+import queue
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.security import audit
+from app.security.audit import AuditEvent, AuditLogger, AuditLogStore
+
+
+@pytest.fixture(autouse=True)
+def _small_store(monkeypatch):
+    monkeypatch.setattr(AuditLogStore, "MAX_ENTRIES", 5)
+    AuditLogStore.clear()
+    yield
+    AuditLogStore.clear()
+
+
+def _store(event, username):
+    AuditLogStore.store({"event": event, "username": username})
+
+
+def test_ring_buffer_is_bounded_and_indexes_drop_evicted_entries():
+    for i in range(8):
+        _store("LOGIN_FAILED" if i < 4 else "LOGIN_SUCCESS", f"user{i % 2}")
+
+    recent = AuditLogStore.get_recent(limit=50)
+    assert len(recent) == 5
+    assert [e["id"] for e in recent] == [8, 7, 6, 5, 4]
+    assert len(AuditLogStore._by_event["LOGIN_FAILED"]) == 1
+    assert sum(len(b) for b in AuditLogStore._by_username.values()) == 5
+
+
+def test_search_uses_indexes_and_returns_newest_first():
+    _store("LOGIN_FAILED", "alice")
+    _store("LOGIN_SUCCESS", "alice")
+    _store("LOGIN_FAILED", "bob")
+    _store("LOGIN_FAILED", "alice")
+
+    results = AuditLogStore.search(event="LOGIN_FAILED", username="alice")
+    assert [e["id"] for e in results] == [4, 1]
+    assert AuditLogStore.search(username="carol") == []
+    assert len(AuditLogStore.search(limit=2)) == 2
+
+
+def test_search_before_buffer_window_is_delegated_to_db(db_session):
+    from app.models.database import AuditEventRecord
+
+    old = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=30)
+    db_session.add(AuditEventRecord(event_type="LOGIN_FAILED", actor_username="alice", created_at=old))
+    db_session.commit()
+    _store("LOGIN_FAILED", "alice")
+
+    results = AuditLogStore.search(
+        event="LOGIN_FAILED", username="alice",
+        start_date=old - timedelta(days=1), db=db_session,
+    )
+    assert len(results) == 1
+    assert results[0]["created_at"] == old.isoformat()
+
+
+def test_audit_logger_enqueues_instead_of_writing_files(monkeypatch):
+    small_queue = queue.Queue(maxsize=1)
+    handler = audit._DroppingQueueHandler(small_queue)
+    monkeypatch.setattr(audit, "audit_queue_handler", handler)
+    monkeypatch.setattr(audit.audit_logger, "handlers", [handler])
+
+    AuditLogger.log(event=AuditEvent.LOGIN_SUCCESS, username="alice")
+    AuditLogger.log(event=AuditEvent.LOGIN_SUCCESS, username="alice")
+
+    assert small_queue.qsize() == 1
+    assert handler.dropped == 1
+    record = small_queue.get_nowait()
+    assert record.audit_data["username"] == "alice"
+    assert AuditLogStore.get_recent(limit=1)[0]["event"] == "LOGIN_SUCCESS"
+
+
+def test_recent_security_events_route_reads_the_store(db_session, monkeypatch):
+    from app.models.database import AuditEventRecord
+    from app.routes import audit as audit_routes
+
+    monkeypatch.setattr(audit_routes, "_require_admin_base", lambda *_args: None)
+    AuditLogger.log(event=AuditEvent.LOGIN_FAILED, username="alice", status="failure")
+    AuditLogger.log(event=AuditEvent.LOGIN_SUCCESS, username="alice")
+    AuditLogger.log(event=AuditEvent.LOGIN_FAILED, username="bob", status="failure")
+
+    recent = audit_routes.recent_security_events(request=None, access_token=None, event="LOGIN_FAILED", db=db_session)
+    assert [e["username"] for e in recent["items"]] == ["bob", "alice"]
+
+    old = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=10)
+    db_session.add(AuditEventRecord(event_type="LOGIN_FAILED", actor_username="carol", created_at=old))
+    db_session.commit()
+    history = audit_routes.recent_security_events(
+        request=None, access_token=None, event="LOGIN_FAILED", start_date=old - timedelta(days=1), db=db_session,
+    )
+    assert [e["username"] for e in history["items"]] == ["carol"]
@@ -0,0 +1,147 @@
+import time
+from datetime import timedelta
+
+import jwt
+import pytest
+from fastapi import HTTPException
+
+
+@pytest.fixture(autouse=True)
+def _fresh_token_caches():
+    from app.security import tokens
+    from app.routes import secure_auth
+
+    tokens.reset_signing_keys()
+    secure_auth.invalidate_user_profile()
+    yield
+    tokens.reset_signing_keys()
+    secure_auth.invalidate_user_profile()
+
+
+def test_verified_claims_are_cached_by_token_hash(monkeypatch):
+    from app.security import tokens
+    from app.security.tokens import TokenManager
+
+    token = TokenManager.create_access_token("admin", "admin")
+    calls = []
+    real_decode = jwt.decode
+    monkeypatch.setattr(tokens.jwt, "decode", lambda *a, **kw: calls.append(1) or real_decode(*a, **kw))
+
+    first = TokenManager.verify_access_token(token)
+    second = TokenManager.verify_access_token(token)
+
+    assert first == second
+    assert len(calls) == 1
+    second["role"] = "tampered"
+    assert TokenManager.verify_access_token(token)["role"] == "admin"
+
+
+def test_cached_claims_still_enforce_role_and_expiry():
+    from app.security import tokens
+    from app.security.tokens import TokenManager
+
+    token = TokenManager.create_access_token("tenant@example.com", "tenant")
+    TokenManager.verify_access_token(token)
+    with pytest.raises(ValueError):
+        TokenManager.verify_access_token(token, required_role="admin")
+
+    short = TokenManager.create_access_token("admin", "admin", expires_delta=timedelta(seconds=1))
+    TokenManager.verify_access_token(short)
+    time.sleep(1.1)
+    with pytest.raises(ValueError, match="expirado"):
+        TokenManager.verify_access_token(short)
+    assert all(entry[2] is None or entry[2] > time.time() for entry in tokens._CLAIMS_CACHE.values())
+
+
+def test_claims_cache_is_bounded(monkeypatch):
+    from app.security import tokens
+    from app.security.tokens import TokenManager
+
+    monkeypatch.setattr(tokens, "_CLAIMS_CACHE_MAX_ENTRIES", 3)
+    for i in range(5):
+        TokenManager.verify_access_token(TokenManager.create_access_token(f"user{i}", "admin"))
+
+    assert len(tokens._CLAIMS_CACHE) == 3
+
+
+def test_roles_verification_shares_cache_and_rejects_after_key_rotation(monkeypatch):
+    from app.routes.roles import create_access_token, verify_token_with_role
+    from app.security import tokens
+
+    token = create_access_token("admin", "admin")
+    assert verify_token_with_role(token, required_role="tenant")["sub"] == "admin"
+
+    monkeypatch.setattr(tokens, "get_runtime_setting", lambda key, default=None: {
+        "JWT_SECRET_KEY": "rotated-secret-for-testing-only",
+    }.get(key, default))
+    tokens.reset_signing_keys()
+
+    with pytest.raises(HTTPException) as exc:
+        verify_token_with_role(token)
+    assert exc.value.status_code == 401
+
+
+def test_profile_cache_is_invalidated_on_orm_update(db_session):
+    from app.models.database import Customer
+    from app.routes import secure_auth
+
+    customer = Customer(
+        email="profile@example.com",
+        full_name="Profile User",
+        company_name="Profile Co",
+        subdomain="profileco",
+        onboarding_step=1,
+    )
+    db_session.add(customer)
+    db_session.commit()
+
+    assert secure_auth._get_cached_profile("tenant", customer.id)["onboarding_step"] == 1
+
+    customer.onboarding_step = 2
+    db_session.commit()
+
+    assert secure_auth._get_cached_profile("tenant", customer.id)["onboarding_step"] == 2
+
+
+def test_rolled_back_profile_change_keeps_cache(db_session, monkeypatch):
+    from app.models.database import Customer
+    from app.routes import secure_auth
+
+    customer = Customer(email="rb@example.com", full_name="RB", company_name="RB Co", subdomain="rbco",
+                        onboarding_step=1)
+    db_session.add(customer)
+    db_session.commit()
+    assert secure_auth._get_cached_profile("tenant", customer.id)["onboarding_step"] == 1
+
+    invalidated = []
+    monkeypatch.setattr(secure_auth, "invalidate_user_profile", lambda *args: invalidated.append(args))
+    customer.onboarding_step = 3
+    db_session.flush()
+    db_session.rollback()
+    assert invalidated == []
+
+    customer.onboarding_step = 4
+    db_session.commit()
+    assert invalidated == [("tenant", customer.id)]
+
+
+def test_signing_keys_follow_runtime_config_after_ttl(monkeypatch):
+    from app.security import tokens
+    from app.security.tokens import TokenManager
+
+    settings = {"JWT_SECRET_KEY": "first-secret-for-testing-only-0001"}
+    monkeypatch.setattr(tokens, "get_runtime_setting", lambda key, default=None: settings.get(key, default))
+    monkeypatch.setattr(tokens, "runtime_config_ttl_seconds", lambda: 0.05)
+    tokens.reset_signing_keys()
+
+    token = TokenManager.create_access_token("admin", "admin")
+    TokenManager.verify_access_token(token)
+
+    # Rotación hecha por otro worker: este proceso no recibe reset_signing_keys()
+    settings["JWT_SECRET_KEY"] = "second-secret-for-testing-only-0002"
+    assert tokens.get_signing_keys()[0] == "first-secret-for-testing-only-0001"
+    time.sleep(0.06)
+    assert tokens.get_signing_keys()[0] == "second-secret-for-testing-only-0002"
+    assert tokens._CLAIMS_CACHE == {}
+    with pytest.raises(ValueError):
+        TokenManager.verify_access_token(token)
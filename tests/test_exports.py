@@ -0,0 +1,213 @@
+"""
+Tests de las exportaciones CSV/XLSX en streaming (memoria constante y mismos
+filtros que los listados).
+"""
+import asyncio
+import csv
+import io
+import json
+import os
+import re
+import threading
+import zipfile
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.database import (
+    AuditEventRecord, Commission, CommissionStatus, Customer, Partner, PartnerPricingOverride, Plan, Subscription,
+    SubscriptionStatus,
+)
+from app.routes import audit, billing, commissions, customers
+from app.services.audit_search import audit_filters
+from app.services.exports import csv_chunks, export_response, session_rows, xlsx_chunks
+
+N_ROWS = 500_000
+# Solo el CSV de 500k filas ocupa ~36 MB: materializarlo supera el límite
+MEMORY_CAP = 24 * 1024 * 1024
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+requires_proc = pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="RSS vía /proc")
+
+
+def _rss():
+    with open("/proc/self/statm") as fh:
+        return int(fh.read().split()[1]) * PAGE_SIZE
+
+
+def _synthetic_rows(n):
+    start = datetime(2026, 1, 1)
+    for i in range(n):
+        yield (i, f"tenant-{i % 977}", i * 0.25, i % 7 == 0, start + timedelta(seconds=i), {"seq": i})
+
+
+def _stream_to_file(chunks, path):
+    """Consume el stream a disco midiendo el pico de RSS por encima del inicial."""
+    baseline = peak = _rss()
+    done = threading.Event()
+
+    def _sample():
+        nonlocal peak
+        while not done.wait(0.005):
+            peak = max(peak, _rss())
+
+    sampler = threading.Thread(target=_sample, daemon=True)
+    sampler.start()
+    try:
+        with open(path, "wb") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+    finally:
+        done.set()
+        sampler.join()
+    return max(peak, _rss()) - baseline
+
+
+def _xlsx_rows(path):
+    with zipfile.ZipFile(path) as archive:
+        assert archive.testzip() is None
+        assert {"[Content_Types].xml", "xl/workbook.xml", "xl/worksheets/sheet1.xml"} <= set(archive.namelist())
+        with archive.open("xl/worksheets/sheet1.xml") as sheet:
+            rows, tail = 0, b""
+            while True:
+                block = sheet.read(1 << 20)
+                if not block:
+                    break
+                rows += (tail + block).count(b"<row>")
+                tail = block[-4:]
+    return rows
+
+
+@requires_proc
+def test_csv_export_of_500k_rows_stays_under_memory_cap(tmp_path):
+    path = tmp_path / "rows.csv"
+    header = ["id", "tenant", "amount", "flag", "created_at", "details"]
+    peak = _stream_to_file(csv_chunks(header, _synthetic_rows(N_ROWS)), path)
+
+    assert peak < MEMORY_CAP
+    with open(path, encoding="utf-8-sig", newline="") as fh:
+        reader = csv.reader(fh)
+        assert next(reader) == header
+        first = next(reader)
+        assert first == ["0", "tenant-0", "0.0", "True", "2026-01-01T00:00:00", '{"seq": 0}']
+        assert sum(1 for _ in reader) == N_ROWS - 1
+
+
+@requires_proc
+def test_xlsx_export_of_500k_rows_stays_under_memory_cap(tmp_path):
+    path = tmp_path / "rows.xlsx"
+    header = ["id", "tenant", "amount", "flag", "created_at", "details"]
+    peak = _stream_to_file(xlsx_chunks(header, _synthetic_rows(N_ROWS)), path)
+
+    assert peak < MEMORY_CAP
+    assert _xlsx_rows(path) == N_ROWS + 1
+
+
+def test_cells_are_escaped():
+    rows = [("=HYPERLINK(\"x\")", "a<b>&\x07c", -3, None)]
+    text = b"".join(csv_chunks(["f", "x", "n", "none"], rows)).decode("utf-8-sig")
+    assert text.splitlines()[1] == "\"'=HYPERLINK(\"\"x\"\")\",a<b>&\x07c,-3,"
+
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(xlsx_chunks(["f", "x", "n", "none"], rows))))
+    sheet = archive.read("xl/worksheets/sheet1.xml").decode()
+    assert "a&lt;b&gt;&amp;c" in sheet and "<c><v>-3</v></c><c/>" in sheet
+
+
+def _consume(response):
+    async def _read():
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return asyncio.run(_read())
+
+
+def test_export_response_headers_and_format_validation():
+    response = export_response("XLSX", "audit-events", ["a"], iter([(1,)]))
+    assert response.media_type.startswith("application/vnd.openxmlformats")
+    assert re.match(r'attachment; filename="audit-events-\d{8}-\d{4}\.xlsx"', response.headers["content-disposition"])
+    assert zipfile.ZipFile(io.BytesIO(_consume(response))).read("xl/worksheets/sheet1.xml").count(b"<row>") == 2
+
+    with pytest.raises(HTTPException) as exc:
+        export_response("pdf", "audit-events", ["a"], iter(()))
+    assert exc.value.status_code == 400
+
+
+def test_audit_export_uses_list_filters(db_session, monkeypatch):
+    monkeypatch.setattr(audit, "EXPORT_BATCH_SIZE", 100)
+    base = datetime(2026, 10, 1)
+    db_session.execute(AuditEventRecord.__table__.insert(), [
+        {"event_type": "login" if i % 3 else "tenant.deleted", "actor_id": i % 5, "actor_username": f"u{i}",
+         "resource": f"tenant/acme{i % 4}", "status": "success" if i % 2 else "failure",
+         "details": {"i": i}, "created_at": base + timedelta(minutes=i // 2)}
+        for i in range(2500)
+    ])
+    db_session.commit()
+
+    filters = dict(event_type="login", status="failure", tenant="acme2")
+    rows = list(session_rows(lambda db: audit._audit_export_rows(db, **filters)))
+    expected = (
+        db_session.query(AuditEventRecord).filter(*audit_filters(**filters))
+        .order_by(AuditEventRecord.created_at.desc(), AuditEventRecord.id.desc()).all()
+    )
+    assert [r.id for r in rows] == [e.id for e in expected] and len(rows) > 100
+    assert rows[0].details == expected[0].details
+
+    text = _consume(export_response("csv", "audit-events", [c.key for c in audit._EXPORT_COLUMNS], iter(rows)))
+    parsed = list(csv.DictReader(io.StringIO(text.decode("utf-8-sig"))))
+    assert [int(r["id"]) for r in parsed] == [e.id for e in expected]
+    assert parsed[0]["details"] == json.dumps(expected[0].details)
+
+
+def test_customer_invoice_and_commission_exports_match_lists(db_session):
+    partner = Partner(company_name="Exp Partner", contact_email="exp@p.com", partner_code="EXP1")
+    plan = Plan(name="basic", display_name="Basic", base_price=100, price_per_user=10, included_users=1,
+                is_active=True)
+    db_session.add_all([partner, plan])
+    db_session.flush()
+    db_session.add(PartnerPricingOverride(partner_id=partner.id, plan_name="basic", base_price_override=80,
+                                          label="Basic Partner", is_active=True))
+    for i in range(30):
+        customer = Customer(email=f"exp{i}@x.com", full_name="E", company_name=f"Exp {i:02d}",
+                            subdomain=f"exp{i}", partner_id=partner.id if i % 2 else None, user_count=1 + i % 4)
+        db_session.add(customer)
+        db_session.flush()
+        if i % 5:
+            db_session.add(Subscription(customer_id=customer.id, plan_name="basic", user_count=1 + i % 4,
+                                        status=SubscriptionStatus.active if i % 3 else SubscriptionStatus.pending))
+    db_session.add_all([
+        Commission(partner_id=partner.id, period_start=datetime(2026, 9, 1), period_end=datetime(2026, 9, 30),
+                   gross_revenue=100 * k, partner_amount=50 * k, jeturing_amount=50 * k,
+                   status=CommissionStatus.pending if k % 2 else CommissionStatus.paid, notes="=SUM(A1)")
+        for k in range(1, 6)
+    ])
+    db_session.commit()
+
+    header = customers._EXPORT_HEADER
+    exported = [dict(zip(header, row)) for row in session_rows(lambda db: customers._customer_export_rows(db))]
+    assert len(exported) == 30
+    for row in exported:
+        customer = db_session.get(Customer, row["id"])
+        sub = db_session.query(Subscription).filter(
+            Subscription.customer_id == customer.id,
+            Subscription.status.in_([SubscriptionStatus.active, SubscriptionStatus.suspended]),
+        ).first()
+        if sub is None:
+            assert row["subscription_id"] is None and row["calculated_amount"] is None
+            continue
+        amount = plan.calculate_monthly(customer.user_count, partner_id=customer.partner_id)
+        assert (row["subscription_id"], row["calculated_amount"]) == (sub.id, round(amount, 2))
+        assert row["plan_display_name"] == ("Basic Partner" if customer.partner_id else "Basic")
+
+    only_partner = list(session_rows(lambda db: customers._customer_export_rows(db, partner_id=partner.id)))
+    assert len(only_partner) == 15
+
+    listed = billing._subscription_rows(db_session, limit=100, offset=0, status="paid")["items"]
+    exported = [dict(zip(billing._INVOICE_EXPORT_HEADER, row))
+                for row in session_rows(lambda db: billing._invoice_export_rows(db, "paid"))]
+    assert [(r["id"], r["amount"], r["status"]) for r in exported] == \
+        [(i["id"], i["amount"], i["status"]) for i in listed]
+
+    exported = list(session_rows(lambda db: commissions._commission_export_rows(db, None, "pending")))
+    assert [r.gross_revenue for r in exported] == [500.0, 300.0, 100.0]
+    assert {r.company_name for r in exported} == {"Exp Partner"}
+    text = b"".join(csv_chunks(commissions._EXPORT_HEADER, exported)).decode("utf-8-sig")
+    assert list(csv.DictReader(io.StringIO(text)))[0]["notes"] == "'=SUM(A1)"
@@ -0,0 +1,156 @@
+"""
+Tests del outbox de leads del funnel: encolado, drain con dedupe, dead-letter y contadores.
+"""
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy.exc import DataError
+from starlette.requests import Request
+
+from app.models.database import FunnelLead, FunnelLeadStat
+from app.routes import funnel_leads as funnel_routes
+from app.routes.funnel_leads import FunnelLeadIn
+from app.services import funnel_outbox
+from app.services.funnel_outbox import (
+    FunnelLeadOutbox,
+    drain_funnel_outbox,
+    email_hash,
+    get_funnel_stats,
+    phone_hash,
+)
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    db = TestingSessionLocal()
+    db.query(FunnelLead).delete()
+    db.query(FunnelLeadStat).delete()
+    db.commit()
+    db.close()
+    funnel_outbox.invalidate_funnel_stats_cache()
+    return FunnelLeadOutbox(str(tmp_path / "outbox.sqlite3"))
+
+
+def _lead(email, niche="mpos", phone=None, qualified=True):
+    return {
+        "niche": niche,
+        "full_name": "Test Lead",
+        "email": email,
+        "phone": phone,
+        "qualified": qualified,
+        "created_at": "2026-10-19T12:00:00",
+    }
+
+
+def test_hashes_normalize_email_and_phone():
+    assert email_hash(" Ana@Example.COM ") == email_hash("ana@example.com")
+    assert phone_hash("+1 (809) 555-1234") == phone_hash("18095551234")
+    assert phone_hash("123") is None
+    assert email_hash("") is None
+
+
+def test_drain_inserts_dedupes_and_counts(outbox):
+    outbox.append(_lead("a@example.com", phone="809-555-0001"))
+    outbox.append(_lead("A@example.com"))                            # mismo email
+    outbox.append(_lead("b@example.com", phone="(809) 555 0001"))    # mismo teléfono
+    outbox.append(_lead("a@example.com", niche="build"))             # otro nicho
+    outbox.append(_lead("c@example.com", qualified=False))
+
+    result = drain_funnel_outbox(outbox, batch_size=2)
+
+    assert result["claimed"] == 5
+    assert result["inserted"] == 3
+    assert result["duplicates"] == 2
+    assert outbox.pending_count() == 0
+
+    db = TestingSessionLocal()
+    try:
+        assert db.query(FunnelLead).count() == 3
+        stats = {s.niche.value: (s.lead_count, s.qualified_count) for s in db.query(FunnelLeadStat).all()}
+    finally:
+        db.close()
+    assert stats == {"mpos": (2, 1), "build": (1, 1)}
+
+    # Reentrega del mismo lead (at-least-once) no duplica ni altera contadores.
+    outbox.append(_lead("a@example.com"))
+    assert drain_funnel_outbox(outbox)["inserted"] == 0
+    assert get_funnel_stats() == {"total_leads": 3, "by_niche": {"mpos": 2, "build": 1}}
+
+
+def test_failed_drain_releases_claim(outbox, monkeypatch):
+    outbox.append(_lead("x@example.com"))
+
+    def boom(db, records):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(funnel_outbox, "_apply_batch", boom)
+    with pytest.raises(RuntimeError):
+        drain_funnel_outbox(outbox)
+    monkeypatch.undo()
+
+    assert outbox.pending_count() == 1
+    assert drain_funnel_outbox(outbox)["inserted"] == 1
+
+
+def test_failing_row_is_dead_lettered_and_the_rest_inserted(outbox, monkeypatch):
+    for email in ("ok1@example.com", "bad@example.com", "ok2@example.com"):
+        outbox.append(_lead(email))
+
+    apply_batch = funnel_outbox._apply_batch
+
+    def too_long(db, records):
+        # SQLite no valida largos: simula el DataError de PostgreSQL para una fila
+        if any(r["email"] == "bad@example.com" for r in records):
+            raise DataError("INSERT INTO funnel_leads", {}, Exception("value too long"))
+        return apply_batch(db, records)
+
+    monkeypatch.setattr(funnel_outbox, "_apply_batch", too_long)
+    result = drain_funnel_outbox(outbox)
+
+    assert (result["inserted"], result["dead_lettered"], result["duplicates"]) == (2, 1, 0)
+    assert outbox.pending_count() == 0
+    assert outbox.dead_letter_count() == 1
+
+    db = TestingSessionLocal()
+    try:
+        assert {lead.email for lead in db.query(FunnelLead)} == {"ok1@example.com", "ok2@example.com"}
+    finally:
+        db.close()
+
+
+def test_outbox_key_makes_redelivery_idempotent(outbox):
+    outbox.append({**_lead("k@example.com"), "outbox_key": "key-1"})
+    assert drain_funnel_outbox(outbox)["inserted"] == 1
+
+    # Otro worker reentrega la misma entrada con otro email: la clave la descarta
+    outbox.append({**_lead("other@example.com"), "outbox_key": "key-1"})
+    result = drain_funnel_outbox(outbox)
+    assert (result["inserted"], result["duplicates"]) == (0, 1)
+
+    db = TestingSessionLocal()
+    try:
+        assert db.query(FunnelLead).filter(FunnelLead.outbox_key == "key-1").count() == 1
+    finally:
+        db.close()
+
+
+def test_lead_fields_are_capped_to_column_lengths():
+    with pytest.raises(ValidationError):
+        FunnelLeadIn(niche="mpos", full_name="x", email="a@example.com", referrer="r" * 501)
+    with pytest.raises(ValidationError):
+        FunnelLeadIn(niche="mpos", full_name="x", email="a@example.com", utm_source="u" * 101)
+
+
+def test_capture_truncates_the_referer_header(monkeypatch):
+    queued = []
+    monkeypatch.setattr(funnel_routes, "enqueue_funnel_lead", queued.append)
+    request = Request({
+        "type": "http", "method": "POST", "path": "/lead", "client": ("1.2.3.4", 1234),
+        "headers": [(b"referer", b"https://example.com/" + b"p" * 1000)],
+    })
+    data = FunnelLeadIn(niche="mpos", full_name="x", email="a@example.com")
+
+    asyncio.run(funnel_routes.capture_funnel_lead(data, request))
+    assert len(queued[0]["referrer"]) == 500
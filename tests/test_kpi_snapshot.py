@@ -0,0 +1,89 @@
+"""
+Tests del overview de KPIs materializado (agregados por tabla + single-flight).
+"""
+import threading
+import time
+
+from sqlalchemy import event
+
+from app.models.database import (
+    ContainerStatus, Customer, Invoice, InvoiceStatus, LXCContainer, NodeStatus, Plan, ProxmoxNode,
+    Subscription, SubscriptionStatus,
+)
+from app.services import kpi_snapshot
+from app.services.kpi_snapshot import compute_overview, get_overview_snapshot, refresh_overview_snapshot
+from tests.conftest import engine
+
+
+def _seed(db, scale):
+    for i in range(scale):
+        node = ProxmoxNode(name=f"n{scale}-{i}", hostname=f"n{scale}-{i}", total_ram_gb=64, used_ram_gb=16,
+                           status=NodeStatus.online if i else NodeStatus.offline)
+        db.add(node)
+        db.flush()
+        db.add(LXCContainer(vmid=1000 * scale + i, hostname=f"c{scale}-{i}", node_id=node.id,
+                            status=ContainerStatus.running))
+        customer = Customer(email=f"c{scale}-{i}@x.com", full_name="C", subdomain=f"c{scale}-{i}")
+        db.add(customer)
+        db.flush()
+        db.add(Subscription(customer_id=customer.id, plan_name="basic", status=SubscriptionStatus.active))
+        db.add(Invoice(invoice_number=f"INV-{scale}-{i}", customer_id=customer.id, total=50,
+                       status=[InvoiceStatus.paid, InvoiceStatus.issued, InvoiceStatus.overdue][i % 3]))
+    db.commit()
+
+
+def _statements(db):
+    statements = []
+
+    def _count(*_args):
+        statements.append(1)
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        overview = compute_overview(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+    return len(statements), overview
+
+
+def test_overview_aggregates_with_constant_queries(db_session):
+    db_session.add(Plan(name="basic", display_name="Basic", base_price=100, price_per_user=0,
+                        included_users=1, max_users=0, is_active=True))
+    _seed(db_session, 3)
+    few, overview = _statements(db_session)
+    assert overview["revenue"]["mrr"] == 300.0
+    assert overview["customers"]["active_subscriptions"] == 3
+    assert (overview["infrastructure"]["nodes_total"], overview["infrastructure"]["nodes_online"]) == (3, 2)
+    assert overview["infrastructure"]["ram"]["percent"] == 25.0
+    assert (overview["invoices"]["paid"], overview["invoices"]["pending"]) == (1, 2)
+
+    _seed(db_session, 12)
+    many, overview = _statements(db_session)
+    assert many == few
+    assert overview["infrastructure"]["containers_running"] == 15
+
+
+def test_refresh_is_single_flight_and_served_with_as_of(db_session, monkeypatch):
+    assert get_overview_snapshot(db_session) is None
+    calls = []
+    real_compute = kpi_snapshot.compute_overview
+
+    def _slow_compute(db):
+        calls.append(1)
+        time.sleep(0.2)
+        return real_compute(db)
+
+    monkeypatch.setattr(kpi_snapshot, "compute_overview", _slow_compute)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(refresh_overview_snapshot(db_session)))
+        for _ in range(6)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1 and len(results) == 6
+    assert len({r["as_of"] for r in results}) == 1
+    assert get_overview_snapshot(db_session)["as_of"] == results[0]["as_of"]
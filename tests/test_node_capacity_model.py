@@ -0,0 +1,151 @@
+"""
+Tests del modelo incremental de capacidad de nodos (heap de placement).
+Secuencia aleatoria con semilla de provisiones, bajas, migraciones y
+métricas; tras cada commit el modelo debe coincidir con el recálculo completo.
+"""
+import random
+
+import pytest
+from sqlalchemy import event
+
+from app.models.database import (
+    ContainerStatus, Customer, LXCContainer, NodeStatus, ProxmoxNode, Subscription, SubscriptionStatus,
+    TenantDeployment,
+)
+from app.services.node_capacity_service import NodeCapacityService, _tenant_counts, capacity_model
+from app.services.resource_monitor import ResourceMonitor
+from tests.conftest import engine
+
+
+@pytest.fixture(autouse=True)
+def _fresh_model():
+    capacity_model.reset()
+    yield
+    capacity_model.reset()
+
+
+def _seed(db, rng, n_nodes=8):
+    nodes = [
+        ProxmoxNode(name=f"cap{i}", hostname=f"10.0.1.{i}", status=NodeStatus.online, can_host_tenants=True,
+                    total_ram_gb=rng.choice([8, 16, 32]), used_ram_gb=rng.uniform(1, 8),
+                    total_storage_gb=500, used_storage_gb=rng.uniform(10, 300),
+                    used_cpu_percent=rng.uniform(0, 80), io_max_tenants=rng.choice([4, 8]),
+                    is_database_node=(i == 0))
+        for i in range(n_nodes)
+    ]
+    customer = Customer(email="cap@x.com", full_name="C", company_name="Cap", subdomain="cap")
+    db.add_all(nodes + [customer])
+    db.flush()
+    sub = Subscription(customer_id=customer.id, plan_name="basic", status=SubscriptionStatus.active)
+    container = LXCContainer(vmid=700, hostname="cap-ct", node_id=nodes[1].id, status=ContainerStatus.running)
+    db.add_all([sub, container])
+    db.commit()
+    return [n.id for n in nodes], sub.id, container.id
+
+
+def _expected(db):
+    nodes = db.query(ProxmoxNode).order_by(ProxmoxNode.id).all()
+    return NodeCapacityService._best_node_full(nodes, _tenant_counts(db))
+
+
+def _assert_consistent(db):
+    assert capacity_model.check_consistency(db) == []
+    best = NodeCapacityService.get_best_node(db)
+    assert ((best["node"].id, best["score"]) if best else None) == _expected(db)
+
+
+def test_incremental_model_matches_full_recompute(db_session, monkeypatch):
+    rng = random.Random(48)
+    node_ids, sub_id, container_id = _seed(db_session, rng)
+    NodeCapacityService.get_best_node(db_session)  # carga inicial del modelo
+    rebuilds = []
+    monkeypatch.setattr(capacity_model, "rebuild", lambda db: rebuilds.append(1))
+    deployments = []
+
+    for step in range(200):
+        op = rng.choice(["provision", "provision", "deprovision", "migrate", "metrics", "scan", "toggle"])
+        if op == "provision":
+            dep = TenantDeployment(subscription_id=sub_id, container_id=container_id, subdomain=f"t{step}",
+                                   active_node_id=rng.choice(node_ids + [None]))
+            db_session.add(dep)
+            deployments.append(dep)
+        elif op == "deprovision" and deployments:
+            db_session.delete(deployments.pop(rng.randrange(len(deployments))))
+        elif op == "migrate" and deployments:
+            rng.choice(deployments).active_node_id = rng.choice(node_ids)
+        elif op == "metrics":
+            node = db_session.get(ProxmoxNode, rng.choice(node_ids))
+            node.used_ram_gb = rng.uniform(0, float(node.total_ram_gb))
+            node.used_cpu_percent = rng.uniform(0, 100)
+        elif op == "scan":
+            # Camino Core del escaneo de recursos (executemany + deltas)
+            outcomes = [
+                (nid, rng.choice(["online", "online", "timeout"]),
+                 {"cpu_percent": rng.uniform(0, 100), "ram_used_gb": rng.uniform(0, 6), "disk_used_gb": 50.0})
+                for nid in rng.sample(node_ids, 3)
+            ]
+            ResourceMonitor._persist(db_session, outcomes, [])
+        elif op == "toggle":
+            node = db_session.get(ProxmoxNode, rng.choice(node_ids))
+            if rng.random() < 0.5:
+                node.can_host_tenants = not node.can_host_tenants
+            else:
+                node.status = NodeStatus.online if node.status != NodeStatus.online else NodeStatus.maintenance
+        db_session.commit()
+        _assert_consistent(db_session)
+    assert rebuilds == []  # todo llegó como delta, sin recargar el modelo
+
+    # Rollback: los cambios descartados no llegan al modelo
+    db_session.get(ProxmoxNode, node_ids[1]).can_host_tenants = False
+    db_session.add(TenantDeployment(subscription_id=sub_id, container_id=container_id, subdomain="rb",
+                                    active_node_id=node_ids[2]))
+    db_session.flush()
+    db_session.rollback()
+    _assert_consistent(db_session)
+
+
+def test_bulk_statements_invalidate_and_rebuild(db_session):
+    rng = random.Random(7)
+    node_ids, _, _ = _seed(db_session, rng)
+    NodeCapacityService.get_best_node(db_session)
+
+    db_session.query(ProxmoxNode).update({ProxmoxNode.can_host_tenants: False})
+    db_session.commit()
+    assert NodeCapacityService.get_best_node(db_session) is None
+
+    NodeCapacityService.evaluate_all_nodes(db_session)
+    _assert_consistent(db_session)
+
+
+def test_best_node_uses_constant_queries_once_loaded(db_session):
+    rng = random.Random(11)
+    _seed(db_session, rng, n_nodes=60)
+    NodeCapacityService.get_best_node(db_session)
+
+    statements = []
+
+    def _count(*_args):
+        statements.append(1)
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        for _ in range(5):
+            statements.clear()
+            assert NodeCapacityService.get_best_node(db_session) is not None
+            assert len(statements) == 2  # la fila del ganador + su conteo de tenants
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+
+def test_best_node_corrects_stale_winner(db_session):
+    rng = random.Random(5)
+    node_ids, _, _ = _seed(db_session, rng)
+    first = NodeCapacityService.get_best_node(db_session)["node"].id
+
+    # Cambio hecho por otro proceso: no pasa por los hooks de esta sesión
+    with engine.begin() as conn:
+        conn.execute(ProxmoxNode.__table__.update().where(ProxmoxNode.__table__.c.id == first)
+                     .values(can_host_tenants=False))
+    best = NodeCapacityService.get_best_node(db_session)
+    assert best["node"].id != first
+    assert (best["node"].id, best["score"]) == _expected(db_session)
@@ -0,0 +1,160 @@
+"""
+Tests del recolector de uso Odoo (pool por nodo + caché TTL + respaldo psql).
+BDs de tenants simuladas con archivos SQLite y funciones pg_* registradas.
+"""
+import subprocess
+import threading
+import time
+
+from sqlalchemy import create_engine, event, text
+
+from app.services import odoo_usage
+from app.services.odoo_usage import OdooUsageCollector, collect_usage_psql
+
+
+class _Tenants:
+    """Fábrica de engines SQLite por BD que registra conexiones y concurrencia."""
+
+    def __init__(self, tmp_path, delay=0.0):
+        self.tmp_path = tmp_path
+        self.delay = delay
+        self.created, self.connects = [], []
+        self.active = self.peak = 0
+        self._lock = threading.Lock()
+
+    def add(self, name, companies, websites=None, size_mb=1):
+        engine = create_engine(f"sqlite:///{self.tmp_path}/{name}.sqlite3")
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE res_company (id INTEGER)"))
+            conn.execute(text("CREATE TABLE meta (size_mb INTEGER)"))
+            conn.execute(text(f"INSERT INTO meta VALUES ({size_mb})"))
+            for i in range(companies):
+                conn.execute(text(f"INSERT INTO res_company VALUES ({i})"))
+            if websites is not None:
+                conn.execute(text("CREATE TABLE website (id INTEGER)"))
+                for i in range(websites):
+                    conn.execute(text(f"INSERT INTO website VALUES ({i})"))
+        engine.dispose()
+
+    def _size(self, dbapi_conn):
+        def _pg_database_size(_name):
+            with self._lock:
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+            time.sleep(self.delay)
+            with self._lock:
+                self.active -= 1
+            return dbapi_conn.execute("SELECT size_mb FROM meta").fetchone()[0] * 1024 * 1024
+        return _pg_database_size
+
+    def factory(self, host, db_name):
+        path = self.tmp_path / f"{db_name}.sqlite3"
+        if not path.exists():
+            raise OSError(f"database {db_name} does not exist")
+        self.created.append((host, db_name))
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+        @event.listens_for(engine, "connect")
+        def _register(dbapi_conn, _record):
+            self.connects.append(db_name)
+            dbapi_conn.create_function("current_database", 0, lambda: db_name)
+            dbapi_conn.create_function("pg_database_size", 1, self._size(dbapi_conn))
+
+        return engine
+
+
+def test_one_round_trip_per_tenant_with_fallback_for_unreachable(tmp_path):
+    tenants = _Tenants(tmp_path)
+    tenants.add("acme", companies=2, websites=3, size_mb=120)
+    tenants.add("beta", companies=1, size_mb=7)           # sin módulo website
+    fallback_calls = []
+
+    def _fallback(names, host):
+        fallback_calls.append((names, host))
+        return {name: dict(odoo_usage.ODOO_USAGE_DEFAULT) for name in names}
+
+    collector = OdooUsageCollector(tenants.factory, fallback=_fallback, ttl_seconds=60)
+    usage = collector.collect(["beta", "acme", "gone", "bad-name!"], host="10.0.0.5")
+
+    assert usage == {
+        "acme": {"websites": 3, "companies": 2, "storage_mb": 120},
+        "beta": {"websites": 1, "companies": 1, "storage_mb": 7},
+        "gone": {"websites": 1, "companies": 1, "storage_mb": 0},
+    }
+    assert fallback_calls == [(["gone"], "10.0.0.5")]
+    assert sorted(tenants.created) == [("10.0.0.5", "acme"), ("10.0.0.5", "beta")]
+    collector.close()
+
+
+def test_cached_within_ttl_and_connections_reused_on_refresh(tmp_path):
+    tenants = _Tenants(tmp_path)
+    for name in ("acme", "beta", "gamma"):
+        tenants.add(name, companies=1, websites=1)
+    collector = OdooUsageCollector(tenants.factory, ttl_seconds=60, idle_connections_per_node=2)
+
+    first = collector.collect(["acme", "beta"], host="h")
+    assert collector.collect(["acme", "beta"], host="h") == first
+    assert len(tenants.connects) == 2
+
+    # refresh vuelve a consultar sobre las conexiones retenidas del pool
+    collector.collect(["acme", "beta"], host="h", refresh=True)
+    assert len(tenants.connects) == 2 and len(tenants.created) == 2
+
+    # Con idle=2 el engine menos usado se desaloja y se vuelve a crear al pedirlo
+    collector.collect(["gamma"], host="h")
+    collector.collect(["acme", "beta"], host="h", refresh=True)
+    assert len(tenants.created) == 5
+    collector.close()
+
+
+def test_fan_out_is_parallel_but_bounded_per_node(tmp_path):
+    tenants = _Tenants(tmp_path, delay=0.05)
+    names = [f"t{i:03d}" for i in range(8)]
+    for name in names:
+        tenants.add(name, companies=1, websites=1)
+    collector = OdooUsageCollector(tenants.factory, max_connections_per_node=3, concurrency=8, ttl_seconds=0)
+
+    started = time.perf_counter()
+    assert sorted(collector.collect(names, host="h")) == names
+    elapsed = time.perf_counter() - started
+
+    assert tenants.peak == 3
+    assert elapsed < 8 * 0.05
+    collector.close()
+
+
+def test_psql_fallback_parses_one_process(monkeypatch):
+    captured = {}
+
+    def _run(cmd, input, **kwargs):
+        captured["cmd"], captured["script"] = cmd, input
+        stdout = (
+            "storage_mb|acme|120\nstorage_mb|beta|7\n"
+            "connected|acme|1\ncompanies|acme|2\nwebsites|acme|3\nconnected|beta|1\ncompanies|beta|1\n"
+        )
+        return subprocess.CompletedProcess(cmd, 0, stdout=stdout, stderr="ERROR: relation \"website\" does not exist")
+
+    monkeypatch.setattr(odoo_usage.subprocess, "run", _run)
+    usage = collect_usage_psql(["beta", "acme", "bad-name!"], host="10.0.0.5")
+    assert usage == {
+        "acme": {"websites": 3, "companies": 2, "storage_mb": 120},
+        "beta": {"websites": 1, "companies": 1, "storage_mb": 7},
+    }
+    assert captured["cmd"][2] == "10.0.0.5"
+    assert captured["script"].count("\\connect") == 2 and "bad-name" not in captured["script"]
+
+
+def test_psql_fallback_treats_the_rest_of_the_script_as_failed_after_a_bad_connect(monkeypatch):
+    def _run(cmd, input, **kwargs):
+        # \connect a "beta" falla: psql cierra la conexión y nada posterior responde
+        stdout = "storage_mb|acme|120\nstorage_mb|beta|7\nstorage_mb|gamma|9\nconnected|acme|1\ncompanies|acme|2\n"
+        stdout += "companies|gamma|4\n"  # fila suelta tras el corte: no cuenta
+        return subprocess.CompletedProcess(cmd, 0, stdout=stdout, stderr="FATAL: database \"beta\" does not exist")
+
+    monkeypatch.setattr(odoo_usage.subprocess, "run", _run)
+    usage = collect_usage_psql(["acme", "beta", "gamma"], host="h")
+    assert usage == {
+        "acme": {"websites": 1, "companies": 2, "storage_mb": 120},
+        "beta": {"websites": 1, "companies": 1, "storage_mb": 7},
+        "gamma": {"websites": 1, "companies": 1, "storage_mb": 9},
+    }
@@ -11,10 +11,13 @@ from app.models.database import (
     PartnerStatus,
     Plan,
     Partner,
+    SeatEvent,
+    SeatHighWater,
     Subscription,
     SubscriptionStatus,
 )
 from app.routes.odoo_webhooks import (
+    _handle_seats_batch,
     _handle_tenant_config_changed,
     _handle_tenant_snapshot,
     _handle_user_created,
@@ -174,3 +177,31 @@ class TestOdooTenantSnapshots:
         assert sajet_admin["reason"] == "non_billable_user"
         assert customer.user_count == 1
         assert subscription.user_count == 1
+
+    def test_seats_batch_ingests_billable_changes_once(self, db_session):
+        plan = Plan(name="basic", display_name="Basic", is_active=True,
+                    base_price=120, price_per_user=17.5, included_users=1)
+        customer = Customer(email="owner@acme.com", full_name="Owner", company_name="Acme",
+                            subdomain="acme", user_count=2)
+        db_session.add_all([plan, customer])
+        db_session.commit()
+        subscription = Subscription(customer_id=customer.id, plan_name="basic",
+                                    status=SubscriptionStatus.active, user_count=2)
+        db_session.add(subscription)
+        db_session.commit()
+
+        result = asyncio.run(_handle_seats_batch("acme", {"changes": [
+            {"event": "user.created", "user_id": 1, "login": "a@acme.com", "occurred_at": "2026-01-05T10:00:00Z"},
+            {"event": "user.created", "user_id": 2, "login": "b@acme.com", "occurred_at": "2026-01-05T10:01:00Z"},
+            {"event": "user.created", "user_id": 3, "login": "acme@sajet.us"},
+            {"event": "user.deleted", "user_id": 1, "login": "a@acme.com", "occurred_at": "2026-01-05T10:02:00Z"},
+        ]}))
+
+        db_session.refresh(customer)
+        db_session.refresh(subscription)
+        assert result["synced"] is True
+        assert result["changes"] == 3 and result["skipped"] == 1
+        assert customer.user_count == 3
+        assert subscription.user_count == 3
+        assert [e.user_count_after for e in db_session.query(SeatEvent).order_by(SeatEvent.created_at)] == [3, 4, 3]
+        assert db_session.query(SeatHighWater).one().hwm_count == 4
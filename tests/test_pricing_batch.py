@@ -0,0 +1,116 @@
+"""
+Propiedad: el pricing por conjuntos (get_effective_plan_snapshots) coincide
+exactamente con get_effective_plan_snapshot suscripción por suscripción.
+"""
+import random
+
+import pytest
+from sqlalchemy import event
+
+from app.models.database import (
+    Customer, Partner, PartnerPricingOverride, Plan, Subscription, SubscriptionStatus,
+)
+from app.services.pricing import (
+    get_effective_plan_snapshot, get_effective_plan_snapshots, get_plan_price_for_sub, get_subscription_prices,
+)
+from tests.conftest import engine
+
+_COMPARED = (
+    "partner_id", "user_count", "base_price", "price_per_user", "included_users",
+    "extra_users", "total", "pricing_source",
+)
+
+
+def _maybe(rng, value, p=0.3):
+    return None if rng.random() < p else value
+
+
+def _seed_world(db, rng):
+    plans = []
+    for i, name in enumerate(rng.sample(["basic", "pro", "enterprise", "custom", "Starter"], k=rng.randint(0, 5))):
+        plans.append(Plan(
+            name=name, display_name=name.title(), base_price=rng.choice([0, 49, 160, 200.5]),
+            price_per_user=rng.choice([0, 12.5, 17.1]), included_users=rng.choice([1, 3, 5]),
+            max_users=rng.choice([0, 0, 2, 5, 10]), sort_order=rng.randint(0, 3),
+            is_active=rng.random() < 0.85,
+        ))
+    partners = [
+        Partner(company_name=f"P{i}", contact_email=f"p{i}@x.com", partner_code=f"P{i}")
+        for i in range(3)
+    ]
+    db.add_all(plans + partners)
+    db.flush()
+
+    pairs = [(partner.id, name) for partner in partners for name in ("basic", "pro", "enterprise", "custom")]
+    for partner_id, plan_name in rng.sample(pairs, k=rng.randint(0, 6)):
+        db.add(PartnerPricingOverride(
+            partner_id=partner_id,
+            plan_name=plan_name,
+            base_price_override=_maybe(rng, rng.choice([99.0, 150.0])),
+            price_per_user_override=_maybe(rng, rng.choice([5.0, 9.9])),
+            included_users_override=_maybe(rng, rng.choice([1, 2, 10])),
+            is_active=rng.random() < 0.8,
+        ))
+
+    customers = []
+    for i in range(12):
+        customer = Customer(
+            email=f"c{i}@x.com", full_name=f"C{i}", subdomain=f"c{i}",
+            user_count=rng.choice([None, 0, 1, 4, 12]),
+            partner_id=_maybe(rng, rng.choice(partners).id, p=0.5),
+            is_admin_account=rng.random() < 0.1,
+        )
+        customers.append(customer)
+    db.add_all(customers)
+    db.flush()
+
+    for i in range(30):
+        db.add(Subscription(
+            customer_id=rng.choice(customers).id,
+            plan_name=rng.choice(["basic", "pro", "enterprise", "custom", "Starter", "legacy"]),
+            status=rng.choice([SubscriptionStatus.active, SubscriptionStatus.pending]),
+            user_count=rng.choice([None, 0, 1, 3, 6, 11, 40]),
+            monthly_amount=rng.choice([0, 0, 75.0]),
+            owner_partner_id=_maybe(rng, rng.choice(partners).id, p=0.6),
+        ))
+    db.commit()
+
+
+def _comparable(snapshot):
+    return (
+        {key: snapshot[key] for key in _COMPARED},
+        snapshot["plan"].id if snapshot["plan"] else None,
+        snapshot["customer"].id if snapshot["customer"] else None,
+        snapshot["override"].id if snapshot["override"] else None,
+    )
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_batch_pricing_matches_per_subscription_snapshot(db_session, seed):
+    _seed_world(db_session, random.Random(seed))
+
+    batch = get_effective_plan_snapshots(db_session)
+    subs = db_session.query(Subscription).order_by(Subscription.id).all()
+    assert [sub.id for sub, _ in batch] == [sub.id for sub in subs]
+    for sub, snapshot in batch:
+        assert _comparable(snapshot) == _comparable(get_effective_plan_snapshot(db_session, sub))
+
+    prices = dict(get_subscription_prices(db_session, Subscription.status == SubscriptionStatus.active))
+    for sub, price in prices.items():
+        assert sub.status == SubscriptionStatus.active
+        assert price == float(get_plan_price_for_sub(db_session, sub))
+
+
+def test_batch_pricing_uses_constant_queries(db_session):
+    _seed_world(db_session, random.Random(3))
+    statements = []
+
+    def _count(*_args):
+        statements.append(1)
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        get_effective_plan_snapshots(db_session)
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+    assert len(statements) == 2       # catálogo de planes + consulta unida
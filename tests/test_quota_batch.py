@@ -0,0 +1,136 @@
+"""
+Tests de la evaluación de cuotas por lotes (vista de todos los clientes).
+"""
+import random
+
+import pytest
+from sqlalchemy import event
+
+from app.models.database import (
+    ContainerStatus, Customer, CustomDomain, LXCContainer, Partner, PartnerPricingOverride, Plan, ProxmoxNode,
+    Subscription, SubscriptionStatus, TenantDeployment,
+)
+from app.services import quota_service
+from app.services.quota_service import QuotaService
+from tests.conftest import engine
+
+
+def _fake_usage(calls):
+    def _collect(tenant_dbs, host=None):
+        names = sorted(set(tenant_dbs))
+        calls.append(names)
+        return {
+            name: {"websites": len(name) % 3, "companies": 1 + len(name) % 2, "storage_mb": 10 * len(name)}
+            for name in names
+        }
+    return _collect
+
+
+def _seed(db, n_customers, rng):
+    plans = [
+        Plan(name=name, display_name=name.title(), base_price=10, max_users=rng.choice([0, 3, 10]),
+             max_domains=rng.choice([-1, 0, 2]), max_storage_mb=rng.choice([0, 50, 500]),
+             max_websites=1, max_companies=1, is_active=True)
+        for name in ("basic", "pro") if not db.query(Plan).filter_by(name=name).first()
+    ]
+    partner = Partner(company_name="P", contact_email=f"p{n_customers}@x.com",
+                      partner_code=f"QP{n_customers}")
+    node = ProxmoxNode(name=f"qn{n_customers}", hostname="10.0.0.9")
+    db.add_all(plans + [partner, node])
+    db.flush()
+    db.add(PartnerPricingOverride(partner_id=partner.id, plan_name="pro", max_users_override=2,
+                                  max_storage_mb_override=40, is_active=True))
+    container = LXCContainer(vmid=900 + n_customers, hostname=f"ct{n_customers}", node_id=node.id,
+                             status=ContainerStatus.running)
+    db.add(container)
+    db.flush()
+    for i in range(n_customers):
+        customer = Customer(email=f"q{n_customers}-{i}@x.com", full_name="Q", company_name=f"Co {i:03d}",
+                            subdomain=f"q{n_customers}x{i}", partner_id=partner.id if i % 3 == 0 else None)
+        db.add(customer)
+        db.flush()
+        if i % 4:
+            sub = Subscription(customer_id=customer.id, plan_name=rng.choice(["basic", "pro", "legacy"]),
+                               status=SubscriptionStatus.active, user_count=rng.randint(1, 12))
+            db.add(sub)
+            db.flush()
+            if i % 2:
+                db.add(TenantDeployment(subscription_id=sub.id, container_id=container.id, customer_id=customer.id,
+                                        subdomain=customer.subdomain, database_name=customer.subdomain))
+        for j in range(rng.randint(0, 3)):
+            db.add(CustomDomain(customer_id=customer.id, external_domain=f"d{j}.{customer.subdomain}.com",
+                                sajet_subdomain=f"{customer.subdomain}{j}"))
+    db.commit()
+
+
+def _per_customer(db):
+    """Evaluación cliente por cliente (ruta del detalle) con el mismo formato de resumen."""
+    svc = QuotaService(db)
+    rows = []
+    for customer in db.query(Customer).order_by(Customer.company_name).all():
+        plan, plan_name = svc._get_active_plan(customer.id)
+        usage = svc._get_current_usage(customer.id)
+        limits = svc._get_effective_limits(customer, plan, plan_name)
+        rows.append(svc._summary_row(customer, plan, plan_name, usage, limits))
+    return rows
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_batch_matches_per_customer_with_one_odoo_pass(db_session, monkeypatch, seed):
+    _seed(db_session, 20, random.Random(seed))
+    calls = []
+    monkeypatch.setattr(quota_service, "collect_odoo_usage", _fake_usage(calls))
+
+    expected = _per_customer(db_session)
+    calls.clear()
+    assert QuotaService(db_session).get_all_customers_quotas() == expected
+    assert len(calls) == 1 and len(calls[0]) == 10
+
+
+def test_batch_queries_do_not_grow_with_customers(db_session, monkeypatch):
+    monkeypatch.setattr(quota_service, "collect_odoo_usage", _fake_usage([]))
+
+    def _statements():
+        statements = []
+
+        def _count(*_args):
+            statements.append(1)
+
+        event.listen(engine, "before_cursor_execute", _count)
+        try:
+            QuotaService(db_session).get_all_customers_quotas()
+        finally:
+            event.remove(engine, "before_cursor_execute", _count)
+        return len(statements)
+
+    _seed(db_session, 5, random.Random(1))
+    few = _statements()
+    _seed(db_session, 40, random.Random(2))
+    assert _statements() == few
+
+
+def test_quota_table_is_cached_paged_and_sorted(db_session, monkeypatch):
+    monkeypatch.setattr(quota_service, "collect_odoo_usage", _fake_usage([]))
+    quota_service._quota_table_cache.clear()
+    _seed(db_session, 12, random.Random(4))
+    svc = QuotaService(db_session)
+
+    page = svc.get_quota_table(sort="company_name", order="asc", limit=5, offset=5)
+    assert page["total"] == 12
+    assert [r["company_name"] for r in page["customers"]] == [f"Co {i:03d}" for i in range(5, 10)]
+
+    by_usage = svc.get_quota_table(limit=12)["customers"]
+    usage = [r["top_usage_percent"] for r in by_usage]
+    assert usage == sorted(usage, reverse=True)
+    assert svc.get_quota_table(search="co 007")["total"] == 1
+
+    # Cacheado: un cliente nuevo no aparece hasta refresh
+    db_session.add(Customer(email="late@x.com", full_name="L", company_name="Late", subdomain="late"))
+    db_session.commit()
+    assert svc.get_quota_table()["total"] == 12
+    assert svc.get_quota_table(refresh=True)["total"] == 13
+    quota_service._quota_table_cache.clear()
+
+    with pytest.raises(ValueError):
+        svc.get_quota_table(sort="nope")
+
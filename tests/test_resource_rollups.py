@@ -0,0 +1,107 @@
+"""
+Tests de los rollups de métricas de recursos (5m/1h/1d), retención por nivel y LTTB.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.models.database import ProxmoxNode, ResourceMetric, ResourceMetricRollup
+from app.services.resource_rollups import (
+    choose_resolution, get_metric_series, lttb, purge_resource_metrics, rollup_resource_metrics,
+)
+
+
+def _seed_samples(db, node_id, start, end, step=timedelta(minutes=1)):
+    rows, at = [], start
+    while at < end:
+        rows.append({"node_id": node_id, "cpu_percent": float(at.minute), "ram_mb": 1024.0,
+                     "disk_gb": 10.0, "recorded_at": at})
+        at += step
+    db.execute(ResourceMetric.__table__.insert(), rows)
+    db.commit()
+
+
+def _node(db):
+    node = ProxmoxNode(name="r1", hostname="r1.local")
+    db.add(node)
+    db.commit()
+    return node.id
+
+
+def _rollup(db, resolution, start):
+    return db.query(ResourceMetricRollup).filter_by(resolution=resolution, bucket_start=start).one()
+
+
+def test_rollups_close_buckets_incrementally_with_p95(db_session):
+    node_id = _node(db_session)
+    now = datetime(2026, 10, 19, 12, 7)
+    _seed_samples(db_session, node_id, datetime(2026, 10, 17), now)
+
+    assert rollup_resource_metrics(db_session, now) == {"5m": 2 * 288 + 145, "1h": 48 + 12, "1d": 2}
+    db_session.commit()
+
+    hour = _rollup(db_session, "1h", datetime(2026, 10, 19, 10))
+    assert (hour.samples, hour.cpu_percent_min, hour.cpu_percent_avg, hour.cpu_percent_max,
+            hour.cpu_percent_p95) == (60, 0.0, 29.5, 59.0, 56.0)
+    five = _rollup(db_session, "5m", datetime(2026, 10, 19, 10, 5))
+    assert (five.cpu_percent_min, five.cpu_percent_max, five.cpu_percent_p95, five.ram_mb_avg) == (5, 9, 9, 1024)
+
+    # Incremental: sin buckets nuevos no se escribe nada; 10 minutos después, solo esos
+    assert rollup_resource_metrics(db_session, now) == {"5m": 0, "1h": 0, "1d": 0}
+    _seed_samples(db_session, node_id, now, now + timedelta(minutes=10))
+    assert rollup_resource_metrics(db_session, now + timedelta(minutes=10)) == {"5m": 2, "1h": 0, "1d": 0}
+    db_session.commit()
+
+    # Retención: las crudas se purgan, los rollups quedan
+    deleted = purge_resource_metrics(db_session, now, raw_days=1)
+    db_session.commit()
+    assert deleted["raw"] == 24 * 60 + 12 * 60 + 7
+    assert db_session.query(ResourceMetricRollup).filter_by(resolution="1d").count() == 2
+
+
+def test_series_picks_resolution_fills_open_tail_and_downsamples(db_session):
+    node_id = _node(db_session)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    _seed_samples(db_session, node_id, now - timedelta(days=3), now, step=timedelta(minutes=2))
+    rollup_resource_metrics(db_session, now - timedelta(hours=1))
+    db_session.commit()
+
+    assert [choose_resolution(h) for h in (1, 48, 24 * 30, 24 * 365)] == ["raw", "5m", "1h", "1d"]
+
+    full = get_metric_series(db_session, node_id=node_id, hours=48)
+    assert full["resolution"] == "5m"
+    # La última hora aún no está en rollups: se completa desde las crudas
+    assert full["data"][-1]["timestamp"] >= (now - timedelta(minutes=10)).isoformat()
+    assert full["points"] >= 48 * 12
+
+    reduced = get_metric_series(db_session, node_id=node_id, hours=48, points=100)
+    assert reduced["points"] == 100
+    assert reduced["data"][0] == full["data"][0] and reduced["data"][-1] == full["data"][-1]
+    assert {"cpu_percent_p95", "cpu_percent_max", "samples"} <= set(reduced["data"][0])
+
+
+def test_a_bucket_is_unique_per_target_even_with_null_ids(db_session):
+    row = {"resolution": "1h", "bucket_start": datetime(2026, 10, 19, 10), "node_id": None,
+           "container_id": None, "samples": 1}
+    db_session.execute(ResourceMetricRollup.__table__.insert(), [row])
+    with pytest.raises(IntegrityError):
+        db_session.execute(ResourceMetricRollup.__table__.insert(), [row])
+    db_session.rollback()
+
+
+def test_lttb_keeps_endpoints_order_and_spikes():
+    rng = random.Random(3)
+    for _ in range(50):
+        n = rng.randint(3, 400)
+        rows = [(i, rng.random()) for i in range(n)]
+        threshold = rng.randint(3, 120)
+        sampled = lttb(rows, threshold, x=lambda r: r[0], y=lambda r: r[1])
+        assert len(sampled) == min(n, threshold)
+        assert sampled[0] == rows[0] and sampled[-1] == rows[-1]
+        assert [r[0] for r in sampled] == sorted({r[0] for r in sampled})
+
+    flat = [(i, 1.0) for i in range(1000)]
+    flat[613] = (613, 95.0)
+    assert (613, 95.0) in lttb(flat, 20, x=lambda r: r[0], y=lambda r: r[1])
@@ -0,0 +1,121 @@
+"""
+Tests del escaneo de recursos concurrente (sondas falsas con latencia fija).
+"""
+import asyncio
+import threading
+import time
+
+from sqlalchemy import event
+
+from app.models.database import (
+    ContainerStatus, LXCContainer, NodeStatus, ProxmoxNode, ResourceMetric,
+)
+from app.services.resource_monitor import ResourceMonitor
+from tests.conftest import engine
+
+PROBE_SECONDS = 0.05
+
+
+class _FakeFleet:
+    """Sondas simuladas: latencia fija, un nodo lento, uno caído y un contenedor detenido."""
+
+    def __init__(self):
+        self.active, self.peak = {}, {}
+        self._lock = threading.Lock()
+
+    def _enter(self, node_name, seconds):
+        with self._lock:
+            self.active[node_name] = self.active.get(node_name, 0) + 1
+            self.peak[node_name] = max(self.peak.get(node_name, 0), self.active[node_name])
+        time.sleep(seconds)
+        with self._lock:
+            self.active[node_name] -= 1
+
+    def probe_node(self, node):
+        if node.name == "down":
+            raise RuntimeError("ssh: connect to host down port 22: No route to host")
+        self._enter(node.name, 0.6 if node.name == "slow" else PROBE_SECONDS)
+        return {"cpu_percent": 10.0, "ram_used_gb": 2.0, "disk_used_gb": 30.0}
+
+    def probe_container(self, node, container):
+        self._enter(node.name, PROBE_SECONDS)
+        if container.hostname.endswith("-stopped"):
+            return None
+        return {"cpu_percent": 150.0, "ram_mb": 512.0, "disk_gb": 4.0}
+
+
+def _seed(db):
+    names = [f"n{i}" for i in range(5)] + ["slow", "down"]
+    for i, name in enumerate(names):
+        node = ProxmoxNode(name=name, hostname=f"{name}.local", status=NodeStatus.online)
+        db.add(node)
+        db.flush()
+        for j in range(4):
+            suffix = "-stopped" if (i, j) == (0, 3) else ""
+            db.add(LXCContainer(vmid=100 * i + j, hostname=f"{name}-c{j}{suffix}", node_id=node.id,
+                                status=ContainerStatus.running))
+    db.commit()
+
+
+def test_full_scan_is_concurrent_bounded_and_writes_metrics_in_one_insert(db_session, monkeypatch):
+    _seed(db_session)
+    fleet = _FakeFleet()
+    monkeypatch.setattr(ResourceMonitor, "_probe_node", staticmethod(fleet.probe_node))
+    monkeypatch.setattr(ResourceMonitor, "_probe_container", staticmethod(fleet.probe_container))
+
+    inserts = []
+
+    def _count(_conn, _cursor, statement, *_args):
+        if statement.lstrip().upper().startswith("INSERT INTO RESOURCE_METRICS"):
+            inserts.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        result = asyncio.run(ResourceMonitor.run_full_scan(per_node_concurrency=2, timeout=0.3))
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+    # Secuencial: 6 nodos que responden + 20 contenedores + el lento ≈ 1.9 s
+    assert result["duration_ms"] < 700
+    assert max(fleet.peak.values()) == 2
+
+    status = {r["node"]: r["status"] for r in result["node_results"]}
+    assert status == {**{f"n{i}": "online" for i in range(5)}, "slow": "timeout", "down": "error"}
+    assert all(r["latency_ms"] >= PROBE_SECONDS * 1000 for r in result["node_results"] if r["status"] == "online")
+    assert result["containers_scanned"] == 20
+    assert [r["status"] for r in result["container_results"]].count("stopped") == 1
+
+    assert len(inserts) == 1 and result["metrics_written"] == 5 + 19
+    db_session.expire_all()
+    assert db_session.query(ResourceMetric).count() == 24
+    offline = {n.name for n in db_session.query(ProxmoxNode).filter_by(status=NodeStatus.offline)}
+    assert offline == {"slow", "down"}
+    stopped = db_session.query(LXCContainer).filter_by(status=ContainerStatus.stopped).one()
+    assert stopped.hostname == "n0-c3-stopped"
+    running = db_session.query(LXCContainer).filter_by(hostname="n1-c0").one()
+    assert (running.cpu_usage_percent, running.ram_usage_mb) == (100, 512.0)
+
+
+def test_timed_out_probes_keep_their_node_slot_until_the_thread_ends(db_session, monkeypatch):
+    node = ProxmoxNode(name="hung", hostname="hung.local", status=NodeStatus.online)
+    db_session.add(node)
+    db_session.flush()
+    for j in range(4):
+        db_session.add(LXCContainer(vmid=900 + j, hostname=f"hung-c{j}", node_id=node.id,
+                                    status=ContainerStatus.running))
+    db_session.commit()
+
+    fleet = _FakeFleet()
+
+    def _probe_container(node, container):
+        fleet._enter(node.name, 0.4 if container.hostname in ("hung-c0", "hung-c1") else PROBE_SECONDS)
+        return {"cpu_percent": 10.0, "ram_mb": 128.0, "disk_gb": 1.0}
+
+    monkeypatch.setattr(ResourceMonitor, "_probe_node", staticmethod(fleet.probe_node))
+    monkeypatch.setattr(ResourceMonitor, "_probe_container", staticmethod(_probe_container))
+    result = asyncio.run(ResourceMonitor.run_full_scan(per_node_concurrency=2, timeout=0.1))
+
+    status = {r["container"]: r["status"] for r in result["container_results"]}
+    assert status == {"hung-c0": "timeout", "hung-c1": "timeout", "hung-c2": "running", "hung-c3": "running"}
+    # Los hilos colgados siguen ocupando el cupo: nunca más de 2 sondas vivas en el nodo
+    assert fleet.peak["hung"] == 2
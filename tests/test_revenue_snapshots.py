@@ -0,0 +1,95 @@
+"""
+Tests de las fotos diarias de revenue (captura idempotente + backfill histórico).
+"""
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app.models.database import (
+    Customer, Invoice, InvoiceStatus, InvoiceType, Plan, RevenueDailySnapshot, SeatHighWater,
+    Subscription, SubscriptionStatus,
+)
+from app.services.revenue_snapshots import (
+    backfill_revenue_snapshots, capture_revenue_snapshot, get_mrr_on, get_revenue_series,
+)
+from tests.conftest import engine
+
+
+def _seed(db):
+    db.add(Plan(name="basic", display_name="Basic", base_price=100, price_per_user=10,
+                included_users=1, max_users=0, is_active=True))
+    kept = Customer(email="a@x.com", full_name="A", subdomain="a", created_at=datetime(2026, 8, 5))
+    churned = Customer(email="b@x.com", full_name="B", subdomain="b", created_at=datetime(2026, 9, 10))
+    internal = Customer(email="ops@x.com", full_name="Ops", subdomain="ops", is_admin_account=True,
+                        created_at=datetime(2026, 8, 1))
+    db.add_all([kept, churned, internal])
+    db.flush()
+    active = Subscription(customer_id=kept.id, plan_name="basic", status=SubscriptionStatus.active,
+                          user_count=3, created_at=datetime(2026, 8, 5))
+    cancelled = Subscription(customer_id=churned.id, plan_name="basic", status=SubscriptionStatus.cancelled,
+                             user_count=1, created_at=datetime(2026, 9, 10))
+    db.add_all([active, cancelled, Subscription(
+        customer_id=internal.id, plan_name="basic", status=SubscriptionStatus.active, created_at=datetime(2026, 8, 1),
+    )])
+    db.flush()
+    # updated_at lleva onupdate: se fija después para simular la fecha de cancelación
+    cancelled.updated_at = datetime(2026, 10, 5, 12)
+    db.add(SeatHighWater(subscription_id=active.id, period_date=datetime(2026, 9, 1), hwm_count=2))
+    db.add(Invoice(
+        invoice_number="INV-T-1", subscription_id=cancelled.id, customer_id=churned.id,
+        invoice_type=InvoiceType.SUBSCRIPTION, status=InvoiceStatus.issued, subtotal=150, total=150,
+        period_start=datetime(2026, 9, 10), period_end=datetime(2026, 10, 10),
+    ))
+    db.commit()
+
+
+def test_backfill_reconstructs_history_from_seats_invoices_and_cancellations(db_session):
+    _seed(db_session)
+    result = backfill_revenue_snapshots(db_session, datetime(2026, 8, 1), datetime(2026, 10, 10))
+    db_session.commit()
+    assert (result["days"], result["skipped"]) == (71, 0)
+
+    assert get_mrr_on(db_session, datetime(2026, 8, 31))["mrr"] == 120.0     # 3 asientos (user_count)
+    assert get_mrr_on(db_session, datetime(2026, 9, 15))["mrr"] == 260.0     # HWM 2 + factura de 150
+    october = get_mrr_on(db_session, datetime(2026, 10, 8))
+    assert (october["mrr"], october["arr"], october["subscriptions"]) == (110.0, 1320.0, 1)
+    assert get_mrr_on(db_session, datetime(2026, 7, 1)) is None
+
+    by_cohort = get_revenue_series(db_session, datetime(2026, 9, 20), datetime(2026, 9, 20), group_by="cohort")
+    assert {p["key"]: p["mrr"] for p in by_cohort} == {"2026-08": 110.0, "2026-09": 150.0}
+
+    # Segunda corrida: solo se reintentan los días sin filas (antes de la primera alta);
+    # overwrite rehace los reconstruidos pero nunca una foto en vivo
+    assert backfill_revenue_snapshots(db_session, datetime(2026, 8, 1), datetime(2026, 10, 10))["days"] == 4
+    capture_revenue_snapshot(db_session, datetime(2026, 10, 10))
+    rerun = backfill_revenue_snapshots(db_session, datetime(2026, 8, 1), datetime(2026, 10, 10), overwrite=True)
+    assert (rerun["days"], rerun["skipped"]) == (70, 1)
+
+
+def test_capture_is_idempotent_and_backfill_queries_do_not_grow_with_days(db_session):
+    _seed(db_session)
+    day = datetime(2026, 10, 19)
+    capture_revenue_snapshot(db_session, day)
+    capture_revenue_snapshot(db_session, day)
+    db_session.commit()
+    rows = db_session.query(RevenueDailySnapshot).filter_by(day=day).all()
+    assert [(r.status, r.subscriptions, r.seats, r.mrr, r.source) for r in rows] == [
+        ("active", 1, 3, 120.0, "live"),
+    ]
+
+    def _statements(start, end):
+        statements = []
+
+        def _count(*_args):
+            statements.append(1)
+
+        event.listen(engine, "before_cursor_execute", _count)
+        try:
+            backfill_revenue_snapshots(db_session, start, end, overwrite=True)
+        finally:
+            event.remove(engine, "before_cursor_execute", _count)
+        return len(statements)
+
+    assert _statements(datetime(2026, 9, 1), datetime(2026, 9, 10)) == _statements(
+        datetime(2026, 8, 1), datetime(2026, 10, 10)
+    )
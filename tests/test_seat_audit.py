@@ -0,0 +1,104 @@
+"""
+Tests de la auditoría de seats DSAM (conteos en SQL + HWM por lotes).
+"""
+import asyncio
+
+import pytest
+
+from app.models.database import (
+    ActiveSession, Customer, SeatEvent, SeatEventType, SeatHighWater,
+    Subscription, SubscriptionStatus, TenantSessionConfig,
+)
+from app.services.seat_events import _today
+from app.tasks.seat_audit import get_seat_reconciliation_report, run_seat_audit
+from tests.conftest import TestingSessionLocal
+
+_MODELS = (ActiveSession, SeatEvent, SeatHighWater, TenantSessionConfig, Subscription, Customer)
+
+
+@pytest.fixture
+def db():
+    session = TestingSessionLocal()
+    for model in _MODELS:
+        session.query(model).delete()
+    session.commit()
+    yield session
+    session.rollback()
+    for model in _MODELS:
+        session.query(model).delete()
+    session.commit()
+    session.close()
+
+
+def _tenant(db, subdomain, email, seats, status=SubscriptionStatus.active):
+    customer = Customer(email=email, full_name=subdomain, company_name=subdomain.title(),
+                        subdomain=subdomain, user_count=seats)
+    db.add(customer)
+    db.flush()
+    sub = Subscription(customer_id=customer.id, plan_name="pro", status=status, user_count=seats)
+    db.add(sub)
+    db.flush()
+    return customer, sub
+
+
+def _sessions(db, tenant, logins):
+    for i, login in enumerate(logins):
+        db.add(ActiveSession(redis_session_key=f"{tenant}:{i}", tenant_db=tenant,
+                             odoo_login=login, ip_address="10.0.0.1", is_active=True))
+
+
+def _seed(db):
+    acme_customer, acme = _tenant(db, "acme", "Owner@Acme.com", seats=2)
+    _, beta = _tenant(db, "beta", "boss@beta.com", seats=5)
+    _tenant(db, "gone", "x@gone.com", seats=1, status=SubscriptionStatus.cancelled)
+    _sessions(db, "acme", [
+        "ana@acme.com", " ANA@acme.com", "luis@acme.com", "pia@acme.com",   # 3 facturables
+        "admin", "owner@acme.com", "acme@sajet.us", "",                     # operativos / vacío
+    ])
+    _sessions(db, "beta", ["boss@beta.com", "eva@beta.com"])
+    _sessions(db, "gone", ["z@gone.com"])
+    db.add(ActiveSession(redis_session_key="old", tenant_db="acme", odoo_login="old@acme.com",
+                         ip_address="10.0.0.1", is_active=False))
+    db.add(TenantSessionConfig(tenant_db="acme"))
+    db.add(SeatHighWater(subscription_id=acme.id, period_date=_today(), hwm_count=7))
+    db.commit()
+    return acme_customer, acme, beta
+
+
+def test_seat_audit_counts_and_batched_hwm(db):
+    acme_customer, acme, beta = _seed(db)
+
+    result = asyncio.run(run_seat_audit(db, include_logins=True))
+    details = {d["tenant_db"]: d for d in result["details"]}
+
+    assert result["tenants_audited"] == 2 and result["tenants_over_limit"] == 1
+    assert details["acme"]["unique_active_users"] == 3
+    assert details["acme"]["operational_users"] == 3
+    assert details["acme"]["total_active_sessions"] == 8
+    assert details["acme"]["active_logins"] == ["ana@acme.com", "luis@acme.com", "pia@acme.com"]
+    assert details["acme"]["operational_logins"] == ["acme@sajet.us", "admin", "owner@acme.com"]
+    assert details["beta"]["unique_active_users"] == 1 and details["beta"]["seats_diff"] == -4
+
+    db.expire_all()
+    hwm = {h.subscription_id: h.hwm_count for h in db.query(SeatHighWater).all()}
+    assert hwm == {acme.id: 7, beta.id: 1}     # GREATEST: no baja el pico del día
+    assert db.get(Subscription, acme.id).user_count == 3
+    assert db.get(Customer, acme_customer.id).user_count == 3
+    events = db.query(SeatEvent).filter(SeatEvent.event_type == SeatEventType.HWM_SNAPSHOT).all()
+    assert sorted(e.subscription_id for e in events) == sorted([acme.id, beta.id])
+    assert db.query(TenantSessionConfig).one().last_seat_audit_at is not None
+
+    result = asyncio.run(run_seat_audit(db))
+    assert "active_logins" not in result["details"][0]
+
+
+def test_reconciliation_report_uses_latest_hwm(db):
+    _, acme, _ = _seed(db)
+
+    report = asyncio.run(get_seat_reconciliation_report(db, tenant_db="acme"))
+    assert len(report["tenants"]) == 1
+    entry = report["tenants"][0]
+    assert entry["active_users"] == 3 and entry["active_sessions"] == 8
+    assert entry["hwm_value"] == 7
+    assert entry["billable_logins"] == ["ana@acme.com", "luis@acme.com", "pia@acme.com"]
+    assert entry["subscription_status"] == "active"
@@ -0,0 +1,81 @@
+"""
+Tests de la ingesta por lotes de seat events y del HWM con upsert GREATEST.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.database import (
+    BillingMode, Customer, SeatEvent, SeatEventType, SeatHighWater, Subscription, SubscriptionStatus,
+)
+from app.services.seat_events import _today, ingest_seat_events, update_hwm, upsert_hwm_counts
+
+
+@pytest.fixture
+def subs(db_session):
+    direct_customer = Customer(email="a@a.com", full_name="A", subdomain="direct", user_count=5)
+    partner_customer = Customer(email="b@b.com", full_name="B", subdomain="partner", user_count=1)
+    db_session.add_all([direct_customer, partner_customer])
+    db_session.commit()
+    direct = Subscription(customer_id=direct_customer.id, plan_name="pro", status=SubscriptionStatus.active,
+                          user_count=5, billing_mode=BillingMode.JETURING_DIRECT_SUBSCRIPTION)
+    partner = Subscription(customer_id=partner_customer.id, plan_name="pro", status=SubscriptionStatus.active,
+                           user_count=1, billing_mode=BillingMode.PARTNER_DIRECT)
+    db_session.add_all([direct, partner])
+    db_session.commit()
+    return direct, partner
+
+
+def test_ingest_applies_deltas_in_order_and_recomputes_peaks(db_session, subs):
+    direct, partner = subs
+    today = _today()
+    at = lambda minutes: today + timedelta(hours=9, minutes=minutes)   # noqa: E731
+
+    result = ingest_seat_events(db_session, [
+        {"subscription_id": direct.id, "event_type": "user_deactivated", "delta": -1, "occurred_at": at(3)},
+        {"subscription_id": direct.id, "event_type": "user_created", "delta": 1, "occurred_at": at(1)},
+        {"subscription_id": direct.id, "event_type": "user_created", "delta": 1, "occurred_at": at(2)},
+        {"subscription_id": partner.id, "event_type": SeatEventType.FIRST_LOGIN, "user_count_after": 2,
+         "occurred_at": at(0)},
+    ])
+    db_session.commit()
+
+    assert result["inserted"] == 4
+    assert result["subscriptions"][direct.id] == {"user_count": 6, "peaks": {today.date().isoformat(): 7}}
+    counts = [e.user_count_after for e in db_session.query(SeatEvent)
+              .filter(SeatEvent.subscription_id == direct.id).order_by(SeatEvent.created_at)]
+    assert counts == [6, 7, 6]
+
+    first_login = db_session.query(SeatEvent).filter(SeatEvent.subscription_id == partner.id).one()
+    assert first_login.is_billable is True
+    assert first_login.grace_expires_at == at(0) + timedelta(hours=8)
+
+    hwm = {h.subscription_id: h.hwm_count for h in db_session.query(SeatHighWater)}
+    assert hwm == {direct.id: 7, partner.id: 2}
+    db_session.expire_all()
+    assert db_session.get(Subscription, direct.id).user_count == 6
+    assert db_session.get(Customer, direct.customer_id).user_count == 6
+
+
+def test_ingest_rejects_unknown_subscription(db_session, subs):
+    with pytest.raises(ValueError):
+        ingest_seat_events(db_session, [{"subscription_id": 999, "event_type": "user_created", "delta": 1}])
+
+
+def test_hwm_upsert_never_lowers_peak_and_reopens_stripe_sync(db_session, subs):
+    direct, _ = subs
+    hwm = update_hwm(db_session, direct.id, 8)
+    hwm.stripe_qty_updated = True
+    db_session.commit()
+
+    upsert_hwm_counts(db_session, {direct.id: 5})
+    db_session.commit()
+    db_session.expire_all()
+    row = db_session.query(SeatHighWater).one()
+    assert (row.hwm_count, row.stripe_qty_updated) == (8, True)
+
+    assert update_hwm(db_session, direct.id, 9).hwm_count == 9
+    db_session.commit()
+    row = db_session.query(SeatHighWater).one()
+    assert (row.hwm_count, row.stripe_qty_updated) == (9, False)
+    assert row.period_date == _today() and isinstance(row.period_date, datetime)
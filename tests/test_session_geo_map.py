@@ -0,0 +1,111 @@
+"""
+Tests de los rollups diarios del mapa de calor DSAM y del mapa en vivo agrupado.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models.database import ActiveSession, SessionGeoDailyRollup, SessionGeoEvent
+from app.services import session_monitor
+from app.services.session_geo_map import (
+    get_geo_heatmap_rollup, get_live_map_clusters, purge_old_geo_rollups, record_geo_rollups,
+)
+from app.services.session_locations import last_location_index
+from tests.conftest import TestingSessionLocal
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@pytest.fixture
+def db():
+    session = TestingSessionLocal()
+    for model in (ActiveSession, SessionGeoEvent, SessionGeoDailyRollup):
+        session.query(model).delete()
+    session.commit()
+    last_location_index.reset()
+    yield session
+    for model in (ActiveSession, SessionGeoEvent, SessionGeoDailyRollup):
+        session.query(model).delete()
+    session.commit()
+    session.close()
+
+
+def _event(tenant, city, lat, lon, at, code="DO", country="Dominican Republic"):
+    return {
+        "tenant_db": tenant, "odoo_login": "u@x", "geo_country_code": code, "geo_country": country,
+        "geo_city": city, "geo_lat": lat, "geo_lon": lon, "event_at": at,
+    }
+
+
+def test_rollups_accumulate_and_sum_by_range(db):
+    now = _now()
+    record_geo_rollups(db, [
+        _event("t1", "Santo Domingo", 18.4861, -69.9312, now),
+        _event("t1", "Santo Domingo", 18.4859, -69.9308, now),          # misma celda redondeada
+        _event("t2", "Santo Domingo", 18.4861, -69.9312, now - timedelta(days=3)),
+        _event("t1", "Madrid", 40.4168, -3.7038, now - timedelta(days=45), code="ES", country="Spain"),
+        _event("t1", None, None, None, now),                           # sin coordenadas
+    ])
+    db.commit()
+    record_geo_rollups(db, [_event("t1", "Santo Domingo", 18.4861, -69.9312, now)])
+    db.commit()
+
+    assert db.query(SessionGeoDailyRollup).count() == 3
+    data = get_geo_heatmap_rollup(db, days=30)
+    assert data == [{
+        "country_code": "DO", "country": "Dominican Republic", "city": "Santo Domingo",
+        "lat": 18.49, "lon": -69.93, "count": 4,
+    }]
+    assert get_geo_heatmap_rollup(db, days=30, tenant_db="t2")[0]["count"] == 1
+    assert {p["city"] for p in get_geo_heatmap_rollup(db, days=60)} == {"Santo Domingo", "Madrid"}
+
+    assert purge_old_geo_rollups(db, retention_days=30) == 1
+    assert {p["city"] for p in get_geo_heatmap_rollup(db, days=60)} == {"Santo Domingo"}
+
+
+def test_sync_maintains_rollups_at_ingest(db, monkeypatch):
+    geo = {"country": "Dominican Republic", "country_code": "DO", "region": None,
+           "city": "Santiago", "lat": 19.45, "lon": -70.69}
+    monkeypatch.setattr(session_monitor, "geolocate_ip", lambda ip: dict(geo))
+
+    async def _scan(failed_sources=None):
+        return [
+            {"redis_key": f"s:{i}", "tenant_db": "t1",
+             "data": {"db": "t1", "uid": i, "login": f"u{i}@t1", "ip": "181.1.1.1"}}
+            for i in range(3)
+        ]
+
+    monkeypatch.setattr(session_monitor, "scan_redis_sessions", _scan)
+    asyncio.run(session_monitor.sync_sessions_to_db(db))
+    asyncio.run(session_monitor.sync_sessions_to_db(db))    # sin cambios: sin eventos nuevos
+
+    data = asyncio.run(session_monitor.get_geo_heatmap_data(db, days=1))
+    assert [(p["city"], p["count"]) for p in data] == [("Santiago", 3)]
+    assert db.query(SessionGeoEvent).count() == 3
+
+
+def test_live_map_clusters_by_zoom_and_caps_points(db):
+    coords = [(18.48, -69.93)] * 5 + [(18.47, -69.89)] * 2 + [(40.41, -3.70)] * 3
+    db.add_all([
+        ActiveSession(
+            redis_session_key=f"k{i}", tenant_db=f"t{i % 2}", odoo_login=f"u{i}",
+            ip_address="1.1.1.1", geo_lat=lat, geo_lon=lon, geo_city="c", is_active=True,
+        )
+        for i, (lat, lon) in enumerate(coords)
+    ])
+    db.add(ActiveSession(redis_session_key="nogeo", tenant_db="t1", ip_address="1.1.1.1", is_active=True))
+    db.commit()
+
+    close = get_live_map_clusters(db, zoom=12)
+    assert sorted(p["count"] for p in close["points"]) == [2, 3, 5]
+    assert close["sessions"] == 10 and not close["truncated"]
+
+    far = get_live_map_clusters(db, zoom=3)
+    assert sorted(p["count"] for p in far["points"]) == [3, 7]
+
+    capped = get_live_map_clusters(db, zoom=12, max_points=2)
+    assert len(capped["points"]) <= 2 and capped["zoom"] < 12
+    assert capped["sessions"] == 10
@@ -0,0 +1,158 @@
+"""
+Tests del sync incremental DSAM por keyspace notifications.
+La prueba de integración levanta un redis-server local (se omite si no existe).
+"""
+import asyncio
+import json
+import shutil
+import socket
+import subprocess
+import time
+
+import pytest
+
+from app.models.database import ActiveSession, SessionGeoEvent
+from app.services import session_monitor
+from app.services.session_keyspace import SessionKeyspaceListener, _notifications_enabled
+from app.services.session_monitor import RedisSessionSource
+from tests.conftest import TestingSessionLocal
+
+SOURCE = RedisSessionSource(redis_db=0, match_pattern="odoo17:session:*", app_name="odoo17")
+
+
+@pytest.fixture
+def db():
+    session = TestingSessionLocal()
+    session.query(ActiveSession).delete()
+    session.query(SessionGeoEvent).delete()
+    session.commit()
+    yield session
+    session.query(ActiveSession).delete()
+    session.query(SessionGeoEvent).delete()
+    session.commit()
+    session.close()
+
+
+def _payload(login, ip="10.1.1.1"):
+    return json.dumps({"db": "t1", "uid": 7, "login": login, "ip": ip})
+
+
+class _MgetRedis:
+    def __init__(self, data):
+        self.data = data
+
+    async def mget(self, keys):
+        return [self.data.get(k) for k in keys]
+
+
+def _pmessage(key, event="set"):
+    return {"type": "pmessage", "channel": f"__keyspace@0__:{key}", "data": event}
+
+
+def test_notify_flags():
+    assert _notifications_enabled("KA")
+    assert _notifications_enabled("Kg$x")
+    assert not _notifications_enabled("Ex")
+    assert not _notifications_enabled("K$")
+
+
+def test_incremental_sync_applies_only_dirty_keys(db, monkeypatch):
+    redis_data = {"odoo17:session:a": _payload("a@t1"), "odoo17:session:b": _payload("b@t1")}
+    fake = _MgetRedis(redis_data)
+
+    async def _client(redis_db=None):
+        return fake
+
+    monkeypatch.setattr(session_monitor, "get_redis_client", _client)
+    listener = SessionKeyspaceListener(sources=[SOURCE])
+    listener._needs_full = False
+    listener._last_full = time.monotonic()
+
+    listener.handle_message(SOURCE, _pmessage("odoo17:session:a"))
+    listener.handle_message(SOURCE, _pmessage("odoo17:session:a", "expire"))
+    stats = asyncio.run(listener.sync(db))
+    assert stats["mode"] == "incremental"
+    assert stats["changed_keys"] == 1
+    assert stats["created"] == 1
+    keys = {s.redis_session_key for s in db.query(ActiveSession).filter(ActiveSession.is_active == True)}
+    assert keys == {"odoo17:session:a"}   # b no fue notificada
+
+    del redis_data["odoo17:session:a"]
+    listener.handle_message(SOURCE, _pmessage("odoo17:session:a", "del"))
+    stats = asyncio.run(listener.sync(db))
+    assert stats["removed"] == 1
+    assert db.query(ActiveSession).filter(ActiveSession.is_active == True).count() == 0
+
+
+def test_full_reconcile_when_flagged(db, monkeypatch):
+    calls = []
+
+    async def _full(db_session):
+        calls.append(1)
+        return {"scanned": 0, "created": 0, "updated": 0, "removed": 0}
+
+    monkeypatch.setattr("app.services.session_keyspace.sync_sessions_to_db", _full)
+    listener = SessionKeyspaceListener(sources=[SOURCE])
+    listener.handle_message(SOURCE, _pmessage("odoo17:session:z"))
+
+    stats = asyncio.run(listener.sync(db))
+    assert stats["mode"] == "full"
+    assert calls == [1]
+    assert listener.metrics()["pending_keys"] == 0
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.skipif(shutil.which("redis-server") is None, reason="redis-server not installed")
+def test_keyspace_listener_against_redis_server(db, monkeypatch):
+    port = _free_port()
+    proc = subprocess.Popen(
+        ["redis-server", "--port", str(port), "--save", "", "--appendonly", "no",
+         "--notify-keyspace-events", "Kg$x"],
+        stdout=subprocess.DEVNULL,
+    )
+    monkeypatch.setattr(session_monitor, "REDIS_HOST", "127.0.0.1")
+    monkeypatch.setattr(session_monitor, "REDIS_PORT", port)
+    monkeypatch.setattr(session_monitor, "REDIS_PASSWORD", "")
+    monkeypatch.setattr(session_monitor, "_redis_clients", {})
+
+    async def scenario():
+        client = await session_monitor.get_redis_client(0)
+        for _ in range(50):
+            try:
+                await client.ping()
+                break
+            except Exception:
+                await asyncio.sleep(0.1)
+
+        listener = SessionKeyspaceListener(sources=[SOURCE])
+        await listener.start()
+        await asyncio.sleep(0.2)
+        listener._needs_full = False
+        listener._last_full = time.monotonic()
+
+        await client.set("odoo17:session:live", _payload("live@t1"), ex=600)
+        await client.set("other:key", "x")
+        await asyncio.sleep(0.2)
+        created = await listener.sync(db)
+
+        await client.delete("odoo17:session:live")
+        await asyncio.sleep(0.2)
+        removed = await listener.sync(db)
+
+        await listener.stop()
+        await session_monitor.close_redis_clients()
+        return created, removed
+
+    try:
+        created, removed = asyncio.run(scenario())
+    finally:
+        proc.terminate()
+        proc.wait(5)
+
+    assert created["mode"] == "incremental" and created["created"] == 1
+    assert removed["removed"] == 1
@@ -0,0 +1,123 @@
+"""
+Tests del índice en memoria de última ubicación (viaje imposible) y de la
+retención de session_geo_events.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app.models.database import ActiveSession, SessionGeoEvent, SessionRuleType, SessionSecurityRule
+from app.security.session_rules import SessionRuleEvaluator
+from app.services.session_locations import LastLocationIndex, last_location_index, purge_old_geo_events
+from tests.conftest import TestingSessionLocal, engine
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@pytest.fixture
+def db():
+    session = TestingSessionLocal()
+    for model in (ActiveSession, SessionGeoEvent, SessionSecurityRule):
+        session.query(model).delete()
+    session.commit()
+    last_location_index.reset()
+    yield session
+    for model in (ActiveSession, SessionGeoEvent, SessionSecurityRule):
+        session.query(model).delete()
+    session.commit()
+    last_location_index.reset()
+    session.close()
+
+
+def _geo_event(login, lat, lon, age, tenant="t1", city=None):
+    return SessionGeoEvent(
+        tenant_db=tenant, odoo_login=login, ip_address="1.1.1.1",
+        geo_lat=lat, geo_lon=lon, geo_city=city, event_at=_now() - age,
+    )
+
+
+def test_warm_load_keeps_latest_located_event(db):
+    db.add_all([
+        _geo_event("ana@t1", 18.5, -69.9, timedelta(days=3), city="Santo Domingo"),
+        _geo_event("ana@t1", 40.4, -3.7, timedelta(hours=1), city="Madrid"),
+        _geo_event("ana@t1", None, None, timedelta(minutes=5)),       # sin coordenadas: se ignora
+        _geo_event("old@t1", 10.0, 10.0, timedelta(days=400)),       # fuera de retención
+        _geo_event("ana@t1", 48.8, 2.3, timedelta(hours=2), tenant="t2", city="Paris"),
+    ])
+    db.commit()
+
+    index = LastLocationIndex()
+    index.warm_load(db)
+    assert len(index) == 2
+    assert index.get("t1", "ana@t1").geo_city == "Madrid"
+    assert index.get("t2", "ana@t1").geo_city == "Paris"
+    assert index.get("t1", "old@t1") is None
+
+
+def test_refresh_and_observe_only_move_forward(db):
+    db.add(_geo_event("ana@t1", 18.5, -69.9, timedelta(hours=5), city="Santo Domingo"))
+    db.commit()
+    index = LastLocationIndex()
+    index.warm_load(db)
+
+    db.add_all([
+        _geo_event("ana@t1", 40.4, -3.7, timedelta(hours=1), city="Madrid"),
+        _geo_event("bob@t1", 19.4, -70.7, timedelta(hours=8), city="Santiago"),
+    ])
+    db.commit()
+    assert index.refresh(db) == 2
+    assert index.refresh(db) == 0
+    assert index.get("t1", "ana@t1").geo_city == "Madrid"
+    assert index.get("t1", "bob@t1").geo_city == "Santiago"
+
+    index.observe([
+        {"tenant_db": "t1", "odoo_login": "ana@t1", "geo_lat": 18.5, "geo_lon": -69.9,
+         "geo_city": "Santo Domingo", "event_at": _now() - timedelta(days=1)},   # más viejo
+        {"tenant_db": "t1", "odoo_login": "bob@t1", "geo_lat": 48.8, "geo_lon": 2.3,
+         "geo_city": "Paris", "event_at": _now()},
+        {"tenant_db": "t1", "odoo_login": "eve@t1", "geo_lat": None, "geo_lon": None, "event_at": _now()},
+    ])
+    assert index.get("t1", "ana@t1").geo_city == "Madrid"
+    assert index.get("t1", "bob@t1").geo_city == "Paris"
+    assert index.get("t1", "eve@t1") is None
+
+
+def test_impossible_travel_reads_index_without_per_session_queries(db):
+    db.add(SessionSecurityRule(rule_type=SessionRuleType.IMPOSSIBLE_TRAVEL, config={}))
+    for i in range(50):
+        db.add(_geo_event(f"u{i}@t1", 40.4, -3.7, timedelta(minutes=30)))
+        db.add(ActiveSession(
+            redis_session_key=f"s{i}", tenant_db="t1", odoo_login=f"u{i}@t1",
+            ip_address="181.1.1.1", geo_lat=18.5, geo_lon=-69.9, is_active=True,
+        ))
+    db.commit()
+    sessions = db.query(ActiveSession).all()
+
+    SessionRuleEvaluator(db, sessions)   # warm load
+    statements = []
+
+    def _count(*_args):
+        statements.append(1)
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        evaluator = SessionRuleEvaluator(db, sessions)
+        violations = [evaluator.evaluate(s) for s in sessions]
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+    assert all(v and v[0]["rule_type"] == "impossible_travel" for v in violations)
+    # Reglas, conteos y refresh incremental del índice: independiente del nº de sesiones
+    assert len(statements) <= 4
+
+
+def test_purge_old_geo_events_in_batches(db):
+    db.add_all([_geo_event(f"u{i}@t1", 1.0, 1.0, timedelta(days=120)) for i in range(7)])
+    db.add(_geo_event("fresh@t1", 1.0, 1.0, timedelta(days=1)))
+    db.commit()
+
+    assert purge_old_geo_events(db, retention_days=90, batch_size=3) == 7
+    assert [e.odoo_login for e in db.query(SessionGeoEvent).all()] == ["fresh@t1"]
@@ -0,0 +1,119 @@
+"""
+Tests del evaluador por lotes de reglas DSAM (SessionRuleEvaluator).
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app.models.database import (
+    ActiveSession, SessionGeoEvent, SessionSecurityRule, SessionRuleType, TenantSessionConfig,
+)
+from app.security.session_rules import SessionRuleEvaluator, evaluate_rules_for_session
+from app.services.session_locations import last_location_index
+from tests.conftest import TestingSessionLocal, engine
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@pytest.fixture
+def db():
+    session = TestingSessionLocal()
+    for model in (ActiveSession, SessionGeoEvent, SessionSecurityRule, TenantSessionConfig):
+        session.query(model).delete()
+    session.commit()
+    last_location_index.reset()
+    yield session
+    for model in (ActiveSession, SessionGeoEvent, SessionSecurityRule, TenantSessionConfig):
+        session.query(model).delete()
+    session.commit()
+    session.close()
+
+
+def _session(db, key, tenant, login, ip="10.0.0.1", lat=None, lon=None, active=True):
+    row = ActiveSession(
+        redis_session_key=key, tenant_db=tenant, odoo_login=login, ip_address=ip,
+        geo_lat=lat, geo_lon=lon, is_active=active,
+    )
+    db.add(row)
+    return row
+
+
+def _rule_types(violations):
+    return sorted(v["rule_type"] for v in violations)
+
+
+def test_batch_matches_single_session_evaluation(db):
+    db.add_all([
+        SessionSecurityRule(rule_type=SessionRuleType.SINGLE_SESSION, config={}, exempt_users=["boss@t1"]),
+        SessionSecurityRule(rule_type=SessionRuleType.MAX_SESSIONS, tenant_db="t1", config={"max": 2}),
+        SessionSecurityRule(rule_type=SessionRuleType.IP_WHITELIST, tenant_db="t2",
+                            config={"allowed_ips": ["192.168.0.0/16"]}),
+        SessionSecurityRule(rule_type=SessionRuleType.IMPOSSIBLE_TRAVEL, config={}, exempt_tenants=["t3"]),
+        TenantSessionConfig(tenant_db="t3", allow_multiple_sessions=True),
+        SessionGeoEvent(tenant_db="t2", odoo_login="eve@t2", ip_address="1.1.1.1",
+                        geo_lat=40.4, geo_lon=-3.7, event_at=_now() - timedelta(minutes=30)),
+        SessionGeoEvent(tenant_db="t2", odoo_login="eve@t2", ip_address="1.1.1.1",
+                        geo_lat=18.5, geo_lon=-69.9, event_at=_now() - timedelta(days=2)),
+    ])
+    sessions = [
+        _session(db, "s1", "t1", "ana@t1"),
+        _session(db, "s2", "t1", "ana@t1"),
+        _session(db, "s3", "t1", "ana@t1"),
+        _session(db, "s4", "t1", "boss@t1"),
+        _session(db, "s5", "t1", "boss@t1"),
+        _session(db, "s6", "t2", "eve@t2", ip="192.168.1.10", lat=18.5, lon=-69.9),
+        _session(db, "s7", "t2", "bob@t2", ip="8.8.8.8"),
+        _session(db, "s8", "t3", "joe@t3"),
+        _session(db, "s9", "t3", "joe@t3"),
+        _session(db, "s10", "t1", "old@t1", active=False),
+    ]
+    db.commit()
+
+    evaluator = SessionRuleEvaluator(db, sessions)
+    batch = {s.redis_session_key: _rule_types(evaluator.evaluate(s)) for s in sessions}
+    single = {s.redis_session_key: _rule_types(evaluate_rules_for_session(db, s)) for s in sessions}
+
+    assert batch == single
+    assert batch["s1"] == ["max_sessions", "single_session"]
+    assert batch["s4"] == []                     # exento de single_session
+    assert batch["s6"] == ["impossible_travel"]  # Madrid hace 30 min → Santo Domingo
+    assert batch["s7"] == ["ip_whitelist"]
+    assert batch["s8"] == []                     # tenant permite múltiples sesiones
+    assert batch["s10"] == []
+
+    details = next(v for v in evaluator.evaluate(sessions[0]) if v["rule_type"] == "max_sessions")["details"]
+    assert details == {"max_allowed": 2, "current_count": 3}
+
+
+def test_batch_query_count_is_constant(db):
+    db.add_all([
+        SessionSecurityRule(rule_type=SessionRuleType.SINGLE_SESSION, config={}),
+        SessionSecurityRule(rule_type=SessionRuleType.MAX_SESSIONS, config={"max": 3}),
+        SessionSecurityRule(rule_type=SessionRuleType.IMPOSSIBLE_TRAVEL, config={}),
+    ])
+    sessions = [
+        _session(db, f"k{i}", f"tenant{i % 7}", f"user{i % 40}", lat=10.0, lon=10.0)
+        for i in range(300)
+    ]
+    db.commit()
+    for s in sessions:
+        s.id  # cargar atributos antes de contar
+    last_location_index.warm_load(db)
+
+    statements = []
+
+    def _count(*args, **kwargs):
+        statements.append(1)
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        evaluator = SessionRuleEvaluator(db, sessions)
+        for s in sessions:
+            evaluator.evaluate(s)
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+    assert len(statements) <= 4
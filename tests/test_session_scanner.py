@@ -0,0 +1,172 @@
+"""
+Tests del escáner de sesiones Redis (DSAM): pipeline por página, MGET solo de
+claves cambiadas y reutilización del parseo cuando el valor no cambió.
+"""
+import asyncio
+import fnmatch
+import json
+
+import pytest
+
+from app.models.database import ActiveSession
+from app.services import session_monitor
+from app.services.session_monitor import RedisSessionSource, get_scan_metrics, scan_redis_sessions
+
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def pttl(self, key):
+        self.ops.append(key)
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        return [self.redis.ttls.get(k, -1) if k in self.redis.data else -2 for k in self.ops]
+
+
+class _FakeRedis:
+    """Subconjunto de redis.asyncio usado por el escáner."""
+
+    def __init__(self):
+        self.data: dict[str, str] = {}
+        self.ttls: dict[str, int] = {}
+        self.round_trips = 0
+        self.mget_keys = 0
+
+    async def scan(self, cursor=0, match="*", count=10):
+        self.round_trips += 1
+        keys = sorted(k for k in self.data if fnmatch.fnmatch(k, match))
+        start = int(cursor)
+        page = keys[start:start + count]
+        nxt = start + count
+        return (nxt if nxt < len(keys) else 0), page
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    async def mget(self, keys):
+        self.round_trips += 1
+        self.mget_keys += len(keys)
+        return [self.data.get(k) for k in keys]
+
+
+@pytest.fixture
+def fake_sources(monkeypatch):
+    clients = {0: _FakeRedis(), 1: _FakeRedis()}
+
+    async def _client(redis_db=None):
+        return clients[redis_db]
+
+    monkeypatch.setattr(session_monitor, "get_redis_client", _client)
+    monkeypatch.setattr(session_monitor, "_get_session_sources", lambda: [
+        RedisSessionSource(redis_db=0, match_pattern="session:*", app_name="odoo17"),
+        RedisSessionSource(redis_db=1, match_pattern="odoo19:session:*", app_name="odoo19"),
+    ])
+    monkeypatch.setattr(session_monitor, "_SCAN_PAGE_SIZE", 7)
+    monkeypatch.setattr(session_monitor, "_scan_cache", {})
+    return clients
+
+
+def _put(client, key, payload, ttl_ms=600_000):
+    client.data[key] = json.dumps(payload)
+    client.ttls[key] = ttl_ms
+
+
+def test_scan_all_sources_and_skip_unchanged(fake_sources):
+    odoo17, odoo19 = fake_sources[0], fake_sources[1]
+    for i in range(20):
+        _put(odoo17, f"session:{i}", {"db": "t1", "uid": i, "login": f"u{i}@t1"})
+    _put(odoo17, "session:anon", {"db": "t1"})
+    for i in range(5):
+        _put(odoo19, f"odoo19:session:{i}", {"db": "t2", "uid": i, "login": f"u{i}@t2"})
+
+    sessions = asyncio.run(scan_redis_sessions())
+    assert len(sessions) == 25
+    assert {s["source_app"] for s in sessions} == {"odoo17", "odoo19"}
+    first = {s["redis_key"]: s for s in sessions}
+    assert first["session:3"]["data"]["login"] == "u3@t1"
+    assert first["session:3"]["session_id"] == "3"
+    # 3 páginas x (SCAN + PTTL + MGET): sin un GET por clave
+    assert odoo17.round_trips == 9
+
+    # Segundo escaneo: mismo vencimiento → sin MGET ni parseo.
+    # Una sesión se re-guardó (TTL renovado, valor nuevo), otra expiró.
+    _put(odoo17, "session:4", {"db": "t1", "uid": 4, "login": "renamed@t1"}, ttl_ms=900_000)
+    del odoo17.data["session:5"]
+    odoo17.mget_keys = 0
+
+    sessions = asyncio.run(scan_redis_sessions())
+    by_key = {s["redis_key"]: s for s in sessions}
+    assert len(sessions) == 24
+    assert by_key["session:4"]["data"]["login"] == "renamed@t1"
+    assert "session:5" not in by_key
+    assert odoo17.mget_keys == 1
+
+    metrics = get_scan_metrics()["0|session:*"]
+    assert metrics["parsed"] == 1
+    assert metrics["unchanged"] == 19   # 20 claves (incl. anónima) - la re-guardada
+
+
+def test_ttl_refresh_with_same_value_reuses_parse(fake_sources):
+    odoo17 = fake_sources[0]
+    _put(odoo17, "session:a", {"db": "t1", "uid": 1, "login": "a@t1"}, ttl_ms=100_000)
+    asyncio.run(scan_redis_sessions())
+
+    odoo17.ttls["session:a"] = 500_000   # EXPIRE renovado, valor intacto
+    sessions = asyncio.run(scan_redis_sessions())
+
+    assert [s["redis_key"] for s in sessions] == ["session:a"]
+    metrics = get_scan_metrics()["0|session:*"]
+    assert metrics["fetched"] == 1
+    assert metrics["parsed"] == 0
+
+
+def test_failing_source_does_not_block_others(fake_sources, monkeypatch):
+    _put(fake_sources[1], "odoo19:session:x", {"db": "t2", "uid": 9, "login": "x@t2"})
+
+    async def _client(redis_db=None):
+        if redis_db == 0:
+            raise ConnectionError("redis down")
+        return fake_sources[redis_db]
+
+    monkeypatch.setattr(session_monitor, "get_redis_client", _client)
+    failed = []
+    sessions = asyncio.run(scan_redis_sessions(failed_sources=failed))
+    assert [s["redis_key"] for s in sessions] == ["odoo19:session:x"]
+    assert [source.app_name for source in failed] == ["odoo17"]
+
+
+def test_sync_keeps_sessions_of_a_failing_source_active(fake_sources, monkeypatch, db_session):
+    monkeypatch.setattr(session_monitor, "geolocate_ip", lambda ip: dict.fromkeys(
+        ("country", "country_code", "region", "city", "lat", "lon")))
+    odoo17, odoo19 = fake_sources[0], fake_sources[1]
+    for i in range(3):
+        _put(odoo17, f"session:{i}", {"db": "t1", "uid": i, "login": f"u{i}@t1", "ip": "181.1.1.1"})
+        _put(odoo19, f"odoo19:session:{i}", {"db": "t2", "uid": i, "login": f"u{i}@t2", "ip": "181.1.1.1"})
+    asyncio.run(session_monitor.sync_sessions_to_db(db_session))
+
+    async def _client(redis_db=None):
+        if redis_db == 0:
+            raise ConnectionError("redis down")
+        return fake_sources[redis_db]
+
+    monkeypatch.setattr(session_monitor, "get_redis_client", _client)
+    del odoo19.data["odoo19:session:2"]
+    stats = asyncio.run(session_monitor.sync_sessions_to_db(db_session))
+
+    active = {s.redis_session_key: s.is_active for s in db_session.query(ActiveSession)}
+    assert stats["removed"] == 1
+    assert active == {
+        "session:0": True, "session:1": True, "session:2": True,
+        "odoo19:session:0": True, "odoo19:session:1": True, "odoo19:session:2": False,
+    }
+
+    # Un patrón que no se puede traducir a LIKE: ninguna baja en ese sync
+    monkeypatch.setattr(session_monitor, "_get_session_sources", lambda: [
+        RedisSessionSource(redis_db=0, match_pattern="session:[0-9]*", app_name="odoo17"),
+        RedisSessionSource(redis_db=1, match_pattern="odoo19:session:*", app_name="odoo19"),
+    ])
+    del odoo19.data["odoo19:session:1"]
+    assert asyncio.run(session_monitor.sync_sessions_to_db(db_session))["removed"] == 0
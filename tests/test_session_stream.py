@@ -0,0 +1,151 @@
+"""
+Tests del canal push DSAM (broadcaster en proceso + deltas del sync).
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import event
+
+from app.models.database import (
+    AccountSecurityAction, ActiveSession, SessionActionType, SessionGeoDailyRollup, SessionGeoEvent,
+    SessionTenantSummary,
+)
+from app.routes import session_monitoring
+from app.services import session_monitor
+from app.services.session_locations import last_location_index
+from app.services.session_stream import SessionBroadcaster, format_sse, session_broadcaster
+from tests.conftest import TestingSessionLocal, engine
+
+_MODELS = (ActiveSession, SessionGeoEvent, SessionGeoDailyRollup, SessionTenantSummary, AccountSecurityAction)
+_GEO = {
+    "181.1.1.1": {"country": "Dominican Republic", "country_code": "DO", "region": None,
+                  "city": "Santiago", "lat": 19.45, "lon": -70.69},
+    "88.1.1.1": {"country": "Spain", "country_code": "ES", "region": None,
+                 "city": "Madrid", "lat": 40.41, "lon": -3.70},
+}
+
+
+@pytest.fixture
+def db(monkeypatch):
+    session = TestingSessionLocal()
+    for model in _MODELS:
+        session.query(model).delete()
+    session.commit()
+    last_location_index.reset()
+    monkeypatch.setattr(session_monitor, "geolocate_ip", lambda ip: dict(_GEO[ip]))
+    yield session
+    for model in _MODELS:
+        session.query(model).delete()
+    session.commit()
+    session.close()
+
+
+def _scan_of(entries):
+    async def _scan(failed_sources=None):
+        return [
+            {"redis_key": key, "tenant_db": "t1", "data": {"db": "t1", "uid": i, "login": f"u{i}@t1", "ip": ip}}
+            for i, (key, ip) in enumerate(entries)
+        ]
+    return _scan
+
+
+def _drain(subscriber):
+    events = []
+    while not subscriber.queue.empty():
+        events.append(subscriber.queue.get_nowait())
+    return events
+
+
+async def _sync_with_subscribers(db, monkeypatch, count, entries):
+    subscribers = [session_broadcaster.subscribe() for _ in range(count)]
+    statements = []
+    monkeypatch.setattr(session_monitor, "scan_redis_sessions", _scan_of(entries))
+
+    def _count(*_args):
+        statements.append(1)
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        await session_monitor.sync_sessions_to_db(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+    await asyncio.sleep(0)          # deja correr los call_soon_threadsafe
+    received = [_drain(subscriber) for subscriber in subscribers]
+    for subscriber in subscribers:
+        session_broadcaster.unsubscribe(subscriber)
+    return len(statements), received
+
+
+def test_sync_fans_out_deltas_with_constant_queries(db, monkeypatch):
+    initial = [("s:1", "181.1.1.1"), ("s:2", "181.1.1.1")]
+    asyncio.run(_sync_with_subscribers(db, monkeypatch, 1, initial))
+
+    changed = [("s:1", "88.1.1.1"), ("s:3", "181.1.1.1")]      # s:1 se mueve, s:2 sale, s:3 entra
+    one_queries, (events,) = asyncio.run(_sync_with_subscribers(db, monkeypatch, 1, changed))
+    assert {(e["type"], e["key"]) for e in events if e["type"] != "sync"} == {
+        ("move", "s:1"), ("add", "s:3"), ("remove", "s:2"),
+    }
+    assert events[-1]["type"] == "sync" and events[-1]["dashboard"]["total_active"] == 2
+    assert [e["id"] for e in events] == sorted(e["id"] for e in events)
+
+    asyncio.run(_sync_with_subscribers(db, monkeypatch, 1, initial))
+    many_queries, received = asyncio.run(_sync_with_subscribers(db, monkeypatch, 50, changed))
+    assert many_queries == one_queries
+    assert len(received) == 50 and all(batch == received[0] for batch in received)
+    assert session_broadcaster.subscriber_count == 0
+
+
+def test_slow_subscriber_gets_resync_without_blocking_others():
+    async def _run():
+        broadcaster = SessionBroadcaster(queue_size=3)
+        slow, fast = broadcaster.subscribe(), broadcaster.subscribe()
+        seen = []
+        for batch in range(3):
+            broadcaster.publish([{"type": "add", "key": f"k{batch}a"}, {"type": "add", "key": f"k{batch}b"}])
+            await asyncio.sleep(0)
+            seen.extend(_drain(fast))
+        assert [e["key"] for e in seen] == ["k0a", "k0b", "k1a", "k1b", "k2a", "k2b"]
+        slow_events = _drain(slow)
+        assert slow_events[0] == {"type": "resync"}
+        assert broadcaster.metrics()["resyncs"] == 1 and broadcaster.metrics()["dropped"] == 3
+        assert await fast.get(timeout=0.01) is None
+    asyncio.run(_run())
+
+
+def test_format_sse():
+    assert format_sse({"id": 7, "type": "remove", "key": "s:1"}) == (
+        'id: 7\nevent: remove\ndata: {"id": 7, "type": "remove", "key": "s:1"}\n\n'
+    )
+
+
+def test_lock_and_unlock_account_routes(db, monkeypatch):
+    asyncio.run(_sync_with_subscribers(db, monkeypatch, 0, [("s:1", "181.1.1.1"), ("s:2", "88.1.1.1")]))
+    terminated = []
+
+    async def _terminate(key):
+        terminated.append(key)
+        return True
+
+    monkeypatch.setattr(session_monitoring, "_require_admin", lambda *_args: type("Admin", (), {"username": "root"})())
+    monkeypatch.setattr(session_monitoring, "terminate_redis_session", _terminate)
+    body = session_monitoring.LockAccountRequest(tenant_db="t1", odoo_login="u0@t1")
+
+    async def _call(route):
+        subscriber = session_broadcaster.subscribe()
+        try:
+            result = await route(body=body, request=None, access_token=None, db=db)
+            await asyncio.sleep(0)
+            return result, _drain(subscriber)
+        finally:
+            session_broadcaster.unsubscribe(subscriber)
+
+    locked, events = asyncio.run(_call(session_monitoring.lock_account))
+    assert locked["data"]["sessions_terminated"] == 1 and terminated == ["s:1"]
+    assert [(e["type"], e["key"]) for e in events] == [("remove", "s:1")]
+    assert db.query(ActiveSession).filter_by(redis_session_key="s:1").one().is_active is False
+
+    unlocked, events = asyncio.run(_call(session_monitoring.unlock_account))
+    assert unlocked["data"]["unlocked"] is True and events == []
+    assert [a.action_type for a in db.query(AccountSecurityAction).order_by(AccountSecurityAction.id)] == [
+        SessionActionType.ACCOUNT_LOCKED, SessionActionType.ACCOUNT_UNLOCKED,
+    ]
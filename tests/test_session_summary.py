@@ -0,0 +1,102 @@
+"""
+Tests del read model de sesiones DSAM (dashboard + vista agrupada paginada).
+"""
+import asyncio
+
+import pytest
+
+from app.models.database import ActiveSession, Customer, SessionGeoDailyRollup, SessionGeoEvent, SessionTenantSummary
+from app.services import session_monitor
+from app.services.session_locations import last_location_index
+from app.services.session_summary import (
+    decode_summary_cursor, list_tenant_summaries, refresh_session_summaries,
+)
+from tests.conftest import TestingSessionLocal
+
+_MODELS = (ActiveSession, SessionGeoEvent, SessionGeoDailyRollup, SessionTenantSummary, Customer)
+
+
+@pytest.fixture
+def db():
+    session = TestingSessionLocal()
+    for model in _MODELS:
+        session.query(model).delete()
+    session.commit()
+    last_location_index.reset()
+    yield session
+    session.rollback()
+    for model in _MODELS:
+        session.query(model).delete()
+    session.commit()
+    session.close()
+
+
+def _scan_of(entries):
+    async def _scan(failed_sources=None):
+        return [
+            {"redis_key": key, "tenant_db": tenant,
+             "data": {"db": tenant, "uid": i, "login": login, "ip": "181.1.1.1"}}
+            for i, (key, tenant, login) in enumerate(entries)
+        ]
+    return _scan
+
+
+def test_sync_maintains_summary_and_dashboard_stats(db, monkeypatch):
+    db.add(Customer(email="owner@acme.com", full_name="A", company_name="Acme", subdomain="acme"))
+    db.commit()
+    geo = {"country": "Dominican Republic", "country_code": "DO", "region": None,
+           "city": "Santiago", "lat": 19.45, "lon": -70.69}
+    monkeypatch.setattr(session_monitor, "geolocate_ip", lambda ip: dict(geo))
+    monkeypatch.setattr(session_monitor, "scan_redis_sessions", _scan_of([
+        ("a:1", "acme", "ana@acme.com"), ("a:2", "acme", "ana@acme.com"),
+        ("a:3", "acme", "owner@acme.com"), ("b:1", "beta", "eva@beta.com"),
+    ]))
+    asyncio.run(session_monitor.sync_sessions_to_db(db))
+
+    stats = asyncio.run(session_monitor.get_session_stats(db))
+    assert stats["total_active"] == 4
+    assert stats["by_tenant"] == [{"tenant": "acme", "count": 3}, {"tenant": "beta", "count": 1}]
+    assert stats["by_country"] == [{"code": "DO", "country": "Dominican Republic", "count": 4}]
+
+    acme = db.query(SessionTenantSummary).filter_by(tenant_db="acme").one()
+    assert (acme.customer_name, acme.billable_users, acme.operational_users) == ("Acme", 1, 1)
+    assert [u["session_count"] for u in acme.users] == [2, 1]
+
+    # beta desaparece de Redis: pierde su fila en el read model
+    monkeypatch.setattr(session_monitor, "scan_redis_sessions", _scan_of([("a:1", "acme", "ana@acme.com")]))
+    asyncio.run(session_monitor.sync_sessions_to_db(db))
+    stats = asyncio.run(session_monitor.get_session_stats(db))
+    assert stats["by_tenant"] == [{"tenant": "acme", "count": 1}]
+
+
+def test_scoped_refresh_and_cursor_pagination(db):
+    for tenant, count in (("t1", 3), ("t2", 2), ("t3", 2), ("t4", 1)):
+        db.add_all([
+            ActiveSession(redis_session_key=f"{tenant}:{i}", tenant_db=tenant, odoo_login=f"u{i}@{tenant}",
+                          ip_address="10.0.0.1", is_active=True)
+            for i in range(count)
+        ])
+    db.commit()
+    assert refresh_session_summaries(db) == 4
+
+    # Solo se recalcula el tenant indicado
+    db.query(ActiveSession).filter_by(redis_session_key="t4:0").update({"is_active": False})
+    db.add(ActiveSession(redis_session_key="t1:9", tenant_db="t1", odoo_login="u9@t1",
+                         ip_address="10.0.0.1", is_active=True))
+    assert refresh_session_summaries(db, {"t4"}) == 0
+    db.commit()
+    assert {r.tenant_db: r.total_sessions for r in db.query(SessionTenantSummary)} == {"t1": 3, "t2": 2, "t3": 2}
+
+    page, meta = list_tenant_summaries(db, limit=2)
+    assert [g["tenant_db"] for g in page] == ["t1", "t2"]
+    assert (meta["total_tenants"], meta["total_sessions"], meta["total_users"]) == (3, 7, 7)
+    assert decode_summary_cursor(meta["next_cursor"]) == (2, "t2")
+
+    page, meta = list_tenant_summaries(db, cursor=meta["next_cursor"], limit=2)
+    assert [g["tenant_db"] for g in page] == ["t3"] and meta["next_cursor"] is None
+
+    page, meta = list_tenant_summaries(db, tenant="t2")
+    assert [g["tenant_db"] for g in page] == ["t2"] and meta["total_sessions"] == 2
+
+    with pytest.raises(ValueError):
+        list_tenant_summaries(db, cursor="sin-separador")
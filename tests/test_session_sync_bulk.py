@@ -0,0 +1,95 @@
+"""
+Tests del upsert masivo de sync_sessions_to_db frente al camino fila por fila.
+"""
+import asyncio
+
+import pytest
+
+from app.models.database import ActiveSession, SessionGeoEvent
+from app.services import session_monitor
+from app.services.session_monitor import sync_sessions_to_db
+from tests.conftest import TestingSessionLocal
+
+GEO = {
+    "181.1.1.1": {"country": "Dominican Republic", "country_code": "DO", "region": None,
+                  "city": "Santo Domingo", "lat": 18.47, "lon": -69.89},
+    "81.2.2.2": {"country": "Spain", "country_code": "ES", "region": None,
+                 "city": "Madrid", "lat": 40.41, "lon": -3.70},
+}
+EMPTY_GEO = {"country": None, "country_code": None, "region": None, "city": None, "lat": None, "lon": None}
+
+
+def _raw(key, login, ip, user_agent=None):
+    data = {"db": "t1", "uid": 1, "login": login, "ip": ip}
+    if user_agent:
+        data["user_agent"] = user_agent
+    return {"redis_key": key, "tenant_db": "t1", "data": data}
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(session_monitor, "geolocate_ip", lambda ip: dict(GEO.get(ip, EMPTY_GEO)))
+    session = TestingSessionLocal()
+    session.query(ActiveSession).delete()
+    session.query(SessionGeoEvent).delete()
+    session.commit()
+    yield session
+    session.query(ActiveSession).delete()
+    session.query(SessionGeoEvent).delete()
+    session.commit()
+    session.close()
+
+
+def _run_rounds(db, monkeypatch, rounds):
+    for raw_sessions in rounds:
+        async def _scan(failed_sources=None, raw_sessions=raw_sessions):
+            return raw_sessions
+        monkeypatch.setattr(session_monitor, "scan_redis_sessions", _scan)
+        stats = asyncio.run(sync_sessions_to_db(db))
+    sessions = {
+        s.redis_session_key: (s.is_active, s.ip_address, s.geo_city, s.user_agent, s.odoo_login)
+        for s in db.query(ActiveSession).all()
+    }
+    events = sorted((e.odoo_login, e.geo_city) for e in db.query(SessionGeoEvent).all())
+    return stats, sessions, events
+
+
+ROUNDS = [
+    [
+        _raw("s:a", "a@t1", "181.1.1.1", user_agent="Firefox"),
+        _raw("s:b", "b@t1", "0.0.0.0"),
+        _raw("s:c", "c@t1", "181.1.1.1"),
+    ],
+    [
+        _raw("s:a", "a@t1", "81.2.2.2"),       # cambio de IP real → nuevo evento geo
+        _raw("s:b", "b@t1", "0.0.0.0"),        # placeholder: conserva IP
+        _raw("s:d", "d@t1", "81.2.2.2"),       # nueva; s:c desaparece
+    ],
+]
+
+
+def test_bulk_path_matches_rowwise(db, monkeypatch):
+    bulk_stats, bulk_sessions, bulk_events = _run_rounds(db, monkeypatch, ROUNDS)
+
+    db.query(ActiveSession).delete()
+    db.query(SessionGeoEvent).delete()
+    db.commit()
+    monkeypatch.setattr(session_monitor, "_supports_bulk_upsert", lambda _db: False)
+    row_stats, row_sessions, row_events = _run_rounds(db, monkeypatch, ROUNDS)
+
+    assert bulk_stats == row_stats == {"scanned": 3, "created": 1, "updated": 2, "removed": 1}
+    assert bulk_sessions == row_sessions
+    assert bulk_events == row_events
+    assert bulk_sessions["s:a"] == (True, "81.2.2.2", "Madrid", "Firefox", "a@t1")
+    assert bulk_sessions["s:c"][0] is False
+    assert bulk_events.count(("a@t1", "Madrid")) == 1
+
+
+def test_bulk_path_keeps_first_seen(db, monkeypatch):
+    _run_rounds(db, monkeypatch, ROUNDS[:1])
+    first_seen = db.query(ActiveSession).filter_by(redis_session_key="s:a").one().first_seen_at
+    db.expire_all()
+    _run_rounds(db, monkeypatch, ROUNDS[1:])
+    row = db.query(ActiveSession).filter_by(redis_session_key="s:a").one()
+    assert row.first_seen_at == first_seen
+    assert row.last_polled_at > first_seen
